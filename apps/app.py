@@ -92,4 +92,10 @@ def create_app(config_key):
 
     app.register_blueprint(notfound_views.notfound, url_prefix="/notfound")
 
+    # 識別番号の採番テーブル（flask db migrate を実行していないデータベースでも登録できるよう、なければ作成する）
+    from apps.register.models import MainIdSequence
+
+    with app.app_context():
+        MainIdSequence.__table__.create(db.engine, checkfirst=True)
+
     return app
@@ -1,26 +1,37 @@
 import os
-import torch
-from ultralytics import YOLO
 from PIL import Image
 import numpy as np
 from pathlib import Path
 
+from core import classifier
+
 class YOLOPredictor:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, service=None):
         """
         YOLOモデルの初期化
         Args:
             model_path: カスタムモデルのパス（Noneの場合は事前学習済みモデルを使用）
+            service: core.inference.InferenceService（指定した場合はモデルを読み込まずにサービスで推論）
         """
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"Using device: {self.device}")
-        
-        if model_path and os.path.exists(model_path):
-            # カスタムモデルを使用
-            self.model = YOLO(model_path)
+        self.service = service
+        if service is not None:
+            # プロセス共有のモデルを使用（torch はサービスのスレッドで読み込まれる）
+            self.device = None
+            self.model = None
         else:
-            # 事前学習済みのYOLO v8nモデルを使用
-            self.model = YOLO('yolov8n.pt')
+            # torch / ultralytics は読み込みに時間がかかるため、使うときに読み込む
+            import torch
+            from ultralytics import YOLO
+
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            print(f"Using device: {self.device}")
+            
+            if model_path and os.path.exists(model_path):
+                # カスタムモデルを使用
+                self.model = YOLO(model_path)
+            else:
+                # 事前学習済みのYOLO v8nモデルを使用
+                self.model = YOLO('yolov8n.pt')
         
         # 拾得物の分類カテゴリ
         self.item_categories = {
@@ -87,7 +98,10 @@ class YOLOPredictor:
                 return {"error": "画像ファイルが見つかりません"}
             
             # YOLOで推論実行
-            results = self.model(image_path, conf=confidence_threshold)
+            if self.service is not None:
+                results = [self.service.predict(image_path, conf=confidence_threshold)]
+            else:
+                results = self.model(image_path, conf=confidence_threshold)
             
             if not results or len(results) == 0:
                 return {"category": "その他", "confidence": 0.0, "detected_objects": []}
@@ -142,109 +156,11 @@ class YOLOPredictor:
         Returns:
             str: 拾得物カテゴリ名
         """
-        # カテゴリマッピング辞書
-        category_mapping = {
-            # かばん類
-            "backpack": "かばん類",
-            "handbag": "かばん類",
-            "suitcase": "かばん類",
-            
-            # 袋・封筒類
-            "plastic bag": "袋・封筒類",
-            
-            # カメラ類
-            "camera": "カメラ類",
-            
-            # 証明書類・カード類
-            "card": "証明書類・カード類",
-            "id card": "証明書類・カード類",
-            
-            # 衣類・履物類
-            "tie": "衣類・履物類",
-            "shirt": "衣類・履物類",
-            "pants": "衣類・履物類",
-            "shoes": "衣類・履物類",
-            
-            # 生活用品類
-            "bottle": "生活用品類",
-            "cup": "生活用品類",
-            "bowl": "生活用品類",
-            "fork": "生活用品類",
-            "knife": "生活用品類",
-            "spoon": "生活用品類",
-            
-            # 書類・紙類
-            "book": "書類・紙類",
-            "newspaper": "書類・紙類",
-            "magazine": "書類・紙類",
-            
-            # 電気製品類
-            "tv": "電気製品類",
-            "laptop": "電気製品類",
-            "cell phone": "携帯電話類",
-            "remote": "電気製品類",
-            "keyboard": "電気製品類",
-            "mouse": "電気製品類",
-            "microwave": "電気製品類",
-            "oven": "電気製品類",
-            "refrigerator": "電気製品類",
-            
-            # 食料品類
-            "banana": "食料品類",
-            "apple": "食料品類",
-            "orange": "食料品類",
-            "sandwich": "食料品類",
-            "hot dog": "食料品類",
-            "pizza": "食料品類",
-            "donut": "食料品類",
-            "cake": "食料品類",
-            
-            # めがね類
-            "glasses": "めがね類",
-            
-            # 趣味娯楽用品類
-            "sports ball": "趣味娯楽用品類",
-            "baseball bat": "趣味娯楽用品類",
-            "tennis racket": "趣味娯楽用品類",
-            "skateboard": "趣味娯楽用品類",
-            "surfboard": "趣味娯楽用品類",
-            
-            # 医療・化粧品類
-            "toothbrush": "医療・化粧品類",
-            
-            # 手帳文具類
-            "pen": "手帳文具類",
-            "pencil": "手帳文具類",
-            
-            # 小包・箱類
-            "box": "小包・箱類",
-            "package": "小包・箱類",
-            
-            # 有価証券類
-            "money": "有価証券類",
-            "coin": "有価証券類",
-            
-            # かさ類
-            "umbrella": "かさ類",
-            
-            # 財布類
-            "wallet": "財布類",
-            
-            # 時計類
-            "clock": "時計類",
-            "watch": "時計類",
-            
-            # 鍵類
-            "key": "鍵類",
-        }
-        
-        # マッピングを試行
-        for key, value in category_mapping.items():
-            if key.lower() in detected_category.lower():
-                return value
-        
-        # デフォルトは「その他」
-        return "その他"
+        # item_classification.json のキーワードと検出モデルのクラス名で採点（core/classifier.py）
+        result = classifier.classify(detected_category)
+        if result is None:
+            return "その他"
+        return result["large_category"]
 
     def get_model_info(self):
         """
@@ -254,7 +170,7 @@ class YOLOPredictor:
         """
         return {
             "model_type": "YOLO",
-            "device": str(self.device),
+            "device": str(self.device) if self.device is not None else "inference service",
             "available_categories": len(self.coco_categories),
             "item_categories": len(self.item_categories)
         } 
\ No newline at end of file
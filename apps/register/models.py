@@ -247,3 +247,11 @@ class NotFound(db.Model):
 
     def to_dict(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+
+
+# 管理番号の採番（拾得者区分・年ごとの連番の最後の値）
+class MainIdSequence(db.Model):
+    __tablename__ = "main_id_sequence"
+    choice_finder = db.Column(db.String, primary_key=True)
+    current_year = db.Column(db.Integer, primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
@@ -7,10 +7,6 @@ from datetime import datetime
 from pathlib import Path
 
 import requests
-import torch
-import torch.nn as nn
-import torchvision.models as models
-import torchvision.transforms as transforms
 from flask import (
     Blueprint,
     current_app,
@@ -23,7 +19,7 @@ from flask import (
     flash,
 )
 from PIL import Image
-from sqlalchemy import func
+from sqlalchemy import func, text
 
 from apps.app import db
 from apps.config import ITEM_CLASS_L, ITEM_CLASS_M, ITEM_CLASS_S, LAMBDA_ENDPOINT
@@ -34,9 +30,9 @@ from apps.register.forms import (
     ThirdPartyLostItemForm,
     FreeFlowLostItemForm,
 )
-from apps.register.model_folder.predict import img2text
-from apps.register.model_folder.yolo_predict import YOLOPredictor
-from apps.register.models import LostItem
+from apps.register.models import LostItem, MainIdSequence
+from core import inference
+from core.sequences import format_main_id
 
 from . import send_s3
 
@@ -124,10 +120,10 @@ def predict_with_yolo(image_path, confidence_threshold=0.5):
         str: 予測されたカテゴリ名
     """
     try:
-        # YOLOモデルの初期化（初回のみ）
+        # YOLOモデルの初期化（初回のみ、モデルはプロセス共有の推論サービスが保持する）
         if not hasattr(predict_with_yolo, 'predictor'):
-            model_path = Path(current_app.root_path, "register", "model_folder", "yolo_model.pt")
-            predict_with_yolo.predictor = YOLOPredictor(model_path if model_path.exists() else None)
+            from apps.register.model_folder.yolo_predict import YOLOPredictor
+            predict_with_yolo.predictor = YOLOPredictor(service=inference.get_service(inference.FLASK_MODEL_CANDIDATES))
         
         # 推論実行
         result = predict_with_yolo.predictor.predict_item_category(image_path, confidence_threshold)
@@ -232,7 +228,8 @@ def register_item(choice_finder, use_AI):
         #     current_app.root_path, "register", "model_folder", "model.pth"
         # )
         # if model_path.exists():
-        #     # img2text関数を実行してテキストを取得
+        #     # img2text関数を実行してテキストを取得（open_clip は使うときに読み込む）
+        #     from apps.register.model_folder.predict import img2text
         #     text = img2text(model_path, root_path)
         # else:
         #     text = ""
@@ -242,6 +239,10 @@ def register_item(choice_finder, use_AI):
         result = predict_with_yolo(str(root_path))
         print(f"YOLO推論結果: {result}")
         # ラズパイでの推論
+        # import torch
+        # import torch.nn as nn
+        # import torchvision.models as models
+        # import torchvision.transforms as transforms
         # device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         # vgg_model_path = Path(
         #     current_app.root_path, "register", "model_folder", "vgg_model.pth"
@@ -311,7 +312,7 @@ def register_item(choice_finder, use_AI):
             s3_image_path = os.path.join(basedir, "renamed_images", moved_path)
             send_s3.send_image_S3(s3_image_path, request.form.get("item_class_L"))
             ownerlostitem = LostItem(
-                main_id=main_id,
+                main_id=allocate_main_id(choice_finder, current_year),
                 current_year=current_year,
                 choice_finder=choice_finder,
                 # track_num=form.track_num.data,
@@ -374,7 +375,7 @@ def register_item(choice_finder, use_AI):
             s3_image_path = os.path.join(basedir, "renamed_images", moved_path)
             send_s3.send_image_S3(s3_image_path, request.form.get("item_class_L"))
             thirdpartylostitem = LostItem(
-                main_id=main_id,
+                main_id=allocate_main_id(choice_finder, current_year),
                 current_year=current_year,
                 choice_finder=choice_finder,
                 # track_num=form.track_num.data,
@@ -447,22 +448,54 @@ def register_item(choice_finder, use_AI):
     )
 
 
-# 識別番号の生成関数
+# 識別番号の生成関数（画面表示用。登録する番号は登録時に allocate_main_id で確定する）
 def generate_main_id(choice_finder, current_year):
-    # choice_finderとcurrent_yearが一致するレコードの数をカウント
-    count = (
-        db.session.query(func.count(LostItem.id))
+    sequence = MainIdSequence.query.get((choice_finder, current_year))
+    if sequence:
+        last_value = sequence.last_value
+    else:
+        last_value = last_main_number(choice_finder, current_year)
+    return format_main_id(choice_finder, current_year, last_value + 1)
+
+
+# 登録済みの連番の最大値（採番テーブルにない区分・年の最初の採番でだけ数える）
+def last_main_number(choice_finder, current_year):
+    count, largest = (
+        db.session.query(func.count(LostItem.id), func.max(LostItem.main_id))
         .filter(
             LostItem.choice_finder == choice_finder,
             LostItem.current_year == current_year,
         )
-        .scalar()
+        .one()
     )
-    if choice_finder == "占有者拾得":
-        identifier = f"1{current_year:02}{count+1:05}"
-    else:
-        identifier = f"2{current_year:02}{count+1:05}"
-    return identifier
+    return max(count, (largest or 0) % 100000)
+
+
+# 登録時の識別番号の採番
+# 採番テーブルの UPDATE で書き込みロックを取り、登録と同じ db.session.commit() で確定する
+# （同時に登録しても番号は重ならず、登録に失敗した場合は番号も戻る）
+# 区分・年の最初の採番は、登録済みの最大値から始める行の INSERT と連番を進める UPDATE を
+# 1つの文（ON CONFLICT）で行い、同時に最初の採番をしても主キーの重複で失敗しないようにする
+SEED_MAIN_ID_SEQUENCE = text("""
+    INSERT INTO main_id_sequence (choice_finder, current_year, last_value)
+    SELECT :choice_finder, :current_year, MAX(COUNT(id), COALESCE(MAX(main_id), 0) % 100000) + 1
+    FROM lost_item WHERE choice_finder = :choice_finder AND current_year = :current_year
+    ON CONFLICT(choice_finder, current_year) DO UPDATE SET last_value = last_value + 1
+""")
+
+
+def allocate_main_id(choice_finder, current_year):
+    key = {"choice_finder": choice_finder, "current_year": current_year}
+    updated = MainIdSequence.query.filter_by(**key).update(
+        {MainIdSequence.last_value: MainIdSequence.last_value + 1},
+        synchronize_session=False,
+    )
+    if not updated:
+        db.session.execute(SEED_MAIN_ID_SEQUENCE, key)
+    last_value = (
+        db.session.query(MainIdSequence.last_value).filter_by(**key).scalar()
+    )
+    return format_main_id(choice_finder, current_year, last_value)
 
 
 # 画像の表示
@@ -621,7 +654,7 @@ def freeflow_register_item(choice_finder, use_AI):
             
             # 拾得物オブジェクトを作成
             lostitem = LostItem(
-                main_id=main_id,
+                main_id=allocate_main_id(choice_finder, current_year),
                 current_year=current_year,
                 choice_finder=choice_finder,
                 notify=form.notify.data,
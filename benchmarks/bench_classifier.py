@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+分類の推定のベンチマーク
+core.classifier（Aho–Corasick で1回走査）と、以前の推定を比較する。
+
+    - 検出モデルのクラス名: 以前の AI分類画面の any(keyword in ...) の連鎖
+    - 自由記述（特徴・遺失届の品物）: 以前の matching.LostReport のキーワードごとの `in` と replace
+
+使い方:
+    python benchmarks/bench_classifier.py [回数]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core import classifier, taxonomy
+
+REPEAT = 20_000
+TEXTS = 2_000
+
+LABELS = [
+    "handbag", "backpack", "suitcase", "cell phone", "umbrella", "wallet", "book", "bottle", "laptop",
+    "keyboard", "tie", "clock", "cup", "glasses", "key", "person", "chair", "lost_item", "Unknown_12",
+]
+
+# 以前の AI分類画面の推定（条件の順番と語は _estimate_classification のまま）
+CHAIN = [
+    (["cash", "money", "現金", "金", "coin", "coins", "硬貨", "紙幣"], "現金", "現金", []),
+    (["bag", "handbag", "backpack", "かばん", "バッグ", "tote", "purse", "briefcase", "suitcase"], "かばん類", "手提げかばん", [
+        (["hand", "手提げ", "handbag", "tote"], "手提げかばん"),
+        (["shoulder", "肩掛け", "shoulder"], "肩掛けかばん"),
+        (["backpack", "リュック", "rucksack"], "肩掛けかばん"),
+    ]),
+    (["wallet", "purse", "財布", "がま口", "coin_purse", "card_case"], "財布類", "財布", [
+        (["がま口", "coin_purse"], "がま口"),
+    ]),
+    (["phone", "mobile", "携帯", "スマホ", "smartphone", "iphone", "android"], "携帯電話類", "携帯電話機", []),
+    (["watch", "clock", "時計", "腕時計", "wristwatch"], "時計類", "腕時計", []),
+    (["glasses", "eyeglasses", "めがね", "眼鏡", "sunglasses", "サングラス"], "めがね類", "めがね", []),
+    (["key", "keys", "鍵", "キー", "keychain", "キーホルダー"], "鍵類", "鍵", []),
+    (["umbrella", "傘", "かさ", "parasol", "日傘"], "かさ類", "かさ", []),
+    (["clothes", "clothing", "shirt", "jacket", "衣類", "服", "coat", "blouse", "dress"], "衣類・履物類", "上着類", []),
+    (["shoe", "shoes", "boot", "靴", "履物", "sneaker", "sandal"], "衣類・履物類", "履物類", []),
+    (["hat", "cap", "帽子", "beanie", "cap"], "衣類・履物類", "帽子類", []),
+    (["glove", "gloves", "手袋", "mittens"], "衣類・履物類", "手袋", []),
+]
+
+
+def classify_with_chain(detected_class):
+    detected_class_lower = detected_class.lower()
+    for keywords, large, medium, branches in CHAIN:
+        if any(keyword in detected_class_lower for keyword in keywords):
+            for sub_keywords, sub_medium in branches:
+                if any(keyword in detected_class_lower for keyword in sub_keywords):
+                    return large, sub_medium
+            return large, medium
+    return "その他", "その他"
+
+
+def scores_with_loop(text, terms):
+    """以前の matching.LostReport の集計（長い語から順に `in` で探して replace）"""
+    mediums = {}
+    remaining = text
+    for term, weight, large, medium in terms:
+        if term in remaining:
+            remaining = remaining.replace(term, " ")
+            mediums[medium] = mediums.get(medium, 0.0) + weight
+    return mediums
+
+
+def make_texts(terms, count):
+    """特徴の記述に近い合成の文字列（キーワード 1〜2語 + 色・素材など）"""
+    rng = random.Random(0)
+    extras = ["黒い", "白色の", "革製の", "布製の", "ブランド不明", "傷あり", "中身なし", "名前の記載あり"]
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(terms)[0] for _ in range(rng.randint(1, 2))] + rng.sample(extras, 2)
+        rng.shuffle(words)
+        texts.append("、".join(words))
+    return texts
+
+
+def measure(label, func, items, repeat):
+    started = time.perf_counter()
+    for i in range(repeat):
+        func(items[i % len(items)])
+    elapsed = time.perf_counter() - started
+    per_call = elapsed / repeat * 1e6
+    print(f"  {label}: {per_call:.2f}µs/回")
+    return per_call
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else REPEAT
+    terms = taxonomy.load().keywords
+
+    started = time.perf_counter()
+    clf = classifier.KeywordClassifier(taxonomy.load())
+    print(f"オートマトンの組み立て: {(time.perf_counter() - started) * 1000:.1f}ms"
+          f"（{len(clf.entries):,}語 / 状態 {len(clf.matcher._goto):,}）")
+
+    print(f"検出モデルのクラス名（{len(LABELS)}種類 x {repeat:,}回）")
+    old = measure("以前の any() の連鎖", classify_with_chain, LABELS, repeat)
+    new = measure("Aho–Corasick", clf.classify, LABELS, repeat)
+    print(f"  -> {old / new:.1f}倍")
+
+    texts = make_texts(terms, TEXTS)
+    print(f"自由記述（{len(terms):,}語の重み付きキーワード、{len(texts):,}件 x {repeat // 10:,}回）")
+    old = measure("以前のキーワードごとの in", lambda text: scores_with_loop(text, terms), texts, repeat // 10)
+    new = measure("Aho–Corasick", clf.scores, texts, repeat // 10)
+    print(f"  -> {old / new:.1f}倍")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+日付条件のベンチマーク
+DATE(get_item) = ? / strftime('%Y-%m', get_item) = ? と、core.query の半開区間条件を
+合成した lost_items テーブル（既定 50万件）上で比較する
+
+使い方:
+    python benchmarks/bench_date_predicates.py [件数]
+"""
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.query import Where
+
+ROWS = 500_000
+YEARS = 5
+REPEAT = 20
+
+
+def build_database(path, rows):
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("""
+        CREATE TABLE lost_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            get_item TEXT,
+            get_item_hour INTEGER,
+            item_situation TEXT,
+            item_class_L TEXT
+        )
+    """)
+    start = date.today() - timedelta(days=365 * YEARS)
+    rng = random.Random(0)
+    classes = ["貴重品", "衣類・履物", "電化製品", "文房具・書籍", "その他"]
+
+    def generate():
+        for _ in range(rows):
+            d = start + timedelta(days=rng.randrange(365 * YEARS))
+            yield (d.isoformat(), rng.randrange(24), "保管中", rng.choice(classes))
+
+    conn.executemany(
+        "INSERT INTO lost_items (get_item, get_item_hour, item_situation, item_class_L) VALUES (?, ?, ?, ?)",
+        generate(),
+    )
+    conn.execute("CREATE INDEX idx_lost_items_get_item ON lost_items(get_item)")
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn
+
+
+def measure(conn, sql, params):
+    """REPEAT回実行した平均時間（ミリ秒）と結果を返す"""
+    result = None
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        result = conn.execute(sql, params).fetchone()[0]
+    elapsed = (time.perf_counter() - started) / REPEAT * 1000
+    return elapsed, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{rows:,}件の合成データを作成中...")
+        conn = build_database(Path(tmp) / "bench.db", rows)
+
+        target_day = date.today() - timedelta(days=100)
+        target_month = target_day.strftime("%Y-%m")
+        day_where = Where().on_day("get_item", target_day)
+        month_where = Where().in_month("get_item", target_month)
+        range_where = Where().date_between("get_item", target_day - timedelta(days=6), target_day)
+
+        cases = [
+            (
+                "日指定",
+                ("SELECT COUNT(*) FROM lost_items WHERE DATE(get_item) = ?", (target_day.isoformat(),)),
+                (f"SELECT COUNT(*) FROM lost_items {day_where.sql()}", day_where.params),
+            ),
+            (
+                "月指定",
+                ("SELECT COUNT(*) FROM lost_items WHERE strftime('%Y-%m', get_item) = ?", (target_month,)),
+                (f"SELECT COUNT(*) FROM lost_items {month_where.sql()}", month_where.params),
+            ),
+            (
+                "7日間",
+                (
+                    "SELECT COUNT(*) FROM lost_items WHERE DATE(get_item) BETWEEN ? AND ?",
+                    ((target_day - timedelta(days=6)).isoformat(), target_day.isoformat()),
+                ),
+                (f"SELECT COUNT(*) FROM lost_items {range_where.sql()}", range_where.params),
+            ),
+        ]
+
+        print(f"{'条件':<8}{'関数で包む(ms)':>16}{'範囲条件(ms)':>14}{'倍率':>8}")
+        for label, (old_sql, old_params), (new_sql, new_params) in cases:
+            old_ms, old_count = measure(conn, old_sql, old_params)
+            new_ms, new_count = measure(conn, new_sql, new_params)
+            assert old_count == new_count, f"{label}: 件数が一致しません ({old_count} != {new_count})"
+            ratio = old_ms / new_ms if new_ms else float("inf")
+            print(f"{label:<8}{old_ms:>16.2f}{new_ms:>14.2f}{ratio:>7.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+一括取り込みのベンチマーク
+合成した拾得物の CSV（既定 10万件）を、空のデータベースに core.bulk_import で取り込む時間を測る。
+インデックスを外して取り込む場合（既定）と、外さない場合（--keep-indexes）を比較する。
+
+使い方:
+    python benchmarks/bench_import.py [件数]
+"""
+import csv
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core import bulk_import, db, taxonomy
+from core.export import LOST_ITEM_COLUMNS
+
+ROWS = 100_000
+YEARS = 5
+
+
+def write_csv(path, rows):
+    """日本語の見出しの CSV を作成（分類は item_classification.json の組み合わせから選ぶ）"""
+    tax = taxonomy.load()
+    triples = [
+        (large, medium, small)
+        for large in tax.large
+        for medium in tax.mediums(large)
+        for small in tax.smalls(medium) or [""]
+    ]
+    rng = random.Random(0)
+    start = date.today() - timedelta(days=365 * YEARS)
+    columns = ["choice_finder", "get_item", "get_item_hour", "get_item_minute", "find_area",
+               "item_class_L", "item_class_M", "item_class_S", "item_color", "item_feature", "item_value"]
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow([LOST_ITEM_COLUMNS[c] for c in columns])
+        for i in range(rows):
+            large, medium, small = rng.choice(triples)
+            writer.writerow([
+                rng.choice(["占有者拾得", "第三者拾得"]),
+                (start + timedelta(days=rng.randrange(365 * YEARS))).isoformat(),
+                rng.randrange(24),
+                rng.randrange(60),
+                rng.choice(["1F ロビー", "2F 売場", "駐車場", "トイレ"]),
+                large, medium, small,
+                rng.choice(["黒", "白", "赤", "青"]),
+                f"過去台帳 {i}",
+                rng.choice(["", "1"]),
+            ])
+
+
+def run(csv_path, db_path, rebuild_indexes):
+    result = bulk_import.import_csv(csv_path, db_path=db_path, rebuild_indexes=rebuild_indexes)
+    db.close_all()
+    return result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "items.csv"
+        print(f"{rows:,}件の合成 CSV を作成中...")
+        write_csv(csv_path, rows)
+
+        for label, rebuild_indexes in (("インデックスを外して取り込み", True), ("インデックスを保ったまま取り込み", False)):
+            db_path = Path(tmp) / f"bench_{int(rebuild_indexes)}.db"
+            started = time.perf_counter()
+            result = run(csv_path, db_path, rebuild_indexes)
+            elapsed = time.perf_counter() - started
+            print(f"{label}: {result['imported']:,}件 {elapsed:.2f}秒（{result['imported'] / elapsed:,.0f}件/秒）"
+                  f"  不正な行 {len(result['errors'])}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+マッチングのベンチマーク
+合成した拾得物（既定 10万件）に対して、遺失届1件あたりの上位候補取得と、
+拾得物登録時の遺失届マッチングにかかる時間を計測する
+
+使い方:
+    python benchmarks/bench_matching.py [件数]
+"""
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core import db, matching, migrations
+
+ROWS = 100_000
+REPORTS = 2_000
+YEARS = 3
+QUERIES = 50
+AREAS = ["1階 正面入口", "2階 フードコート", "3階 映画館", "駐車場", "トイレ", "エレベーター前"]
+COLORS = list(matching.COLOR_TERMS)
+
+
+def build_database(path, rows):
+    migrations.migrate(path)
+    conn = db.connect(path)
+    terms = matching.load_terms()
+    start = date.today() - timedelta(days=365 * YEARS)
+    rng = random.Random(0)
+
+    def generate():
+        for _ in range(rows):
+            term, _, large, medium = rng.choice(terms)
+            d = start + timedelta(days=rng.randrange(365 * YEARS))
+            color = rng.choice(COLORS)
+            yield (
+                "x", 25, "占有者拾得", d.isoformat(), large, medium, term, color,
+                rng.choice(AREAS), f"{color}色の{term}", "保管中",
+            )
+
+    conn.execute("BEGIN")
+    conn.executemany(
+        """
+        INSERT INTO lost_items (main_id, current_year, choice_finder, get_item, item_class_L,
+            item_class_M, item_class_S, item_color, find_area, item_feature, item_situation)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        generate(),
+    )
+    reports = []
+    for _ in range(REPORTS):
+        term = rng.choice(terms)[0]
+        d = start + timedelta(days=rng.randrange(365 * YEARS))
+        reports.append(("遺失者", d.isoformat() + " 10:00:00", rng.choice(AREAS), f"{term} - {rng.choice(COLORS)}色"))
+    conn.executemany(
+        "INSERT INTO notfound_items (name, lost_date, location, item) VALUES (?, ?, ?, ?)", reports
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        print(f"{rows:,}件の合成データを作成中...")
+        conn = build_database(path, rows)
+        rng = random.Random(1)
+
+        report_ids = [r[0] for r in conn.execute("SELECT id FROM notfound_items")]
+        started = time.perf_counter()
+        found = 0
+        for notfound_id in rng.sample(report_ids, QUERIES):
+            found += len(matching.match_report(conn, notfound_id))
+        report_ms = (time.perf_counter() - started) / QUERIES * 1000
+
+        item_ids = [r[0] for r in conn.execute("SELECT id FROM lost_items LIMIT 20000")]
+        started = time.perf_counter()
+        for lost_item_id in rng.sample(item_ids, QUERIES):
+            matching.match_found_item(conn, lost_item_id)
+        item_ms = (time.perf_counter() - started) / QUERIES * 1000
+
+        print(f"遺失届 -> 拾得物（上位10件）: {report_ms:.1f} ms/件（平均候補 {found / QUERIES:.1f}件）")
+        print(f"拾得物 -> 遺失届（登録時）  : {item_ms:.1f} ms/件")
+        conn.close()
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+カメラプレビューのベンチマーク
+720p / 1080p の合成フレームについて、従来のプレビュー（フル解像度を PIL で JPEG 画質85）と
+縮小プレビュー（表示サイズに縮小して cv2.imencode で JPEG）の1フレームあたりの圧縮時間と、
+30fps で送った場合に Flet クライアントへ送るバイト数（base64 文字列）を比較する
+
+使い方:
+    python benchmarks/bench_preview.py [フレーム数]
+"""
+import base64
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core import camera
+
+FRAMES = 60
+FPS = 30
+PREVIEW_SIZE = (480, 360)
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080)}
+
+
+def synthetic_frames(width, height, count, seed=0):
+    """カメラ映像に近い合成フレーム（なだらかな濃淡とセンサーノイズ、少しずつ動く物体）"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([x / width * 180, y / height * 160, (x + y) / (width + height) * 200], axis=-1)
+    for i in range(count):
+        frame = base.copy()
+        cx, cy = int(width * (0.3 + 0.4 * i / count)), height // 2
+        frame[cy - height // 6:cy + height // 6, cx - width // 8:cx + width // 8] = (40, 60, 200)
+        frame += rng.normal(0, 6, frame.shape)
+        yield np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def encode_full_pil(frame, preview_size=None):
+    """変更前のプレビュー: フル解像度を RGB に変換して PIL で JPEG（画質85）"""
+    from PIL import Image
+
+    rgb_frame = camera.cv2.cvtColor(frame, camera.cv2.COLOR_BGR2RGB)
+    buffer = io.BytesIO()
+    Image.fromarray(rgb_frame).save(buffer, format="JPEG", quality=85)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def measure(encoder, frames):
+    sizes = []
+    started = time.perf_counter()
+    for frame in frames:
+        sizes.append(len(encoder(frame, PREVIEW_SIZE)))
+    elapsed = time.perf_counter() - started
+    return elapsed / len(frames) * 1000, sum(sizes) / len(sizes)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else FRAMES
+    encoders = {
+        "変更前（フル解像度 / PIL 画質85）": encode_full_pil,
+        f"縮小プレビュー（{PREVIEW_SIZE[0]}x{PREVIEW_SIZE[1]} / cv2 画質{camera.PREVIEW_QUALITY}）": camera.encode_preview,
+    }
+    for label, (width, height) in RESOLUTIONS.items():
+        frames = list(synthetic_frames(width, height, count))
+        print(f"=== {label} ({width}x{height}, {count}フレーム)")
+        for name, encoder in encoders.items():
+            encode_ms, frame_bytes = measure(encoder, frames)
+            print(
+                f"  {name}: 圧縮 {encode_ms:.1f} ms/フレーム, {frame_bytes / 1024:.0f} KB/フレーム, "
+                f"{frame_bytes * FPS / (1024 * 1024):.2f} MB/s（{FPS}fps）"
+            )
+
+
+if __name__ == "__main__":
+    main()
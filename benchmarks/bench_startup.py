@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+起動時間のベンチマーク
+python -X importtime で Flet アプリ・Flask アプリの import にかかる時間を計測し、
+時間のかかったモジュールの上位と、起動時に読み込むべきでない重いモジュールが
+含まれていないかを表示する
+
+使い方:
+    python benchmarks/bench_startup.py [表示件数]
+"""
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+TOP = 15
+
+# 起動時には読み込まず、使うとき（またはバックグラウンド）に読み込むモジュール
+HEAVY_MODULES = ["torch", "torchvision", "ultralytics", "cv2", "open_clip", "onnxruntime", "openvino"]
+
+TARGETS = {
+    "Flet アプリ": "import flet_app",
+    "Flask アプリ": "from apps.app import create_app; import apps.register.views",
+}
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile(statement):
+    """statement を -X importtime 付きで実行し、(モジュール, 自身の時間, 累積時間, 深さ) のリストを返す"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT_DIR, capture_output=True, text=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    error = completed.stderr.strip().splitlines()[-1] if completed.returncode else None
+    return rows, error
+
+
+def main():
+    top = int(sys.argv[1]) if len(sys.argv) > 1 else TOP
+    for label, statement in TARGETS.items():
+        rows, error = profile(statement)
+        print(f"=== {label}: {statement}")
+        if error:
+            print(f"  読み込みエラー（途中までの結果です）: {error}")
+        if not rows:
+            continue
+        total_ms = sum(row[2] for row in rows if row[3] == 0) / 1000
+        print(f"  import 合計: {total_ms:.0f} ms（{len(rows)}モジュール）")
+        print("  累積時間の上位（トップレベルの import）:")
+        for name, _, cumulative_us, _ in sorted((r for r in rows if r[3] == 0), key=lambda r: -r[2])[:top]:
+            print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+        loaded = sorted({row[0] for row in rows if row[0].split(".")[0] in HEAVY_MODULES and "." not in row[0]})
+        if loaded:
+            print(f"  ❌ 起動時に重いモジュールを読み込んでいます: {', '.join(loaded)}")
+        else:
+            print("  ✅ 起動時に重いモジュールは読み込んでいません")
+
+
+if __name__ == "__main__":
+    main()
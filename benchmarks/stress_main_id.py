@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+管理番号の採番の同時実行テスト
+複数のスレッド（それぞれ別の接続）から同時に拾得物を登録し、管理番号が重ならないこと・
+区分・年ごとに 1 から欠番なく並ぶことを確かめる。
+比較のため、以前の採番（登録件数を数えて + 1）で同じように登録した場合の重複数も表示する。
+
+使い方:
+    python benchmarks/stress_main_id.py [スレッド数] [1スレッドあたりの登録件数]
+"""
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core import db, migrations, sequences
+
+THREADS = 16
+ITEMS_PER_THREAD = 200
+CHOICES = ["占有者拾得", "第三者拾得"]
+YEARS = [24, 25]
+
+INSERT_SQL = "INSERT INTO lost_items (main_id, current_year, choice_finder, item_class_L) VALUES (?, ?, ?, 'その他')"
+
+
+def register_with_sequence(db_path, seed):
+    """採番テーブルで採番して登録（INSERT と同じ BEGIN IMMEDIATE のトランザクション）"""
+    rng = random.Random(seed)
+    conn = db.connect(db_path)
+    try:
+        for _ in range(ITEMS_PER_THREAD):
+            choice, year = rng.choice(CHOICES), rng.choice(YEARS)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                main_id = sequences.allocate(conn, choice, year)
+                conn.execute(INSERT_SQL, (main_id, year, choice))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.close()
+
+
+def register_with_count(db_path, seed):
+    """以前の採番（件数を数えてから別のトランザクションで登録）"""
+    rng = random.Random(seed)
+    conn = db.connect(db_path)
+    try:
+        for _ in range(ITEMS_PER_THREAD):
+            choice, year = rng.choice(CHOICES), rng.choice(YEARS)
+            count = conn.execute(
+                "SELECT COUNT(*) FROM lost_items WHERE choice_finder = ? AND current_year = ?", (choice, year)
+            ).fetchone()[0]
+            conn.execute(INSERT_SQL, (sequences.format_main_id(choice, year, count + 1), year, choice))
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def run(db_path, target):
+    errors = []
+
+    def worker(seed):
+        try:
+            target(db_path, seed)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    db.close_all()
+    if errors:
+        raise errors[0]
+    return elapsed
+
+
+def check(db_path):
+    """(登録件数, 重複した管理番号の数, 欠番のある区分・年の数)"""
+    conn = sqlite3.connect(str(db_path))
+    try:
+        rows = conn.execute("SELECT choice_finder, current_year, main_id FROM lost_items").fetchall()
+    finally:
+        conn.close()
+    duplicates = sum(n - 1 for n in Counter(main_id for _, _, main_id in rows).values() if n > 1)
+    numbers = {}
+    for choice, year, main_id in rows:
+        numbers.setdefault((choice, year), []).append(int(main_id[3:]))
+    gaps = sum(1 for values in numbers.values() if sorted(values) != list(range(1, len(values) + 1)))
+    return len(rows), duplicates, gaps
+
+
+def main():
+    global THREADS, ITEMS_PER_THREAD
+    if len(sys.argv) > 1:
+        THREADS = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        ITEMS_PER_THREAD = int(sys.argv[2])
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, target in (("採番テーブル", register_with_sequence), ("件数 + 1（以前の採番）", register_with_count)):
+            db_path = Path(tmp) / f"{target.__name__}.db"
+            migrations.migrate(db_path)
+            elapsed = run(db_path, target)
+            rows, duplicates, gaps = check(db_path)
+            print(f"{label}: {THREADS}スレッド {rows:,}件 {elapsed:.2f}秒  重複 {duplicates}件  欠番のある区分・年 {gaps}")
+            if target is register_with_sequence and (duplicates or gaps or rows != THREADS * ITEMS_PER_THREAD):
+                failed = True
+    if failed:
+        print("NG: 採番テーブルで管理番号が重複または欠番しました")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+共通処理パッケージ
+Fletアプリの各画面から利用するデータアクセス層など
+"""
+from .db import (
+    DEFAULT_DB_PATH,
+    ConnectionPool,
+    PooledConnection,
+    get_pool,
+    connect,
+    transaction,
+    query_all,
+    query_one,
+    query_scalar,
+    execute,
+    close_all,
+)
+from .migrations import (
+    MIGRATIONS,
+    migrate,
+    check_query_plans,
+)
+from .query import Where
+
+__all__ = [
+    "DEFAULT_DB_PATH",
+    "ConnectionPool",
+    "PooledConnection",
+    "get_pool",
+    "connect",
+    "transaction",
+    "query_all",
+    "query_one",
+    "query_scalar",
+    "execute",
+    "close_all",
+    "MIGRATIONS",
+    "migrate",
+    "check_query_plans",
+    "Where",
+]
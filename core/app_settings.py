@@ -0,0 +1,238 @@
+"""
+設定（settings テーブル）の読み書き
+登録フォームや設定画面を開くたびに settings テーブルを読み、JSON を解析していたため、
+settings テーブル全体をメモリに持ち、変わったときだけ読み直す。
+
+    - このモジュールの set() / set_many() で書き込むと、その場でキャッシュを捨てる
+    - 別のスレッド・別のプロセス（もう1台の端末など）の書き込みは、キャッシュ専用の接続の
+      PRAGMA data_version で検出する（他の接続がコミットすると値が変わる）
+    - data_version の確認は CHECK_INTERVAL 秒に1回だけ行い、それ以外は DB にアクセスしない
+
+使用例:
+    from core import app_settings
+    places = app_settings.find_places()
+    app_settings.set_json("find_places", places + ["4階 休憩室"])
+"""
+import copy
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from . import db
+
+# 他の接続の書き込みを確認する間隔（秒）
+CHECK_INTERVAL = 2.0
+
+DEFAULT_FIND_PLACES = ["1階 エントランス", "2階 トイレ前", "3階 会議室前"]
+DEFAULT_STAFF_LIST = ["佐藤", "鈴木", "田中", "高橋"]
+
+_UPSERT_SQL = """
+    INSERT INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+"""
+
+
+class SettingsCache:
+    """
+    1つのデータベースの settings テーブルのキャッシュ（スレッドセーフ）
+
+    data_version は接続ごとの値のため、キャッシュ専用の接続で読み込みと確認を行う。
+    """
+
+    def __init__(self, db_path, check_interval=CHECK_INTERVAL):
+        self.db_path = Path(db_path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._conn = None
+        self._values = None      # key -> value（文字列）
+        self._parsed = {}        # key -> JSON を解析した値
+        self._data_version = None
+        self._checked_at = 0.0
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(str(self.db_path), timeout=db.BUSY_TIMEOUT, check_same_thread=False)
+        return self._conn
+
+    def _data_version_now(self):
+        return self._connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def _load(self):
+        conn = self._connection()
+        try:
+            rows = conn.execute("SELECT key, value FROM settings").fetchall()
+        except sqlite3.OperationalError:
+            rows = []  # settings テーブルがまだない
+        self._values = dict(rows)
+        self._parsed = {}
+        self._data_version = self._data_version_now()
+
+    def _ensure_fresh(self):
+        """キャッシュが古ければ読み直す（ロック取得済みで呼ぶこと）"""
+        now = time.monotonic()
+        if self._values is not None and now - self._checked_at < self.check_interval:
+            return
+        if self._values is None or self._data_version_now() != self._data_version:
+            self._load()
+        self._checked_at = now
+
+    def invalidate(self):
+        """キャッシュを捨てる（次の読み込みで読み直す）"""
+        with self._lock:
+            self._values = None
+            self._parsed = {}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._values = None
+            self._parsed = {}
+
+    def all(self):
+        """すべての設定（key -> value の文字列）"""
+        with self._lock:
+            self._ensure_fresh()
+            return dict(self._values)
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._ensure_fresh()
+            return self._values.get(key, default)
+
+    def get_json(self, key, default=None):
+        """JSON の設定を解析した値（未設定・不正な JSON は default）。呼び出し側で変更してよいようコピーを返す"""
+        with self._lock:
+            self._ensure_fresh()
+            if key not in self._parsed:
+                raw = self._values.get(key)
+                try:
+                    self._parsed[key] = json.loads(raw) if raw else None
+                except ValueError:
+                    print(f"設定の JSON が不正です: {key}")
+                    self._parsed[key] = None
+            value = self._parsed[key]
+        return copy.deepcopy(value) if value is not None else default
+
+    def set_many(self, values):
+        """設定をまとめて保存してキャッシュを捨てる（値が文字列でなければ str に変換）"""
+        with db.transaction(self.db_path) as conn:
+            conn.executemany(
+                _UPSERT_SQL,
+                [(key, value if value is None or isinstance(value, str) else str(value)) for key, value in values.items()],
+            )
+        self.invalidate()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_path=None):
+    """データベースパスに対応する設定のキャッシュを取得"""
+    path = Path(db_path or db.DEFAULT_DB_PATH).resolve()
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = SettingsCache(path)
+            _caches[path] = cache
+        return cache
+
+
+def close_all():
+    """すべてのキャッシュの接続を閉じる（バックアップの復元時など）"""
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.close()
+
+
+# ----------------------------------------------------------------------
+# 読み書き
+# ----------------------------------------------------------------------
+def get(key, default=None, db_path=None):
+    return get_cache(db_path).get(key, default)
+
+
+def get_int(key, default=None, db_path=None):
+    """整数の設定（未設定・不正な値は default）"""
+    try:
+        return int(get(key, db_path=db_path))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_json(key, default=None, db_path=None):
+    return get_cache(db_path).get_json(key, default)
+
+
+def get_list(key, default=None, db_path=None):
+    """リストの設定（JSON の配列でなければ default のコピー）"""
+    value = get_json(key, db_path=db_path)
+    if isinstance(value, list):
+        return value
+    return list(default) if default is not None else []
+
+
+def set(key, value, db_path=None):
+    set_many({key: value}, db_path=db_path)
+
+
+def set_many(values, db_path=None):
+    get_cache(db_path).set_many(values)
+
+
+def set_json(key, value, db_path=None):
+    set(key, json.dumps(value, ensure_ascii=False), db_path=db_path)
+
+
+def invalidate(db_path=None):
+    get_cache(db_path).invalidate()
+
+
+# ----------------------------------------------------------------------
+# 画面で使う設定
+# ----------------------------------------------------------------------
+def _list_or_default(key, default, db_path=None):
+    """リストの設定（未設定の場合は default を保存して返す）"""
+    value = get_json(key, db_path=db_path)
+    if isinstance(value, list):
+        return value
+    if value is None and get(key, db_path=db_path) is None:
+        set_json(key, default, db_path=db_path)
+    return list(default)
+
+
+def base_storage_places():
+    """apps/config の STORAGE_PLACE の保管場所（apps/config がなければ空）"""
+    try:
+        from apps.config import STORAGE_PLACE
+    except ImportError:
+        return []
+    return [item[0] for item in STORAGE_PLACE]
+
+
+def find_places(db_path=None):
+    """拾得場所の一覧"""
+    return _list_or_default("find_places", DEFAULT_FIND_PLACES, db_path)
+
+
+def storage_places(db_path=None):
+    """保管場所の一覧（STORAGE_PLACE の保管場所 + 設定で追加した保管場所）"""
+    base_places = base_storage_places()
+    places = list(base_places)
+    for place in _list_or_default("storage_places", base_places, db_path):
+        if place not in places:
+            places.append(place)
+    return places
+
+
+def staff_list(db_path=None):
+    """担当者の一覧"""
+    return _list_or_default("staff_list", DEFAULT_STAFF_LIST, db_path)
+
+
+def facility_name(default="未設定", db_path=None):
+    return get("facility_name", default, db_path=db_path)
@@ -0,0 +1,448 @@
+"""
+データベースと写真のバックアップ
+アプリの使用中でも壊れたコピーにならないよう、SQLite のオンラインバックアップ API で
+少しずつ（BACKUP_PAGES ページずつ）スナップショットを取り、gzip で圧縮して保存する。
+スナップショットごとに SHA-256 などを記録したファイル（<名前>.json）を作り、検証・復元時に確認する。
+
+    DB_BACKUP_DIR/lostitem_20250101_093000.db.gz
+    DB_BACKUP_DIR/lostitem_20250101_093000.db.gz.json
+
+古いスナップショットは保持ルール（日ごと・週ごと・月ごとに残す数、settings テーブルで変更可）に
+従って削除する。写真は IMAGE_BACKUP_DIR に、新しいファイルと変更されたファイルだけをコピーする。
+
+使い方:
+    python -m core.backup create [--db DBパス]          # バックアップを作成
+    python -m core.backup list
+    python -m core.backup verify スナップショット
+    python -m core.backup restore スナップショット [--db DBパス]
+    python -m core.backup retention 日 週 月           # 保持ルールを設定
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from data.config import DB_BACKUP_DIR, IMAGE_BACKUP_DIR, IMAGES_DIR
+
+from . import app_settings, db
+
+# オンラインバックアップで1回にコピーするページ数と、その間に書き込みへ譲る時間（秒）
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.005
+
+# gzip の圧縮レベル（速度と大きさのバランス）
+COMPRESS_LEVEL = 6
+
+# 読み書きの単位
+CHUNK_SIZE = 1024 * 1024
+
+SNAPSHOT_PREFIX = "lostitem"
+BEFORE_RESTORE_PREFIX = "before_restore"
+SNAPSHOT_SUFFIX = ".db.gz"
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+_TIMESTAMP_PATTERN = re.compile(r"(\d{8}_\d{6})")
+
+# 保持ルール（日ごと・週ごと・月ごとに、それぞれ最新のスナップショットを何個残すか）
+DEFAULT_RETENTION = {"daily": 7, "weekly": 4, "monthly": 12}
+RETENTION_KEYS = {name: f"backup_keep_{name}" for name in DEFAULT_RETENTION}
+
+_running = threading.Lock()
+
+
+# ----------------------------------------------------------------------
+# 保持ルール
+# ----------------------------------------------------------------------
+def retention_policy(db_path=None):
+    """settings テーブルに設定された保持ルール（未設定・不正な値は既定値）"""
+    policy = dict(DEFAULT_RETENTION)
+    for name, key in RETENTION_KEYS.items():
+        try:
+            value = app_settings.get_int(key, db_path=db_path)
+        except sqlite3.Error:
+            value = None
+        if value is not None and value >= 0:
+            policy[name] = value
+    return policy
+
+
+def set_retention_policy(daily, weekly, monthly, db_path=None):
+    """保持ルールを settings テーブルに保存"""
+    values = {"daily": daily, "weekly": weekly, "monthly": monthly}
+    for name, value in values.items():
+        if int(value) < 0:
+            raise ValueError(f"保持する数は0以上にしてください: {name}={value}")
+    app_settings.set_many(
+        {RETENTION_KEYS[name]: str(int(value)) for name, value in values.items()}, db_path=db_path
+    )
+
+
+# ----------------------------------------------------------------------
+# スナップショット
+# ----------------------------------------------------------------------
+def manifest_path(snapshot):
+    snapshot = Path(snapshot)
+    return snapshot.with_name(snapshot.name + ".json")
+
+
+def snapshot_time(snapshot):
+    """スナップショットの名前から作成日時を取り出す（取り出せなければ None）"""
+    match = _TIMESTAMP_PATTERN.search(Path(snapshot).name)
+    try:
+        return datetime.strptime(match.group(1), TIMESTAMP_FORMAT) if match else None
+    except ValueError:
+        return None
+
+
+def list_snapshots(directory=None, include_legacy=True):
+    """
+    スナップショットの一覧（新しい順）
+
+    Args:
+        include_legacy: 以前の方式でコピーした .db ファイルも含める
+    """
+    directory = Path(directory or DB_BACKUP_DIR)
+    if not directory.exists():
+        return []
+    snapshots = list(directory.glob(f"*{SNAPSHOT_SUFFIX}"))
+    if include_legacy:
+        snapshots += directory.glob("*.db")
+    return sorted(
+        (p for p in snapshots if p.is_file()),
+        key=lambda p: snapshot_time(p) or datetime.fromtimestamp(p.stat().st_mtime),
+        reverse=True,
+    )
+
+
+def _new_snapshot_path(directory, prefix):
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    path = directory / f"{prefix}_{timestamp}{SNAPSHOT_SUFFIX}"
+    counter = 1
+    while path.exists():
+        path = directory / f"{prefix}_{timestamp}-{counter}{SNAPSHOT_SUFFIX}"
+        counter += 1
+    return path
+
+
+def backup_database(db_path=None, directory=None, prefix=SNAPSHOT_PREFIX, on_progress=None,
+                    pages=BACKUP_PAGES, sleep=BACKUP_SLEEP):
+    """
+    オンラインバックアップ API でスナップショットを作成し、圧縮して保存
+
+    書き込み中のアプリを止めないよう pages ページずつコピーし、その間に sleep 秒だけ譲る。
+    コピー中に書き込みがあった場合は SQLite が自動でやり直すため、常に一貫したスナップショットになる。
+
+    Args:
+        on_progress: 進み具合を受け取る関数 on_progress(コピー済みのページ数, 全ページ数)
+
+    Returns:
+        Path: 作成したスナップショット
+    """
+    directory = Path(directory or DB_BACKUP_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    snapshot = _new_snapshot_path(directory, prefix)
+    raw_copy = snapshot.with_name(f".{snapshot.name}.db.tmp")
+    compressed = snapshot.with_name(f".{snapshot.name}.tmp")
+
+    def progress(status, remaining, total):
+        if on_progress:
+            on_progress(total - remaining, total)
+
+    try:
+        source = db.connect(db_path)
+        target = sqlite3.connect(str(raw_copy))
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=sleep)
+            page_count = target.execute("PRAGMA page_count").fetchone()[0]
+            user_version = target.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            target.close()
+            source.close()
+
+        digest = hashlib.sha256()
+        with open(raw_copy, "rb") as src, gzip.open(compressed, "wb", compresslevel=COMPRESS_LEVEL) as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+        os.replace(compressed, snapshot)
+
+        manifest = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "source": str(Path(db_path or db.DEFAULT_DB_PATH).resolve()),
+            "sha256": digest.hexdigest(),
+            "size": raw_copy.stat().st_size,
+            "compressed_size": snapshot.stat().st_size,
+            "page_count": page_count,
+            "user_version": user_version,
+        }
+        manifest_path(snapshot).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    finally:
+        raw_copy.unlink(missing_ok=True)
+        compressed.unlink(missing_ok=True)
+    return snapshot
+
+
+def _extract(snapshot, target):
+    """スナップショットを展開して target に書き込み、SHA-256 を返す（以前の .db はそのままコピー）"""
+    snapshot = Path(snapshot)
+    opener = gzip.open if snapshot.name.endswith(".gz") else open
+    digest = hashlib.sha256()
+    with opener(snapshot, "rb") as src, open(target, "wb") as dst:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+    return digest.hexdigest()
+
+
+def verify(snapshot):
+    """
+    スナップショットを検証（SHA-256 の照合と PRAGMA integrity_check）
+
+    Returns:
+        tuple: (問題がなければ True, メッセージ)
+    """
+    snapshot = Path(snapshot)
+    if not snapshot.is_file():
+        return False, f"スナップショットが見つかりません: {snapshot}"
+    extracted = snapshot.with_name(f".{snapshot.name}.verify.tmp")
+    try:
+        try:
+            digest = _extract(snapshot, extracted)
+        except (OSError, EOFError) as e:
+            return False, f"展開できません: {e}"
+        manifest_file = manifest_path(snapshot)
+        if manifest_file.exists():
+            expected = json.loads(manifest_file.read_text(encoding="utf-8")).get("sha256")
+            if digest != expected:
+                return False, "SHA-256 が記録と一致しません"
+        elif snapshot.name.endswith(".gz"):
+            return False, f"記録ファイルがありません: {manifest_file.name}"
+        conn = sqlite3.connect(str(extracted))
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        except sqlite3.DatabaseError as e:
+            result = str(e)
+        finally:
+            conn.close()
+        if result != "ok":
+            return False, f"integrity_check: {result}"
+        return True, "ok"
+    finally:
+        extracted.unlink(missing_ok=True)
+
+
+def restore(snapshot, db_path=None, directory=None):
+    """
+    スナップショットからデータベースを復元
+
+    検証してから、現在のデータベースを before_restore_* としてバックアップし、
+    オンラインバックアップ API で中身を置き換える（ファイルを上書きしないため、使用中の接続も新しい内容を読む）。
+
+    Returns:
+        Path: 復元前のデータベースのスナップショット
+    """
+    snapshot = Path(snapshot)
+    ok, message = verify(snapshot)
+    if not ok:
+        raise ValueError(f"スナップショットを復元できません（{message}）: {snapshot.name}")
+    before = backup_database(db_path, directory, prefix=BEFORE_RESTORE_PREFIX)
+    extracted = snapshot.with_name(f".{snapshot.name}.restore.tmp")
+    try:
+        _extract(snapshot, extracted)
+        source = sqlite3.connect(str(extracted))
+        target = sqlite3.connect(str(Path(db_path or db.DEFAULT_DB_PATH)), timeout=db.BUSY_TIMEOUT)
+        try:
+            # 一度にコピーして、復元途中の状態が他の接続から見えないようにする
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    finally:
+        extracted.unlink(missing_ok=True)
+    return before
+
+
+def apply_retention(directory=None, policy=None, db_path=None):
+    """
+    保持ルールに含まれないスナップショットを削除
+
+    日ごと・週ごと・月ごとに、それぞれの期間の最新のスナップショットを新しい期間から順に残す。
+    最新のスナップショットと、復元前に作った before_restore_* は常に残す。
+
+    Returns:
+        list: 削除したスナップショット
+    """
+    policy = policy or retention_policy(db_path)
+    snapshots = [
+        p for p in list_snapshots(directory, include_legacy=False)
+        if p.name.startswith(SNAPSHOT_PREFIX + "_") and snapshot_time(p)
+    ]
+    keep = set(snapshots[:1])
+    periods = {
+        "daily": lambda t: t.date(),
+        "weekly": lambda t: t.isocalendar()[:2],
+        "monthly": lambda t: (t.year, t.month),
+    }
+    for name, period_of in periods.items():
+        seen = set()
+        for snapshot in snapshots:
+            period = period_of(snapshot_time(snapshot))
+            if period in seen:
+                continue
+            if len(seen) >= policy.get(name, 0):
+                break
+            seen.add(period)
+            keep.add(snapshot)
+    removed = []
+    for snapshot in snapshots:
+        if snapshot not in keep:
+            snapshot.unlink(missing_ok=True)
+            manifest_path(snapshot).unlink(missing_ok=True)
+            removed.append(snapshot)
+    return removed
+
+
+# ----------------------------------------------------------------------
+# 写真
+# ----------------------------------------------------------------------
+def backup_images(source=None, target=None):
+    """
+    写真を新しいファイルと変更されたファイルだけコピー（増分バックアップ）
+
+    大きさと更新時刻が同じファイルは飛ばす。写真の保存先から削除されたファイルはバックアップに残す。
+    一時ファイル・一時フォルダ（"." で始まるもの）はコピーしない。
+
+    Returns:
+        dict: {"copied": コピーした数, "skipped": 飛ばした数, "bytes": コピーしたバイト数}
+    """
+    source = Path(source or IMAGES_DIR)
+    target = Path(target or IMAGE_BACKUP_DIR)
+    result = {"copied": 0, "skipped": 0, "bytes": 0}
+    if not source.exists():
+        return result
+    for current, dirs, files in os.walk(source):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        relative = Path(current).relative_to(source)
+        for name in files:
+            if name.startswith(".") or name.endswith(".tmp"):
+                continue
+            src = Path(current) / name
+            dst = target / relative / name
+            src_stat = src.stat()
+            try:
+                dst_stat = dst.stat()
+                if dst_stat.st_size == src_stat.st_size and abs(dst_stat.st_mtime - src_stat.st_mtime) < 2:
+                    result["skipped"] += 1
+                    continue
+            except FileNotFoundError:
+                pass
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            temporary = dst.with_name(f".{name}.tmp")
+            shutil.copy2(src, temporary)
+            os.replace(temporary, dst)
+            result["copied"] += 1
+            result["bytes"] += src_stat.st_size
+    return result
+
+
+# ----------------------------------------------------------------------
+# まとめて実行
+# ----------------------------------------------------------------------
+def run_backup(db_path=None, on_progress=None):
+    """
+    データベースのスナップショット作成・保持ルールの適用・写真の増分バックアップをまとめて実行
+
+    Returns:
+        dict: {"snapshot": Path, "removed": [...], "images": {...}}
+    """
+    snapshot = backup_database(db_path, on_progress=on_progress)
+    removed = apply_retention(db_path=db_path)
+    images = backup_images()
+    return {"snapshot": snapshot, "removed": removed, "images": images}
+
+
+def start(db_path=None, on_done=None, on_error=None, on_progress=None):
+    """
+    バックアップをバックグラウンドのスレッドで実行（実行中なら何もしない）
+
+    Args:
+        on_done: 完了時に run_backup() の結果を受け取る関数
+        on_error: 失敗時に例外を受け取る関数
+
+    Returns:
+        threading.Thread: 開始したスレッド（既に実行中の場合は None）
+    """
+    if not _running.acquire(blocking=False):
+        return None
+
+    def worker():
+        try:
+            result = run_backup(db_path, on_progress=on_progress)
+        except Exception as e:
+            print(f"バックアップ作成エラー: {e}")
+            if on_error:
+                on_error(e)
+            return
+        finally:
+            _running.release()
+        print(f"バックアップを作成しました: {result['snapshot'].name}")
+        if on_done:
+            on_done(result)
+
+    thread = threading.Thread(target=worker, name="backup", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="データベースと写真のバックアップ")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = commands.add_parser("create", help="バックアップを作成（写真の増分バックアップと保持ルールの適用を含む）")
+    create_parser.add_argument("--db", help="データベースのパス")
+
+    commands.add_parser("list", help="スナップショットの一覧")
+
+    verify_parser = commands.add_parser("verify", help="スナップショットを検証")
+    verify_parser.add_argument("snapshot")
+
+    restore_parser = commands.add_parser("restore", help="スナップショットから復元")
+    restore_parser.add_argument("snapshot")
+    restore_parser.add_argument("--db", help="データベースのパス")
+
+    retention_parser = commands.add_parser("retention", help="保持ルールを設定")
+    retention_parser.add_argument("daily", type=int)
+    retention_parser.add_argument("weekly", type=int)
+    retention_parser.add_argument("monthly", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        result = run_backup(args.db)
+        images = result["images"]
+        print(f"スナップショットを作成しました: {result['snapshot']}")
+        print(f"古いスナップショットを {len(result['removed'])}個 削除しました")
+        print(f"写真: コピー {images['copied']}枚（{images['bytes'] / 1024 / 1024:.1f}MB）、変更なし {images['skipped']}枚")
+    elif args.command == "list":
+        for snapshot in list_snapshots():
+            print(f"{snapshot.name}  {snapshot.stat().st_size / 1024 / 1024:.1f}MB")
+    elif args.command == "verify":
+        ok, message = verify(args.snapshot)
+        print(f"{Path(args.snapshot).name}: {message}")
+        if not ok:
+            raise SystemExit(1)
+    elif args.command == "restore":
+        before = restore(args.snapshot, args.db)
+        print(f"復元しました: {Path(args.snapshot).name}（復元前のデータベース: {before.name}）")
+    elif args.command == "retention":
+        set_retention_policy(args.daily, args.weekly, args.monthly)
+        print(f"保持ルールを設定しました: 日 {args.daily} / 週 {args.weekly} / 月 {args.monthly}")
+
+
+if __name__ == "__main__":
+    main()
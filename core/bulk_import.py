@@ -0,0 +1,367 @@
+"""
+拾得物の一括取り込み（CSV）
+紙の台帳や他のシステムから移行する過去の拾得物を、1回のトランザクションでまとめて lost_items に登録する。
+
+    - 分類（大・中・小）を apps/config と item_classification.json の分類で検証し、不正な行は飛ばして報告する
+    - 管理番号は拾得者区分・年ごとの連番を採番テーブルから最初に1回だけ読み、以降はメモリ上で採番する
+    - CSV に書かれた管理番号は先に1回読んで予約し、CSV 内で重複する行と登録済みの管理番号の行は飛ばして報告する
+    - BATCH_ROWS 行ずつ executemany で登録する
+    - 取り込みの間は lost_items のインデックスを外し、全文検索索引・日次集計の INSERT トリガーを止め、
+      最後にまとめて作り直す（1行ごとの索引更新をしない）
+
+CSV の見出しは列名（main_id, get_item, ...）か、エクスポートと同じ日本語の見出し（管理番号, 拾得日, ...）。
+文字コードは UTF-8（BOM 付き可）か Shift_JIS（cp932）。
+
+使い方:
+    python -m core.bulk_import 拾得物.csv [--db DBパス] [--dry-run] [--keep-indexes] [--errors エラー.csv]
+"""
+import argparse
+import codecs
+import csv
+import time
+from contextlib import contextmanager
+
+from . import db, migrations, search, sequences, stats
+from .export import LOST_ITEM_COLUMNS
+from .query import parse_date
+from .taxonomy import load as load_taxonomy
+
+# 1回の executemany で登録する行数
+BATCH_ROWS = 5000
+
+# 取り込む列（エクスポートできる列のうち、id と登録日時以外）
+IMPORT_COLUMNS = [c for c in LOST_ITEM_COLUMNS if c not in ("id", "created_at")]
+
+# 見出し -> 列名（列名そのものと、エクスポートの日本語の見出しを受け付ける）
+HEADER_ALIASES = {**{c: c for c in IMPORT_COLUMNS}, **{h: c for c, h in LOST_ITEM_COLUMNS.items() if c in IMPORT_COLUMNS}}
+
+# 登録する列（取り込む列 + 年）
+INSERT_COLUMNS = IMPORT_COLUMNS + ["current_year"]
+
+DEFAULT_CHOICE_FINDER = "占有者拾得"
+
+# 取り込みの間止めて、最後にまとめて反映する INSERT トリガー -> 反映する関数 (conn, 取り込み前の最大id)
+DEFERRED_TRIGGERS = {
+    "trg_lost_items_fts_insert": lambda conn, after_id: search.index_rows_after(conn, "lost_items", after_id),
+    "trg_lost_items_stats_insert": stats.add_rows_to_rollup,
+}
+
+_TRUE_VALUES = {"1", "true", "yes", "はい", "有", "あり", "○", "貴重品"}
+_FALSE_VALUES = {"0", "false", "no", "いいえ", "無", "なし", "×", ""}
+
+
+def read_csv(path):
+    """
+    CSV を1行ずつ {列名: 値} で返す（行番号付き）
+
+    UTF-8 で読めない場合は Shift_JIS（Excel で保存した CSV）として読む。
+    """
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+    try:
+        # 読み込み範囲の末尾で文字が切れていても UTF-8 と判定できるよう、逐次デコーダーで確認する
+        codecs.getincrementaldecoder("utf-8-sig")().decode(head, final=False)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "cp932"
+    with open(path, "r", newline="", encoding=encoding) as f:
+        reader = csv.reader(f)
+        headers = next(reader, None)
+        if headers is None:
+            return
+        columns = [HEADER_ALIASES.get(h.strip()) for h in headers]
+        missing = [c for c in ("get_item", "item_class_L") if c not in columns]
+        if missing:
+            raise ValueError(f"必須の列がありません: {', '.join(LOST_ITEM_COLUMNS[c] for c in missing)}")
+        for row in reader:
+            if not any(value.strip() for value in row):
+                continue
+            yield reader.line_num, {c: v.strip() for c, v in zip(columns, row) if c}
+
+
+def _int(value, name, low=None, high=None):
+    if value in (None, ""):
+        return None
+    try:
+        number = int(str(value).replace(",", "").replace("円", "").replace("時", "").replace("分", ""))
+    except ValueError:
+        raise ValueError(f"{name}が数値ではありません: {value}")
+    if (low is not None and number < low) or (high is not None and number > high):
+        raise ValueError(f"{name}が範囲外です: {value}")
+    return number
+
+
+def _date(value, name):
+    if value in (None, ""):
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f"{name}が日付ではありません: {value}")
+    return parsed.isoformat()
+
+
+def normalize(raw, taxonomy):
+    """
+    CSV の1行を登録する値に変換（不正な値は ValueError）
+
+    Returns:
+        dict: INSERT_COLUMNS の値
+    """
+    values = {c: (raw.get(c) or None) for c in IMPORT_COLUMNS}
+    values["get_item"] = _date(raw.get("get_item"), "拾得日")
+    if values["get_item"] is None:
+        raise ValueError("拾得日がありません")
+    values["recep_item"] = _date(raw.get("recep_item"), "受付日") or values["get_item"]
+    values["get_item_hour"] = _int(raw.get("get_item_hour"), "拾得時", 0, 23)
+    values["get_item_minute"] = _int(raw.get("get_item_minute"), "拾得分", 0, 59)
+    values["item_num"] = _int(raw.get("item_num"), "数量", 0) or 1
+    values["item_money"] = _int(raw.get("item_money"), "金額", 0)
+    value = str(raw.get("item_value") or "").strip().lower()
+    if value in _TRUE_VALUES:
+        values["item_value"] = 1
+    elif value in _FALSE_VALUES:
+        values["item_value"] = 0
+    else:
+        raise ValueError(f"貴重品の値が不明です: {raw.get('item_value')}")
+
+    if not values["item_class_L"]:
+        raise ValueError("大分類がありません")
+    error = taxonomy.check(values["item_class_L"], values["item_class_M"], values["item_class_S"])
+    if error:
+        raise ValueError(error)
+
+    values["choice_finder"] = values["choice_finder"] or DEFAULT_CHOICE_FINDER
+    values["item_unit"] = values["item_unit"] or "個"
+    values["item_situation"] = values["item_situation"] or "保管中"
+    values["refund_situation"] = values["refund_situation"] or "未"
+    # 管理番号があればその年を使う（拾得日から求めた年と食い違わないように）
+    parsed = sequences.parse_main_id(values["main_id"])
+    values["current_year"] = parsed[1] if parsed else int(values["get_item"][:4]) % 100
+    return values
+
+
+class MainIdAllocator:
+    """
+    管理番号の一括採番
+
+    区分・年ごとの連番の最後の値を採番テーブル（core/sequences.py）から1回だけ読み、以降はメモリ上で数える。
+    CSV に書かれた管理番号は採番の前に reserve() で予約し、その連番まで進めたうえで、
+    予約した番号は next() で採番しない。
+    最後に save() で採番テーブルへ書き戻す（取り込みと同じトランザクション内で使う）。
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.values = {}
+        self.reserved = set()
+
+    def _value(self, key):
+        if key not in self.values:
+            self.values[key] = sequences.current_value(self.conn, *key)
+        return self.values[key]
+
+    def next(self, choice_finder, current_year):
+        key = (choice_finder, current_year)
+        while True:
+            self.values[key] = self._value(key) + 1
+            main_id = sequences.format_main_id(choice_finder, current_year, self.values[key])
+            if main_id not in self.reserved:
+                return main_id
+
+    def reserve(self, choice_finder, main_id):
+        """CSV の管理番号を予約し、区分・年が合えばその連番まで進める"""
+        self.reserved.add(main_id)
+        parsed = sequences.parse_main_id(main_id)
+        if parsed is None or parsed[0] != sequences.prefix_of(choice_finder):
+            return
+        key = (choice_finder, parsed[1])
+        self.values[key] = max(self._value(key), parsed[2])
+
+    def save(self):
+        """
+        採番テーブルへ書き戻す
+
+        登録済みの管理番号（今回取り込んだ行を含む）の最大値より小さくならないよう、
+        取り込んだ区分・年は existing_max() まで進める。
+        """
+        for (choice_finder, current_year), value in self.values.items():
+            value = max(value, sequences.existing_max(self.conn, choice_finder, current_year))
+            sequences.set_value(self.conn, choice_finder, current_year, value)
+
+
+def explicit_main_ids(path):
+    """
+    CSV に書かれた管理番号を読む（登録の前の1回目の読み込み）
+
+    Returns:
+        dict: 管理番号 -> 拾得者区分（最初に書かれた行のもの）
+    """
+    main_ids = {}
+    for _, raw in read_csv(path):
+        main_id = raw.get("main_id")
+        if main_id and main_id not in main_ids:
+            main_ids[main_id] = raw.get("choice_finder") or DEFAULT_CHOICE_FINDER
+    return main_ids
+
+
+def registered_main_ids(conn, main_ids):
+    """main_ids のうち lost_items に登録済みの管理番号（lost_items を1回だけ走査する）"""
+    if not main_ids:
+        return set()
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_main_ids (main_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.import_main_ids")
+    conn.executemany("INSERT INTO temp.import_main_ids (main_id) VALUES (?)", ((m,) for m in main_ids))
+    rows = conn.execute(
+        "SELECT DISTINCT main_id FROM lost_items WHERE main_id IN (SELECT main_id FROM temp.import_main_ids)"
+    ).fetchall()
+    conn.execute("DROP TABLE temp.import_main_ids")
+    return {row[0] for row in rows}
+
+
+@contextmanager
+def bulk_load(conn, rebuild_indexes=True):
+    """
+    大量の INSERT の前後で、インデックスと INSERT トリガーを外して最後にまとめて作り直す
+
+    呼び出し側のトランザクション内で使う（途中で失敗してロールバックすれば元に戻る）。
+    """
+    after_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM lost_items").fetchone()[0]
+    triggers = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'lost_items' "
+        f"AND name IN ({', '.join('?' * len(DEFERRED_TRIGGERS))})",
+        list(DEFERRED_TRIGGERS),
+    ).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    indexes = {}
+    if rebuild_indexes:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        indexes = {name: target for name, target in migrations.LOST_ITEMS_INDEXES.items() if name in existing}
+        for name in indexes:
+            conn.execute(f"DROP INDEX {name}")
+
+    yield
+
+    for name, sql in triggers:
+        DEFERRED_TRIGGERS[name](conn, after_id)
+        conn.execute(sql)
+    if indexes:
+        migrations.create_indexes(conn, indexes)
+        conn.execute("ANALYZE lost_items")
+
+
+def import_csv(path, db_path=None, dry_run=False, rebuild_indexes=True, on_progress=None, taxonomy=None):
+    """
+    CSV の拾得物を一括登録
+
+    すべての行を1回のトランザクションで登録する（途中で失敗した場合は1行も登録しない）。
+    検証で不正だった行、管理番号が CSV 内の前の行と重複する行、管理番号が登録済みの行は
+    登録せずに errors で返す。管理番号のない行には、CSV に書かれた管理番号と重ならない番号を採番する。
+
+    Args:
+        dry_run: True の場合は検証だけ行い、最後にロールバックする
+        rebuild_indexes: 取り込みの間インデックスを外す（既存の件数に比べて取り込む件数が少ない場合は False）
+        on_progress: 登録した行数を受け取る関数 on_progress(行数)
+
+    Returns:
+        dict: {"imported": 登録した行数, "errors": [(行番号, メッセージ), ...], "seconds": 所要時間}
+    """
+    started = time.perf_counter()
+    taxonomy = taxonomy or load_taxonomy()
+    placeholders = ", ".join("?" * len(INSERT_COLUMNS))
+    sql = f"INSERT INTO lost_items ({', '.join(INSERT_COLUMNS)}) VALUES ({placeholders})"
+    imported = 0
+    errors = []
+
+    migrations.migrate(db_path)
+    conn = db.connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            allocator = MainIdAllocator(conn)
+            main_ids = explicit_main_ids(path)
+            registered = registered_main_ids(conn, main_ids)
+            for main_id, choice_finder in main_ids.items():
+                allocator.reserve(choice_finder, main_id)
+            used = {}  # 登録する管理番号 -> 行番号
+            with bulk_load(conn, rebuild_indexes):
+                batch = []
+                for line, raw in read_csv(path):
+                    try:
+                        values = normalize(raw, taxonomy)
+                    except ValueError as e:
+                        errors.append((line, str(e)))
+                        continue
+                    main_id = values["main_id"]
+                    if main_id in registered:
+                        errors.append((line, f"管理番号が登録済みです: {main_id}"))
+                        continue
+                    if main_id in used:
+                        errors.append((line, f"管理番号が{used[main_id]}行目と重複しています: {main_id}"))
+                        continue
+                    if main_id:
+                        used[main_id] = line
+                    else:
+                        values["main_id"] = allocator.next(values["choice_finder"], values["current_year"])
+                    batch.append(tuple(values[c] for c in INSERT_COLUMNS))
+                    if len(batch) >= BATCH_ROWS:
+                        conn.executemany(sql, batch)
+                        imported += len(batch)
+                        batch = []
+                        if on_progress:
+                            on_progress(imported)
+                if batch:
+                    conn.executemany(sql, batch)
+                    imported += len(batch)
+            allocator.save()
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.close()
+    if on_progress:
+        on_progress(imported)
+    return {"imported": imported, "errors": errors, "seconds": time.perf_counter() - started}
+
+
+def write_errors(errors, path):
+    """検証で不正だった行の一覧を CSV に書き出す"""
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["行", "エラー"])
+        writer.writerows(errors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="拾得物の一括取り込み（CSV）")
+    parser.add_argument("csv", help="取り込む CSV")
+    parser.add_argument("--db", help="データベースのパス")
+    parser.add_argument("--dry-run", action="store_true", help="検証だけ行い、登録しない")
+    parser.add_argument("--keep-indexes", action="store_true", help="取り込みの間もインデックスを外さない（少量の取り込み向け）")
+    parser.add_argument("--errors", help="不正だった行の一覧を書き出す CSV")
+    args = parser.parse_args(argv)
+
+    result = import_csv(
+        args.csv,
+        db_path=args.db,
+        dry_run=args.dry_run,
+        rebuild_indexes=not args.keep_indexes,
+        on_progress=lambda count: print(f"\r{count}件", end="", flush=True),
+    )
+    action = "検証しました（登録していません）" if args.dry_run else "登録しました"
+    print(f"\n{result['imported']}件を{action}（{result['seconds']:.1f}秒）")
+    if result["errors"]:
+        print(f"不正な行: {len(result['errors'])}件")
+        for line, message in result["errors"][:20]:
+            print(f"  {line}行目: {message}")
+        if args.errors:
+            write_errors(result["errors"], args.errors)
+            print(f"不正な行の一覧を書き出しました: {args.errors}")
+
+
+if __name__ == "__main__":
+    main()
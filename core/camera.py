@@ -0,0 +1,338 @@
+"""
+カメラ映像の取り込みとプレビュー
+カメラからの読み込み（取り込みスレッド）と、画面へのプレビュー送信（プレビュースレッド）を分け、
+間を固定長のリングバッファでつなぐ。
+
+    取り込みスレッド: カメラの速度で読み続け、最新のフレームをリングバッファに書き込む
+    プレビュースレッド: 最新のフレームだけを圧縮して画面に送る（古いフレームは捨てる）。
+                        送信（control.update()）に時間がかかるほど送信間隔を広げ、
+                        画面の描画が追いつかないときに他の処理のCPUを奪わないようにする
+
+撮影時は取り込み済みの最新フレームを使うため、画面のスレッドからカメラを直接読まない。
+
+カメラはフル解像度で取り込み、フル解像度のフレームは撮影にだけ使う。プレビューは表示する大きさまで
+縮小し、低めの画質で cv2.imencode により JPEG にする（PIL を経由しない）。
+
+使用例:
+    stream = CameraStream(camera_index=0, width=1280, height=720, preview_size=(480, 360))
+    if stream.open():
+        stream.start(on_preview=lambda b64: (setattr(image, "src_base64", b64), image.update()))
+    frame = stream.latest_frame()   # 撮影
+    stream.stats()                  # {"capture_fps": ..., "encode_fps": ..., "display_fps": ...}
+    stream.stop()
+"""
+import base64
+import threading
+import time
+from collections import deque
+
+from .lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+
+# リングバッファのフレーム数
+RING_SIZE = 4
+
+# プレビューの最大フレームレート
+PREVIEW_MAX_FPS = 30
+
+# プレビューの最小フレームレート（送信が遅い場合でもこれ以上は間隔を広げない）
+PREVIEW_MIN_FPS = 5
+
+# 送信にかかった時間のこの倍数を次の送信までの間隔にする
+# （送信中以外の時間を他の処理に残すため 1 より大きくする）
+BACKPRESSURE_FACTOR = 1.5
+
+# プレビューの JPEG 画質（撮影した写真の画質には影響しない）
+PREVIEW_QUALITY = 70
+
+# 連続してフレームを読めなかった場合にカメラを止める回数
+MAX_READ_FAILURES = 10
+
+
+class FrameRing:
+    """
+    固定長のリングバッファ
+
+    書き込みのたびに連番を振り、読み手は前回より新しいフレームだけを待って受け取る。
+    読み手が遅れた場合は古いフレームが上書きされる（読み手を待たない）。
+    """
+
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self._slots = [None] * size
+        self._sequence = 0
+        self._condition = threading.Condition()
+
+    def put(self, frame):
+        with self._condition:
+            self._sequence += 1
+            self._slots[self._sequence % self.size] = (self._sequence, time.perf_counter(), frame)
+            self._condition.notify_all()
+
+    def latest(self):
+        """最新の (連番, 時刻, フレーム)（まだなければ None）"""
+        with self._condition:
+            return self._slots[self._sequence % self.size] if self._sequence else None
+
+    def wait_newer(self, sequence, timeout=None):
+        """連番が sequence より新しいフレームを待って返す（タイムアウト時は None）"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._sequence > sequence, timeout):
+                return None
+            return self._slots[self._sequence % self.size]
+
+    def wake(self):
+        """待っている読み手を起こす（停止時に使う）"""
+        with self._condition:
+            self._condition.notify_all()
+
+
+class FpsMeter:
+    """直近 window 秒のフレームレート（amount を渡した場合は1秒あたりの量）を計測"""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self._ticks = deque()
+        self._lock = threading.Lock()
+
+    def tick(self, amount=1):
+        now = time.perf_counter()
+        with self._lock:
+            self._ticks.append((now, amount))
+            while self._ticks and now - self._ticks[0][0] > self.window:
+                self._ticks.popleft()
+
+    @property
+    def rate(self):
+        with self._lock:
+            if len(self._ticks) < 2:
+                return 0.0
+            span = time.perf_counter() - self._ticks[0][0]
+            # 最初の記録は区間の始まりとして扱い、量には含めない
+            total = sum(amount for _, amount in self._ticks) - self._ticks[0][1]
+            return total / span if span > 0 else 0.0
+
+
+def preview_scale(frame_size, preview_size):
+    """
+    プレビューの縮小率（表示枠を覆う大きさまで縮小し、拡大はしない）
+
+    Args:
+        frame_size: フレームの (幅, 高さ)
+        preview_size: 表示枠の (幅, 高さ)
+    """
+    return min(1.0, max(preview_size[0] / frame_size[0], preview_size[1] / frame_size[1]))
+
+
+def encode_preview(frame, preview_size=None, quality=PREVIEW_QUALITY):
+    """
+    プレビュー用に BGR のフレームを縮小して JPEG の base64 文字列にする
+
+    Args:
+        frame: BGR のフレーム
+        preview_size: 表示枠の (幅, 高さ)（省略時は縮小しない）
+        quality: JPEG 画質
+    """
+    if preview_size:
+        height, width = frame.shape[:2]
+        scale = preview_scale((width, height), preview_size)
+        if scale < 1.0:
+            frame = cv2.resize(
+                frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("プレビューの JPEG 変換に失敗しました")
+    return base64.b64encode(buffer).decode()
+
+
+def open_camera(camera_index, width, height):
+    """
+    カメラを開く（DirectShow → Media Foundation → 自動選択の順に試す）
+
+    開けたうえでフレームを実際に読めたバックエンドの VideoCapture を返す。どれも使えなければ None。
+    """
+    backends = [
+        cv2.CAP_DSHOW,  # DirectShow
+        cv2.CAP_MSMF,   # Microsoft Media Foundation
+        cv2.CAP_ANY,    # 自動選択
+    ]
+    for backend in backends:
+        cap = None
+        try:
+            print(f"バックエンド {backend} を試行中...")
+            cap = cv2.VideoCapture(camera_index, backend)
+            if not cap.isOpened():
+                print(f"カメラ {camera_index} を開けませんでした")
+                cap.release()
+                continue
+            print(f"カメラ {camera_index} が開きました")
+
+            # フレームサイズを設定
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            # バッファサイズを設定（フレーム遅延を防ぐ）
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+            # 実際にフレームを読み取ってテスト（複数回試行）
+            for attempt in range(3):
+                ret, frame = cap.read()
+                if ret and frame is not None and frame.shape[0] > 0 and frame.shape[1] > 0:
+                    print(f"カメラ初期化成功: バックエンド {backend} (試行 {attempt + 1})")
+                    return cap
+                print(f"フレーム取得失敗 (試行 {attempt + 1})")
+                time.sleep(0.1)
+            print(f"バックエンド {backend} でフレーム取得に失敗")
+            cap.release()
+        except Exception as e:
+            print(f"バックエンド {backend} でエラー: {e}")
+            if cap is not None:
+                cap.release()
+    return None
+
+
+class CameraStream:
+    """
+    カメラの取り込みスレッドとプレビュースレッド
+
+    Args:
+        camera_index: カメラ番号
+        width, height: 要求するフレームサイズ（撮影する写真の解像度）
+        preview_size: プレビューの表示枠の (幅, 高さ)（省略時はフレームサイズのまま）
+        encoder: プレビュー用にフレームを base64 文字列にする関数 encoder(frame, preview_size)
+        max_fps, min_fps: プレビュー送信のフレームレートの上限・下限
+    """
+
+    def __init__(self, camera_index=0, width=480, height=360, preview_size=None, encoder=encode_preview,
+                 max_fps=PREVIEW_MAX_FPS, min_fps=PREVIEW_MIN_FPS):
+        self.camera_index = camera_index
+        self.width = width
+        self.height = height
+        self.preview_size = preview_size
+        self.encoder = encoder
+        self.min_interval = 1.0 / max_fps
+        self.max_interval = 1.0 / min_fps
+        self.cap = None
+        self.ring = FrameRing()
+        self.capture_fps = FpsMeter()
+        self.encode_fps = FpsMeter()
+        self.display_fps = FpsMeter()
+        self.preview_bytes = FpsMeter()  # 画面に送った base64 文字列のバイト数
+        self.dropped = 0
+        self.interval = self.min_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self.on_error = None
+
+    @property
+    def running(self):
+        return self.cap is not None and not self._stop.is_set()
+
+    def open(self):
+        """カメラを開く（成功したら True）"""
+        self.cap = open_camera(self.camera_index, self.width, self.height)
+        return self.cap is not None
+
+    def start(self, on_preview=None, on_error=None):
+        """
+        取り込みとプレビューのスレッドを開始
+
+        Args:
+            on_preview: プレビュー画像（base64 文字列）を画面に反映する関数。戻るまでを送信時間として計測する
+            on_error: カメラが止まったときに呼ぶ関数 on_error(メッセージ)
+        """
+        if self.cap is None:
+            raise RuntimeError("カメラが開かれていません")
+        self.on_error = on_error
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._capture_loop, name="camera-capture", daemon=True)]
+        if on_preview is not None:
+            self._threads.append(
+                threading.Thread(target=self._preview_loop, args=(on_preview,), name="camera-preview", daemon=True)
+            )
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """スレッドを止めてカメラを解放"""
+        self._stop.set()
+        self.ring.wake()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=1.0)
+        self._threads = []
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def latest_frame(self):
+        """撮影用に最新のフレーム（フル解像度）のコピーを返す（まだなければ None）"""
+        latest = self.ring.latest()
+        return latest[2].copy() if latest else None
+
+    def stats(self):
+        """計測したフレームレートと、送信が追いつかずに捨てたフレーム数"""
+        return {
+            "capture_fps": self.capture_fps.rate,
+            "encode_fps": self.encode_fps.rate,
+            "display_fps": self.display_fps.rate,
+            "preview_interval": self.interval,
+            "dropped": self.dropped,
+            "preview_bytes_per_second": self.preview_bytes.rate,
+        }
+
+    def _fail(self, message):
+        print(message)
+        self._stop.set()
+        self.ring.wake()
+        if self.on_error:
+            self.on_error(message)
+
+    def _capture_loop(self):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                ret, frame = self.cap.read()
+            except Exception as e:
+                self._fail(f"カメラフレーム更新エラー: {e}")
+                return
+            if ret and frame is not None and frame.shape[0] > 0 and frame.shape[1] > 0:
+                failures = 0
+                self.ring.put(frame)
+                self.capture_fps.tick()
+            else:
+                failures += 1
+                if failures > MAX_READ_FAILURES:
+                    self._fail("フレーム取得が連続して失敗したため、カメラを停止します")
+                    return
+                time.sleep(0.05)
+
+    def _preview_loop(self, on_preview):
+        sequence = 0
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            latest = self.ring.wait_newer(sequence, timeout=self.max_interval)
+            if latest is None or self._stop.is_set():
+                continue
+            # 前回の送信から今回までに書き込まれたフレームは表示せずに捨てる
+            self.dropped += max(0, latest[0] - sequence - 1) if sequence else 0
+            sequence = latest[0]
+            try:
+                image = self.encoder(latest[2], self.preview_size)
+                self.encode_fps.tick()
+                sent = time.perf_counter()
+                on_preview(image)
+                self.display_fps.tick()
+                self.preview_bytes.tick(len(image))
+            except Exception as e:
+                print(f"フレーム処理エラー: {e}")
+                continue
+            # 送信にかかった時間に応じて次の送信までの間隔を調整（画面側の混雑を背圧として扱う）
+            push_seconds = time.perf_counter() - sent
+            target = min(max(push_seconds * BACKPRESSURE_FACTOR, self.min_interval), self.max_interval)
+            self.interval = self.interval * 0.7 + target * 0.3
+            remaining = self.interval - (time.perf_counter() - started)
+            if remaining > 0:
+                self._stop.wait(remaining)
@@ -0,0 +1,271 @@
+"""
+キーワードによる分類の推定
+item_classification.json の重み付きキーワードと、物体検出モデルのクラス名（英語のラベル）を
+1つの Aho–Corasick オートマトンにまとめ、文字列を1回なめるだけですべての中分類を採点する。
+検出したクラス名（"handbag" など）と、特徴・遺失届の品物などの自由記述の両方に使う。
+
+    - 文字列は NFKC で正規化して小文字にしてから照合する（全角英数字・半角カナも一致する）
+    - 長い語に含まれる短い語は数えない（「キーホルダー」の中の「キー」など）
+    - 英字で始まる（終わる）語は、前（後）が英字の場合は一致としない（"monkey" の中の "key" など）
+    - 同点の場合は中分類の priority が高いほう、それも同じなら分類の並び順で先のほうを選ぶ
+
+組み立てたオートマトンは core.taxonomy の分類が組み立て直されるまでキャッシュする。
+
+使用例:
+    from core import classifier
+    classifier.classify("handbag")
+    # {"large_category": "かばん類", "medium_category": "手提げかばん", ...}
+"""
+import threading
+import unicodedata
+from collections import deque
+
+from . import taxonomy
+
+# 物体検出モデルのクラス名 -> 中分類（item_classification.json のキーワードにない語だけ使う）
+LABEL_TERMS = {
+    # 現金
+    "cash": "現金", "money": "現金", "coin": "現金", "coins": "現金", "硬貨": "現金", "紙幣": "現金",
+    # かばん類
+    "bag": "その他かばん類", "bags": "その他かばん類",
+    "handbag": "手提げかばん", "tote": "手提げかばん", "briefcase": "手提げかばん",
+    "suitcase": "手提げかばん", "手提げ": "手提げかばん",
+    "shoulder": "肩掛けかばん", "肩掛け": "肩掛けかばん",
+    "backpack": "肩掛けかばん", "rucksack": "肩掛けかばん", "リュック": "肩掛けかばん",
+    "plastic bag": "袋",
+    # 財布類
+    "wallet": "財布", "purse": "財布", "coin_purse": "がま口", "card_case": "カードケース",
+    # 携帯電話類
+    "phone": "携帯電話機", "mobile": "携帯電話機", "smartphone": "携帯電話機", "cell phone": "携帯電話機",
+    # 時計類
+    "watch": "腕時計", "wristwatch": "腕時計", "clock": "その他時計類",
+    # めがね類
+    "glasses": "めがね", "eyeglasses": "めがね", "sunglasses": "サングラス類",
+    # 鍵類
+    "key": "鍵", "keys": "鍵", "キー": "鍵", "keychain": "鍵(キーホルダー付)",
+    # かさ類
+    "umbrella": "かさ", "parasol": "かさ", "かさ": "かさ",
+    # 衣類・履物類
+    "clothes": "上着類", "clothing": "上着類", "shirt": "上着類", "jacket": "上着類", "coat": "上着類",
+    "blouse": "上着類", "dress": "上着類", "衣類": "上着類", "服": "上着類",
+    "pants": "ズボン類", "tie": "衣類付属品",
+    "shoe": "履物類", "shoes": "履物類", "boot": "履物類", "boots": "履物類", "sneaker": "履物類",
+    "sneakers": "履物類", "sandal": "履物類", "sandals": "履物類", "履物": "履物類",
+    "hat": "帽子類", "cap": "帽子類", "beanie": "帽子類",
+    "glove": "手袋", "gloves": "手袋", "mittens": "手袋",
+    # カメラ類
+    "camera": "カメラ",
+    # 証明書類・カード類
+    "card": "会員証(カード)類", "id card": "身分証明書類",
+    # 著作品類・書類
+    "book": "書籍類", "magazine": "書籍類", "newspaper": "その他紙類",
+    # 電気製品類
+    "laptop": "電子機器", "tv": "電気製品", "remote": "電気製品", "keyboard": "電気製品類付属品",
+    "mouse": "電気製品類付属品", "microwave": "電気製品", "oven": "電気製品", "refrigerator": "電気製品",
+    # 生活用品類
+    "bottle": "生活用品", "cup": "食器類", "bowl": "食器類", "fork": "食器類", "knife": "食器類", "spoon": "食器類",
+    # 食料品類
+    "banana": "食料品類", "apple": "食料品類", "orange": "食料品類", "sandwich": "食料品類",
+    "hot dog": "食料品類", "pizza": "食料品類", "donut": "食料品類", "cake": "食料品類",
+    # 趣味・娯楽用品類
+    "sports ball": "レジャー・スポーツ用品", "baseball bat": "レジャー・スポーツ用品",
+    "tennis racket": "レジャー・スポーツ用品", "skateboard": "レジャー・スポーツ用品",
+    "surfboard": "レジャー・スポーツ用品",
+    # 医療・化粧品類
+    "toothbrush": "化粧品類",
+    # 手帳・文具類
+    "pen": "筆箱・筆記用具類", "pencil": "筆箱・筆記用具類",
+    # 小包・箱類
+    "box": "小包・箱類", "package": "小包・箱類",
+    # その他
+    "lost_item": "その他", "拾得物": "その他", "遺失物": "その他",
+}
+
+# 検出モデルのクラス名の重み
+LABEL_WEIGHT = 1.0
+
+
+def normalize(text):
+    """照合用の正規化（NFKC + 小文字）"""
+    text = str(text or "")
+    if text.isascii():
+        return text.lower()  # 検出モデルのクラス名は NFKC で変わらない
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _is_ascii_letter(ch):
+    return "a" <= ch <= "z"
+
+
+class KeywordMatcher:
+    """
+    複数の語を1回の走査で探す Aho–Corasick オートマトン
+
+    Args:
+        terms: 語のリスト（正規化済み）。一致は terms のインデックスで返す
+    """
+
+    def __init__(self, terms):
+        self.terms = list(terms)
+        goto = [{}]
+        outputs = [[]]
+        for index, term in enumerate(self.terms):
+            if not term:
+                continue
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(index)
+
+        # 失敗遷移（幅優先）。出力は失敗遷移先の出力も合わせて持つ
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0  # 根の直下は根へ
+                outputs[nxt].extend(outputs[fail[nxt]])
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [tuple(o) for o in outputs]
+
+    def find_all(self, text):
+        """(開始位置, 終了位置, 語のインデックス) をすべて返す（重なりを含む）"""
+        goto, fail, outputs, terms = self._goto, self._fail, self._outputs, self.terms
+        matches = []
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in outputs[state]:
+                matches.append((end - len(terms[index]), end, index))
+        return matches
+
+    def find(self, text):
+        """
+        重ならない一致を返す（長い語を優先し、英字の語は前後が英字でないものだけ）
+
+        Returns:
+            list: 一致した語のインデックス（重複なし、見つかった順）
+        """
+        matches = []
+        for start, end, index in self.find_all(text):
+            term = self.terms[index]
+            if _is_ascii_letter(term[0]) and start > 0 and _is_ascii_letter(text[start - 1]):
+                continue
+            if _is_ascii_letter(term[-1]) and end < len(text) and _is_ascii_letter(text[end]):
+                continue
+            matches.append((start, end, index))
+        if len(matches) < 2:
+            return [index for _, _, index in matches]
+        matches.sort(key=lambda m: (m[0] - m[1], m[0]))
+        covered = bytearray(len(text))
+        found = []
+        for start, end, index in matches:
+            if any(covered[start:end]):
+                continue
+            covered[start:end] = b"\x01" * (end - start)
+            if index not in found:
+                found.append(index)
+        return found
+
+
+class KeywordClassifier:
+    """分類のキーワードをまとめたオートマトンと、中分類ごとの採点"""
+
+    def __init__(self, tax):
+        self.taxonomy = tax
+        entries = {}  # 正規化した語 -> [(語, 重み, 大分類, 中分類)]
+        for term, weight, large, medium in tax.keywords:
+            entries.setdefault(normalize(term), []).append((term, weight, large, medium))
+        for term, medium in LABEL_TERMS.items():
+            key = normalize(term)
+            large = tax.large_of(medium)
+            if large and key not in entries:
+                entries[key] = [(term, LABEL_WEIGHT, large, medium)]
+        self.matcher = KeywordMatcher(list(entries))
+        self.entries = list(entries.values())
+        # 同点のときの順番（priority が高い順、同じなら分類の並び順）
+        self.rank = {}
+        for large in tax.large:
+            for medium in tax.mediums(large):
+                self.rank[(large, medium)] = (tax.priorities.get(medium, 0), -len(self.rank))
+
+    def scores(self, text):
+        """
+        文字列に含まれるキーワードの重みを集計
+
+        Returns:
+            tuple: (キーワード -> 重み, (大分類, 中分類) -> 重みの合計, 大分類 -> 重みの合計)
+        """
+        terms = {}
+        mediums = {}
+        larges = {}
+        for index in self.matcher.find(normalize(text)):
+            for term, weight, large, medium in self.entries[index]:
+                terms[term] = max(weight, terms.get(term, 0.0))
+                mediums[(large, medium)] = mediums.get((large, medium), 0.0) + weight
+                larges[large] = larges.get(large, 0.0) + weight
+        return terms, mediums, larges
+
+    def classify(self, text):
+        """
+        最も重みの大きい中分類と、その大分類・小分類
+
+        小分類は一致したキーワードのうち小分類として受け付けるもの（重みの大きい順）、
+        なければ中分類の最初の小分類、それもなければ中分類名。
+
+        Returns:
+            dict: {"large_category", "medium_category", "small_category", "score", "terms"}
+                  キーワードが1つもなければ None
+        """
+        terms, mediums, _ = self.scores(text)
+        if not mediums:
+            return None
+        (large, medium), score = max(
+            mediums.items(), key=lambda item: (item[1],) + self.rank.get(item[0], (0, float("-inf")))
+        )
+        smalls = sorted(
+            (t for t in terms if self.taxonomy.accepts_small(medium, t)), key=lambda t: -terms[t]
+        )
+        small = smalls[0] if smalls else next(iter(self.taxonomy.smalls(medium)), medium)
+        return {
+            "large_category": large,
+            "medium_category": medium,
+            "small_category": small,
+            "score": score,
+            "terms": terms,
+        }
+
+
+_cache = {"taxonomy": None, "classifier": None}
+_cache_lock = threading.Lock()
+
+
+def get_classifier():
+    """組み立て済みの分類器（core.taxonomy の分類が変わるまでキャッシュ）"""
+    tax = taxonomy.load()
+    with _cache_lock:
+        if _cache["taxonomy"] is not tax:
+            _cache.update(taxonomy=tax, classifier=KeywordClassifier(tax))
+        return _cache["classifier"]
+
+
+def scores(text):
+    return get_classifier().scores(text)
+
+
+def classify(text):
+    return get_classifier().classify(text)
@@ -0,0 +1,255 @@
+"""
+データベース接続管理
+Fletアプリ全体で共有するSQLite接続プールとデータアクセス関数
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from data.config import LEGACY_DB_PATH
+
+# 一旦、旧場所（プロジェクト直下の lostitem.db）を使用
+DEFAULT_DB_PATH = LEGACY_DB_PATH
+
+# ビジー時の待ち時間（秒）。WALモードでは読み取りが書き込みを待たないため短めに設定
+BUSY_TIMEOUT = 5.0
+# ページキャッシュサイズ（KiB）
+CACHE_SIZE_KIB = 16 * 1024
+# メモリマップサイズ（バイト）
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+class PooledConnection:
+    """
+    プールされた接続のハンドル
+
+    sqlite3.Connection と同じように使えるが、close() を呼んでも接続は閉じず、
+    スレッドごとのプールへ返却される。未コミットのトランザクションは返却時にロールバックする。
+
+    同じスレッドで取得したハンドルは1つの接続を共有するため、独立したトランザクションにはならない
+    （内側で commit() / rollback() すると外側の書き込みも確定・破棄される）。
+    外側の書き込み中に別の処理を入れ子にする場合は transaction() を使う（SAVEPOINT になる）。
+    row_factory などの設定は、このハンドルを close() した時点で元の値に戻す。
+    """
+
+    def __init__(self, pool, raw):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_raw", raw)
+        object.__setattr__(self, "_saved", {})
+
+    @property
+    def closed(self):
+        return self._raw is None
+
+    def close(self):
+        """接続をプールへ返却"""
+        raw = self._raw
+        if raw is not None:
+            object.__setattr__(self, "_raw", None)
+            # 入れ子で取得した場合も外側のハンドルの設定を変えたままにしない
+            for name, value in self._saved.items():
+                setattr(raw, name, value)
+            self._pool._release(raw)
+
+    def __getattr__(self, name):
+        raw = object.__getattribute__(self, "_raw")
+        if raw is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(raw, name)
+
+    def __setattr__(self, name, value):
+        # row_factory などの設定は実接続へ反映（close() で元の値に戻す）
+        if self._raw is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        if name not in self._saved:
+            self._saved[name] = getattr(self._raw, name)
+        setattr(self._raw, name, value)
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw.__exit__(exc_type, exc, tb)
+
+    def __del__(self):
+        # close() されずに破棄された場合もプールへ返却
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    スレッド単位のSQLite接続プール
+
+    各スレッドは最初の利用時に一度だけ接続を開き、以降は同じ接続を再利用する。
+    終了したスレッドの接続は次回の接続取得時に閉じられる。
+    """
+
+    def __init__(self, db_path, timeout=BUSY_TIMEOUT):
+        self.db_path = Path(db_path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # スレッドID -> (スレッド, 接続)
+        self._connections = {}
+
+    def _open(self):
+        """新しい接続を開き、PRAGMAを設定"""
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=self.timeout,
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _prune(self):
+        """終了したスレッドの接続を閉じる（ロック取得済みで呼ぶこと）"""
+        for ident, (thread, conn) in list(self._connections.items()):
+            if not thread.is_alive():
+                del self._connections[ident]
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def _acquire(self):
+        raw = getattr(self._local, "conn", None)
+        if raw is None:
+            raw = self._open()
+            self._local.conn = raw
+            self._local.depth = 0
+            thread = threading.current_thread()
+            with self._lock:
+                self._prune()
+                self._connections[thread.ident] = (thread, raw)
+        self._local.depth += 1
+        return raw
+
+    def _release(self, raw):
+        if getattr(self._local, "conn", None) is not raw:
+            return
+        self._local.depth = max(0, self._local.depth - 1)
+        if self._local.depth == 0:
+            # 最後の利用者が返却した時点で状態をリセット
+            if raw.in_transaction:
+                raw.rollback()
+            raw.row_factory = None
+
+    def connect(self):
+        """現在のスレッド用の接続を取得"""
+        return PooledConnection(self, self._acquire())
+
+    def close_all(self):
+        """プール内のすべての接続を閉じる"""
+        with self._lock:
+            for thread, conn in self._connections.values():
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=None):
+    """データベースパスに対応する接続プールを取得"""
+    path = Path(db_path or DEFAULT_DB_PATH).resolve()
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = ConnectionPool(path)
+            _pools[path] = pool
+        return pool
+
+
+def connect(db_path=None):
+    """
+    プールから接続を取得
+
+    Args:
+        db_path: データベースのパス（省略時は既定のデータベース）
+
+    Returns:
+        PooledConnection: close() でプールへ返却される接続
+    """
+    return get_pool(db_path).connect()
+
+
+@contextmanager
+def transaction(db_path=None):
+    """
+    正常終了時にコミット、例外時にロールバックする接続を提供
+
+    同じスレッドの接続で未コミットのトランザクションがある場合は SAVEPOINT で入れ子にし、
+    呼び出し側の書き込みを確定・破棄しない（確定は呼び出し側の commit() で行われる）。
+    """
+    conn = connect(db_path)
+    try:
+        if conn.in_transaction:
+            conn.execute("SAVEPOINT db_transaction")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK TO db_transaction")
+                raise
+            finally:
+                conn.execute("RELEASE db_transaction")
+        else:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.close()
+
+
+def query_all(sql, params=(), db_path=None):
+    """SELECTを実行して全行を返す"""
+    conn = connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def query_one(sql, params=(), db_path=None):
+    """SELECTを実行して最初の行を返す（なければNone）"""
+    conn = connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchone()
+    finally:
+        conn.close()
+
+
+def query_scalar(sql, params=(), default=None, db_path=None):
+    """SELECTを実行して最初の行の最初の列を返す"""
+    row = query_one(sql, params, db_path=db_path)
+    return row[0] if row else default
+
+
+def execute(sql, params=(), db_path=None):
+    """更新系SQLを実行してコミットし、lastrowidを返す"""
+    with transaction(db_path) as conn:
+        return conn.execute(sql, params).lastrowid
+
+
+def close_all():
+    """すべてのプールの接続を閉じる（アプリ終了時やバックアップ復元時に使用）"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
@@ -0,0 +1,605 @@
+"""
+画像の特徴ベクトルによる類似画像検索
+拾得物のメイン写真ごとに open_clip の画像ベクトルを CPU で計算し、
+float16 のメモリマップ行列（vectors.f16）と id 対応表（ids.i64）に保存する。
+
+検索は NumPy による全件の内積計算（上位k件）で行う。件数が多い場合は
+build_ivf_pq() で IVF-PQ 索引を作成すると、候補を絞ってから元のベクトルで並べ直す。
+
+拾得物の登録ごとのベクトル計算は既定では行わない（窓口の PC で初回の登録時に重みをダウンロードし、
+torch / open_clip を Flet のプロセスに読み込むため）。使う場合は enable で有効にし、
+オフラインの PC では事前に用意した重みファイルのパスを指定する。
+
+使い方:
+    python -m core.embeddings enable [重みファイル]  # 登録ごとのベクトル計算を有効にする
+    python -m core.embeddings disable               # 登録ごとのベクトル計算を止める
+    python -m core.embeddings backfill [DBパス]     # 未登録の写真をまとめて登録
+    python -m core.embeddings build-ivf             # IVF-PQ 索引を作成
+    python -m core.embeddings similar 拾得物ID [件数]
+"""
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from data.config import EMBEDDINGS_DIR
+
+from . import app_settings, db
+
+# open_clip のモデル（CPU で軽量に動く ViT-B-32 を使用）
+MODEL_NAME = "ViT-B-32"
+PRETRAINED = "laion2b_s34b_b79k"
+
+# 登録ごとのベクトル計算を行うか（"1" で有効）と、重みファイルのパス（未設定なら PRETRAINED をダウンロード）
+INDEXING_SETTING_KEY = "image_indexing"
+WEIGHTS_SETTING_KEY = "embedding_weights"
+
+# 一度にモデルへ渡す画像の枚数
+BATCH_SIZE = 16
+
+# 検索時に一度に内積を計算する行数（メモリ使用量の上限）
+SEARCH_BLOCK_ROWS = 65536
+
+# この件数以上で IVF-PQ 索引があれば使う
+IVF_MIN_ITEMS = 50000
+
+# 削除済みの行の id
+EMPTY_ID = -1
+
+
+def main_photo_path(item_image):
+    """
+    lost_items.item_image からメイン写真のパスを取得
+
+    Args:
+        item_image: 写真パスの JSON（{"main_photos": [...]} / {"photos": [...]} / [...]）または単一のパス
+    """
+    if not isinstance(item_image, str) or not item_image:
+        return None
+    try:
+        data = json.loads(item_image)
+    except ValueError:
+        return item_image
+    if isinstance(data, dict):
+        photos = data.get("main_photos") or data.get("photos") or []
+        return photos[0] if photos else None
+    if isinstance(data, list):
+        return data[0] if data else None
+    return None
+
+
+class ImageEmbedder:
+    """
+    open_clip による画像ベクトルの計算
+
+    モデルは最初の encode() で読み込む（torch / open_clip の import もその時点で行う）。
+    読み込みに失敗した場合（オフライン・重みファイルがないなど）は1回だけ表示し、
+    以降は読み込み直さずにすぐ RuntimeError にする。
+
+    Args:
+        pretrained: open_clip の学習済みの重みの名前、または重みファイルのパス
+    """
+
+    def __init__(self, model_name=MODEL_NAME, pretrained=PRETRAINED):
+        self.model_name = model_name
+        self.pretrained = pretrained
+        self.error = None
+        self._model = None
+        self._preprocess = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.error is not None:
+            raise RuntimeError(f"画像ベクトルのモデルを使用できません: {self.error}")
+        if self._model is None:
+            try:
+                import open_clip
+                import torch
+
+                model, _, preprocess = open_clip.create_model_and_transforms(
+                    self.model_name, pretrained=self.pretrained, device=torch.device("cpu")
+                )
+            except Exception as e:
+                self.error = e
+                print(f"画像ベクトルのモデルを読み込めませんでした（以降は使用しません）: {e}")
+                raise RuntimeError(f"画像ベクトルのモデルを使用できません: {e}") from e
+            model.eval()
+            self._model, self._preprocess = model, preprocess
+            print(f"画像ベクトルのモデルを読み込みました: {self.model_name} ({self.pretrained})")
+        return self._model, self._preprocess
+
+    def encode(self, images):
+        """
+        画像（パスまたは PIL.Image）のリストをベクトルに変換
+
+        Returns:
+            numpy.ndarray: (枚数, 次元) の正規化済み float32 行列
+        """
+        from PIL import Image
+
+        with self._lock:
+            model, preprocess = self._load()
+            import torch
+
+            vectors = []
+            for start in range(0, len(images), BATCH_SIZE):
+                batch = []
+                for image in images[start:start + BATCH_SIZE]:
+                    if not isinstance(image, Image.Image):
+                        image = Image.open(image)
+                    batch.append(preprocess(image.convert("RGB")))
+                with torch.no_grad():
+                    features = model.encode_image(torch.stack(batch))
+                vectors.append(features.float().numpy())
+        vectors = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return normalize(vectors)
+
+
+def normalize(vectors):
+    """行ごとに L2 正規化（内積がコサイン類似度になる）"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    """
+    拾得物 id ごとの画像ベクトルの保存と検索
+
+    ファイル構成（directory 以下）:
+        meta.json   : モデル名・次元数・件数・容量
+        vectors.f16 : (容量, 次元) の float16 行列
+        ids.i64     : 各行の拾得物 id（未使用・削除済みは -1）
+        ivfpq.npz   : IVF-PQ 索引（任意）
+    """
+
+    def __init__(self, directory=None, dim=None, model_name=MODEL_NAME):
+        self.directory = Path(directory or EMBEDDINGS_DIR)
+        self._lock = threading.RLock()
+        self.meta = {"model": model_name, "dim": dim, "count": 0, "capacity": 0}
+        self.vectors = None
+        self.ids = None
+        self._rows = {}
+        self._ivf = None
+        self._load()
+
+    # ------------------------------------------------------------------
+    # ファイル入出力
+    # ------------------------------------------------------------------
+    @property
+    def _meta_path(self):
+        return self.directory / "meta.json"
+
+    def _load(self):
+        if not self._meta_path.exists():
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self.meta.update(json.load(f))
+        self._map()
+        ids = np.asarray(self.ids[:self.meta["count"]])
+        self._rows = {int(item_id): row for row, item_id in enumerate(ids) if item_id != EMPTY_ID}
+
+    def _map(self):
+        capacity, dim = self.meta["capacity"], self.meta["dim"]
+        if not capacity:
+            self.vectors = self.ids = None
+            return
+        self.vectors = np.memmap(self.directory / "vectors.f16", dtype=np.float16, mode="r+", shape=(capacity, dim))
+        self.ids = np.memmap(self.directory / "ids.i64", dtype=np.int64, mode="r+", shape=(capacity,))
+
+    def _save_meta(self):
+        tmp = self._meta_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        tmp.replace(self._meta_path)
+
+    def _grow(self, needed):
+        """容量が足りない場合は倍に拡張（ファイルを伸ばしてマップし直す）"""
+        capacity = self.meta["capacity"]
+        if needed <= capacity:
+            return
+        new_capacity = max(1024, capacity * 2, needed)
+        dim = self.meta["dim"]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.ids.flush()
+            self.vectors = self.ids = None
+        for name, itemsize, width in (("vectors.f16", 2, dim), ("ids.i64", 8, 1)):
+            with open(self.directory / name, "ab") as f:
+                f.truncate(new_capacity * itemsize * width)
+        self.meta["capacity"] = new_capacity
+        self._map()
+        self.ids[capacity:] = EMPTY_ID
+
+    def flush(self):
+        with self._lock:
+            if self.vectors is not None:
+                self.vectors.flush()
+                self.ids.flush()
+            self._save_meta()
+
+    # ------------------------------------------------------------------
+    # 登録・削除
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, item_id):
+        return int(item_id) in self._rows
+
+    def add(self, item_ids, vectors):
+        """
+        ベクトルを登録（登録済みの id は上書き）
+
+        Args:
+            item_ids: 拾得物 id のリスト
+            vectors: (件数, 次元) の行列
+        """
+        vectors = normalize(vectors)
+        if len(item_ids) != len(vectors):
+            raise ValueError("id とベクトルの件数が一致しません")
+        with self._lock:
+            if self.meta["dim"] is None:
+                self.meta["dim"] = int(vectors.shape[1])
+            elif vectors.shape[1] != self.meta["dim"]:
+                raise ValueError(f"ベクトルの次元が違います: {vectors.shape[1]} != {self.meta['dim']}")
+            new_ids = [int(i) for i in item_ids if int(i) not in self._rows]
+            self._grow(self.meta["count"] + len(new_ids))
+            for item_id, vector in zip(item_ids, vectors):
+                item_id = int(item_id)
+                row = self._rows.get(item_id)
+                if row is None:
+                    row = self.meta["count"]
+                    self.meta["count"] += 1
+                    self._rows[item_id] = row
+                    self.ids[row] = item_id
+                self.vectors[row] = vector.astype(np.float16)
+            self.flush()
+
+    def remove(self, item_id):
+        """ベクトルを削除（行は空きとして残す）"""
+        with self._lock:
+            row = self._rows.pop(int(item_id), None)
+            if row is not None:
+                self.ids[row] = EMPTY_ID
+                self.vectors[row] = 0
+                self.flush()
+
+    def vector_of(self, item_id):
+        row = self._rows.get(int(item_id))
+        if row is None:
+            return None
+        return np.asarray(self.vectors[row], dtype=np.float32)
+
+    # ------------------------------------------------------------------
+    # 検索
+    # ------------------------------------------------------------------
+    def search(self, query, k=10, exclude_ids=(), use_ivf=None):
+        """
+        類似度の高い順に k 件を返す
+
+        Args:
+            query: 検索するベクトル（1次元）
+            exclude_ids: 結果から除く拾得物 id
+            use_ivf: IVF-PQ 索引を使うか（None の場合は件数と索引の有無で判断）
+
+        Returns:
+            list: (拾得物 id, コサイン類似度) のリスト
+        """
+        query = normalize(query).reshape(-1)
+        exclude = {int(i) for i in exclude_ids}
+        with self._lock:
+            count = self.meta["count"]
+            if not count:
+                return []
+            ivf = self._ivf_index()
+            if use_ivf is None:
+                use_ivf = ivf is not None and len(self) >= IVF_MIN_ITEMS
+            if use_ivf and ivf is not None:
+                # 索引の候補を元のベクトルで採点し、索引作成後に追加された行は全件で採点する
+                rows = ivf.candidates(query, max(k * 50, 500))
+                scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+                if ivf.covered < count:
+                    tail_rows, tail_scores = self._brute_force(query, count, k + len(exclude), ivf.covered)
+                    rows = np.concatenate([rows, tail_rows])
+                    scores = np.concatenate([scores, tail_scores])
+            else:
+                rows, scores = self._brute_force(query, count, k + len(exclude))
+            ids = np.asarray(self.ids[rows])
+        results = []
+        for index in np.argsort(-scores):
+            item_id = int(ids[index])
+            if item_id == EMPTY_ID or item_id in exclude:
+                continue
+            results.append((item_id, float(scores[index])))
+            if len(results) >= k:
+                break
+        return results
+
+    def _brute_force(self, query, count, k, first_row=0):
+        """first_row 行目以降の内積をブロックごとに計算し、上位 k 件の行番号とスコアを返す"""
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for start in range(first_row, count, SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:min(start + SEARCH_BLOCK_ROWS, count)], dtype=np.float32)
+            scores = block @ query
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+            else:
+                top = np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        return best_rows, best_scores
+
+    def _ivf_index(self):
+        path = self.directory / "ivfpq.npz"
+        if self._ivf is None and path.exists():
+            self._ivf = IVFPQIndex.load(path)
+        return self._ivf
+
+    def build_ivf_pq(self, nlist=None, m=16, nprobe=16, iterations=10, seed=0):
+        """
+        IVF-PQ 索引を作成して保存
+
+        Args:
+            nlist: 粗い量子化のクラスタ数（省略時は √件数）
+            m: 直積量子化の分割数（次元数を割り切れる値）
+            nprobe: 検索時に調べるクラスタ数
+        """
+        with self._lock:
+            rows = np.array(sorted(self._rows.values()), dtype=np.int64)
+            data = np.asarray(self.vectors[rows], dtype=np.float32)
+            nlist = nlist or max(1, int(np.sqrt(len(rows))))
+            index = IVFPQIndex.train(data, rows, nlist=nlist, m=m, nprobe=nprobe, iterations=iterations, seed=seed)
+            index.covered = self.meta["count"]
+            index.save(self.directory / "ivfpq.npz")
+            self._ivf = index
+        return index
+
+
+def _kmeans(data, k, iterations=10, seed=0):
+    """簡易な k-means（ユークリッド距離）"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(data, centroids)
+        for c in range(k):
+            members = data[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+    return centroids, _nearest(data, centroids)
+
+
+def _nearest(data, centroids, block=16384):
+    result = np.empty(len(data), dtype=np.int64)
+    c_norm = (centroids ** 2).sum(axis=1)
+    for start in range(0, len(data), block):
+        part = data[start:start + block]
+        dist = c_norm[None, :] - 2 * part @ centroids.T
+        result[start:start + block] = dist.argmin(axis=1)
+    return result
+
+
+class IVFPQIndex:
+    """
+    IVF-PQ 索引（NumPy 実装）
+
+    ベクトルを nlist 個のクラスタに分け、クラスタ中心との差分を m 個の部分ベクトルごとに
+    256 個の代表値で符号化する。検索では近い nprobe 個のクラスタだけを距離表で概算する。
+    """
+
+    def __init__(self, coarse, codebooks, codes, lists, rows, nprobe=16, covered=None):
+        self.coarse = coarse          # (nlist, dim)
+        self.codebooks = codebooks    # (m, 256, dim/m)
+        self.codes = codes            # (件数, m) uint8
+        self.lists = lists            # 各行のクラスタ番号
+        self.rows = rows              # 各行の EmbeddingIndex 上の行番号
+        self.nprobe = nprobe
+        self._order = None
+        self._offsets = None
+        # 索引作成時点の行数（これ以降の行は索引に含まれない）
+        self.covered = int(rows.max()) + 1 if covered is None and len(rows) else (covered or 0)
+
+    @classmethod
+    def train(cls, data, rows, nlist, m=16, nprobe=16, iterations=10, seed=0):
+        dim = data.shape[1]
+        if dim % m:
+            raise ValueError(f"次元数 {dim} は分割数 {m} で割り切れません")
+        coarse, lists = _kmeans(data, nlist, iterations, seed)
+        residual = data - coarse[lists]
+        sub = dim // m
+        codebooks = np.zeros((m, 256, sub), dtype=np.float32)
+        codes = np.zeros((len(data), m), dtype=np.uint8)
+        for j in range(m):
+            part = residual[:, j * sub:(j + 1) * sub]
+            book, assign = _kmeans(part, 256, iterations, seed + j + 1)
+            codebooks[j, :len(book)] = book
+            codes[:, j] = assign
+        return cls(coarse, codebooks, codes, lists, rows, nprobe)
+
+    def candidates(self, query, count):
+        """query に近い行番号を最大 count 件返す（元のベクトルで並べ直す前の候補）"""
+        m, _, sub = self.codebooks.shape
+        if self._order is None:
+            # クラスタごとの行の並び（転置リスト）
+            self._order = np.argsort(self.lists, kind="stable")
+            self._offsets = np.searchsorted(self.lists[self._order], np.arange(len(self.coarse) + 1))
+        probe = np.argsort(((self.coarse - query) ** 2).sum(axis=1))[:self.nprobe]
+        selected, dists = [], []
+        for p in probe:
+            members = self._order[self._offsets[p]:self._offsets[p + 1]]
+            if not len(members):
+                continue
+            # クラスタ中心との差分について、部分ベクトルごとの距離表 (m, 256) を作り引くだけで概算
+            residual = (query - self.coarse[p]).reshape(m, sub)
+            table = ((residual[:, None, :] - self.codebooks) ** 2).sum(axis=2)
+            dists.append(table[np.arange(m), self.codes[members]].sum(axis=1))
+            selected.append(members)
+        if not selected:
+            return np.zeros(0, dtype=np.int64)
+        selected = np.concatenate(selected)
+        dist = np.concatenate(dists)
+        if len(dist) > count:
+            top = np.argpartition(dist, count)[:count]
+        else:
+            top = np.arange(len(dist))
+        return self.rows[selected[top]]
+
+    def save(self, path):
+        np.savez(
+            path, coarse=self.coarse, codebooks=self.codebooks, codes=self.codes,
+            lists=self.lists, rows=self.rows, nprobe=np.array(self.nprobe),
+            covered=np.array(self.covered),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(
+            data["coarse"], data["codebooks"], data["codes"], data["lists"], data["rows"],
+            int(data["nprobe"]), int(data["covered"]),
+        )
+
+
+_embedder = None
+_index = None
+_shared_lock = threading.Lock()
+
+
+def configured_weights(db_path=None):
+    """settings テーブルに設定された重みファイルのパス（未設定なら None）"""
+    try:
+        return app_settings.get(WEIGHTS_SETTING_KEY, db_path=db_path) or None
+    except Exception:
+        return None
+
+
+def indexing_enabled(db_path=None):
+    """拾得物の登録ごとにベクトルを計算するか（settings テーブル、既定は行わない）"""
+    try:
+        return app_settings.get(INDEXING_SETTING_KEY, db_path=db_path) == "1"
+    except Exception:
+        return False
+
+
+def set_indexing(enabled, weights=None, db_path=None):
+    """登録ごとのベクトル計算の有効・無効と、重みファイルのパスを settings テーブルに保存"""
+    if weights and not Path(weights).is_file():
+        raise ValueError(f"重みファイルが見つかりません: {weights}")
+    values = {INDEXING_SETTING_KEY: "1" if enabled else "0"}
+    if weights is not None:
+        values[WEIGHTS_SETTING_KEY] = str(weights)
+    app_settings.set_many(values, db_path=db_path)
+
+
+def get_embedder():
+    """プロセス全体で共有する ImageEmbedder（重みは settings テーブルの重みファイル、未設定なら PRETRAINED）"""
+    global _embedder
+    with _shared_lock:
+        if _embedder is None:
+            _embedder = ImageEmbedder(pretrained=configured_weights() or PRETRAINED)
+        return _embedder
+
+
+def should_index_on_register():
+    """登録ごとのベクトル計算を行うか（無効に設定されている、またはモデルの読み込みに失敗済みなら False）"""
+    return indexing_enabled() and get_embedder().error is None
+
+
+def get_index():
+    """プロセス全体で共有する EmbeddingIndex"""
+    global _index
+    with _shared_lock:
+        if _index is None:
+            _index = EmbeddingIndex()
+        return _index
+
+
+def index_item(lost_item_id, image_path):
+    """拾得物1件のメイン写真を登録（写真がない場合は何もしない）"""
+    if not image_path or not Path(image_path).exists():
+        return False
+    vectors = get_embedder().encode([image_path])
+    get_index().add([lost_item_id], vectors)
+    return True
+
+
+def find_similar_items(lost_item_id, k=10):
+    """
+    拾得物に見た目が似ている拾得物を返す
+
+    Returns:
+        list: (拾得物 id, コサイン類似度) のリスト（登録されていない場合は空）
+    """
+    index = get_index()
+    vector = index.vector_of(lost_item_id)
+    if vector is None:
+        return []
+    return index.search(vector, k, exclude_ids=[lost_item_id])
+
+
+def find_similar_to_image(image, k=10):
+    """写真（パスまたは PIL.Image）に見た目が似ている拾得物を返す"""
+    vectors = get_embedder().encode([image])
+    return get_index().search(vectors[0], k)
+
+
+def backfill(db_path=None, batch_size=BATCH_SIZE * 4):
+    """
+    まだ登録されていない拾得物のメイン写真をまとめて登録
+
+    Returns:
+        int: 登録した件数
+    """
+    index = get_index()
+    conn = db.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT id, item_image FROM lost_items WHERE item_image IS NOT NULL AND item_image != ''"
+        ).fetchall()
+    finally:
+        conn.close()
+    pending = []
+    for item_id, item_image in rows:
+        path = main_photo_path(item_image)
+        if item_id not in index and path and Path(path).exists():
+            pending.append((item_id, path))
+    added = 0
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        vectors = get_embedder().encode([path for _, path in batch])
+        index.add([item_id for item_id, _ in batch], vectors)
+        added += len(batch)
+        print(f"  {added}/{len(pending)}件の写真を登録しました")
+    return added
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "enable":
+        set_indexing(True, sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"登録ごとの画像ベクトルの計算を有効にしました（重み: {configured_weights() or PRETRAINED}）")
+    elif command == "disable":
+        set_indexing(False)
+        print("登録ごとの画像ベクトルの計算を止めました")
+    elif command == "backfill":
+        count = backfill(sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"画像ベクトルを {count}件 登録しました（合計 {len(get_index())}件）")
+    elif command == "build-ivf":
+        index = get_index().build_ivf_pq()
+        print(f"IVF-PQ 索引を作成しました（クラスタ数 {len(index.coarse)}）")
+    elif command == "similar" and len(sys.argv) > 2:
+        k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+        for item_id, score in find_similar_items(int(sys.argv[2]), k):
+            print(f"{item_id}\t{score:.3f}")
+    else:
+        print("使い方: python -m core.embeddings "
+              "[enable [重みファイル] | disable | backfill [DBパス] | build-ivf | similar 拾得物ID [件数]]")
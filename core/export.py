@@ -0,0 +1,383 @@
+"""
+拾得物・遺失物の CSV / Excel エクスポート
+行を fetchmany で FETCH_SIZE 件ずつ読みながら書き出すため、件数が増えてもメモリ使用量は変わらない。
+
+    CSV:  UTF-8（BOM 付き、Excel でそのまま開ける）
+    XLSX: 標準ライブラリの zipfile でシートの XML を1行ずつ書き出す（共有文字列表を使わない）
+
+絞り込み条件は一覧画面と同じもの（core.search.lost_items_filter / notfound_items_filter）を使う。
+
+使い方:
+    python -m core.export lost_items [--format xlsx] [--columns main_id,get_item] [--start 2025-01-01] [--end 2025-01-31]
+    python -m core.export notfound_items --status 連絡待ち
+"""
+import argparse
+import csv
+import os
+import re
+import threading
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from data.config import EXPORTS_DIR
+
+from . import db
+from .search import lost_items_filter, notfound_items_filter
+
+# 1回に読み込む行数
+FETCH_SIZE = 500
+
+# 拾得物の出力できる列（列名 -> 見出し、この順で出力）
+LOST_ITEM_COLUMNS = {
+    "id": "ID",
+    "main_id": "管理番号",
+    "choice_finder": "拾得者区分",
+    "get_item": "拾得日",
+    "get_item_hour": "拾得時",
+    "get_item_minute": "拾得分",
+    "recep_item": "受付日",
+    "recep_manager": "受付担当者",
+    "find_area": "拾得場所",
+    "finder_name": "拾得者氏名",
+    "finder_tel1": "拾得者電話番号",
+    "item_class_L": "大分類",
+    "item_class_M": "中分類",
+    "item_class_S": "小分類",
+    "item_feature": "特徴",
+    "item_color": "色",
+    "item_maker": "メーカー",
+    "item_storage_place": "保管場所",
+    "item_num": "数量",
+    "item_unit": "単位",
+    "item_value": "貴重品",
+    "item_money": "金額",
+    "item_remarks": "備考",
+    "item_situation": "状況",
+    "refund_situation": "返還状況",
+    "created_at": "登録日時",
+}
+
+# 遺失物（遺失届）の出力できる列
+NOTFOUND_ITEM_COLUMNS = {
+    "id": "ID",
+    "name": "氏名",
+    "phone": "電話番号",
+    "lost_date": "遺失日",
+    "location": "遺失場所",
+    "item": "遺失物",
+    "status": "状況",
+    "contact_date": "連絡日",
+    "return_date": "返還日",
+    "created_at": "登録日時",
+}
+
+# テーブルごとの (出力できる列, 絞り込み条件を作る関数, 並び順)
+TABLES = {
+    "lost_items": (LOST_ITEM_COLUMNS, lost_items_filter, "get_item DESC, id DESC"),
+    "notfound_items": (NOTFOUND_ITEM_COLUMNS, notfound_items_filter, "lost_date DESC, id DESC"),
+}
+
+FORMATS = ("csv", "xlsx")
+
+_running = threading.Lock()
+
+
+def resolve_columns(table, columns=None):
+    """出力する列と見出し（columns を省略した場合はすべての列）"""
+    available = TABLES[table][0]
+    columns = list(columns) if columns else list(available)
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ValueError(f"{table} に出力できない列です: {', '.join(unknown)}")
+    return columns, [available[c] for c in columns]
+
+
+def count_rows(table, search_params=None, db_path=None):
+    """条件に合う行数"""
+    conn = db.connect(db_path)
+    try:
+        where = TABLES[table][1](conn, search_params)
+        return conn.execute(f"SELECT COUNT(*) FROM {table} {where.sql()}", where.params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def iter_rows(table, columns, search_params=None, db_path=None, fetch_size=FETCH_SIZE):
+    """条件に合う行を fetch_size 件ずつ読み込んで1行ずつ返す"""
+    _, make_filter, order_by = TABLES[table]
+    conn = db.connect(db_path)
+    try:
+        where = make_filter(conn, search_params)
+        cur = conn.execute(
+            f"SELECT {', '.join(columns)} FROM {table} {where.sql()} ORDER BY {order_by}",
+            where.params,
+        )
+        while True:
+            rows = cur.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+# ----------------------------------------------------------------------
+# 書き出し
+# ----------------------------------------------------------------------
+class CsvWriter:
+    """CSV（UTF-8 BOM 付き）"""
+
+    def __init__(self, path):
+        self._file = open(path, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._file)
+
+    def writerow(self, row):
+        self._writer.writerow(["" if value is None else value for value in row])
+
+    def close(self):
+        self._file.close()
+
+
+# XML に書けない制御文字
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_STATIC_FILES = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # 見出し行用に太字（s="1"）を用意する
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Yu Gothic"/></font>'
+        '<font><b/><sz val="11"/><name val="Yu Gothic"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+class XlsxWriter:
+    """
+    Excel（.xlsx、シート1枚）
+
+    シートの XML を zip に直接書き出す。文字列はセル内に書く（inlineStr）ため、
+    行数が増えても保持するデータは増えない。1行目（見出し）は太字にして固定する。
+    """
+
+    # この行数ごとに zip へ書き込む
+    FLUSH_ROWS = 200
+
+    def __init__(self, path, sheet_name="Sheet1"):
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        for name, content in _XLSX_STATIC_FILES.items():
+            self._zip.writestr(name, content)
+        self._zip.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name, {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>',
+        )
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            b'<sheetViews><sheetView workbookViewId="0">'
+            b'<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+            b'</sheetView></sheetViews><sheetData>'
+        )
+        self._row_number = 0
+        self._buffer = []
+
+    @staticmethod
+    def _cell(value, style):
+        if value is None or value == "":
+            return "<c/>"
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f"<c{style}><v>{value}</v></c>"
+        text = _INVALID_XML_CHARS.sub("", str(value))
+        return f'<c{style} t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+    def writerow(self, row):
+        self._row_number += 1
+        style = ' s="1"' if self._row_number == 1 else ""
+        cells = "".join(self._cell(value, style) for value in row)
+        self._buffer.append(f'<row r="{self._row_number}">{cells}</row>')
+        if len(self._buffer) >= self.FLUSH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._sheet.write("".join(self._buffer).encode("utf-8"))
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+
+
+WRITERS = {"csv": CsvWriter, "xlsx": XlsxWriter}
+
+
+def default_path(table, fmt):
+    """エクスポート先の既定のパス（EXPORTS_DIR/<テーブル>_<日時>.<形式>）"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return Path(EXPORTS_DIR) / f"{table}_{timestamp}.{fmt}"
+
+
+def export(table, path=None, fmt=None, columns=None, search_params=None, on_progress=None, db_path=None,
+           fetch_size=FETCH_SIZE):
+    """
+    テーブルの行を CSV / Excel に書き出す
+
+    書き出し中のファイルは一時ファイルに書き、完了してから名前を変える。
+
+    Args:
+        table: "lost_items" / "notfound_items"
+        path: 出力先（省略時は default_path()）
+        fmt: "csv" / "xlsx"（省略時は path の拡張子、どちらでもなければ csv）
+        columns: 出力する列（省略時はすべて）
+        search_params: 絞り込み条件（一覧画面と同じ形式）
+        on_progress: 進み具合を受け取る関数 on_progress(書き出した行数, 全体の行数)
+
+    Returns:
+        dict: {"path": Path, "rows": 書き出した行数}
+    """
+    if table not in TABLES:
+        raise ValueError(f"エクスポートできないテーブルです: {table}")
+    if fmt is None:
+        fmt = Path(path).suffix.lstrip(".").lower() if path else "csv"
+        fmt = fmt if fmt in FORMATS else "csv"
+    if fmt not in FORMATS:
+        raise ValueError(f"不明な形式です: {fmt}（{', '.join(FORMATS)}）")
+    columns, headers = resolve_columns(table, columns)
+    path = Path(path or default_path(table, fmt))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    total = count_rows(table, search_params, db_path) if on_progress else None
+
+    temporary = path.with_name(f".{path.name}.tmp")
+    writer = WRITERS[fmt](temporary)
+    written = 0
+    try:
+        try:
+            writer.writerow(headers)
+            for row in iter_rows(table, columns, search_params, db_path, fetch_size):
+                writer.writerow(row)
+                written += 1
+                if on_progress and written % fetch_size == 0:
+                    on_progress(written, total)
+        finally:
+            writer.close()
+        os.replace(temporary, path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    if on_progress:
+        on_progress(written, total)
+    return {"path": path, "rows": written}
+
+
+def start(table, on_done=None, on_error=None, **options):
+    """
+    エクスポートをバックグラウンドのスレッドで実行（実行中なら何もしない）
+
+    Args:
+        on_done: 完了時に export() の結果を受け取る関数
+        on_error: 失敗時に例外を受け取る関数
+        options: export() に渡す引数
+
+    Returns:
+        threading.Thread: 開始したスレッド（既に実行中の場合は None）
+    """
+    if not _running.acquire(blocking=False):
+        return None
+
+    def worker():
+        try:
+            result = export(table, **options)
+        except Exception as e:
+            print(f"エクスポートエラー: {e}")
+            if on_error:
+                on_error(e)
+            return
+        finally:
+            _running.release()
+        print(f"{result['rows']}件をエクスポートしました: {result['path']}")
+        if on_done:
+            on_done(result)
+
+    thread = threading.Thread(target=worker, name="export", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="拾得物・遺失物の CSV / Excel エクスポート")
+    parser.add_argument("table", choices=list(TABLES))
+    parser.add_argument("-o", "--output", help="出力先（省略時は data/exports）")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--columns", help="出力する列（カンマ区切り）")
+    parser.add_argument("--start", help="開始日（拾得日・遺失日）")
+    parser.add_argument("--end", help="終了日（拾得日・遺失日）")
+    parser.add_argument("--status", help="遺失物の状況")
+    parser.add_argument("--all", action="store_true", help="返還済み・廃棄/売却済みの拾得物も含める")
+    parser.add_argument("--db", help="データベースのパス")
+    args = parser.parse_args(argv)
+
+    search_params = {"start_date": args.start, "end_date": args.end, "status": args.status}
+    if args.all:
+        search_params.update(show_refunded=True, show_disposed=True)
+    result = export(
+        args.table,
+        path=args.output,
+        fmt=args.format,
+        columns=args.columns.split(",") if args.columns else None,
+        search_params=search_params,
+        on_progress=lambda done, total: print(f"\r{done}/{total}", end="", flush=True),
+        db_path=args.db,
+    )
+    print(f"\n{result['rows']}件をエクスポートしました: {result['path']}")
+
+
+if __name__ == "__main__":
+    main()
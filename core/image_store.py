@@ -0,0 +1,377 @@
+"""
+写真の保存先（内容アドレス方式）
+写真は内容の SHA-256 を名前にして、ハッシュの先頭4文字で振り分けたフォルダに保存する。
+
+    IMAGE_STORE_DIR/<ハッシュ1-2文字目>/<ハッシュ3-4文字目>/<ハッシュ>.jpg
+
+1つのフォルダのファイル数が増えないため、写真が数万枚になっても一覧やバックアップが遅くならない。
+同じ内容の写真は1つのファイルにまとめ（重複排除）、lost_items.item_image の JSON から
+参照されている数を image_refs テーブルで数える。参照がなくなった写真は collect_garbage() で削除する。
+
+使い方:
+    python -m core.image_store migrate [DBパス] [--remove-originals]  # 旧来の保存場所の写真を移行
+    python -m core.image_store gc [DBパス]                              # 参照されていない写真を削除
+    python -m core.image_store stats [DBパス]
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from data.config import (
+    BUNDLE_IMAGES_DIR,
+    IMAGE_STORE_DIR,
+    IMAGES_DIR,
+    MAIN_IMAGES_DIR,
+    ROOT_DIR,
+    SUB_IMAGES_DIR,
+)
+
+from . import db
+
+REFS_TABLE = "image_refs"
+
+# 移行時に写真を探す旧来の保存場所（item_image にファイル名だけが入っている場合や、パスが変わった場合）
+LEGACY_DIRS = (
+    ROOT_DIR / "images",                    # Flet アプリの旧保存先
+    MAIN_IMAGES_DIR,
+    SUB_IMAGES_DIR,
+    BUNDLE_IMAGES_DIR,
+    IMAGES_DIR,
+    ROOT_DIR / "apps" / "renamed_images",   # Flask アプリの保存先
+    ROOT_DIR / "apps" / "images",
+)
+
+# 参照されていない写真を削除するまでの猶予（書き込み直後でまだ登録されていない写真を消さない）
+GC_GRACE_SECONDS = 3600
+
+# 移行時に1回のトランザクションで更新する行数
+MIGRATE_BATCH_ROWS = 500
+
+_HEX = set("0123456789abcdef")
+
+
+def object_path(digest, ext=".jpg", root=None):
+    """ハッシュに対応する保存先のパス"""
+    return Path(root or IMAGE_STORE_DIR) / digest[:2] / digest[2:4] / f"{digest}{ext}"
+
+
+def digest_of(path, root=None):
+    """保存先の写真のパスからハッシュを取り出す（保存先の写真でなければ None）"""
+    path = Path(path)
+    digest = path.stem
+    if len(digest) != 64 or not set(digest) <= _HEX:
+        return None
+    if path.parent.parent.parent.resolve() != Path(root or IMAGE_STORE_DIR).resolve():
+        return None
+    return digest
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _touch(target):
+    """
+    既にある写真の更新時刻を今にする
+
+    重複排除で既存の写真を使う場合、参照が登録される前に collect_garbage() が
+    古い（猶予を過ぎた）未参照の写真として削除しないようにする。
+    """
+    try:
+        os.utime(target)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def install(temporary, target):
+    """一時ファイルを保存先に移動（同じ内容が既にあれば一時ファイルを削除）。新しく置いたら True"""
+    if target.exists() and _touch(target):
+        os.unlink(temporary)
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temporary, target)
+    return True
+
+
+def put_file(source, root=None):
+    """
+    写真のファイルを保存先にコピー（元のファイルはそのまま）
+
+    Returns:
+        tuple: (保存先のパス, 新しく保存したか)
+    """
+    source = Path(source)
+    digest = hash_file(source)
+    target = object_path(digest, source.suffix.lower() or ".jpg", root)
+    if target.exists() and _touch(target):
+        return target, False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f".{uuid.uuid4().hex}.tmp")
+    shutil.copy2(source, temporary)
+    return target, install(temporary, target)
+
+
+# ----------------------------------------------------------------------
+# item_image の JSON
+# ----------------------------------------------------------------------
+def _parse(item_image):
+    if not isinstance(item_image, str) or not item_image:
+        return None
+    try:
+        return json.loads(item_image)
+    except ValueError:
+        return item_image  # 単一のパス（ファイル名）
+
+
+def iter_paths(item_image):
+    """
+    lost_items.item_image に含まれる写真のパスをすべて返す
+
+    Args:
+        item_image: {"main_photos": [...], "sub_photos": [...], ...} / [...] / 単一のパス
+    """
+    data = _parse(item_image)
+    if isinstance(data, str):
+        return [data]
+    if isinstance(data, list):
+        return [p for p in data if isinstance(p, str) and p]
+    if isinstance(data, dict):
+        return [p for photos in data.values() if isinstance(photos, list) for p in photos if isinstance(p, str) and p]
+    return []
+
+
+def replace_paths(item_image, mapping):
+    """item_image の形を保ったまま、写真のパスを mapping で置き換える"""
+    data = _parse(item_image)
+    if isinstance(data, str):
+        return mapping.get(data, data)
+    if isinstance(data, list):
+        return json.dumps([mapping.get(p, p) for p in data], ensure_ascii=False)
+    if isinstance(data, dict):
+        replaced = {
+            key: [mapping.get(p, p) for p in photos] if isinstance(photos, list) else photos
+            for key, photos in data.items()
+        }
+        return json.dumps(replaced, ensure_ascii=False)
+    return item_image
+
+
+# ----------------------------------------------------------------------
+# 参照数
+# ----------------------------------------------------------------------
+def create_refs_table(conn):
+    """写真の参照数のテーブルを作成"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {REFS_TABLE} (
+            digest TEXT PRIMARY KEY,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _digests(paths, root=None):
+    return [digest for digest in (digest_of(p, root) for p in paths) if digest]
+
+
+def add_refs(conn, paths, root=None):
+    """
+    写真の参照数を増やす（呼び出し側のトランザクション内で実行する）
+
+    item_image の書き換えや拾得物の削除では減らさない。参照数は collect_garbage() が
+    lost_items から数え直すため、減らし忘れで写真が残り続けることはない。
+    """
+    for digest in _digests(paths, root):
+        conn.execute(f"""
+            INSERT INTO {REFS_TABLE} (digest, refcount) VALUES (?, 1)
+            ON CONFLICT(digest) DO UPDATE SET refcount = refcount + 1, updated_at = CURRENT_TIMESTAMP
+        """, (digest,))
+
+
+def recount(conn, root=None):
+    """lost_items.item_image から参照数を数え直す（呼び出し側のトランザクション内で実行する）"""
+    counts = Counter()
+    for (item_image,) in conn.execute("SELECT item_image FROM lost_items WHERE item_image IS NOT NULL"):
+        counts.update(_digests(iter_paths(item_image), root))
+    conn.execute(f"DELETE FROM {REFS_TABLE}")
+    conn.executemany(
+        f"INSERT INTO {REFS_TABLE} (digest, refcount) VALUES (?, ?)",
+        counts.items(),
+    )
+    return counts
+
+
+def iter_objects(root=None):
+    """保存先の写真をすべて返す"""
+    root = Path(root or IMAGE_STORE_DIR)
+    if not root.exists():
+        return
+    for shard in root.iterdir():
+        if shard.is_dir() and len(shard.name) == 2:
+            for path in shard.glob("*/*"):
+                if digest_of(path, root):
+                    yield path
+
+
+def collect_garbage(db_path=None, root=None, grace_seconds=GC_GRACE_SECONDS):
+    """
+    参照数を数え直し、どの拾得物からも参照されていない写真を削除
+
+    Returns:
+        int: 削除した写真の枚数
+    """
+    with db.transaction(db_path) as conn:
+        counts = recount(conn, root)
+    removed = 0
+    cutoff = time.time() - grace_seconds
+    for path in iter_objects(root):
+        if counts.get(path.stem, 0) == 0 and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+# ----------------------------------------------------------------------
+# 旧来の保存場所からの移行
+# ----------------------------------------------------------------------
+def _implied_dirs(path, search_dirs):
+    """item_image のパスのフォルダ部分から考えられる保存場所（一致する部分が長い順）"""
+    parts = Path(path).parent.parts
+    implied = []
+    for directory in search_dirs:
+        directory = Path(directory)
+        try:
+            tail = directory.relative_to(ROOT_DIR).parts
+        except ValueError:
+            tail = (directory.name,)
+        if tail and parts[-len(tail):] == tail:
+            implied.append((len(tail), directory))
+    return [directory for _, directory in sorted(implied, key=lambda d: -d[0])]
+
+
+def locate(path, search_dirs=LEGACY_DIRS):
+    """
+    item_image のパスから実際のファイルを探す（見つからなければ None）
+
+    パスのままで見つからない場合は、パスのフォルダ部分に合う保存場所を先に探し、
+    それでもなければすべての保存場所からファイル名で探す。
+    ファイル名だけで探して、内容の違う同じ名前のファイルが複数の保存場所にある場合は ValueError。
+    """
+    candidate = Path(path)
+    if candidate.is_file():
+        return candidate
+    name = Path(path).name
+    for directory in _implied_dirs(path, search_dirs):
+        candidate = directory / name
+        if candidate.is_file():
+            return candidate
+    found = [Path(directory) / name for directory in search_dirs if (Path(directory) / name).is_file()]
+    if len(found) > 1 and len({hash_file(p) for p in found}) > 1:
+        raise ValueError(f"同じ名前の写真が複数の保存場所にあります: {', '.join(str(p) for p in found)}")
+    return found[0] if found else None
+
+
+def migrate_layout(db_path=None, root=None, search_dirs=LEGACY_DIRS, remove_originals=False):
+    """
+    登録済みの写真を保存先に移し、item_image のパスを書き換える
+
+    同じ内容の写真は1つにまとめる。見つからない写真と、同じ名前で内容の違う写真が
+    複数の保存場所にあってどれか決められない写真のパスはそのまま残す。
+
+    Args:
+        remove_originals: True の場合、移し終えた元のファイルを削除する
+
+    Returns:
+        dict: {"rows": 更新した行数, "stored": 保存した枚数, "deduplicated": 重複でまとめた枚数,
+               "missing": 見つからなかった枚数, "ambiguous": どれか決められなかった枚数}
+    """
+    from . import photos
+
+    result = {"rows": 0, "stored": 0, "deduplicated": 0, "missing": 0, "ambiguous": 0}
+    migrated = set()
+    conn = db.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT id, item_image FROM lost_items WHERE item_image IS NOT NULL AND item_image != '' ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    for start in range(0, len(rows), MIGRATE_BATCH_ROWS):
+        updates = []
+        for item_id, item_image in rows[start:start + MIGRATE_BATCH_ROWS]:
+            mapping = {}
+            for path in iter_paths(item_image):
+                if digest_of(path, root):
+                    continue
+                try:
+                    source = locate(path, search_dirs)
+                except ValueError as e:
+                    print(f"拾得物 id={item_id}: {e}")
+                    result["ambiguous"] += 1
+                    continue
+                if source is None:
+                    result["missing"] += 1
+                    continue
+                target, created = put_file(source, root)
+                result["stored" if created else "deduplicated"] += 1
+                mapping[path] = str(target)
+                migrated.add(source)
+            if mapping:
+                updates.append((replace_paths(item_image, mapping), item_id))
+        if updates:
+            with db.transaction(db_path) as conn:
+                conn.executemany("UPDATE lost_items SET item_image = ? WHERE id = ?", updates)
+                for item_image, item_id in updates:
+                    photos.sync_item(conn, item_id, item_image)
+            result["rows"] += len(updates)
+
+    with db.transaction(db_path) as conn:
+        recount(conn, root)
+    if remove_originals:
+        for source in migrated:
+            source.unlink(missing_ok=True)
+    return result
+
+
+def stats(db_path=None, root=None):
+    """保存先の写真の枚数・合計サイズと、参照数の集計"""
+    files = 0
+    total_bytes = 0
+    for path in iter_objects(root):
+        files += 1
+        total_bytes += path.stat().st_size
+    references = db.query_scalar(f"SELECT COALESCE(SUM(refcount), 0) FROM {REFS_TABLE}", db_path=db_path)
+    return {"files": files, "bytes": total_bytes, "references": references}
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    command = args[0] if args else ""
+    path = args[1] if len(args) > 1 else None
+    if command == "migrate":
+        result = migrate_layout(path, remove_originals="--remove-originals" in sys.argv)
+        print(
+            f"{result['rows']}件の拾得物の写真を移行しました"
+            f"（保存 {result['stored']}枚、重複 {result['deduplicated']}枚、見つからない写真 {result['missing']}枚、"
+            f"保存場所を決められない写真 {result['ambiguous']}枚）"
+        )
+    elif command == "gc":
+        print(f"参照されていない写真を {collect_garbage(path)}枚 削除しました")
+    elif command == "stats":
+        result = stats(path)
+        print(f"写真 {result['files']}枚（{result['bytes'] / 1024 / 1024:.1f}MB）、参照 {result['references']}件")
+    else:
+        print("使い方: python -m core.image_store [migrate|gc|stats] [DBパス] [--remove-originals]")
@@ -0,0 +1,325 @@
+"""
+YOLO推論サービス
+プロセス全体で1つのモデルを読み込んだまま保持し、推論要求をキューで受け付けて
+専用のスレッドで処理する。短い間隔（BATCH_WINDOW）に届いた要求はまとめて1回で推論する。
+
+モデルの読み込みは専用スレッドで行うため、画面のスレッドは止まらない。
+settings テーブルの yolo_backend で ONNX Runtime / OpenVINO への切り替えができる（core.yolo_export）。
+アプリ起動時に warm_up() を呼んでおくと、最初の分類を待たずにモデルを準備できる。
+
+使用例:
+    from core import inference
+    result = inference.get_service().predict("photo.jpg", conf=0.5)
+    for box in result.boxes:
+        ...
+
+    python -m core.inference 画像パス [画像パス ...]
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+
+from . import yolo_export
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# 読み込むモデルの優先順位: (ファイル, 表示名)
+MODEL_CANDIDATES = [
+    (ROOT_DIR / "yolov8x_seg_custom.pt", "YOLOv8x カスタムモデル"),
+    (ROOT_DIR / "yolo11x_seg_custom.pt", "YOLOv11x カスタムモデル"),
+    (ROOT_DIR / "apps" / "register" / "model_folder" / "yolo_model.pt", "YOLO カスタムモデル"),
+]
+# Flask アプリのモデル（これまでどおり model_folder の yolo_model.pt、なければ DEFAULT_MODEL）
+FLASK_MODEL_CANDIDATES = [
+    (ROOT_DIR / "apps" / "register" / "model_folder" / "yolo_model.pt", "YOLO カスタムモデル"),
+]
+# どれも読み込めない場合に使う事前学習済みモデル（ultralytics が自動でダウンロードする）
+DEFAULT_MODEL = ("yolov8n.pt", "YOLOv8n デフォルトモデル")
+
+# 最初の要求からこの秒数の間に届いた要求をまとめて推論する
+BATCH_WINDOW = 0.02
+
+# 1回にまとめる要求の上限
+MAX_BATCH = 8
+
+# ウォームアップで推論する画像の大きさ
+WARMUP_SIZE = 640
+
+
+def available_cores():
+    """このプロセスが使えるCPUコア数"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_num_threads():
+    """推論に使うスレッド数（コアが3つ以上あれば1つを画面の処理に残す）"""
+    cores = available_cores()
+    return cores - 1 if cores > 2 else cores
+
+
+def to_bgr_array(image):
+    """
+    推論に渡す画像を OpenCV 形式（BGR の ndarray）にそろえる
+
+    Args:
+        image: 画像ファイルのパス、PIL.Image、または BGR の ndarray
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, (str, Path)):
+        import cv2
+
+        array = cv2.imread(str(image))
+        if array is None:
+            raise FileNotFoundError(f"画像ファイルを読み込めません: {image}")
+        return array
+    # PIL.Image
+    return np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])
+
+
+class _Request:
+    __slots__ = ("image", "options", "future")
+
+    def __init__(self, image, options, future):
+        self.image = image
+        self.options = options
+        self.future = future
+
+
+class InferenceService:
+    """
+    YOLOモデルを保持して推論要求を順に処理するサービス
+
+    要求は submit() でキューに入れ、戻り値の Future で結果（ultralytics の Results）を受け取る。
+    同じ推論オプションの要求は BATCH_WINDOW 秒の間にまとめて1回で推論する。
+    """
+
+    def __init__(self, model_candidates=None, batch_window=BATCH_WINDOW, max_batch=MAX_BATCH, num_threads=None):
+        self.model_candidates = list(model_candidates or MODEL_CANDIDATES)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.num_threads = num_threads or default_num_threads()
+        self.model = None
+        self.model_name = None
+        self.backend = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._warm_up = None
+        self.stats = {"requests": 0, "batches": 0, "load_seconds": 0.0}
+
+    # ------------------------------------------------------------------
+    # 起動・モデル読み込み
+    # ------------------------------------------------------------------
+    def start(self):
+        """推論スレッドを起動（起動済みなら何もしない）"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="yolo-inference", daemon=True)
+                self._thread.start()
+        return self
+
+    def warm_up(self):
+        """
+        モデルの読み込みとダミー画像での推論をバックグラウンドで開始（2回目以降は何もしない）
+
+        Returns:
+            Future: ウォームアップの完了を待つ場合に使う
+        """
+        with self._lock:
+            if self._warm_up is None:
+                blank = np.zeros((WARMUP_SIZE, WARMUP_SIZE, 3), dtype=np.uint8)
+                self._warm_up = Future()
+                self._queue.put(_Request(blank, {"verbose": False}, self._warm_up))
+        self.start()
+        return self._warm_up
+
+    def wait_ready(self, timeout=None):
+        """モデルの読み込みが終わる（失敗した場合を含む）まで待つ"""
+        return self._ready.wait(timeout)
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def _load_model(self):
+        import torch
+        from ultralytics import YOLO
+
+        torch.set_num_threads(self.num_threads)
+        started = time.perf_counter()
+        backend = yolo_export.configured_backend()
+        for model_path, name in self.model_candidates:
+            model_path = Path(model_path)
+            if not model_path.exists():
+                continue
+            # 設定に従って ONNX / OpenVINO に変換済みのモデルを優先し、読み込めなければ .pt を使う
+            load_path, self.backend = yolo_export.resolve_model(model_path, backend)
+            paths = [load_path] if load_path == model_path else [load_path, model_path]
+            for path in paths:
+                try:
+                    print(f"🔄 {name}を読み込み中... ({path.name})")
+                    self.model = YOLO(str(path))
+                    self.model_name = name
+                    break
+                except Exception as e:
+                    print(f"❌ {name}読み込みエラー: {e}")
+                    if "C3k2" in str(e):
+                        print("💡 互換性エラー: 次のモデルを試行します")
+                    self.backend = "pytorch"
+            if self.model is not None:
+                break
+        if self.model is None:
+            model_file, name = DEFAULT_MODEL
+            print(f"🔄 {name}にフォールバック...")
+            self.model = YOLO(model_file)
+            self.model_name = name
+            self.backend = "pytorch"
+        self.stats["load_seconds"] = time.perf_counter() - started
+        print(
+            f"✅ {self.model_name}を読み込みました "
+            f"({self.backend}, {self.stats['load_seconds']:.1f}秒, スレッド数 {self.num_threads})"
+        )
+
+    # ------------------------------------------------------------------
+    # 推論
+    # ------------------------------------------------------------------
+    def submit(self, image, **options):
+        """
+        推論要求をキューに入れる
+
+        Args:
+            image: 画像ファイルのパス、PIL.Image、または BGR の ndarray
+            **options: YOLO の推論オプション（conf など）
+
+        Returns:
+            Future: 結果は ultralytics の Results（画像1枚分）
+        """
+        self.start()
+        future = Future()
+        self._queue.put(_Request(image, options, future))
+        return future
+
+    def predict(self, image, timeout=None, **options):
+        """推論して結果を返す（完了まで待つ）"""
+        return self.submit(image, **options).result(timeout)
+
+    def _collect(self, first):
+        """最初の要求から batch_window 秒の間に届いた要求を集める"""
+        requests = [first]
+        deadline = time.perf_counter() + self.batch_window
+        while len(requests) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                requests.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return requests
+
+    def _run(self):
+        while True:
+            requests = self._collect(self._queue.get())
+            if self.model is None:
+                try:
+                    self._load_model()
+                except Exception as e:
+                    print(f"❌ YOLOモデルを読み込めませんでした: {e}")
+                    for request in requests:
+                        request.future.set_exception(e)
+                    continue
+                finally:
+                    self._ready.set()
+
+            # 推論オプションが同じ要求ごとにまとめて推論する
+            groups = {}
+            for request in requests:
+                key = tuple(sorted(request.options.items()))
+                groups.setdefault(key, []).append(request)
+            for group in groups.values():
+                self._infer(group)
+
+    def _infer(self, requests):
+        images = []
+        ready = []
+        for request in requests:
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            try:
+                images.append(to_bgr_array(request.image))
+                ready.append(request)
+            except Exception as e:
+                request.future.set_exception(e)
+        if not ready:
+            return
+        try:
+            results = self.model(images, **ready[0].options)
+        except Exception as e:
+            for request in ready:
+                request.future.set_exception(e)
+            return
+        self.stats["requests"] += len(ready)
+        self.stats["batches"] += 1
+        for request, result in zip(ready, results):
+            request.future.set_result(result)
+
+
+_services = {}
+_service_lock = threading.Lock()
+
+
+def get_service(model_candidates=None):
+    """
+    プロセス全体で共有する InferenceService（モデルの候補ごとに1つ）
+
+    Args:
+        model_candidates: 読み込むモデルの候補（省略時は MODEL_CANDIDATES、Flask アプリは FLASK_MODEL_CANDIDATES）
+    """
+    candidates = tuple(model_candidates or MODEL_CANDIDATES)
+    with _service_lock:
+        service = _services.get(candidates)
+        if service is None:
+            service = InferenceService(candidates).start()
+            _services[candidates] = service
+        return service
+
+
+def warm_up(model_candidates=None):
+    """共有サービスのモデルをバックグラウンドで読み込む（アプリ起動時に呼ぶ）"""
+    return get_service(model_candidates).warm_up()
+
+
+if __name__ == "__main__":
+    import sys
+
+    paths = sys.argv[1:]
+    if not paths:
+        print("使い方: python -m core.inference 画像パス [画像パス ...]")
+        sys.exit(1)
+    service = get_service()
+    started = time.perf_counter()
+    warm_up().result()
+    print(f"ウォームアップ: {time.perf_counter() - started:.2f}秒")
+
+    # すべての要求を同時に投入し、まとめて推論されることを確認する
+    started = time.perf_counter()
+    futures = [service.submit(path, verbose=False) for path in paths]
+    for path, future in zip(paths, futures):
+        result = future.result()
+        names = [result.names[int(c)] for c in result.boxes.cls] if result.boxes is not None else []
+        print(f"{path}: {', '.join(names) or '検出なし'}")
+    elapsed = time.perf_counter() - started
+    print(
+        f"{len(paths)}枚 {elapsed:.2f}秒 ({elapsed / len(paths) * 1000:.0f} ms/枚, "
+        f"推論 {service.stats['batches']}回 / 要求 {service.stats['requests']}件)"
+    )
@@ -0,0 +1,78 @@
+"""
+重いモジュールの遅延読み込み
+torch / ultralytics / cv2 などは読み込みに数秒かかるため、起動時には読み込まず、
+最初に使われたとき（またはバックグラウンドの preload）に読み込む。
+
+使用例:
+    from core.lazy import lazy_import
+    cv2 = lazy_import("cv2")      # この時点では読み込まない
+    cv2.resize(frame, size)       # 最初の属性アクセスで読み込む
+
+    preload("cv2")                # 起動後にバックグラウンドで読み込んでおく
+"""
+import importlib
+import sys
+import threading
+import time
+import types
+
+
+class LazyModule(types.ModuleType):
+    """最初の属性アクセスで本物のモジュールを import する代理オブジェクト"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            # import 自体はインタープリタのロックで保護されるため、同時に呼ばれても1回だけ読み込まれる
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_module"] = module
+        return module
+
+    @property
+    def is_loaded(self):
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name):
+    """name のモジュールを遅延読み込みする（読み込み済みならそのまま返す）"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def preload(*names):
+    """
+    モジュールをバックグラウンドのスレッドで読み込む（アプリ起動後のウォームアップ用）
+
+    読み込めないモジュールはメッセージを出して飛ばす。
+
+    Returns:
+        threading.Thread: 読み込みの完了を待つ場合に join する
+    """
+    def worker():
+        for name in names:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+                print(f"モジュールを事前に読み込みました: {name} ({time.perf_counter() - started:.1f}秒)")
+            except ImportError as e:
+                print(f"モジュールを事前に読み込めませんでした: {name} ({e})")
+
+    thread = threading.Thread(target=worker, name="preload", daemon=True)
+    thread.start()
+    return thread
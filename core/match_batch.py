@@ -0,0 +1,233 @@
+"""
+マッチングの一括処理（夜間バッチ）
+未解決の遺失届をすべて再採点し、結果を match_candidates テーブルへ保存する。
+
+前回の実行位置（ウォーターマーク）を match_watermarks テーブルに記録し、次のように差分だけを処理する:
+    - 前回以降に登録された遺失届: 期間内のすべての拾得物と照合
+    - それ以前の遺失届: 前回以降に登録された拾得物とだけ照合
+
+差分処理では、候補だった拾得物が返還などで保管中でなくなっても空いた枠は補充されず、
+登録内容の修正で点数が下がった候補も残る。
+--full では遺失届ごとに保存済みの候補を削除してから保存し直すため、全件を照合した場合と同じ候補になる。
+定期的に --full で照合し直す。
+
+遺失届は id 順に一定件数ずつ読み込み、採点はプロセスプールで並列に行う。
+書き込みは親プロセスだけが短いトランザクションで行うため、実行中も画面の読み取りは止まらない。
+
+使い方:
+    python -m core.match_batch [--db DBパス] [--workers N] [--chunk N] [--full]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from . import db, matching, migrations
+
+WATERMARK_TABLE = "match_watermarks"
+
+# 1回に読み込む遺失届の件数
+CHUNK_SIZE = 500
+
+# 遺失届1件あたりに保存する候補の上限
+CANDIDATES_PER_REPORT = 10
+
+
+def create_watermark_table(conn):
+    """ウォーターマークテーブルを作成"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def get_watermark(conn, name):
+    row = conn.execute(f"SELECT value FROM {WATERMARK_TABLE} WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_watermark(conn, name, value):
+    conn.execute(
+        f"""
+        INSERT INTO {WATERMARK_TABLE} (name, value) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+        """,
+        (name, value),
+    )
+
+
+def iter_open_reports(conn, max_id, chunk_size=CHUNK_SIZE):
+    """id が max_id 以下の未解決の遺失届を、id 順に chunk_size 件ずつ返す"""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT {matching._REPORT_COLUMNS} FROM notfound_items "
+            f"WHERE id > ? AND id <= ? AND {matching.OPEN_REPORT_CONDITION} ORDER BY id LIMIT ?",
+            (last_id, max_id, chunk_size),
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def score_reports(db_path, rows, report_watermark, item_range):
+    """
+    遺失届のまとまりを採点（ワーカープロセスで実行）
+
+    Args:
+        db_path: データベースのパス
+        rows: notfound_items の行のリスト
+        report_watermark: これより大きい id の遺失届は期間内のすべての拾得物と照合する
+        item_range: (前回の拾得物id, 今回の拾得物id)
+
+    Returns:
+        list: matching.save_candidates に渡せる辞書のリスト
+    """
+    results = []
+    conn = db.connect(db_path)
+    try:
+        for row in rows:
+            report = matching.Report.from_row(row)
+            if row[0] > report_watermark:
+                id_range = (0, item_range[1])
+            else:
+                id_range = item_range
+            for match in matching.find_matches(conn, report, CANDIDATES_PER_REPORT, id_range=id_range):
+                match["notfound_id"] = row[0]
+                results.append(match)
+    finally:
+        conn.close()
+    return results
+
+
+def prune_candidates(conn, keep=CANDIDATES_PER_REPORT):
+    """
+    不要になった候補を削除
+
+    保管中でなくなった拾得物・解決済みの遺失届の候補と、差分処理で増えた
+    遺失届ごとの上位 keep 件より下の候補を削除する。
+    """
+    table = matching.CANDIDATES_TABLE
+    conn.execute(f"""
+        DELETE FROM {table}
+        WHERE lost_item_id IN (SELECT id FROM lost_items WHERE item_situation != '保管中')
+           OR lost_item_id NOT IN (SELECT id FROM lost_items)
+           OR notfound_id NOT IN (
+               SELECT id FROM notfound_items WHERE {matching.OPEN_REPORT_CONDITION}
+           )
+    """)
+    conn.execute(f"""
+        DELETE FROM {table}
+        WHERE (notfound_id, lost_item_id) IN (
+            SELECT notfound_id, lost_item_id FROM (
+                SELECT notfound_id, lost_item_id,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY notfound_id ORDER BY score DESC, lost_item_id
+                       ) AS rank
+                FROM {table}
+            )
+            WHERE rank > ?
+        )
+    """, (keep,))
+
+
+def run(db_path=None, workers=None, chunk_size=CHUNK_SIZE, full=False, progress=None):
+    """
+    未解決の遺失届を差分で再採点して候補テーブルを更新
+
+    Args:
+        db_path: データベースのパス（省略時は既定のデータベース）
+        workers: ワーカープロセス数（省略時はCPU数、1の場合は同じプロセスで実行）
+        chunk_size: 1回に読み込む遺失届の件数
+        full: True の場合はウォーターマークを無視してすべてを照合し直し、遺失届ごとに保存済みの候補を入れ替える
+        progress: 進捗を受け取る関数 progress(処理済み件数)
+
+    Returns:
+        dict: {"reports": 処理した遺失届の件数, "candidates": 保存した候補の件数, "seconds": 所要時間}
+    """
+    db_path = str(db_path or db.DEFAULT_DB_PATH)
+    started = time.perf_counter()
+    migrations.migrate(db_path)
+    conn = db.connect(db_path)
+    try:
+        report_watermark = 0 if full else get_watermark(conn, "notfound_items")
+        item_watermark = 0 if full else get_watermark(conn, "lost_items")
+        # 実行開始時点の最大idまでを今回の処理範囲とする（実行中の登録は次回に回す）
+        max_report_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM notfound_items").fetchone()[0]
+        max_item_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM lost_items").fetchone()[0]
+        item_range = (item_watermark, max_item_id)
+        if item_watermark >= max_item_id and report_watermark >= max_report_id:
+            print("前回の実行以降に登録された遺失届・拾得物はありません")
+            return {"reports": 0, "candidates": 0, "seconds": time.perf_counter() - started}
+
+        totals = {"reports": 0, "candidates": 0}
+
+        def save(report_ids, matches):
+            conn.execute("BEGIN IMMEDIATE")
+            if full:
+                # 今回の採点で MIN_SCORE を下回った候補が残らないよう、保存済みの候補を入れ替える
+                conn.executemany(
+                    f"DELETE FROM {matching.CANDIDATES_TABLE} WHERE notfound_id = ?",
+                    ((report_id,) for report_id in report_ids),
+                )
+            matching.save_candidates(conn, matches)
+            conn.commit()
+            totals["reports"] += len(report_ids)
+            totals["candidates"] += len(matches)
+            if progress:
+                progress(totals["reports"])
+
+        chunks = iter_open_reports(conn, max_report_id, chunk_size)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            for rows in chunks:
+                save([row[0] for row in rows], score_reports(db_path, rows, report_watermark, item_range))
+        else:
+            # Windows と同じ spawn 方式で起動し、親の接続をワーカーへ持ち込まない
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+                pending = []
+                for rows in chunks:
+                    future = executor.submit(score_reports, db_path, rows, report_watermark, item_range)
+                    pending.append(([row[0] for row in rows], future))
+                    # 読み込みが採点より先行しすぎないよう、未完了はワーカー数の2倍までに抑える
+                    while len(pending) >= workers * 2:
+                        report_ids, future = pending.pop(0)
+                        save(report_ids, future.result())
+                for report_ids, future in pending:
+                    save(report_ids, future.result())
+
+        conn.execute("BEGIN IMMEDIATE")
+        prune_candidates(conn)
+        set_watermark(conn, "notfound_items", max_report_id)
+        set_watermark(conn, "lost_items", max_item_id)
+        conn.commit()
+    finally:
+        conn.close()
+    return dict(totals, seconds=time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="遺失届と拾得物のマッチングを一括で実行します")
+    parser.add_argument("--db", help="データベースのパス（省略時は既定のデータベース）")
+    parser.add_argument("--workers", type=int, default=None, help="ワーカープロセス数")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="1回に読み込む遺失届の件数")
+    parser.add_argument("--full", action="store_true", help="前回の実行位置を無視してすべて照合し直す")
+    args = parser.parse_args(argv)
+
+    result = run(
+        args.db, workers=args.workers, chunk_size=args.chunk, full=args.full,
+        progress=lambda n: print(f"  {n}件の遺失届を処理しました"),
+    )
+    print(
+        f"マッチング完了: 遺失届 {result['reports']}件 / 候補 {result['candidates']}件 "
+        f"({result['seconds']:.1f}秒)"
+    )
+
+
+if __name__ == "__main__":
+    main()
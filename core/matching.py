@@ -0,0 +1,382 @@
+"""
+遺失届と拾得物のマッチング
+遺失届（notfound_items）と保管中の拾得物（lost_items）を、分類（大・中・小）、色、
+遺失日から拾得日までの日数、遺失場所と拾得場所、キーワードの一致で採点する。
+
+候補は全件の総当たりではなく、インデックスで絞り込んだものだけを採点する:
+    - 拾得物: (item_situation, get_item) のインデックスで「保管中 かつ 遺失日前後の期間」
+      に絞り、さらに推定した大分類か全文検索索引のキーワード一致で絞る
+    - 遺失届: lost_date のインデックスで拾得日前後の期間に絞る
+
+遺失届の品物は自由記述のため、item_classification.json のキーワードと重みで分類を推定する。
+"""
+import json
+import re
+from datetime import date, timedelta
+
+from . import classifier, search, taxonomy
+from .query import day_range, parse_date
+
+CANDIDATES_TABLE = "match_candidates"
+
+# 採点の重み（判定できない項目は除いて正規化する）
+WEIGHTS = {
+    "category": 0.35,
+    "color": 0.15,
+    "time": 0.15,
+    "area": 0.15,
+    "keyword": 0.20,
+}
+
+# 拾得日の検索範囲（遺失日の WINDOW_BEFORE_DAYS 日前から WINDOW_AFTER_DAYS 日後まで）
+WINDOW_BEFORE_DAYS = 1
+WINDOW_AFTER_DAYS = 30
+
+# 採点する候補の上限（期間内の件数が極端に多い場合の保険）
+# 上限を超える場合は日付の近いものから採点し、上限に達したことを出力する
+MAX_CANDIDATES = 5000
+
+# これ未満のスコアは候補にしない
+MIN_SCORE = 0.3
+
+# マッチング対象とする遺失届の状態
+OPEN_REPORT_CONDITION = "(status IS NULL OR status = '' OR status = '連絡待ち')"
+
+# 色の表記ゆれ（拾得物の色 -> 遺失届の記述に現れる語）
+COLOR_TERMS = {
+    "黒": ["黒", "ブラック"],
+    "白": ["白", "ホワイト"],
+    "赤": ["赤", "レッド"],
+    "青": ["青", "ブルー", "紺", "ネイビー"],
+    "緑": ["緑", "グリーン"],
+    "黄": ["黄", "イエロー"],
+    "茶": ["茶", "ブラウン"],
+    "紫": ["紫", "パープル"],
+    "灰": ["灰", "グレー"],
+    "ピンク": ["ピンク"],
+    "オレンジ": ["オレンジ"],
+    "金": ["金色", "ゴールド"],
+    "銀": ["銀色", "シルバー"],
+}
+
+_FOUND_COLUMNS = (
+    "id, get_item, item_class_L, item_class_M, item_class_S, item_color, "
+    "find_area, item_feature, item_remarks"
+)
+_REPORT_COLUMNS = "id, name, lost_date, location, item"
+
+def load_terms(path=None):
+    """
+    item_classification.json のキーワード一覧（core.taxonomy のキャッシュを使う）
+
+    Returns:
+        list: (キーワード, 重み, 大分類, 中分類) のリスト（長い語から順）
+    """
+    return taxonomy.load(path).keywords
+
+
+def _bigrams(text):
+    text = re.sub(r"\s+", "", str(text or ""))
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _overlap(grams_a, b):
+    """2文字組の集合 grams_a のうち、文字列 b にも含まれる割合"""
+    if not grams_a:
+        return 0.0
+    return len(grams_a & _bigrams(b)) / len(grams_a)
+
+
+def _colors_in(text):
+    text = str(text or "")
+    return {color for color, terms in COLOR_TERMS.items() if any(t in text for t in terms)}
+
+
+class Report:
+    """
+    遺失届の特徴（品物の記述から推定した分類・色・キーワード）
+
+    Args:
+        item_text: 品物の記述（品名 - 内容）
+        lost_date: 遺失日（日時文字列・date どちらでも可）
+        location: 遺失場所
+        report_id: notfound_items.id（未登録の場合はNone）
+    """
+
+    def __init__(self, item_text, lost_date=None, location="", report_id=None):
+        self.id = report_id
+        self.text = str(item_text or "")
+        self.lost_date = parse_date(lost_date)
+        self.location = str(location or "")
+        self.colors = _colors_in(self.text)
+        self.text_grams = _bigrams(self.text)
+        self.location_grams = _bigrams(self.location)
+
+        # 記述に含まれる分類キーワードから、中分類・大分類ごとの重みを集計
+        self.terms, mediums, self.larges = classifier.scores(self.text)
+        self.mediums = {}
+        for (_, medium), weight in mediums.items():
+            self.mediums[medium] = self.mediums.get(medium, 0.0) + weight
+
+    @classmethod
+    def from_row(cls, row):
+        """notfound_items の行（id, name, lost_date, location, item）から作成"""
+        return cls(row[4], row[2], row[3], report_id=row[0])
+
+    @classmethod
+    def from_form(cls, form_data):
+        """遺失物登録フォームの入力値から作成"""
+        item_text = f"{form_data.get('valuables_name') or ''} - {form_data.get('valuables_content') or ''}"
+        return cls(item_text.strip(" -"), form_data.get("lost_date"), form_data.get("lost_place"))
+
+    def window(self):
+        """拾得日の検索範囲 [開始, 終了) を ISO文字列で返す"""
+        base = self.lost_date or date.today() - timedelta(days=WINDOW_AFTER_DAYS)
+        start, _ = day_range(base - timedelta(days=WINDOW_BEFORE_DAYS))
+        _, end = day_range(base + timedelta(days=WINDOW_AFTER_DAYS))
+        return start, end
+
+    def score(self, found):
+        """
+        拾得物1件を採点
+
+        Args:
+            found: lost_items の行（_FOUND_COLUMNS の順）
+
+        Returns:
+            tuple: (0〜1のスコア, 項目ごとの値の辞書)
+        """
+        _, get_item, class_l, class_m, class_s, color, find_area, feature, remarks = found
+        found_text = " ".join(str(v) for v in (class_l, class_m, class_s, feature, remarks) if v)
+        reasons = {}
+
+        # 分類（中分類の一致 > 大分類の一致。小分類名が記述にあれば満点）
+        if self.larges:
+            if class_s and class_s in self.text:
+                reasons["category"] = 1.0
+            elif class_m and class_m in self.mediums:
+                reasons["category"] = 0.6 + 0.4 * self.mediums[class_m] / max(self.mediums.values())
+            elif class_l and class_l in self.larges:
+                reasons["category"] = 0.5 * self.larges[class_l] / max(self.larges.values())
+            else:
+                reasons["category"] = 0.0
+
+        # 色
+        if self.colors and color:
+            found_colors = _colors_in(color)
+            reasons["color"] = 1.0 if found_colors & self.colors else 0.0
+
+        # 遺失日から拾得日までの日数（近いほど高い）
+        found_date = parse_date(get_item)
+        if self.lost_date and found_date:
+            days = (found_date - self.lost_date).days
+            if days < -WINDOW_BEFORE_DAYS:
+                reasons["time"] = 0.0
+            else:
+                reasons["time"] = max(0.0, 1.0 - max(days, 0) / WINDOW_AFTER_DAYS)
+
+        # 遺失場所と拾得場所
+        if self.location and find_area:
+            if self.location == find_area:
+                reasons["area"] = 1.0
+            elif self.location in find_area or find_area in self.location:
+                reasons["area"] = 0.8
+            else:
+                reasons["area"] = _overlap(self.location_grams, find_area)
+
+        # キーワード（分類キーワードの重み付き一致と、記述の2文字組の一致の高い方）
+        if self.text:
+            term_score = 0.0
+            if self.terms:
+                hit = sum(w for term, w in self.terms.items() if term in found_text)
+                term_score = hit / sum(self.terms.values())
+            reasons["keyword"] = max(term_score, _overlap(self.text_grams, found_text))
+
+        total_weight = sum(WEIGHTS[k] for k in reasons)
+        if not total_weight:
+            return 0.0, reasons
+        score = sum(WEIGHTS[k] * v for k, v in reasons.items()) / total_weight
+        return score, reasons
+
+
+def _round(reasons):
+    return {k: round(v, 3) for k, v in reasons.items()}
+
+
+def candidate_found_items(conn, report, id_range=None):
+    """
+    遺失届に対する拾得物の候補を取得（保管中・期間内・推定分類またはキーワード一致）
+
+    Args:
+        id_range: (開始id, 終了id) を指定すると、開始id < id <= 終了id の拾得物だけを対象にする
+    """
+    start, end = report.window()
+    sql = (
+        f"SELECT {_FOUND_COLUMNS} FROM lost_items "
+        "WHERE item_situation = '保管中' AND get_item >= ? AND get_item < ?"
+    )
+    params = [start, end]
+    if id_range is not None:
+        sql += " AND id > ? AND id <= ?"
+        params.extend(id_range)
+    if report.larges:
+        # 推定した大分類、または分類キーワードのいずれかを含む拾得物
+        narrow = [f"item_class_L IN ({', '.join('?' * len(report.larges))})"]
+        params.extend(report.larges)
+        terms = [t for t in report.terms if len(t) >= search.MIN_TERM_LENGTH]
+        if terms and search.index_exists(conn, "lost_items"):
+            fts_table = search.FTS_TABLES["lost_items"][0]
+            narrow.append(f"id IN (SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?)")
+            params.append(search.match_expression(terms, operator="OR"))
+        sql += " AND (" + " OR ".join(narrow) + ")"
+    # 上限を超える場合に遺失日に近い拾得物から残るよう、日付の近い順に並べてから絞る
+    sql += " ORDER BY ABS(julianday(get_item) - julianday(?)), id DESC LIMIT ?"
+    params.extend([(report.lost_date or date.today()).isoformat(), MAX_CANDIDATES])
+    rows = conn.execute(sql, params).fetchall()
+    if len(rows) >= MAX_CANDIDATES:
+        print(f"⚠️ 拾得物の候補が上限（{MAX_CANDIDATES}件）に達したため、遺失日に近いものだけを採点します")
+    return rows
+
+
+def find_matches(conn, report, limit=10, min_score=MIN_SCORE, id_range=None):
+    """
+    遺失届に一致する可能性の高い拾得物をスコアの高い順に返す
+
+    Args:
+        conn: データベース接続
+        report: Report
+        limit: 返す件数の上限
+        id_range: 対象にする拾得物の id の範囲（candidate_found_items を参照）
+
+    Returns:
+        list: {"lost_item_id", "score", "reasons", "get_item", "item_class_L", "item_class_M",
+               "item_color", "find_area", "item_feature"} の辞書のリスト
+    """
+    results = []
+    for row in candidate_found_items(conn, report, id_range):
+        score, reasons = report.score(row)
+        if score < min_score:
+            continue
+        results.append({
+            "lost_item_id": row[0],
+            "score": round(score, 3),
+            "reasons": _round(reasons),
+            "get_item": row[1],
+            "item_class_L": row[2],
+            "item_class_M": row[3],
+            "item_color": row[5],
+            "find_area": row[6],
+            "item_feature": row[7],
+        })
+    results.sort(key=lambda r: (-r["score"], r["lost_item_id"]))
+    return results[:limit]
+
+
+def match_report(conn, notfound_id, limit=10):
+    """登録済みの遺失届に一致する拾得物を返す"""
+    row = conn.execute(
+        f"SELECT {_REPORT_COLUMNS} FROM notfound_items WHERE id = ?", (notfound_id,)
+    ).fetchone()
+    if row is None:
+        return []
+    return find_matches(conn, Report.from_row(row), limit)
+
+
+def match_found_item(conn, lost_item_id, limit=10, min_score=MIN_SCORE):
+    """
+    新しく登録された拾得物に一致する可能性の高い遺失届を返す
+
+    拾得日の WINDOW_AFTER_DAYS 日前から WINDOW_BEFORE_DAYS 日後までに遺失した、
+    未解決の遺失届だけを lost_date のインデックスで取得して採点する。
+
+    Returns:
+        list: {"notfound_id", "lost_item_id", "score", "reasons"} の辞書のリスト
+    """
+    found = conn.execute(
+        f"SELECT {_FOUND_COLUMNS} FROM lost_items WHERE id = ?", (lost_item_id,)
+    ).fetchone()
+    if found is None:
+        return []
+    found_date = parse_date(found[1]) or date.today()
+    start, _ = day_range(found_date - timedelta(days=WINDOW_AFTER_DAYS))
+    _, end = day_range(found_date + timedelta(days=WINDOW_BEFORE_DAYS))
+    reports = conn.execute(
+        f"SELECT {_REPORT_COLUMNS} FROM notfound_items "
+        f"WHERE lost_date >= ? AND lost_date < ? AND {OPEN_REPORT_CONDITION} "
+        "ORDER BY ABS(julianday(lost_date) - julianday(?)), id DESC LIMIT ?",
+        (start, end, found_date.isoformat(), MAX_CANDIDATES),
+    ).fetchall()
+    if len(reports) >= MAX_CANDIDATES:
+        print(f"⚠️ 遺失届の候補が上限（{MAX_CANDIDATES}件）に達したため、拾得日に近いものだけを採点します")
+    results = []
+    for row in reports:
+        score, reasons = Report.from_row(row).score(found)
+        if score >= min_score:
+            results.append({
+                "notfound_id": row[0],
+                "lost_item_id": lost_item_id,
+                "score": round(score, 3),
+                "reasons": _round(reasons),
+            })
+    results.sort(key=lambda r: (-r["score"], r["notfound_id"]))
+    return results[:limit]
+
+
+def create_candidates_table(conn):
+    """マッチング候補テーブルを作成"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CANDIDATES_TABLE} (
+            notfound_id INTEGER NOT NULL,
+            lost_item_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            reasons TEXT,
+            status TEXT DEFAULT '未確認',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (notfound_id, lost_item_id)
+        )
+    """)
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{CANDIDATES_TABLE}_lost_item ON {CANDIDATES_TABLE}(lost_item_id)"
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{CANDIDATES_TABLE}_score ON {CANDIDATES_TABLE}(notfound_id, score DESC)"
+    )
+
+
+def save_candidates(conn, matches):
+    """
+    マッチング結果を候補テーブルに保存（同じ組み合わせはスコアを更新）
+
+    Args:
+        matches: "notfound_id", "lost_item_id", "score", "reasons" を持つ辞書のリスト
+    """
+    conn.executemany(
+        f"""
+        INSERT INTO {CANDIDATES_TABLE} (notfound_id, lost_item_id, score, reasons)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(notfound_id, lost_item_id) DO UPDATE SET
+            score = excluded.score,
+            reasons = excluded.reasons,
+            updated_at = CURRENT_TIMESTAMP
+        """,
+        [
+            (m["notfound_id"], m["lost_item_id"], m["score"], json.dumps(m["reasons"], ensure_ascii=False))
+            for m in matches
+        ],
+    )
+
+
+def on_found_item_registered(conn, lost_item_id, limit=10):
+    """
+    拾得物の登録直後に呼び出し、一致する遺失届を候補テーブルに保存する
+
+    Returns:
+        list: 見つかった候補（match_found_item の戻り値）
+    """
+    matches = match_found_item(conn, lost_item_id, limit)
+    if matches:
+        save_candidates(conn, matches)
+        conn.commit()
+    return matches
+
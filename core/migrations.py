@@ -0,0 +1,314 @@
+"""
+スキーマ移行（マイグレーション）
+PRAGMA user_version でバージョンを管理し、未適用の移行だけを順番に実行する
+"""
+from . import db
+
+# 一覧画面・採番・ホーム統計で使う検索条件に合わせたインデックス
+LOST_ITEMS_INDEXES = {
+    "idx_lost_items_get_item": "lost_items(get_item)",
+    "idx_lost_items_recep_item": "lost_items(recep_item)",
+    "idx_lost_items_situation_get_item": "lost_items(item_situation, get_item)",
+    "idx_lost_items_refund_situation": "lost_items(refund_situation)",
+    "idx_lost_items_class": "lost_items(item_class_L, item_class_M, item_class_S)",
+    "idx_lost_items_finder_year": "lost_items(choice_finder, current_year)",
+}
+
+NOTFOUND_ITEMS_INDEXES = {
+    "idx_notfound_items_lost_date": "notfound_items(lost_date)",
+    "idx_notfound_items_status_lost_date": "notfound_items(status, lost_date)",
+    "idx_notfound_items_created_at": "notfound_items(created_at)",
+}
+
+# EXPLAIN QUERY PLAN で確認する代表的なクエリと、使われるべきインデックス
+QUERY_PLAN_CHECKS = [
+    (
+        "SELECT COUNT(*) FROM lost_items WHERE choice_finder = ? AND current_year = ?",
+        ("占有者拾得", 25),
+        "idx_lost_items_finder_year",
+    ),
+    (
+        "SELECT COUNT(*) FROM lost_items WHERE item_situation = ?",
+        ("保管中",),
+        "idx_lost_items_situation_get_item",
+    ),
+    (
+        "SELECT id FROM lost_items WHERE item_class_L = ? AND item_class_M = ? AND item_class_S = ?",
+        ("貴重品", "財布", "財布"),
+        "idx_lost_items_class",
+    ),
+    (
+        "SELECT COUNT(*) FROM lost_items WHERE get_item >= ? AND get_item < ?",
+        ("2025-01-01", "2025-01-02"),
+        "idx_lost_items_get_item",
+    ),
+    (
+        "SELECT id FROM lost_items ORDER BY get_item DESC, id DESC LIMIT 20",
+        (),
+        "idx_lost_items_get_item",
+    ),
+    (
+        "SELECT id FROM lost_items ORDER BY recep_item DESC, id DESC LIMIT 20",
+        (),
+        "idx_lost_items_recep_item",
+    ),
+    (
+        "SELECT id FROM notfound_items WHERE status = ? ORDER BY lost_date DESC",
+        ("連絡待ち",),
+        "idx_notfound_items_status_lost_date",
+    ),
+]
+
+
+def table_columns(conn, table):
+    """テーブルのカラム名一覧を取得"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def add_column_if_missing(conn, table, column, definition):
+    """カラムが存在しない場合のみ追加"""
+    if column not in table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"{table}.{column} カラムを追加しました")
+
+
+def create_indexes(conn, indexes):
+    for name, target in indexes.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+
+def _create_base_tables(conn):
+    """基本テーブルを作成"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT DEFAULT 'user',
+            store_name TEXT DEFAULT '未設定',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lost_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            main_id TEXT NOT NULL,
+            current_year INTEGER NOT NULL,
+            choice_finder TEXT NOT NULL,
+            notify TEXT,
+            get_item DATE,
+            get_item_hour INTEGER,
+            get_item_minute INTEGER,
+            recep_item DATE,
+            recep_item_hour INTEGER,
+            recep_item_minute INTEGER,
+            recep_manager TEXT,
+            find_area TEXT,
+            find_area_police TEXT,
+            own_waiver TEXT,
+            finder_name TEXT,
+            own_name_note TEXT,
+            finder_age INTEGER,
+            finder_sex TEXT,
+            finder_post TEXT,
+            finder_address TEXT,
+            finder_tel1 TEXT,
+            finder_tel2 TEXT,
+            item_class_L TEXT,
+            item_class_M TEXT,
+            item_class_S TEXT,
+            item_value INTEGER,
+            item_feature TEXT,
+            item_color TEXT,
+            item_storage TEXT,
+            item_storage_place TEXT,
+            item_maker TEXT,
+            item_expiration DATE,
+            item_num INTEGER,
+            item_unit TEXT,
+            item_plice TEXT,
+            item_money INTEGER,
+            item_remarks TEXT,
+            item_image TEXT,
+            finder_affiliation TEXT,
+            item_situation TEXT DEFAULT '保管中',
+            refund_situation TEXT DEFAULT '未',
+            card_campany TEXT,
+            card_tel TEXT,
+            card_name TEXT,
+            card_person TEXT,
+            thirdparty_waiver TEXT,
+            thirdparty_name_note TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS notfound_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT,
+            lost_date TEXT,
+            location TEXT,
+            item TEXT,
+            status TEXT DEFAULT '連絡待ち',
+            contact_date TEXT,
+            return_date TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT UNIQUE NOT NULL,
+            value TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _add_users_store_name(conn):
+    """usersテーブルに店舗名カラムを追加"""
+    add_column_if_missing(conn, "users", "store_name", "TEXT DEFAULT '未設定'")
+
+
+def _add_search_indexes(conn):
+    """一覧・採番・統計用のインデックスを作成"""
+    create_indexes(conn, LOST_ITEMS_INDEXES)
+    create_indexes(conn, NOTFOUND_ITEMS_INDEXES)
+    conn.execute("ANALYZE")
+
+
+def _add_fulltext_search(conn):
+    """キーワード検索用の全文検索索引（FTS5 trigram）を作成"""
+    from . import search
+    search.create_indexes(conn)
+
+
+def _add_match_candidates(conn):
+    """遺失届と拾得物のマッチング候補テーブルを作成"""
+    from . import matching
+    matching.create_candidates_table(conn)
+
+
+def _add_match_watermarks(conn):
+    """マッチング一括処理の実行位置を記録するテーブルを作成"""
+    from . import match_batch
+    match_batch.create_watermark_table(conn)
+
+
+def _add_image_refs(conn):
+    """写真の参照数テーブルを作成し、登録済みの写真の参照数を数える"""
+    from . import image_store
+    image_store.create_refs_table(conn)
+    image_store.recount(conn)
+
+
+def _add_main_id_sequences(conn):
+    """管理番号の採番テーブルを作成し、登録済みの管理番号の最大値を入れる"""
+    from . import sequences
+    sequences.create_table(conn)
+    sequences.seed(conn)
+
+
+def _add_item_photos(conn):
+    """写真の一覧テーブルと表紙の列を作成し、登録済みの item_image から作る"""
+    from . import photos
+    photos.create_table(conn)
+    photos.backfill(conn)
+
+
+# (バージョン, 名前, 移行関数) の一覧。追加のみ行い、既存の番号は変更しないこと
+MIGRATIONS = [
+    (1, "create_base_tables", _create_base_tables),
+    (2, "add_users_store_name", _add_users_store_name),
+    (3, "add_search_indexes", _add_search_indexes),
+    (4, "add_fulltext_search", _add_fulltext_search),
+    (5, "add_match_candidates", _add_match_candidates),
+    (6, "add_match_watermarks", _add_match_watermarks),
+    (7, "add_image_refs", _add_image_refs),
+    (8, "add_main_id_sequences", _add_main_id_sequences),
+    (9, "add_item_photos", _add_item_photos),
+]
+
+
+def get_version(conn):
+    """現在のスキーマバージョンを取得"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path=None, target=None):
+    """
+    未適用のマイグレーションを実行
+
+    各マイグレーションは BEGIN IMMEDIATE のトランザクション内で実行し、
+    成功した場合のみ user_version を進める。
+
+    Args:
+        db_path: データベースのパス（省略時は既定のデータベース）
+        target: 移行先のバージョン（省略時は最新）
+
+    Returns:
+        list: 適用したマイグレーション名の一覧
+    """
+    applied = []
+    conn = db.connect(db_path)
+    try:
+        current = get_version(conn)
+        for version, name, func in MIGRATIONS:
+            if version <= current or (target is not None and version > target):
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                func(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(name)
+            print(f"マイグレーションを適用しました: {version:03d}_{name}")
+    finally:
+        conn.close()
+    return applied
+
+
+def explain(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN の detail 列を返す"""
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def check_query_plans(db_path=None, checks=None):
+    """
+    代表的なクエリが想定どおりのインデックスを使うか確認
+
+    Returns:
+        list: (SQL, 想定インデックス, 実際のプラン) のうち、想定と異なるもの
+    """
+    failures = []
+    conn = db.connect(db_path)
+    try:
+        for sql, params, index_name in checks or QUERY_PLAN_CHECKS:
+            plan = explain(conn, sql, params)
+            if not any(index_name in detail for detail in plan):
+                failures.append((sql, index_name, plan))
+    finally:
+        conn.close()
+    return failures
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    applied = migrate(path)
+    print(f"適用したマイグレーション: {len(applied)}件")
+    failures = check_query_plans(path)
+    for sql, index_name, plan in failures:
+        print(f"[NG] {index_name} が使われていません: {sql.strip()}")
+        for detail in plan:
+            print(f"    {detail}")
+    if failures:
+        sys.exit(1)
+    print("クエリプランの確認: OK")
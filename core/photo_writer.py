@@ -0,0 +1,177 @@
+"""
+写真の保存
+撮影した写真（BGR のフレーム）の JPEG 変換と書き込みをスレッドプールで並列に行う。
+
+写真はまず写真の保存先（core/image_store.py）の中の一時フォルダに書き出し、拾得物の登録
+（DB のコミット）と合わせて内容のハッシュの名前で保存先に移動する。同じ内容の写真が既にあれば
+移動せずに既存の写真を参照する。登録に失敗した場合は DB をロールバックして一時フォルダを削除する。
+保存先に移動済みの写真は削除しない（同じ内容の写真を同時に登録した別の拾得物が参照している場合があるため）。
+どこからも参照されない写真は image_store.collect_garbage() が猶予期間の後に削除する。
+書き込みに失敗した写真はこれまでどおり飛ばし（failed に記録）、残りの写真で登録する。
+
+使用例:
+    batch = PhotoBatch(on_progress=lambda done, total: ...)
+    batch.add("main_photos", frame)
+    with batch.commit(conn) as paths:     # 書き込みを待ってから、写真を移動してコミット
+        conn.execute("INSERT ...", (json.dumps(paths), ...))
+"""
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+
+from data.config import IMAGE_STORE_DIR
+
+from . import image_store
+
+# 写真の JPEG 画質（cv2.imwrite の既定値と同じ）
+JPEG_QUALITY = 95
+
+# 書き込みに使うスレッド数（JPEG 変換は GIL を解放するため、コア数まで並列に動く）
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """写真の書き込みに使う共有のスレッドプール"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="photo-writer")
+        return _executor
+
+
+def encode_jpeg(frame, quality=JPEG_QUALITY):
+    """BGR のフレームを JPEG のデータにする"""
+    import cv2
+
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("写真の JPEG 変換に失敗しました")
+    return buffer.tobytes()
+
+
+def _stage(frame, path):
+    """
+    フレームを JPEG にして一時ファイルに書き込み、内容のハッシュを返す
+
+    cv2.imwrite は Windows で日本語を含むパスに書き込めないため、
+    cv2.imencode で変換してから Python でファイルに書き込む。
+    """
+    data = encode_jpeg(frame)
+    with open(path, "wb") as f:
+        f.write(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+class PhotoBatch:
+    """
+    1件の登録でまとめて保存する写真
+
+    Args:
+        root: 写真の保存先（省略時は IMAGE_STORE_DIR）
+        on_progress: wait() の間、写真を1枚書き込むたびに呼ぶ関数 on_progress(書き込んだ枚数, 全体の枚数)
+    """
+
+    def __init__(self, root=None, on_progress=None):
+        self.root = Path(root or IMAGE_STORE_DIR)
+        self.temp_dir = self.root / f".tmp-{uuid.uuid4().hex}"
+        self.on_progress = on_progress
+        self._entries = []  # (種類, 一時ファイル, Future（結果はハッシュ）, (幅, 高さ))
+        self.failed = []    # 書き込みに失敗した (種類, 例外)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, kind, frame):
+        """
+        写真の書き込みをスレッドプールに依頼（すぐに戻る）
+
+        Args:
+            kind: "main_photos" / "sub_photos" / "bundle_photos"
+            frame: BGR のフレーム
+        """
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        temporary = self.temp_dir / f"{len(self._entries)}.jpg"
+        future = get_executor().submit(_stage, frame, temporary)
+        height, width = frame.shape[:2]
+        self._entries.append((kind, temporary, future, (width, height)))
+        return future
+
+    def _report(self, done, total):
+        if self.on_progress:
+            try:
+                self.on_progress(done, total)
+            except Exception as e:
+                print(f"進捗表示エラー: {e}")
+
+    def final_paths(self):
+        """種類ごとの保存後のパス（{"main_photos": [...], "sub_photos": [...], "bundle_photos": [...]}）"""
+        paths = {"main_photos": [], "sub_photos": [], "bundle_photos": []}
+        for kind, _, future, _ in self._entries:
+            paths.setdefault(kind, []).append(str(image_store.object_path(future.result(), root=self.root)))
+        return paths
+
+    def sizes(self):
+        """保存後のパス -> 写真の (幅, 高さ)（撮影したフレームの大きさ）"""
+        return {
+            str(image_store.object_path(future.result(), root=self.root)): size
+            for _, _, future, size in self._entries
+        }
+
+    def wait(self):
+        """
+        すべての書き込みが終わるまで待ち、失敗した写真を除く
+
+        写真をすべて add() してから呼ぶため、進捗の全体の枚数はここで確定する。
+        """
+        total = len(self._entries)
+        for done, _ in enumerate(as_completed(entry[2] for entry in self._entries), 1):
+            self._report(done, total)
+        written = []
+        for entry in self._entries:
+            try:
+                entry[2].result()
+                written.append(entry)
+            except Exception as e:
+                print(f"写真保存エラー: {entry[0]} ({e})")
+                self.failed.append((entry[0], e))
+        self._entries = written
+
+    def cleanup(self):
+        """一時フォルダを削除"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _move_into_place(self):
+        """一時ファイルを保存先に移動する（同じ内容が既にあれば移動しない）"""
+        for _, temporary, future, _ in self._entries:
+            image_store.install(temporary, image_store.object_path(future.result(), root=self.root))
+
+    @contextmanager
+    def commit(self, conn):
+        """
+        写真の書き込みを待ち、with ブロック内の DB 更新と合わせて確定する
+
+        with ブロックでは final_paths() を受け取って登録を行う。ブロックを抜けると写真を保存先に移動し、
+        参照数を増やしてからコミットする。途中で失敗した場合は DB をロールバックし、一時フォルダを削除する。
+        保存先に移動済みの写真は、同時に登録した別の拾得物が参照している場合があるため削除せず、
+        image_store.collect_garbage() に任せる。
+        """
+        try:
+            self.wait()
+            paths = self.final_paths()
+            yield paths
+            self._move_into_place()
+            image_store.add_refs(conn, [p for photos in paths.values() for p in photos], root=self.root)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.cleanup()
@@ -0,0 +1,226 @@
+"""
+拾得物の写真の一覧（item_photos テーブル）
+lost_items.item_image の JSON を写真1枚1行に分けて持ち、一覧に表示する表紙の写真のパスを
+lost_items.cover_photo に入れておく。一覧・検索・今日の拾得物は cover_photo を読むだけでよく、
+行ごとに JSON を解析して形式（{"main_photos": ...} / {"photos": ...} / [...] / 単一のパス）を
+判定する必要がない。
+
+item_image はこれまでどおり写真の正で（詳細画面・編集・Flask アプリが読む）、
+item_image を書き換えたときは同じトランザクションで sync_item() を呼んで作り直す。
+
+使い方:
+    python -m core.photos backfill [DBパス]   # item_image から item_photos と cover_photo を作り直す
+    python -m core.photos measure [DBパス]    # 大きさ・サムネイルが未設定の写真を調べて埋める
+"""
+import json
+
+from . import db, thumbnails
+
+PHOTOS_TABLE = "item_photos"
+
+# item_image のキー -> 写真の種類（"photos" は旧形式のメイン写真）
+KINDS = {
+    "main_photos": "main",
+    "photos": "main",
+    "sub_photos": "sub",
+    "bundle_photos": "bundle",
+}
+
+# 1回のトランザクションで作り直す拾得物の件数
+BACKFILL_BATCH_ROWS = 1000
+
+
+def create_table(conn):
+    """写真の一覧テーブル、表紙の列、拾得物を削除したときに写真の行を消すトリガーを作成"""
+    from .migrations import add_column_if_missing
+
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PHOTOS_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            ordinal INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            thumb_path TEXT,
+            UNIQUE (item_id, kind, ordinal)
+        )
+    """)
+    add_column_if_missing(conn, "lost_items", "cover_photo", "TEXT")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_lost_items_photos_delete AFTER DELETE ON lost_items BEGIN
+            DELETE FROM {PHOTOS_TABLE} WHERE item_id = old.id;
+        END
+    """)
+
+
+def entries(item_image):
+    """
+    item_image の写真を (種類, 種類ごとの順番, パス) で返す
+
+    Args:
+        item_image: {"main_photos": [...], "sub_photos": [...], ...} / [...] / 単一のパス
+    """
+    if not isinstance(item_image, str) or not item_image:
+        return []
+    try:
+        data = json.loads(item_image)
+    except ValueError:
+        data = item_image
+    if isinstance(data, str):
+        groups = [("main", [data])]
+    elif isinstance(data, list):
+        groups = [("main", data)]
+    elif isinstance(data, dict):
+        groups = [(kind, data.get(key)) for key, kind in KINDS.items()]
+    else:
+        groups = []
+
+    result = []
+    counts = {}
+    for kind, paths in groups:
+        if not isinstance(paths, list):
+            continue
+        for path in paths:
+            if isinstance(path, str) and path:
+                ordinal = counts.get(kind, 0)
+                counts[kind] = ordinal + 1
+                result.append((kind, ordinal, path))
+    return result
+
+
+def cover_of(item_image):
+    """表紙の写真（メイン写真の1枚目、なければ None）"""
+    for kind, _, path in entries(item_image):
+        if kind == "main":
+            return path
+    return None
+
+
+def measure(path):
+    """
+    写真の大きさとサムネイル（一覧用の一番小さいもの）のパス
+
+    大きさは画像のヘッダーだけを読んで調べる。写真がなければ (None, None, None)。
+    """
+    from PIL import Image
+
+    key = thumbnails.cache_key(path)
+    if key is None:
+        return None, None, None
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+    except Exception:
+        width = height = None
+    return width, height, str(thumbnails.cache_path(key, thumbnails.SIZES[0]))
+
+
+def sync_item(conn, item_id, item_image, sizes=None, measure_files=False):
+    """
+    1件の拾得物の写真の行と表紙を item_image に合わせて作り直す（呼び出し側のトランザクション内で実行する）
+
+    Args:
+        sizes: パス -> (幅, 高さ)。撮影したフレームの大きさなど、分かっている場合に渡す
+        measure_files: True の場合、sizes にない写真はファイルを読んで大きさを調べる
+    """
+    sizes = sizes or {}
+    rows = []
+    for kind, ordinal, path in entries(item_image):
+        width, height = sizes.get(path, (None, None))
+        thumb_path = None
+        if measure_files:
+            measured_width, measured_height, thumb_path = measure(path)
+            width = width or measured_width
+            height = height or measured_height
+        rows.append((item_id, kind, ordinal, path, width, height, thumb_path))
+    conn.execute(f"DELETE FROM {PHOTOS_TABLE} WHERE item_id = ?", (item_id,))
+    conn.executemany(
+        f"INSERT INTO {PHOTOS_TABLE} (item_id, kind, ordinal, path, width, height, thumb_path) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    cover = next((path for _, kind, _, path, *_ in rows if kind == "main"), None)
+    conn.execute("UPDATE lost_items SET cover_photo = ? WHERE id = ?", (cover, item_id))
+    return cover
+
+
+def backfill(conn):
+    """
+    登録済みのすべての拾得物の写真の行と表紙を作り直す（呼び出し側のトランザクション内で実行する）
+
+    ファイルは読まない（大きさ・サムネイルは measure_missing() で後から埋める）。
+    """
+    conn.execute(f"DELETE FROM {PHOTOS_TABLE}")
+    conn.execute("UPDATE lost_items SET cover_photo = NULL WHERE cover_photo IS NOT NULL")
+    count = 0
+    rows = conn.execute(
+        "SELECT id, item_image FROM lost_items WHERE item_image IS NOT NULL AND item_image != ''"
+    ).fetchall()
+    for start in range(0, len(rows), BACKFILL_BATCH_ROWS):
+        photos = []
+        covers = []
+        for item_id, item_image in rows[start:start + BACKFILL_BATCH_ROWS]:
+            items = entries(item_image)
+            photos.extend((item_id, kind, ordinal, path) for kind, ordinal, path in items)
+            cover = next((path for kind, _, path in items if kind == "main"), None)
+            if cover:
+                covers.append((cover, item_id))
+        conn.executemany(
+            f"INSERT INTO {PHOTOS_TABLE} (item_id, kind, ordinal, path) VALUES (?, ?, ?, ?)", photos
+        )
+        conn.executemany("UPDATE lost_items SET cover_photo = ? WHERE id = ?", covers)
+        count += len(photos)
+    return count
+
+
+def measure_missing(db_path=None, batch_rows=BACKFILL_BATCH_ROWS):
+    """
+    大きさ・サムネイルのパスが未設定の写真を調べて埋める
+
+    写真を読む間はトランザクションを開かず、結果だけを短いトランザクションで書き込む。
+
+    Returns:
+        int: 埋めた写真の枚数
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.query_all(
+            f"SELECT id, path FROM {PHOTOS_TABLE} WHERE id > ? AND (width IS NULL OR thumb_path IS NULL) "
+            "ORDER BY id LIMIT ?",
+            (last_id, batch_rows),
+            db_path=db_path,
+        )
+        if not rows:
+            return updated
+        last_id = rows[-1][0]
+        results = []
+        for photo_id, path in rows:
+            width, height, thumb_path = measure(path)
+            if thumb_path:
+                results.append((width, height, thumb_path, photo_id))
+        if results:
+            with db.transaction(db_path) as conn:
+                conn.executemany(
+                    f"UPDATE {PHOTOS_TABLE} SET width = COALESCE(width, ?), height = COALESCE(height, ?), "
+                    "thumb_path = ? WHERE id = ?",
+                    results,
+                )
+            updated += len(results)
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    path = sys.argv[2] if len(sys.argv) > 2 else None
+    if command == "backfill":
+        with db.transaction(path) as conn:
+            count = backfill(conn)
+        print(f"写真 {count}枚 の一覧を作り直しました")
+    elif command == "measure":
+        print(f"写真 {measure_missing(path)}枚 の大きさを調べました")
+    else:
+        print("使い方: python -m core.photos [backfill|measure] [DBパス]")
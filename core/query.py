@@ -0,0 +1,210 @@
+"""
+検索条件（WHERE句）の組み立て
+日付条件は DATE(col) や strftime() で列を包まず、生の列に対する半開区間
+（col >= 開始 AND col < 終了）に変換してインデックスを使えるようにする
+一覧画面のキーセット（カーソル）ページングもここで扱う
+"""
+from datetime import date, datetime, timedelta
+
+
+def parse_date(value):
+    """
+    日付を date に変換
+
+    Args:
+        value: date / datetime / "YYYY-MM-DD" / "YYYY/MM/DD"（時刻付きも可）
+
+    Returns:
+        date: 変換できない場合はNone
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip().replace("/", "-")[:10]
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        parts = text.split("-")
+        if len(parts) == 3 and all(p.isdigit() for p in parts):
+            try:
+                return date(int(parts[0]), int(parts[1]), int(parts[2]))
+            except ValueError:
+                return None
+        return None
+
+
+def day_range(day):
+    """指定日の [開始, 翌日) を ISO文字列で返す"""
+    d = parse_date(day)
+    if d is None:
+        raise ValueError(f"日付を解釈できません: {day!r}")
+    return d.isoformat(), (d + timedelta(days=1)).isoformat()
+
+
+def month_range(year_month):
+    """
+    指定月の [月初, 翌月初) を ISO文字列で返す
+
+    Args:
+        year_month: "YYYY-MM" / (年, 月) / date
+    """
+    if isinstance(year_month, (date, datetime)):
+        year, month = year_month.year, year_month.month
+    elif isinstance(year_month, (tuple, list)):
+        year, month = int(year_month[0]), int(year_month[1])
+    else:
+        year, month = (int(p) for p in str(year_month).replace("/", "-").split("-")[:2])
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def year_range(year):
+    """指定年の [1月1日, 翌年1月1日) を ISO文字列で返す"""
+    year = int(year)
+    return date(year, 1, 1).isoformat(), date(year + 1, 1, 1).isoformat()
+
+
+class Where:
+    """
+    WHERE句とパラメータの組み立て
+
+    使用例:
+        where = Where()
+        where.equals("item_class_L", "貴重品")
+        where.date_between("get_item", "2025/01/01", "2025/01/31")
+        cur.execute(f"SELECT * FROM lost_items {where.sql()}", where.params)
+    """
+
+    def __init__(self):
+        self.conditions = []
+        self.params = []
+
+    def __bool__(self):
+        return bool(self.conditions)
+
+    def add(self, condition, *params):
+        """任意の条件を追加"""
+        self.conditions.append(condition)
+        self.params.extend(params)
+        return self
+
+    def equals(self, column, value):
+        return self.add(f"{column} = ?", value)
+
+    def like(self, column, value):
+        """部分一致の条件を追加"""
+        return self.add(f"{column} LIKE ?", f"%{value}%")
+
+    def on_day(self, column, day):
+        """指定日の条件を追加（DATE(column) = ? と同等）"""
+        start, end = day_range(day)
+        return self.add(f"{column} >= ? AND {column} < ?", start, end)
+
+    def in_month(self, column, year_month):
+        """指定月の条件を追加（strftime('%Y-%m', column) = ? と同等）"""
+        start, end = month_range(year_month)
+        return self.add(f"{column} >= ? AND {column} < ?", start, end)
+
+    def in_year(self, column, year):
+        """指定年の条件を追加"""
+        start, end = year_range(year)
+        return self.add(f"{column} >= ? AND {column} < ?", start, end)
+
+    def date_from(self, column, day):
+        """指定日以降の条件を追加（DATE(column) >= ? と同等）"""
+        start, _ = day_range(day)
+        return self.add(f"{column} >= ?", start)
+
+    def date_to(self, column, day):
+        """指定日以前の条件を追加（DATE(column) <= ? と同等）"""
+        _, end = day_range(day)
+        return self.add(f"{column} < ?", end)
+
+    def date_between(self, column, start_day=None, end_day=None):
+        """
+        日付範囲の条件を追加（両端の日を含む）
+
+        解釈できない日付は無視する
+        """
+        if parse_date(start_day):
+            self.date_from(column, start_day)
+        if parse_date(end_day):
+            self.date_to(column, end_day)
+        return self
+
+    def sql(self, prefix="WHERE"):
+        """WHERE句の文字列を返す（条件がなければ空文字）"""
+        if not self.conditions:
+            return ""
+        return f"{prefix} " + " AND ".join(self.conditions)
+
+
+class Keyset:
+    """
+    キーセット（カーソル）方式のページング
+
+    OFFSET を使わず「前のページの最後の行より後ろ」という条件で次のページを取得する。
+    並べ替え列が同じ値の行は id で順序を決める。行値比較 (col, id) < (?, ?) を使うため
+    (col) のインデックスでそのまま検索できる。NULL は SQLite と同じく最小値として扱い、
+    NULL の行は別の区間として続けて取得する。
+
+    使用例:
+        keyset = Keyset("get_item", "DESC")
+        for condition, params in keyset.segments(cursor):
+            sql = f"SELECT ... WHERE {condition} {keyset.order_by()} LIMIT ?"
+            ...  # ページが埋まるまで区間を順に読む
+        next_cursor = keyset.cursor_of(last_row_get_item, last_row_id)
+    """
+
+    def __init__(self, column=None, direction="DESC", id_column="id"):
+        self.column = column
+        self.direction = direction.upper()
+        self.id_column = id_column
+
+    def order_by(self):
+        """ORDER BY句を返す"""
+        if self.column is None:
+            return f"ORDER BY {self.id_column} {self.direction}"
+        return f"ORDER BY {self.column} {self.direction}, {self.id_column} {self.direction}"
+
+    def cursor_of(self, value, row_id):
+        """行の並べ替えキーからカーソルを作成"""
+        return (value, row_id) if self.column is not None else (None, row_id)
+
+    def segments(self, cursor=None):
+        """
+        カーソルより後ろの行を表す条件の一覧を、並び順どおりに返す
+
+        各条件はそれぞれインデックスで検索できる形になっている。
+        前の条件の結果でページが埋まらなかった場合に次の条件を読む。
+
+        Args:
+            cursor: cursor_of() で作成した (並べ替え列の値, id)。先頭ページはNone
+
+        Returns:
+            list: (条件SQL, パラメータのリスト) のリスト
+        """
+        id_col = self.id_column
+        op = "<" if self.direction == "DESC" else ">"
+        if self.column is None:
+            if cursor is None:
+                return [("1 = 1", [])]
+            return [(f"{id_col} {op} ?", [cursor[1]])]
+
+        col = self.column
+        not_null = (f"{col} IS NOT NULL", [])
+        null = (f"{col} IS NULL", [])
+        if cursor is None:
+            # 降順では NULL が最後、昇順では先頭に来る
+            return [not_null, null] if self.direction == "DESC" else [null, not_null]
+
+        value, row_id = cursor
+        if value is None:
+            null_after = (f"{col} IS NULL AND {id_col} {op} ?", [row_id])
+            return [null_after] if self.direction == "DESC" else [null_after, not_null]
+        value_after = (f"({col}, {id_col}) {op} (?, ?)", [value, row_id])
+        return [value_after, null] if self.direction == "DESC" else [value_after]
@@ -0,0 +1,343 @@
+"""
+全文検索
+lost_items / notfound_items の文字列カラムに FTS5（trigram トークナイザ）の索引を張り、
+キーワード検索を LIKE '%語%' の全件走査ではなく索引で行う。索引はトリガーで同期する。
+
+trigram は3文字以上の語しか索引で引けないため、2文字以下の語（「財布」「鍵」など）は
+従来どおり LIKE で絞り込む。FTS5 が使えない環境や索引が未作成の場合もすべて LIKE で検索する。
+"""
+from .query import Where
+
+# 対象テーブルごとの索引定義: (索引テーブル名, 対象カラム, bm25の重み)
+FTS_TABLES = {
+    "lost_items": (
+        "lost_items_fts",
+        ["item_feature", "item_maker", "item_remarks", "item_class_L", "item_class_M",
+         "item_class_S", "find_area", "item_color"],
+        [3.0, 2.0, 1.0, 2.0, 2.0, 2.0, 1.0, 1.0],
+    ),
+    "notfound_items": (
+        "notfound_items_fts",
+        ["name", "phone", "location", "item"],
+        [1.0, 1.0, 1.0, 3.0],
+    ),
+}
+
+# trigram で索引を引ける最短の語の長さ
+MIN_TERM_LENGTH = 3
+
+
+def is_supported(conn):
+    """FTS5 の trigram トークナイザが使えるか（SQLite 3.34 以降）"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._fts_probe")
+        return True
+    except Exception:
+        return False
+
+
+def index_exists(conn, table):
+    """table の全文検索索引が作成済みかどうか"""
+    fts_table = FTS_TABLES[table][0]
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,)
+    ).fetchone()
+    return row is not None
+
+
+def _values(prefix, columns):
+    return ", ".join(f"{prefix}.{column}" for column in columns)
+
+
+def create_index(conn, table):
+    """
+    全文検索索引と同期用トリガーを作成し、既存データを取り込む
+
+    索引は外部コンテンツ方式（content=table）のため、本文は元のテーブルにだけ保存される。
+    """
+    fts_table, columns, _ = FTS_TABLES[table]
+    column_list = ", ".join(columns)
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column_list},
+            content='{table}', content_rowid='id', tokenize='trigram'
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (NEW.id, {_values("NEW", columns)});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+            VALUES ('delete', OLD.id, {_values("OLD", columns)});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_update
+        AFTER UPDATE OF {column_list} ON {table}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+            VALUES ('delete', OLD.id, {_values("OLD", columns)});
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (NEW.id, {_values("NEW", columns)});
+        END
+    """)
+    rebuild(conn, table)
+
+
+def create_indexes(conn):
+    """すべての対象テーブルに全文検索索引を作成（FTS5 が使えない場合は何もしない）"""
+    if not is_supported(conn):
+        print("FTS5(trigram) が利用できないため、全文検索索引は作成しません")
+        return False
+    for table in FTS_TABLES:
+        create_index(conn, table)
+    return True
+
+
+def rebuild(conn, table=None):
+    """全文検索索引を元のテーブルから作り直す（table 省略時はすべて）"""
+    for name in [table] if table else FTS_TABLES:
+        if index_exists(conn, name):
+            fts_table = FTS_TABLES[name][0]
+            conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+
+def index_rows_after(conn, table, after_id):
+    """
+    id が after_id より大きい行を全文検索索引に追加
+
+    一括取り込みで INSERT トリガーを外した場合に、取り込んだ行をまとめて索引へ反映する。
+    """
+    if not index_exists(conn, table):
+        return
+    fts_table, columns, _ = FTS_TABLES[table]
+    column_list = ", ".join(columns)
+    conn.execute(
+        f"INSERT INTO {fts_table} (rowid, {column_list}) SELECT id, {column_list} FROM {table} WHERE id > ?",
+        (after_id,),
+    )
+
+
+def drop_index(conn, table):
+    """全文検索索引とトリガーを削除"""
+    fts_table = FTS_TABLES[table][0]
+    for name in ("insert", "delete", "update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{fts_table}_{name}")
+    conn.execute(f"DROP TABLE IF EXISTS {fts_table}")
+
+
+def split_keyword(keyword):
+    """キーワードを空白（全角含む）で語に分割"""
+    return str(keyword or "").replace("　", " ").split()
+
+
+def _phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def match_expression(terms, columns=None, operator="AND"):
+    """
+    FTS5 の MATCH 式を作成（既定はすべての語を含む行に一致）
+
+    Args:
+        terms: 3文字以上の語のリスト
+        columns: 検索対象のカラム（省略時は索引のすべてのカラム）
+        operator: 語の結合（"AND" / "OR"）
+    """
+    expression = f" {operator} ".join(_phrase(term) for term in terms)
+    if columns:
+        return "{" + " ".join(columns) + "} : (" + expression + ")"
+    return expression
+
+
+class KeywordSearch:
+    """
+    キーワード検索の条件
+
+    3文字以上の語は全文検索索引、2文字以下の語は LIKE で絞り込む。
+    複数の語はすべてを含む行に一致する（AND）。
+
+    使用例:
+        # 関連度順に並べる場合
+        search = KeywordSearch(conn, "lost_items", "黒い 財布")
+        where = search.apply_like(Where())
+        cur.execute(f"SELECT ... FROM lost_items {search.join()} {where.sql()} "
+                    f"ORDER BY {search.rank_order('get_item DESC')}", search.join_params + where.params)
+    """
+
+    def __init__(self, conn, table, keyword, columns=None):
+        self.table = table
+        self.fts_table, all_columns, weights = FTS_TABLES[table]
+        self.columns = list(columns) if columns else all_columns
+        self.weights = weights
+        terms = split_keyword(keyword)
+        if index_exists(conn, table):
+            self.match_terms = [t for t in terms if len(t) >= MIN_TERM_LENGTH]
+            self.like_terms = [t for t in terms if len(t) < MIN_TERM_LENGTH]
+        else:
+            self.match_terms = []
+            self.like_terms = terms
+
+    def __bool__(self):
+        return bool(self.match_terms or self.like_terms)
+
+    @property
+    def match(self):
+        """MATCH 式（索引で引く語がなければNone）"""
+        if not self.match_terms:
+            return None
+        columns = None if self.columns == FTS_TABLES[self.table][1] else self.columns
+        return match_expression(self.match_terms, columns)
+
+    def apply(self, where, id_column="id"):
+        """
+        Where に条件を追加（並べ替えに関連度を使わない場合）
+
+        Args:
+            where: core.query.Where
+            id_column: 元テーブルの id カラム（別名付きの場合は "t.id" など）
+        """
+        if self.match:
+            where.add(
+                f"{id_column} IN (SELECT rowid FROM {self.fts_table} WHERE {self.fts_table} MATCH ?)",
+                self.match,
+            )
+        return self.apply_like(where)
+
+    def apply_like(self, where):
+        """2文字以下の語の LIKE 条件だけを追加（join() と組み合わせる場合はこちらを使う）"""
+        for term in self.like_terms:
+            pattern = f"%{term}%"
+            where.add(
+                "(" + " OR ".join(f"{column} LIKE ?" for column in self.columns) + ")",
+                *([pattern] * len(self.columns)),
+            )
+        return where
+
+    def join(self, id_column="id"):
+        """
+        関連度で並べ替えるための JOIN 句（索引で引く語がなければ空文字）
+
+        join() を使う場合は apply() ではなく apply_like() で残りの条件を追加する。
+        パラメータは join_params を WHERE句のパラメータより前に渡す。
+        """
+        if not self.match:
+            return ""
+        weights = ", ".join(str(w) for w in self.weights)
+        return (
+            f"JOIN (SELECT rowid AS fts_id, bm25({self.fts_table}, {weights}) AS fts_rank "
+            f"FROM {self.fts_table} WHERE {self.fts_table} MATCH ?) AS fts "
+            f"ON fts.fts_id = {id_column}"
+        )
+
+    @property
+    def join_params(self):
+        return [self.match] if self.match else []
+
+    def rank_order(self, fallback):
+        """ORDER BY 句の中身（関連度の高い順、同点は fallback の順）"""
+        if not self.match:
+            return fallback
+        return f"fts.fts_rank, {fallback}"
+
+
+def lost_items_filter(conn, search_params=None):
+    """
+    拾得物一覧の検索条件（一覧画面・エクスポートで共通）
+
+    削除済みは常に除外する。返還済み・廃棄/売却済みは show_refunded / show_disposed を指定した場合だけ含める。
+
+    Args:
+        search_params: 一覧画面の検索条件（id, item_feature, find_area, item_color, start_date, end_date,
+                       item_class_L/M/S, item_not_yet, valuable_only, show_refunded, show_disposed）
+
+    Returns:
+        Where: 条件とパラメータ
+    """
+    where = Where().add("item_situation != '削除済み'")
+    search_params = search_params or {}
+
+    if search_params.get("id"):
+        where.equals("id", search_params["id"])
+
+    # 特徴・拾得場所は全文検索索引で絞り込む
+    for column in ("item_feature", "find_area"):
+        if search_params.get(column):
+            KeywordSearch(conn, "lost_items", search_params[column], [column]).apply(where)
+
+    if search_params.get("item_color") and search_params["item_color"] != "未選択":
+        where.like("item_color", search_params["item_color"])
+
+    # DATE(get_item) で包まずに範囲条件にしてインデックスを使う
+    where.date_between("get_item", search_params.get("start_date"), search_params.get("end_date"))
+
+    for column in ("item_class_L", "item_class_M", "item_class_S"):
+        if search_params.get(column) and search_params[column] != "選択してください":
+            where.equals(column, search_params[column])
+
+    if search_params.get("item_not_yet"):
+        where.add("item_situation != '返還済み'")
+
+    if search_params.get("valuable_only"):
+        where.add("item_value = 1")
+
+    if not search_params.get("show_refunded", False):
+        where.add("item_situation != '返還済み'")
+
+    if not search_params.get("show_disposed", False):
+        where.add("item_situation NOT IN ('廃棄', '売却済み')")
+    return where
+
+
+def notfound_items_filter(conn, search_params=None):
+    """
+    遺失物（遺失届）の検索条件
+
+    Args:
+        search_params: status, start_date, end_date（遺失日）, keyword
+
+    Returns:
+        Where: 条件とパラメータ
+    """
+    where = Where()
+    search_params = search_params or {}
+    if search_params.get("status") and search_params["status"] != "すべて":
+        where.equals("status", search_params["status"])
+    where.date_between("lost_date", search_params.get("start_date"), search_params.get("end_date"))
+    if search_params.get("keyword"):
+        KeywordSearch(conn, "notfound_items", search_params["keyword"]).apply(where)
+    return where
+
+
+if __name__ == "__main__":
+    import sys
+    from . import db
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    path = sys.argv[2] if len(sys.argv) > 2 else None
+    conn = db.connect(path)
+    try:
+        if command == "create":
+            if create_indexes(conn):
+                conn.commit()
+                print("全文検索索引を作成しました")
+        elif command == "rebuild":
+            rebuild(conn)
+            conn.commit()
+            print("全文検索索引を再構築しました")
+        elif command == "drop":
+            for table in FTS_TABLES:
+                drop_index(conn, table)
+            conn.commit()
+            print("全文検索索引を削除しました")
+        else:
+            print("使い方: python -m core.search [create|rebuild|drop] [DBパス]")
+    finally:
+        conn.close()
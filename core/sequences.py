@@ -0,0 +1,135 @@
+"""
+管理番号の採番
+管理番号（main_id）は「区分(1桁) + 年(2桁) + 連番(5桁)」で、連番は拾得者区分・年ごとに数える。
+連番の最後の値を main_id_sequences テーブルに持ち、登録のたびに1行だけ更新する
+（以前は登録のたびに lost_items の件数を数えていたため、件数が増えるほど遅く、
+2台の端末が同時に登録すると同じ番号になることがあった）。
+
+採番は拾得物の INSERT と同じ書き込みトランザクション（BEGIN IMMEDIATE）の中で行う。
+書き込みトランザクションは同時に1つしか開けないため、同時に登録しても番号は重ならず、
+登録に失敗してロールバックした場合は番号も元に戻る。
+
+使用例:
+    conn.execute("BEGIN IMMEDIATE")
+    main_id = sequences.allocate(conn, "占有者拾得", 25)
+    conn.execute("INSERT INTO lost_items (main_id, ...) VALUES (?, ...)", (main_id, ...))
+    conn.commit()
+"""
+SEQUENCE_TABLE = "main_id_sequences"
+
+OWNER_FINDER = "占有者拾得"
+
+
+def create_table(conn):
+    """採番テーブルを作成"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SEQUENCE_TABLE} (
+            choice_finder TEXT NOT NULL,
+            current_year INTEGER NOT NULL,
+            last_value INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (choice_finder, current_year)
+        )
+    """)
+
+
+def prefix_of(choice_finder):
+    """管理番号の先頭の区分（占有者拾得は 1、それ以外は 2）"""
+    return "1" if choice_finder == OWNER_FINDER else "2"
+
+
+def format_main_id(choice_finder, current_year, number):
+    return f"{prefix_of(choice_finder)}{current_year:02}{number:05}"
+
+
+def parse_main_id(main_id):
+    """管理番号を (先頭の区分, 年, 連番) に分解（format_main_id の形式でなければ None）"""
+    text = str(main_id or "").strip()
+    if len(text) < 8 or not text.isdigit() or text[0] not in ("1", "2"):
+        return None
+    return text[0], int(text[1:3]), int(text[3:])
+
+
+def existing_max(conn, choice_finder, current_year):
+    """
+    lost_items に登録済みの連番の最大値
+
+    以前の採番（件数 + 1）で欠番や重複がある場合も次の番号が重ならないよう、
+    件数と管理番号の連番部分の最大値の大きい方を返す。
+    """
+    head = f"{prefix_of(choice_finder)}{current_year:02}"
+    count, largest = conn.execute("""
+        SELECT COUNT(*), MAX(CASE
+            WHEN substr(main_id, 1, 3) = ? AND length(main_id) > 3 AND substr(main_id, 4) NOT GLOB '*[^0-9]*'
+            THEN CAST(substr(main_id, 4) AS INTEGER)
+        END)
+        FROM lost_items
+        WHERE choice_finder = ? AND current_year = ?
+    """, (head, choice_finder, current_year)).fetchone()
+    return max(count, largest or 0)
+
+
+def current_value(conn, choice_finder, current_year):
+    """
+    連番の最後の値（採番テーブルにない区分・年は登録済みの最大値から始める）
+
+    呼び出し側の書き込みトランザクション内で実行する。
+    """
+    key = (choice_finder, current_year)
+    row = conn.execute(
+        f"SELECT last_value FROM {SEQUENCE_TABLE} WHERE choice_finder = ? AND current_year = ?", key
+    ).fetchone()
+    if row:
+        return row[0]
+    value = existing_max(conn, choice_finder, current_year)
+    conn.execute(
+        f"INSERT INTO {SEQUENCE_TABLE} (choice_finder, current_year, last_value) VALUES (?, ?, ?)",
+        key + (value,),
+    )
+    return value
+
+
+def set_value(conn, choice_finder, current_year, value):
+    """連番の最後の値を進める（小さい値では戻さない）。呼び出し側の書き込みトランザクション内で実行する"""
+    conn.execute(f"""
+        INSERT INTO {SEQUENCE_TABLE} (choice_finder, current_year, last_value) VALUES (?, ?, ?)
+        ON CONFLICT(choice_finder, current_year) DO UPDATE SET
+            last_value = MAX(last_value, excluded.last_value),
+            updated_at = CURRENT_TIMESTAMP
+    """, (choice_finder, current_year, value))
+
+
+def next_number(conn, choice_finder, current_year):
+    """
+    連番を1つ進めて返す
+
+    呼び出し側の書き込みトランザクション（BEGIN IMMEDIATE）内で実行し、同じトランザクションで登録する。
+    """
+    key = (choice_finder, current_year)
+    updated = conn.execute(f"""
+        UPDATE {SEQUENCE_TABLE} SET last_value = last_value + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE choice_finder = ? AND current_year = ?
+    """, key)
+    if updated.rowcount == 0:
+        value = current_value(conn, choice_finder, current_year) + 1
+        set_value(conn, choice_finder, current_year, value)
+        return value
+    return conn.execute(
+        f"SELECT last_value FROM {SEQUENCE_TABLE} WHERE choice_finder = ? AND current_year = ?", key
+    ).fetchone()[0]
+
+
+def allocate(conn, choice_finder, current_year):
+    """管理番号を採番（呼び出し側の書き込みトランザクション内で実行する）"""
+    return format_main_id(choice_finder, current_year, next_number(conn, choice_finder, current_year))
+
+
+def seed(conn):
+    """登録済みの拾得物から、区分・年ごとの連番の最大値を採番テーブルに入れる"""
+    keys = conn.execute(
+        "SELECT DISTINCT choice_finder, current_year FROM lost_items "
+        "WHERE choice_finder IS NOT NULL AND current_year IS NOT NULL"
+    ).fetchall()
+    for choice_finder, current_year in keys:
+        set_value(conn, choice_finder, current_year, existing_max(conn, choice_finder, current_year))
+    return len(keys)
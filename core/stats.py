@@ -0,0 +1,250 @@
+"""
+統計集計
+統計画面のグラフ（日別・月別・年別・時間帯別・カテゴリ別）を、グラフごとに
+1回の GROUP BY で集計する。日次集計テーブル（ロールアップ）が有効な場合はそちらを使う
+"""
+from datetime import date, timedelta
+
+from .query import day_range, month_range
+
+ROLLUP_TABLE = "lost_items_daily_stats"
+
+# 集計元ごとの列定義
+_RAW_SOURCE = {
+    "table": "lost_items",
+    "date_column": "get_item",
+    "day": "substr(get_item, 1, 10)",
+    "hour": "get_item_hour",
+    "class": "item_class_L",
+    "count": "COUNT(*)",
+}
+_ROLLUP_SOURCE = {
+    "table": ROLLUP_TABLE,
+    "date_column": "day",
+    "day": "day",
+    "hour": "hour",
+    "class": "item_class_L",
+    "count": "SUM(item_count)",
+}
+
+# 集計キー（NULLはロールアップの主キーに入れられないため置き換える）
+_KEY_DAY = "COALESCE(substr({row}.get_item, 1, 10), '')"
+_KEY_HOUR = "COALESCE({row}.get_item_hour, -1)"
+_KEY_CLASS = "COALESCE({row}.item_class_L, '')"
+
+
+def _keys(row):
+    return ", ".join(k.format(row=row) for k in (_KEY_DAY, _KEY_HOUR, _KEY_CLASS))
+
+
+def _increment_sql(row, delta):
+    return (
+        f"INSERT INTO {ROLLUP_TABLE} (day, hour, item_class_L, item_count) "
+        f"VALUES ({_keys(row)}, {delta}) "
+        f"ON CONFLICT(day, hour, item_class_L) DO UPDATE SET item_count = item_count + ({delta});"
+    )
+
+
+def rollup_enabled(conn):
+    """日次集計テーブルが作成済みかどうか"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (ROLLUP_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def enable_rollup(conn):
+    """
+    日次集計テーブルとトリガーを作成し、既存データから再集計する
+
+    以降は lost_items への INSERT / UPDATE / DELETE のたびにトリガーで更新されるため、
+    統計画面は lost_items の件数に関係なく小さな集計テーブルだけを読む。
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+            day TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            item_class_L TEXT NOT NULL,
+            item_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, hour, item_class_L)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_lost_items_stats_insert
+        AFTER INSERT ON lost_items
+        BEGIN
+            {_increment_sql("NEW", 1)}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_lost_items_stats_delete
+        AFTER DELETE ON lost_items
+        BEGIN
+            {_increment_sql("OLD", -1)}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_lost_items_stats_update
+        AFTER UPDATE OF get_item, get_item_hour, item_class_L ON lost_items
+        BEGIN
+            {_increment_sql("OLD", -1)}
+            {_increment_sql("NEW", 1)}
+        END
+    """)
+    rebuild_rollup(conn)
+    conn.commit()
+
+
+def rebuild_rollup(conn):
+    """日次集計テーブルを lost_items から作り直す"""
+    conn.execute(f"DELETE FROM {ROLLUP_TABLE}")
+    conn.execute(f"""
+        INSERT INTO {ROLLUP_TABLE} (day, hour, item_class_L, item_count)
+        SELECT {_keys("lost_items")}, COUNT(*)
+        FROM lost_items
+        GROUP BY 1, 2, 3
+    """)
+
+
+def add_rows_to_rollup(conn, after_id):
+    """
+    id が after_id より大きい lost_items の行を日次集計テーブルに加算
+
+    一括取り込みで INSERT トリガーを外した場合に、取り込んだ行をまとめて集計へ反映する。
+    """
+    if not rollup_enabled(conn):
+        return
+    conn.execute(f"""
+        INSERT INTO {ROLLUP_TABLE} (day, hour, item_class_L, item_count)
+        SELECT {_keys("lost_items")}, COUNT(*)
+        FROM lost_items
+        WHERE id > ?
+        GROUP BY 1, 2, 3
+        ON CONFLICT(day, hour, item_class_L) DO UPDATE SET item_count = item_count + excluded.item_count
+    """, (after_id,))
+
+
+def disable_rollup(conn):
+    """日次集計テーブルとトリガーを削除"""
+    for name in ("insert", "delete", "update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_lost_items_stats_{name}")
+    conn.execute(f"DROP TABLE IF EXISTS {ROLLUP_TABLE}")
+    conn.commit()
+
+
+def _source(conn):
+    return _ROLLUP_SOURCE if rollup_enabled(conn) else _RAW_SOURCE
+
+
+def _grouped_counts(conn, key, start=None, end=None, source=None):
+    """key ごとの件数を辞書で返す（start/end は集計元の日付列に対する半開区間）"""
+    src = source or _source(conn)
+    conditions = [f"{src['date_column']} IS NOT NULL", f"{src['date_column']} != ''"]
+    params = []
+    if start is not None:
+        conditions.append(f"{src['date_column']} >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{src['date_column']} < ?")
+        params.append(end)
+    sql = (
+        f"SELECT {src[key]} AS k, {src['count']} FROM {src['table']} "
+        f"WHERE {' AND '.join(conditions)} GROUP BY k"
+    )
+    return {row[0]: row[1] or 0 for row in conn.execute(sql, params)}
+
+
+def daily_series(conn, days=31, today=None):
+    """直近 days 日分の日別件数（古い順）"""
+    today = today or date.today()
+    first = today - timedelta(days=days - 1)
+    start, _ = day_range(first)
+    _, end = day_range(today)
+    counts = _grouped_counts(conn, "day", start, end)
+    data = []
+    for i in range(days):
+        day = (first + timedelta(days=i)).isoformat()
+        data.append({"label": day[-5:], "value": counts.get(day, 0)})
+    return data
+
+
+def _shift_month(year, month, delta):
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def monthly_series(conn, months=13, today=None):
+    """直近 months ヶ月分の月別件数（古い順）"""
+    today = today or date.today()
+    first_year, first_month = _shift_month(today.year, today.month, -(months - 1))
+    start, _ = month_range((first_year, first_month))
+    _, end = month_range((today.year, today.month))
+    src = _source(conn)
+    month_key = dict(src, month=f"substr({src['day']}, 1, 7)")
+    counts = _grouped_counts(conn, "month", start, end, source=month_key)
+    data = []
+    for i in range(months):
+        year, month = _shift_month(first_year, first_month, i)
+        label = f"{year:04d}-{month:02d}"
+        data.append({"label": label[-5:], "value": counts.get(label, 0)})
+    return data
+
+
+def yearly_series(conn):
+    """年別件数（古い順）"""
+    src = _source(conn)
+    year_key = dict(src, year=f"substr({src['day']}, 1, 4)")
+    counts = _grouped_counts(conn, "year", source=year_key)
+    return [{"label": year, "value": counts[year]} for year in sorted(counts) if year]
+
+
+def hourly_distribution(conn, bucket_hours=3):
+    """時間帯別分布（bucket_hours 時間ごと）"""
+    src = _source(conn)
+    sql = (
+        f"SELECT {src['hour']} / ? AS b, {src['count']} FROM {src['table']} "
+        f"WHERE {src['hour']} >= 0 AND {src['hour']} < 24 GROUP BY b"
+    )
+    counts = {row[0]: row[1] or 0 for row in conn.execute(sql, (bucket_hours,))}
+    data = []
+    for hour in range(0, 24, bucket_hours):
+        data.append({
+            "label": f"{hour:02d}-{hour + bucket_hours:02d}時",
+            "value": counts.get(hour // bucket_hours, 0),
+        })
+    return data
+
+
+def category_distribution(conn, limit=6):
+    """大分類別の件数（多い順に上位 limit 件）"""
+    src = _source(conn)
+    sql = (
+        f"SELECT {src['class']}, {src['count']} AS c FROM {src['table']} "
+        f"WHERE {src['class']} IS NOT NULL AND {src['class']} != '' "
+        f"GROUP BY {src['class']} ORDER BY c DESC LIMIT ?"
+    )
+    return [{"label": row[0] or "未分類", "value": row[1] or 0} for row in conn.execute(sql, (limit,))]
+
+
+if __name__ == "__main__":
+    import sys
+    from . import db
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    path = sys.argv[2] if len(sys.argv) > 2 else None
+    conn = db.connect(path)
+    try:
+        if command == "enable-rollup":
+            enable_rollup(conn)
+            print("日次集計テーブルを有効にしました")
+        elif command == "disable-rollup":
+            disable_rollup(conn)
+            print("日次集計テーブルを削除しました")
+        elif command == "rebuild-rollup":
+            rebuild_rollup(conn)
+            conn.commit()
+            print("日次集計テーブルを再集計しました")
+        else:
+            print("使い方: python -m core.stats [enable-rollup|disable-rollup|rebuild-rollup] [DBパス]")
+    finally:
+        conn.close()
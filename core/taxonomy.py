@@ -0,0 +1,209 @@
+"""
+物件の分類（大・中・小）
+item_classification.json と apps/config の ITEM_CLASS_L/M/S を合わせた分類を1回だけ組み立て、
+どの画面からも同じものを使う。組み立てた結果は2つのファイルの更新時刻を鍵にしてキャッシュし、
+どちらかが更新されたときだけ組み立て直す。
+
+    - 大分類 -> 中分類、中分類 -> 小分類の選択肢（ドロップダウンの順番）
+    - 中分類・小分類の親（辞書で O(1)）
+    - 組み合わせの検証（集合で O(1)）
+    - item_classification.json の ID（"cash" など）と日本語名の対応
+    - キーワード（推定用。長い語から順）
+
+apps/config がない場合は item_classification.json だけを使う。
+
+使用例:
+    from core import taxonomy
+    tax = taxonomy.load()
+    tax.mediums("かばん類")       # ["手提げかばん", ...]
+    tax.large_of("手提げかばん")   # "かばん類"
+"""
+import json
+import threading
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+CLASSIFICATION_PATH = ROOT_DIR / "item_classification.json"
+CONFIG_PATH = ROOT_DIR / "apps" / "config.py"
+
+# どちらの分類も読み込めない場合の分類
+FALLBACK = {
+    "現金": {"現金": ["現金"]},
+    "かばん類": {
+        "手提げかばん": ["ハンドバッグ", "ビジネスバッグ", "トートバッグ"],
+        "肩掛けかばん": ["ショルダーバッグ", "リュックサック"],
+        "その他かばん類": [],
+    },
+    "財布類": {"財布": ["札入れ", "財布"], "がま口": [], "小銭入れ": []},
+    "その他": {"その他": ["その他"]},
+}
+
+
+class Taxonomy:
+    """組み立て済みの分類（読み取り専用として扱う）"""
+
+    def __init__(self):
+        self.large = []                 # 大分類（表示順）
+        self._mediums = {}              # 大分類 -> [中分類]
+        self._smalls = {}               # 中分類 -> [小分類]
+        self._medium_set = {}           # 大分類 -> {中分類}
+        self._small_set = {}            # 中分類 -> {小分類}
+        self._large_set = set()
+        self._large_of = {}             # 中分類 -> 大分類
+        self._medium_of = {}            # 小分類 -> 中分類（最初に登録したもの）
+        self.large_ids = {}             # 大分類 -> ID
+        self.medium_ids = {}            # 中分類 -> ID
+        self.large_names = {}           # ID -> 大分類
+        self.medium_names = {}          # ID -> 中分類
+        self.priorities = {}            # 中分類 -> 優先度
+        self.keywords = []              # (キーワード, 重み, 大分類, 中分類)（長い語から順）
+        self._keyword_set = {}          # 中分類 -> {キーワード}
+
+    def add(self, large, medium=None, small=None):
+        if large not in self._large_set:
+            self._large_set.add(large)
+            self.large.append(large)
+        if not medium:
+            return
+        mediums = self._medium_set.setdefault(large, set())
+        if medium not in mediums:
+            mediums.add(medium)
+            self._mediums.setdefault(large, []).append(medium)
+            self._large_of.setdefault(medium, large)
+        if not small:
+            return
+        smalls = self._small_set.setdefault(medium, set())
+        if small not in smalls:
+            smalls.add(small)
+            self._smalls.setdefault(medium, []).append(small)
+            self._medium_of.setdefault(small, medium)
+
+    # ------------------------------------------------------------------
+    # 選択肢・親子
+    # ------------------------------------------------------------------
+    def mediums(self, large):
+        """大分類の中分類の選択肢"""
+        return list(self._mediums.get(large, ()))
+
+    def smalls(self, medium):
+        """中分類の小分類の選択肢"""
+        return list(self._smalls.get(medium, ()))
+
+    def large_of(self, medium):
+        """中分類の大分類（不明なら None）"""
+        return self._large_of.get(medium)
+
+    def medium_of(self, small):
+        """小分類の中分類（不明なら None）"""
+        return self._medium_of.get(small)
+
+    def has_large(self, large):
+        return large in self._large_set
+
+    def has_medium(self, large, medium):
+        return medium in self._medium_set.get(large, ())
+
+    def has_small(self, medium, small):
+        return small in self._small_set.get(medium, ())
+
+    def accepts_small(self, medium, small):
+        """小分類として受け付けるか（ITEM_CLASS_S の小分類か、中分類のキーワード）"""
+        return self.has_small(medium, small) or small in self._keyword_set.get(medium, ())
+
+    def check(self, large, medium=None, small=None):
+        """組み合わせが正しければ None、誤りがあればメッセージ"""
+        if large not in self._large_set:
+            return f"大分類が不明です: {large}"
+        if medium and not self.has_medium(large, medium):
+            return f"中分類が大分類「{large}」にありません: {medium}"
+        if small and medium and not self.accepts_small(medium, small):
+            return f"小分類が中分類「{medium}」にありません: {small}"
+        return None
+
+
+def _add_json(tax, data):
+    for large in data:
+        large_name = large["large_category_name_ja"]
+        tax.add(large_name)
+        if large.get("large_category_id"):
+            tax.large_ids.setdefault(large_name, large["large_category_id"])
+            tax.large_names.setdefault(large["large_category_id"], large_name)
+        for medium in large.get("medium_categories", []):
+            medium_name = medium["medium_category_name_ja"]
+            tax.add(large_name, medium_name)
+            if medium.get("medium_category_id"):
+                tax.medium_ids.setdefault(medium_name, medium["medium_category_id"])
+                tax.medium_names.setdefault(medium["medium_category_id"], medium_name)
+            if "priority" in medium:
+                tax.priorities[medium_name] = medium["priority"]
+            terms = tax._keyword_set.setdefault(medium_name, set())
+            for keyword in medium.get("keywords", []):
+                terms.add(keyword["term"])
+                tax.keywords.append((
+                    keyword["term"], float(keyword.get("weight", 1.0)), large_name, medium_name,
+                ))
+    tax.keywords.sort(key=lambda t: len(t[0]), reverse=True)
+
+
+def _add_config(tax, item_class_l, item_class_m, item_class_s):
+    for large in item_class_l:
+        tax.add(large)
+    for item in item_class_m:
+        tax.add(item["data-val"], item["value"])
+    for item in item_class_s:
+        medium = item["data-val"]
+        large = tax.large_of(medium)
+        if large:
+            tax.add(large, medium, item["value"])
+
+
+def build(path=None):
+    """
+    分類を組み立てる（キャッシュを使わない）
+
+    apps/config の分類を先に入れ、item_classification.json にだけある分類を後ろに加える。
+    """
+    tax = Taxonomy()
+    try:
+        from apps.config import ITEM_CLASS_L, ITEM_CLASS_M, ITEM_CLASS_S
+        _add_config(tax, ITEM_CLASS_L, ITEM_CLASS_M, ITEM_CLASS_S)
+    except ImportError:
+        pass
+    try:
+        with open(path or CLASSIFICATION_PATH, "r", encoding="utf-8") as f:
+            _add_json(tax, json.load(f))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"分類データ読み込みエラー: {e}")
+    if not tax.large:
+        for large, mediums in FALLBACK.items():
+            tax.add(large)
+            for medium, smalls in mediums.items():
+                tax.add(large, medium)
+                for small in smalls:
+                    tax.add(large, medium, small)
+    return tax
+
+
+def _mtime(path):
+    try:
+        return Path(path).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+_cache = {"key": None, "taxonomy": None}
+_cache_lock = threading.Lock()
+
+
+def load(path=None):
+    """
+    組み立て済みの分類（item_classification.json と apps/config.py の更新時刻が変わるまでキャッシュ）
+
+    apps/config.py は Python のモジュールとして読み込むため、更新後の内容はアプリの再起動で反映される。
+    """
+    path = Path(path or CLASSIFICATION_PATH)
+    key = (str(path), _mtime(path), _mtime(CONFIG_PATH))
+    with _cache_lock:
+        if _cache["key"] != key:
+            _cache.update(key=key, taxonomy=build(path))
+        return _cache["taxonomy"]
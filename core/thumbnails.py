@@ -0,0 +1,294 @@
+"""
+写真のサムネイル
+一覧・写真表示・今日の拾得物で元の写真（フル解像度の JPEG）をそのまま表示すると、
+件数が多いときにスクロールが極端に遅くなるため、縮小した画像を使う。
+
+    ディスクのキャッシュ: THUMBNAILS_DIR/<大きさ>/<キーの先頭2文字>/<キー>.jpg
+                         キーは元の写真のパス・更新時刻・ファイルサイズから作るため、
+                         写真が差し替えられると自動的に別のサムネイルになる
+    メモリのキャッシュ:   表示用の base64 文字列を合計バイト数の上限つき LRU で保持する
+
+サムネイルは写真の保存時にバックグラウンドで作成する（schedule()）。
+キャッシュにない場合は表示時にその場で作成する。
+
+使い方:
+    python -m core.thumbnails backfill [DBパス]    # 登録済みの写真のサムネイルをまとめて作成
+    python -m core.thumbnails clear                # ディスクのキャッシュを削除
+"""
+import base64
+import hashlib
+import os
+import queue
+import shutil
+import threading
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+
+from data.config import THUMBNAILS_DIR
+
+# 作成するサムネイルの大きさ（正方形の一辺、px）
+SIZES = (128, 256, 640)
+
+# サムネイルの JPEG 画質
+QUALITY = 80
+
+# メモリに保持するサムネイル（base64 文字列）の合計バイト数の上限
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+
+
+def pick_size(display_size):
+    """表示する大きさ以上で最も小さいサムネイルの大きさ（どれより大きければ最大のもの）"""
+    for size in SIZES:
+        if size >= display_size:
+            return size
+    return SIZES[-1]
+
+
+def cache_key(path):
+    """元の写真のパス・更新時刻・ファイルサイズから作るキー（写真がなければ None）"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    source = f"{Path(path).resolve()}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def cache_path(key, size, directory=None):
+    return Path(directory or THUMBNAILS_DIR) / str(size) / key[:2] / f"{key}.jpg"
+
+
+def _square(image):
+    """中央を正方形に切り出す"""
+    width, height = image.size
+    side = min(width, height)
+    left, top = (width - side) // 2, (height - side) // 2
+    return image.crop((left, top, left + side, top + side))
+
+
+def generate(path, sizes=SIZES, directory=None):
+    """
+    写真のサムネイルをすべての大きさで作成（作成済みの大きさは飛ばす）
+
+    JPEG は縮小しながら読み込む（draft）ため、元の写真を一度だけ、小さく展開する。
+
+    Returns:
+        dict: 大きさ -> サムネイルのパス（写真がなければ空）
+    """
+    from PIL import Image, ImageOps
+
+    key = cache_key(path)
+    if key is None:
+        return {}
+    targets = {size: cache_path(key, size, directory) for size in sizes}
+    missing = sorted((size for size, target in targets.items() if not target.exists()), reverse=True)
+    if missing:
+        with Image.open(path) as image:
+            image.draft("RGB", (missing[0], missing[0]))
+            image = _square(ImageOps.exif_transpose(image).convert("RGB"))
+            for size in missing:
+                # 大きい順に縮小し、前の結果から次の大きさを作る
+                if image.width > size:
+                    image = image.resize((size, size), Image.LANCZOS)
+                target = targets[size]
+                target.parent.mkdir(parents=True, exist_ok=True)
+                temporary = target.with_suffix(f".{threading.get_ident()}.tmp")
+                image.save(temporary, format="JPEG", quality=QUALITY, optimize=True)
+                os.replace(temporary, target)
+    return targets
+
+
+def thumbnail_path(path, display_size, directory=None):
+    """表示する大きさに合ったサムネイルのパス（なければ作成、写真がなければ None）"""
+    key = cache_key(path)
+    if key is None:
+        return None
+    size = pick_size(display_size)
+    target = cache_path(key, size, directory)
+    if not target.exists():
+        generate(path, directory=directory)
+    return target
+
+
+class MemoryCache:
+    """合計バイト数の上限つき LRU（スレッドセーフ）"""
+
+    def __init__(self, max_bytes=MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._items[key] = value
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+_memory = MemoryCache()
+
+# 撮影直後のフレーム（ndarray）のサムネイル: (大きさ, id) -> (フレームへの弱参照, base64)
+_frame_thumbnails = {}
+_frame_lock = threading.Lock()
+
+
+def thumbnail_base64(path, display_size):
+    """表示用のサムネイル（base64 文字列、写真がなければ None）"""
+    key = cache_key(path)
+    if key is None:
+        return None
+    size = pick_size(display_size)
+    memory_key = (key, size)
+    encoded = _memory.get(memory_key)
+    if encoded is None:
+        target = cache_path(key, size)
+        if not target.exists():
+            generate(path)
+        encoded = base64.b64encode(target.read_bytes()).decode()
+        _memory.put(memory_key, encoded)
+    return encoded
+
+
+def image_source(path, display_size):
+    """
+    ft.Image に渡す画像の指定（サムネイルを作れない場合は元の写真）
+
+    使用例:
+        ft.Image(**thumbnails.image_source(item["image"], 100), width=100, height=100)
+    """
+    try:
+        encoded = thumbnail_base64(path, display_size)
+    except Exception as e:
+        print(f"サムネイル作成エラー: {path} ({e})")
+        encoded = None
+    return {"src_base64": encoded} if encoded else {"src": str(path)}
+
+
+def frame_thumbnail_base64(frame, size, quality=60):
+    """
+    撮影直後のフレーム（BGR の ndarray）の正方形サムネイル（base64 文字列）
+
+    同じフレームは2回目以降、作成済みの結果を返す（フォームを作り直すたびに圧縮しない）。
+    """
+    key = (size, id(frame))
+    with _frame_lock:
+        cached = _frame_thumbnails.get(key)
+        if cached is not None and cached[0]() is frame:
+            return cached[1]
+
+    import cv2
+
+    height, width = frame.shape[:2]
+    side = min(width, height)
+    top, left = (height - side) // 2, (width - side) // 2
+    square = frame[top:top + side, left:left + side]
+    small = cv2.resize(square, (size, size), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("サムネイルの JPEG 変換に失敗しました")
+    encoded = base64.b64encode(buffer).decode()
+
+    def forget(_, key=key):
+        with _frame_lock:
+            _frame_thumbnails.pop(key, None)
+
+    with _frame_lock:
+        _frame_thumbnails[key] = (weakref.ref(frame, forget), encoded)
+    return encoded
+
+
+# ----------------------------------------------------------------------
+# バックグラウンドでの作成
+# ----------------------------------------------------------------------
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _work():
+    while True:
+        path = _queue.get()
+        try:
+            generate(path)
+        except Exception as e:
+            print(f"サムネイル作成エラー: {path} ({e})")
+        finally:
+            _queue.task_done()
+
+
+def schedule(paths):
+    """写真のサムネイル作成をバックグラウンドのスレッドに依頼（写真の保存時に呼ぶ）"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name="thumbnails", daemon=True)
+            _worker.start()
+    for path in paths:
+        if path:
+            _queue.put(str(path))
+
+
+def wait():
+    """依頼したサムネイル作成がすべて終わるまで待つ"""
+    _queue.join()
+
+
+def backfill(db_path=None):
+    """登録済みの拾得物の表紙の写真のサムネイルをまとめて作成"""
+    from . import db
+
+    conn = db.connect(db_path)
+    try:
+        rows = conn.execute("SELECT cover_photo FROM lost_items WHERE cover_photo IS NOT NULL").fetchall()
+    finally:
+        conn.close()
+    created = 0
+    for (path,) in rows:
+        if generate(path):
+            created += 1
+    return created
+
+
+def clear(directory=None):
+    """ディスクとメモリのキャッシュを削除"""
+    shutil.rmtree(Path(directory or THUMBNAILS_DIR), ignore_errors=True)
+    _memory.clear()
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "backfill":
+        count = backfill(sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"{count}件の写真のサムネイルを作成しました")
+    elif command == "clear":
+        clear()
+        print("サムネイルのキャッシュを削除しました")
+    else:
+        print("使い方: python -m core.thumbnails [backfill|clear] [DBパス]")
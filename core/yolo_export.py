@@ -0,0 +1,389 @@
+"""
+YOLOモデルの CPU 向けバックエンド
+PyTorch 形式（.pt）のモデルを ONNX / OpenVINO 形式に変換し、推論サービスがどの形式で
+読み込むかを settings テーブルの yolo_backend で切り替える。
+
+    pytorch   : .pt をそのまま使う
+    onnx      : ONNX Runtime で推論（変換時にグラフ最適化を済ませたモデルを保存する）
+    onnx-int8 : 上記を int8 に量子化したモデル（撮影済みの写真で校正する）
+    openvino  : OpenVINO で推論
+    auto      : 変換済みの ONNX があれば onnx、なければ pytorch（既定）
+
+変換したモデルは .pt と同じ場所に保存し、ultralytics の YOLO() でそのまま読み込めるため、
+推論結果（Results）の扱いは PyTorch の場合と変わらない。
+
+使い方:
+    python -m core.yolo_export export [--int8] [--openvino] [--calib 画像フォルダ] [.ptのパス]
+    python -m core.yolo_export parity [--backend onnx] 画像パス [画像パス ...]
+    python -m core.yolo_export use [auto|pytorch|onnx|onnx-int8|openvino]
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from . import app_settings, db
+
+BACKENDS = ("auto", "pytorch", "onnx", "onnx-int8", "openvino")
+DEFAULT_BACKEND = "auto"
+SETTING_KEY = "yolo_backend"
+
+# 変換時の入力画像の大きさ（幅・高さは可変で書き出すため、推論時の大きさはこれに限られない）
+IMAGE_SIZE = 640
+
+# int8 の校正に使う写真の枚数
+CALIBRATION_IMAGES = 64
+
+
+def artifact_path(model_path, backend):
+    """
+    .pt から変換したモデルのパス
+
+    Args:
+        model_path: .pt のパス
+        backend: "onnx" / "onnx-int8" / "openvino"
+    """
+    model_path = Path(model_path)
+    if backend == "onnx":
+        return model_path.with_suffix(".onnx")
+    if backend == "onnx-int8":
+        return model_path.with_suffix(".int8.onnx")
+    if backend == "openvino":
+        # ultralytics が書き出すフォルダ名
+        return model_path.with_name(f"{model_path.stem}_openvino_model")
+    return model_path
+
+
+def configured_backend(db_path=None):
+    """settings テーブルに設定されたバックエンド（未設定・不正な値は既定値）"""
+    try:
+        value = app_settings.get(SETTING_KEY, db_path=db_path)
+    except Exception:
+        value = None
+    return value if value in BACKENDS else DEFAULT_BACKEND
+
+
+def set_backend(backend, db_path=None):
+    """使用するバックエンドを settings テーブルに保存"""
+    if backend not in BACKENDS:
+        raise ValueError(f"不明なバックエンドです: {backend}（{', '.join(BACKENDS)}）")
+    app_settings.set(SETTING_KEY, backend, db_path=db_path)
+
+
+def _onnxruntime_available():
+    try:
+        import onnxruntime  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _openvino_available():
+    try:
+        import openvino  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_model(model_path, backend=None):
+    """
+    設定に従って読み込むモデルのパスを決める
+
+    変換済みのモデルがない場合や、必要なランタイムが入っていない場合は .pt を返す。
+
+    Returns:
+        tuple: (読み込むパス, 実際に使うバックエンド名)
+    """
+    backend = backend or configured_backend()
+    if backend == "auto":
+        backend = "onnx" if artifact_path(model_path, "onnx").exists() and _onnxruntime_available() else "pytorch"
+    if backend == "pytorch":
+        return Path(model_path), "pytorch"
+    path = artifact_path(model_path, backend)
+    if not path.exists():
+        print(f"⚠️ {backend} 形式のモデルがありません: {path.name}（python -m core.yolo_export export で作成）")
+        return Path(model_path), "pytorch"
+    if backend.startswith("onnx") and not _onnxruntime_available():
+        print("⚠️ onnxruntime がインストールされていないため PyTorch で推論します")
+        return Path(model_path), "pytorch"
+    if backend == "openvino" and not _openvino_available():
+        print("⚠️ openvino がインストールされていないため PyTorch で推論します")
+        return Path(model_path), "pytorch"
+    return path, backend
+
+
+# ----------------------------------------------------------------------
+# 変換
+# ----------------------------------------------------------------------
+def _copy_metadata(source, target):
+    """ultralytics が埋め込んだメタデータ（クラス名・タスクなど）を引き継ぐ"""
+    import onnx
+
+    source_model = onnx.load(str(source), load_external_data=False)
+    target_model = onnx.load(str(target))
+    del target_model.metadata_props[:]
+    target_model.metadata_props.extend(source_model.metadata_props)
+    onnx.save(target_model, str(target))
+
+
+def optimize_onnx(source, target):
+    """
+    ONNX Runtime のグラフ最適化（定数畳み込み・演算の融合など）を済ませたモデルを保存
+
+    読み込みのたびに最適化する時間を省ける。ハードウェアに依存する最適化（ORT_ENABLE_ALL）は
+    読み込み時に ONNX Runtime が行うため、保存するのは移植できる EXTENDED までとする。
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = str(target)
+    ort.InferenceSession(str(source), options, providers=["CPUExecutionProvider"])
+    _copy_metadata(source, target)
+    return Path(target)
+
+
+def letterbox(image, size=IMAGE_SIZE):
+    """ultralytics と同じ前処理（縦横比を保って縮小し、余白を灰色で埋める）で NCHW の float32 にする"""
+    from PIL import Image
+
+    image = image.convert("RGB")
+    scale = min(size / image.width, size / image.height)
+    resized = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.BILINEAR)
+    canvas = Image.new("RGB", (size, size), (114, 114, 114))
+    canvas.paste(resized, ((size - resized.width) // 2, (size - resized.height) // 2))
+    array = np.asarray(canvas, dtype=np.float32) / 255.0
+    return array.transpose(2, 0, 1)[np.newaxis]
+
+
+def calibration_images(directory=None, limit=CALIBRATION_IMAGES, db_path=None):
+    """
+    int8 の校正に使う写真
+
+    directory を指定しない場合は登録済みの拾得物の表紙の写真（lost_items.cover_photo、新しい順）を使い、
+    足りなければ写真の保存先（core/image_store.py）の写真で補う。
+    """
+    if directory:
+        paths = sorted(p for p in Path(directory).rglob("*") if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        return paths[:limit]
+
+    from . import image_store
+
+    paths = []
+    seen = set()
+    try:
+        rows = db.query_all(
+            "SELECT cover_photo FROM lost_items WHERE cover_photo IS NOT NULL ORDER BY id DESC",
+            db_path=db_path,
+        )
+    except Exception as e:
+        print(f"校正用の写真の取得エラー: {e}")
+        rows = []
+    for (cover_photo,) in rows:
+        path = Path(cover_photo)
+        if path not in seen and path.is_file():
+            seen.add(path)
+            paths.append(path)
+            if len(paths) >= limit:
+                return paths
+    for path in image_store.iter_objects():
+        if path not in seen:
+            seen.add(path)
+            paths.append(path)
+            if len(paths) >= limit:
+                break
+    return paths
+
+
+def quantize_int8(source, target, images):
+    """
+    校正用の写真で静的量子化（QDQ 形式、チャネルごとの重み）した int8 モデルを作成
+
+    畳み込みが中心の YOLO では、動的量子化より静的量子化のほうが CPU で速くなる。
+    """
+    from PIL import Image
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if not images:
+        raise ValueError("int8 の校正に使う写真がありません（--calib で写真のフォルダを指定してください）")
+
+    class Reader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.input_name = input_name
+            self.paths = iter(images)
+
+        def get_next(self):
+            path = next(self.paths, None)
+            if path is None:
+                return None
+            with Image.open(path) as image:
+                return {self.input_name: letterbox(image)}
+
+    import onnxruntime as ort
+
+    source, target = Path(source), Path(target)
+    prepared = target.with_suffix(".prep.onnx")
+    quant_pre_process(str(source), str(prepared))
+    input_name = ort.InferenceSession(str(prepared), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    try:
+        quantize_static(
+            str(prepared), str(target), Reader(input_name),
+            quant_format=QuantFormat.QDQ, per_channel=True,
+            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+        )
+        _copy_metadata(source, target)
+    finally:
+        prepared.unlink(missing_ok=True)
+    return target
+
+
+def export(model_path, int8=False, openvino=False, calibration_dir=None):
+    """
+    .pt を ONNX（と必要に応じて int8 / OpenVINO）に変換
+
+    Returns:
+        dict: バックエンド名 -> 作成したモデルのパス
+    """
+    from ultralytics import YOLO
+
+    model_path = Path(model_path)
+    created = {}
+    started = time.perf_counter()
+    print(f"🔄 {model_path.name} を ONNX に変換中...")
+    exported = Path(YOLO(str(model_path)).export(format="onnx", imgsz=IMAGE_SIZE, dynamic=True, simplify=True))
+    onnx_path = artifact_path(model_path, "onnx")
+    raw_path = onnx_path.with_suffix(".raw.onnx")
+    exported.replace(raw_path)
+    try:
+        optimize_onnx(raw_path, onnx_path)
+        created["onnx"] = onnx_path
+        if int8:
+            print("🔄 int8 に量子化中...")
+            created["onnx-int8"] = quantize_int8(
+                raw_path, artifact_path(model_path, "onnx-int8"), calibration_images(calibration_dir)
+            )
+    finally:
+        raw_path.unlink(missing_ok=True)
+    if openvino:
+        print("🔄 OpenVINO に変換中...")
+        created["openvino"] = Path(YOLO(str(model_path)).export(format="openvino", imgsz=IMAGE_SIZE, dynamic=True))
+    for backend, path in created.items():
+        size = sum(p.stat().st_size for p in path.rglob("*")) if path.is_dir() else path.stat().st_size
+        print(f"✅ {backend}: {path} ({size / (1024*1024):.1f} MB)")
+    print(f"変換完了 ({time.perf_counter() - started:.1f}秒)")
+    return created
+
+
+# ----------------------------------------------------------------------
+# 一致確認
+# ----------------------------------------------------------------------
+def _box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _top_detection(result):
+    if result.boxes is None or len(result.boxes) == 0:
+        return None
+    best = int(result.boxes.conf.argmax())
+    return (
+        result.names[int(result.boxes.cls[best])],
+        float(result.boxes.conf[best]),
+        [float(v) for v in result.boxes.xyxy[best]],
+    )
+
+
+def check_parity(model_path, images, backend="onnx", min_iou=0.9, max_conf_diff=0.05):
+    """
+    PyTorch と変換後のモデルで、写真ごとの最も信頼度の高い検出結果を比べる
+
+    クラスが同じで、枠の IoU が min_iou 以上、信頼度の差が max_conf_diff 以下なら一致とする。
+
+    Returns:
+        dict: {"images": 枚数, "matched": 一致した枚数, "pytorch_ms": 平均, backend + "_ms": 平均}
+    """
+    from ultralytics import YOLO
+
+    path, resolved = resolve_model(model_path, backend)
+    if resolved != backend:
+        raise FileNotFoundError(f"{backend} 形式のモデルを読み込めません")
+    models = {"pytorch": YOLO(str(model_path)), backend: YOLO(str(path))}
+    timings = {name: 0.0 for name in models}
+    matched = 0
+    for image in images:
+        top = {}
+        for name, model in models.items():
+            model(str(image), verbose=False)  # 初回の読み込みを計測から除く
+            started = time.perf_counter()
+            top[name] = _top_detection(model(str(image), verbose=False)[0])
+            timings[name] += time.perf_counter() - started
+        reference, converted = top["pytorch"], top[backend]
+        if reference is None or converted is None:
+            ok = reference is None and converted is None
+        else:
+            ok = (
+                reference[0] == converted[0]
+                and _box_iou(reference[2], converted[2]) >= min_iou
+                and abs(reference[1] - converted[1]) <= max_conf_diff
+            )
+        matched += ok
+        print(f"{'✅' if ok else '❌'} {Path(image).name}: pytorch={reference and reference[:2]} {backend}={converted and converted[:2]}")
+    count = max(len(images), 1)
+    result = {"images": len(images), "matched": matched}
+    for name, seconds in timings.items():
+        result[f"{name}_ms"] = seconds / count * 1000
+    return result
+
+
+def default_model_path():
+    """推論サービスが読み込む .pt（候補のうち最初に見つかったもの）"""
+    from .inference import MODEL_CANDIDATES
+
+    for model_path, _ in MODEL_CANDIDATES:
+        if Path(model_path).exists():
+            return Path(model_path)
+    raise FileNotFoundError("変換する .pt モデルが見つかりません")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="YOLOモデルの変換とバックエンドの切り替え")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help=".pt を ONNX / OpenVINO に変換")
+    export_parser.add_argument("model", nargs="?", help=".pt のパス（省略時は推論サービスが使うモデル）")
+    export_parser.add_argument("--int8", action="store_true", help="int8 に量子化したモデルも作成")
+    export_parser.add_argument("--openvino", action="store_true", help="OpenVINO 形式も作成")
+    export_parser.add_argument("--calib", help="int8 の校正に使う写真のフォルダ（省略時は登録済みの拾得物の写真）")
+
+    parity_parser = commands.add_parser("parity", help="PyTorch と変換後のモデルの検出結果を比較")
+    parity_parser.add_argument("images", nargs="+", help="比較に使う写真")
+    parity_parser.add_argument("--model", help=".pt のパス")
+    parity_parser.add_argument("--backend", default="onnx", choices=BACKENDS[2:])
+
+    use_parser = commands.add_parser("use", help="推論に使うバックエンドを設定")
+    use_parser.add_argument("backend", choices=BACKENDS)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export(args.model or default_model_path(), int8=args.int8, openvino=args.openvino, calibration_dir=args.calib)
+    elif args.command == "parity":
+        result = check_parity(args.model or default_model_path(), args.images, args.backend)
+        print(
+            f"一致: {result['matched']}/{result['images']}枚  "
+            f"pytorch {result['pytorch_ms']:.0f} ms/枚  {args.backend} {result[args.backend + '_ms']:.0f} ms/枚"
+        )
+        if result["matched"] < result["images"]:
+            raise SystemExit(1)
+    elif args.command == "use":
+        set_backend(args.backend)
+        print(f"YOLOのバックエンドを {args.backend} に設定しました（次回の起動から有効）")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,16 @@ from .paths import (
     MAIN_IMAGES_DIR,
     SUB_IMAGES_DIR,
     BUNDLE_IMAGES_DIR,
+    IMAGE_STORE_DIR,
+    THUMBNAILS_DIR,
+    EMBEDDINGS_DIR,
     LOGS_DIR,
     APP_LOG_PATH,
     ERROR_LOG_PATH,
     BACKUPS_DIR,
     DB_BACKUP_DIR,
     IMAGE_BACKUP_DIR,
+    EXPORTS_DIR,
     CONFIG_DIR,
     USER_SETTINGS_PATH,
     LEGACY_DB_PATH,
@@ -32,12 +36,16 @@ __all__ = [
     "MAIN_IMAGES_DIR",
     "SUB_IMAGES_DIR",
     "BUNDLE_IMAGES_DIR",
+    "IMAGE_STORE_DIR",
+    "THUMBNAILS_DIR",
+    "EMBEDDINGS_DIR",
     "LOGS_DIR",
     "APP_LOG_PATH",
     "ERROR_LOG_PATH",
     "BACKUPS_DIR",
     "DB_BACKUP_DIR",
     "IMAGE_BACKUP_DIR",
+    "EXPORTS_DIR",
     "CONFIG_DIR",
     "USER_SETTINGS_PATH",
     "LEGACY_DB_PATH",
@@ -20,6 +20,15 @@ MAIN_IMAGES_DIR = IMAGES_DIR / "main"
 SUB_IMAGES_DIR = IMAGES_DIR / "sub"
 BUNDLE_IMAGES_DIR = IMAGES_DIR / "bundle"
 
+# 写真の保存先（内容のハッシュを名前にしたファイルを、ハッシュの先頭で振り分けたフォルダに置く）
+IMAGE_STORE_DIR = IMAGES_DIR / "store"
+
+# サムネイルのキャッシュディレクトリ
+THUMBNAILS_DIR = DATA_DIR / "thumbnails"
+
+# 画像の特徴ベクトル（類似画像検索）ディレクトリ
+EMBEDDINGS_DIR = DATA_DIR / "embeddings"
+
 # ログディレクトリ
 LOGS_DIR = DATA_DIR / "logs"
 APP_LOG_PATH = LOGS_DIR / "app.log"
@@ -30,6 +39,9 @@ BACKUPS_DIR = DATA_DIR / "backups"
 DB_BACKUP_DIR = BACKUPS_DIR / "database"
 IMAGE_BACKUP_DIR = BACKUPS_DIR / "images"
 
+# エクスポート（CSV / Excel）ディレクトリ
+EXPORTS_DIR = DATA_DIR / "exports"
+
 # PDFファイルディレクトリ
 PDF_DIR = ROOT_DIR / "apps" / "PDFfile"
 DISPOSAL_PDF_DIR = PDF_DIR / "disposal_file"
@@ -54,10 +66,14 @@ def ensure_directories():
         MAIN_IMAGES_DIR,
         SUB_IMAGES_DIR,
         BUNDLE_IMAGES_DIR,
+        IMAGE_STORE_DIR,
+        THUMBNAILS_DIR,
+        EMBEDDINGS_DIR,
         LOGS_DIR,
         BACKUPS_DIR,
         DB_BACKUP_DIR,
         IMAGE_BACKUP_DIR,
+        EXPORTS_DIR,
         CONFIG_DIR,
     ]
     
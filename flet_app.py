@@ -1,7 +1,10 @@
 import flet as ft
 from pathlib import Path
-import sqlite3
+from core import db, inference, lazy, matching, migrations, photos, sequences, thumbnails
+from core.photo_writer import PhotoBatch
+from core.query import Where
 import json
+import threading
 from datetime import date
 from flet_pages.camera_form import CameraFormView
 from flet_pages.register_form import RegisterFormView
@@ -30,111 +33,11 @@ current_user = {
 DB_PATH = Path(__file__).parent / "lostitem.db"
 
 def initialize_database():
-	"""データベースの初期化 - 必要なテーブルをすべて作成"""
+	"""データベースの初期化 - 未適用のマイグレーションを実行"""
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
-		cur = conn.cursor()
-		
 		print("データベース初期化開始...")
-		
-		# usersテーブル
-		cur.execute("""
-			CREATE TABLE IF NOT EXISTS users (
-				id INTEGER PRIMARY KEY AUTOINCREMENT,
-				username TEXT UNIQUE NOT NULL,
-				password_hash TEXT NOT NULL,
-				role TEXT DEFAULT 'user',
-				store_name TEXT DEFAULT '未設定',
-				created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-			)
-		""")
-		
-		# lost_itemsテーブル（拾得物）
-		cur.execute("""
-			CREATE TABLE IF NOT EXISTS lost_items (
-				id INTEGER PRIMARY KEY AUTOINCREMENT,
-				main_id TEXT NOT NULL,
-				current_year INTEGER NOT NULL,
-				choice_finder TEXT NOT NULL,
-				notify TEXT,
-				get_item DATE,
-				get_item_hour INTEGER,
-				get_item_minute INTEGER,
-				recep_item DATE,
-				recep_item_hour INTEGER,
-				recep_item_minute INTEGER,
-				recep_manager TEXT,
-				find_area TEXT,
-				find_area_police TEXT,
-				own_waiver TEXT,
-				finder_name TEXT,
-				own_name_note TEXT,
-				finder_age INTEGER,
-				finder_sex TEXT,
-				finder_post TEXT,
-				finder_address TEXT,
-				finder_tel1 TEXT,
-				finder_tel2 TEXT,
-				item_class_L TEXT,
-				item_class_M TEXT,
-				item_class_S TEXT,
-				item_value INTEGER,
-				item_feature TEXT,
-				item_color TEXT,
-				item_storage TEXT,
-				item_storage_place TEXT,
-				item_maker TEXT,
-				item_expiration DATE,
-				item_num INTEGER,
-				item_unit TEXT,
-				item_plice TEXT,
-				item_money INTEGER,
-				item_remarks TEXT,
-				item_image TEXT,
-				finder_affiliation TEXT,
-				item_situation TEXT DEFAULT '保管中',
-				refund_situation TEXT DEFAULT '未',
-				card_campany TEXT,
-				card_tel TEXT,
-				card_name TEXT,
-				card_person TEXT,
-				thirdparty_waiver TEXT,
-				thirdparty_name_note TEXT,
-				created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-			)
-		""")
-		
-		# notfound_itemsテーブル（遺失物）
-		cur.execute("""
-			CREATE TABLE IF NOT EXISTS notfound_items (
-				id INTEGER PRIMARY KEY AUTOINCREMENT,
-				name TEXT NOT NULL,
-				phone TEXT,
-				lost_date TEXT,
-				location TEXT,
-				item TEXT,
-				status TEXT DEFAULT '連絡待ち',
-				contact_date TEXT,
-				return_date TEXT,
-				created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-				updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-			)
-		""")
-		
-		# settingsテーブル（各種設定）
-		cur.execute("""
-			CREATE TABLE IF NOT EXISTS settings (
-				id INTEGER PRIMARY KEY AUTOINCREMENT,
-				key TEXT UNIQUE NOT NULL,
-				value TEXT,
-				created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-				updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-			)
-		""")
-		
-		conn.commit()
-		conn.close()
-		print("データベース初期化完了")
+		applied = migrations.migrate()
+		print(f"データベース初期化完了（適用したマイグレーション: {len(applied)}件）")
 		
 	except Exception as e:
 		print(f"データベース初期化エラー: {e}")
@@ -144,7 +47,7 @@ def initialize_database():
 def check_initial_setup_needed():
 	"""初回セットアップが必要かどうかをチェック"""
 	try:
-		conn = sqlite3.connect(str(DB_PATH))
+		conn = db.connect()
 		cur = conn.cursor()
 		
 		# usersテーブルが存在するかチェック
@@ -201,7 +104,7 @@ def get_counts():
 	"""DBから件数を取得（なければ0）"""
 	stored = refunded = total = 0
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
 		cur.execute("SELECT COUNT(*) FROM lost_items WHERE item_situation = '保管中'")
 		stored = cur.fetchone()[0]
@@ -219,38 +122,21 @@ def get_today_items():
 	"""本日の拾得物（画像パスと日時）を取得"""
 	items = []
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
+		where = Where().on_day("get_item", date.today())
 		cur.execute(
-			"""
-			SELECT id, item_image, get_item, get_item_hour, get_item_minute
+			f"""
+			SELECT id, cover_photo, get_item, get_item_hour, get_item_minute
 			FROM lost_items
-			WHERE DATE(get_item) = ?
+			{where.sql()}
 			ORDER BY get_item DESC
 			""",
-			(date.today().isoformat(),),
+			where.params,
 		)
 		for row in cur.fetchall():
-			item_id, item_image, d, hh, mm = row
-			# 画像の決定（JSON/文字列どちらにも対応）
-			img_path = None
-			if isinstance(item_image, str) and item_image:
-				try:
-					data = json.loads(item_image)
-					if isinstance(data, dict):
-						# 新しいデータ構造に対応
-						if data.get("main_photos") and len(data["main_photos"]) > 0:
-							img_path = data["main_photos"][0]
-						elif data.get("photos") and len(data["photos"]) > 0:
-							# 旧データ構造のフォールバック
-							img_path = data["photos"][0]
-					elif isinstance(data, list) and len(data) > 0:
-						# 旧データ構造のフォールバック
-						img_path = data[0]
-					else:
-						img_path = item_image
-				except Exception:
-					img_path = item_image
+			# 画像は表紙の写真（core/photos.py で登録時に決めたもの）
+			item_id, img_path, d, hh, mm = row
 			items.append({
 				"id": item_id,
 				"image": img_path,
@@ -264,22 +150,6 @@ def get_today_items():
 	return items
 
 
-def add_store_name_column():
-	"""ユーザーテーブルに店舗名カラムを追加"""
-	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
-		cur = conn.cursor()
-		# カラムが存在するかチェック
-		cur.execute("PRAGMA table_info(users)")
-		columns = [column[1] for column in cur.fetchall()]
-		if 'store_name' not in columns:
-			cur.execute("ALTER TABLE users ADD COLUMN store_name TEXT DEFAULT '未設定'")
-			conn.commit()
-			print("店舗名カラムを追加しました")
-		conn.close()
-	except Exception as e:
-		print(f"店舗名カラム追加エラー: {e}")
-
 def main(page: ft.Page):
 	page.title = "拾得物管理システム (Flet)"
 	page.theme_mode = ft.ThemeMode.LIGHT
@@ -287,11 +157,12 @@ def main(page: ft.Page):
 	page.transitions = [ft.PageTransitionTheme.NONE]
 	page.snack_bar = ft.SnackBar(ft.Text("未実装です"))
 	
-	# データベースの初期化
+	# データベースの初期化（テーブル作成・カラム追加・インデックス作成）
 	initialize_database()
 	
-	# データベース構造を更新
-	add_store_name_column()
+	# AI分類用のYOLOモデルとカメラ用の OpenCV をバックグラウンドで読み込む（起動と最初の操作を待たせない）
+	inference.warm_up()
+	lazy.preload("cv2")
 	
 	# グローバル変数にアクセス
 	global current_user
@@ -386,169 +257,70 @@ def main(page: ft.Page):
 		# ログアウト後、ホームに戻る（route_changeが呼ばれて最新のcurrent_userでサイドバーが再構築される）
 		page.go("/")
 
-	def generate_main_id(choice_finder: str, current_year: int) -> str:
-		try:
-			conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
-			cur = conn.cursor()
-			cur.execute(
-				"SELECT COUNT(*) FROM lost_items WHERE choice_finder = ? AND current_year = ?",
-				(choice_finder, current_year),
-			)
-			count = cur.fetchone()[0]
-			conn.close()
-		except Exception:
-			count = 0
-		prefix = "1" if choice_finder == "占有者拾得" else "2"
-		return f"{prefix}{current_year:02}{count+1:05}"
-
+	def start_found_item_matching(lost_item_id):
+		"""登録した拾得物と未解決の遺失届のマッチングをバックグラウンドで実行"""
+		import threading
+		
+		def worker():
+			try:
+				conn = db.connect()
+				try:
+					matches = matching.on_found_item_registered(conn, lost_item_id)
+				finally:
+					conn.close()
+			except Exception as e:
+				print(f"マッチングエラー: {e}")
+				return
+			if matches and page:
+				page.snack_bar = ft.SnackBar(
+					content=ft.Text(f"一致する可能性のある遺失届が {len(matches)}件 あります", color=ft.colors.WHITE),
+					bgcolor=ft.colors.BLUE_700
+				)
+				page.snack_bar.open = True
+				page.update()
+		
+		threading.Thread(target=worker, daemon=True).start()
+	
+	def start_image_indexing(lost_item_id, image_path):
+		"""拾得物のメイン写真の画像ベクトルをバックグラウンドで登録（python -m core.embeddings enable で有効にした場合のみ）"""
+		import threading
+		from core import embeddings
+		
+		if not embeddings.should_index_on_register():
+			return
+		
+		def worker():
+			try:
+				embeddings.index_item(lost_item_id, image_path)
+			except Exception as e:
+				print(f"画像ベクトル登録エラー: {e}")
+		
+		threading.Thread(target=worker, daemon=True).start()
+	
 	def save_lost_item(form_data: dict) -> None:
+		"""
+		拾得物を登録する
+		
+		写真の書き込みはスレッドプールで並列に行い、画面にはすぐに戻る。写真の書き込みを待ってからの
+		DB 登録はバックグラウンドで行い、写真と DB の行をまとめて確定する（core/photo_writer.py）。
+		"""
 		try:
 			print(f"save_lost_item called with form_data: {form_data.keys()}")
 			from datetime import datetime as _dt
-			import os
 			current_year = _dt.now().year % 100
 			choice = form_data.get("finder_type") or "占有者拾得"
-			main_id = generate_main_id(choice, current_year)
 			
 			# 撮影データの処理（register_form.py の collect() メソッドから "captured_photos" というキーで渡される）
-			captured_photos = form_data.get("captured_photos", {})
-			saved_photo_paths = {"main_photos": [], "sub_photos": [], "bundle_photos": []}
-			
-			# 画像保存ディレクトリの作成
-			images_dir = Path(__file__).parent / "images"
-			images_dir.mkdir(exist_ok=True)
-			
-			print(f"captured_photos: {captured_photos}")
+			captured_photos = form_data.get("captured_photos") or {}
 			
-			# メイン写真の保存
-			if captured_photos and captured_photos.get("main_photos"):
-				for i, photo_data in enumerate(captured_photos.get("main_photos", [])):
+			# メイン・サブ・同梱物写真の書き込みを依頼（すぐに戻る）
+			# 写真は data/images/store に内容のハッシュの名前で保存する（core/image_store.py）
+			batch = PhotoBatch(on_progress=show_photo_progress)
+			for kind in ("main_photos", "sub_photos", "bundle_photos"):
+				for photo_data in captured_photos.get(kind) or []:
 					if photo_data and "frame" in photo_data:
-						try:
-							frame = photo_data["frame"]
-							timestamp = photo_data.get("timestamp", "")
-							filename = f"main_{main_id}_{i+1}_{timestamp}.jpg"
-							filepath = images_dir / filename
-							
-							# OpenCVで画像を保存
-							import cv2
-							cv2.imwrite(str(filepath), frame)
-							saved_photo_paths["main_photos"].append(str(filepath))
-							print(f"メイン写真を保存しました: {filepath}")
-						except Exception as e:
-							print(f"メイン写真保存エラー: {e}")
-			
-			# サブ写真の保存
-			if captured_photos and captured_photos.get("sub_photos"):
-				for i, photo_data in enumerate(captured_photos.get("sub_photos", [])):
-					if photo_data and "frame" in photo_data:
-						try:
-							frame = photo_data["frame"]
-							timestamp = photo_data.get("timestamp", "")
-							filename = f"sub_{main_id}_{i+1}_{timestamp}.jpg"
-							filepath = images_dir / filename
-							
-							# OpenCVで画像を保存
-							import cv2
-							cv2.imwrite(str(filepath), frame)
-							saved_photo_paths["sub_photos"].append(str(filepath))
-							print(f"サブ写真を保存しました: {filepath}")
-						except Exception as e:
-							print(f"サブ写真保存エラー: {e}")
-			
-			# 同梱物写真の保存
-			if captured_photos and captured_photos.get("bundle_photos"):
-				for i, photo_data in enumerate(captured_photos.get("bundle_photos", [])):
-					if photo_data and "frame" in photo_data:
-						try:
-							frame = photo_data["frame"]
-							timestamp = photo_data.get("timestamp", "")
-							filename = f"bundle_{main_id}_{i+1}_{timestamp}.jpg"
-							filepath = images_dir / filename
-							
-							# OpenCVで画像を保存
-							import cv2
-							cv2.imwrite(str(filepath), frame)
-							saved_photo_paths["bundle_photos"].append(str(filepath))
-							print(f"同梱物写真を保存しました: {filepath}")
-						except Exception as e:
-							print(f"同梱物写真保存エラー: {e}")
-			
-			# 保存されたパスをデバッグ出力
-			print(f"保存された写真パス: {saved_photo_paths}")
-			
-			conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
-			cur = conn.cursor()
-			
-			# lost_itemsテーブルが存在するかチェックし、存在しない場合は作成
-			cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='lost_items'")
-			if not cur.fetchone():
-				cur.execute("""
-					CREATE TABLE IF NOT EXISTS lost_items (
-						id INTEGER PRIMARY KEY AUTOINCREMENT,
-						main_id TEXT,
-						current_year INTEGER,
-						choice_finder TEXT,
-						notify TEXT,
-						get_item TEXT,
-						get_item_hour INTEGER,
-						get_item_minute INTEGER,
-						recep_item TEXT,
-						recep_item_hour INTEGER,
-						recep_item_minute INTEGER,
-						recep_manager TEXT,
-						find_area TEXT,
-						find_area_police TEXT,
-						finder_name TEXT,
-						finder_age INTEGER,
-						finder_sex TEXT,
-						finder_post TEXT,
-						finder_address TEXT,
-						finder_tel1 TEXT,
-						finder_tel2 TEXT,
-						finder_affiliation TEXT,
-						item_class_L TEXT,
-						item_class_M TEXT,
-						item_class_S TEXT,
-						item_feature TEXT,
-						item_color TEXT,
-						item_storage TEXT,
-						item_storage_place TEXT,
-						item_maker TEXT,
-						item_expiration TEXT,
-						item_num INTEGER,
-						item_unit TEXT,
-						item_value INTEGER,
-						item_money TEXT,
-						item_remarks TEXT,
-						item_image TEXT,
-						item_situation TEXT,
-						refund_situation TEXT,
-						created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-					)
-				""")
-				conn.commit()
-				print("lost_itemsテーブルを作成しました")
-			
-			sql = '''
-				INSERT INTO lost_items (
-					main_id, current_year, choice_finder, notify,
-					get_item, get_item_hour, get_item_minute,
-					recep_item, recep_item_hour, recep_item_minute,
-					recep_manager, find_area, find_area_police,
-					finder_name, finder_age, finder_sex, finder_post,
-					finder_address, finder_tel1, finder_tel2,
-					finder_affiliation, item_class_L, item_class_M,
-					item_class_S, item_feature, item_color,
-					item_storage, item_storage_place, item_maker,
-					item_expiration, item_num, item_unit,
-					item_value, item_money, item_remarks,
-					item_image, item_situation, refund_situation
-				) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-			'''
-			# JSONデータを作成
-			image_json = json.dumps(saved_photo_paths, ensure_ascii=False) if saved_photo_paths else "{}"
-			print(f"データベースに保存するJSONデータ: {image_json}")
+						batch.add(kind, photo_data["frame"])
+			print(f"写真 {len(batch)}枚 の保存を開始しました")
 			
 			# 時刻データの変換（"時"、"分"を削除して数値に変換）
 			get_hour = form_data.get("get_hour", "0")
@@ -568,8 +340,10 @@ def main(page: ft.Page):
 				recep_hour_int = 0
 				recep_min_int = 0
 			
-			data = (
-				main_id, current_year, choice, "",
+			# 管理番号は登録のトランザクション内で採番し、写真のパス（item_image）は書き込みの完了後に決まるため、
+			# 前後に分けて用意する
+			data_before_image = (
+				current_year, choice, "",
 				form_data.get("get_date"), get_hour_int, get_min_int,
 				form_data.get("recep_date"), recep_hour_int, recep_min_int,
 				None,
@@ -584,42 +358,164 @@ def main(page: ft.Page):
 				form_data.get("storage_place"), None, None,
 				None, 1, "個",
 				0, "", "",
-				image_json,
-				"保管中", "未",
 			)
-			cur.execute(sql, data)
-			conn.commit()
-			conn.close()
-			
-			# 成功メッセージを表示
-			print(f"拾得物を登録しました (ID: {main_id})")
+			data_after_image = ("保管中", "未")
 			
-			# ページに成功メッセージを表示
-			if page:
-				page.snack_bar = ft.SnackBar(
-					content=ft.Text("拾得物を登録しました", color=ft.colors.WHITE),
-					bgcolor=ft.colors.GREEN_700
-				)
-				page.snack_bar.open = True
-				page.update()
-				
+			threading.Thread(
+				target=finish_lost_item,
+				args=(choice, current_year, batch, data_before_image, data_after_image),
+				name="save-lost-item",
+				daemon=True,
+			).start()
 		except Exception as e:
 			print(f"データベース保存エラー: {e}")
 			import traceback
 			traceback.print_exc()
-			if page:
-				page.snack_bar = ft.SnackBar(
-					content=ft.Text(f"エラー: {str(e)}", color=ft.colors.WHITE),
-					bgcolor=ft.colors.RED_700
-				)
-				page.snack_bar.open = True
-				page.update()
+			show_save_error(e)
 			raise e
+	
+	def show_photo_progress(done, total):
+		"""写真の書き込みの進み具合を表示"""
+		if page:
+			page.snack_bar = ft.SnackBar(
+				content=ft.Text(f"写真を保存中... ({done}/{total})", color=ft.colors.WHITE),
+				bgcolor=ft.colors.BLUE_GREY_700
+			)
+			page.snack_bar.open = True
+			page.update()
+	
+	def show_save_error(e):
+		if page:
+			page.snack_bar = ft.SnackBar(
+				content=ft.Text(f"エラー: {str(e)}", color=ft.colors.WHITE),
+				bgcolor=ft.colors.RED_700
+			)
+			page.snack_bar.open = True
+			page.update()
+	
+	def finish_lost_item(choice, current_year, batch, data_before_image, data_after_image):
+		"""写真の書き込みを待って拾得物を DB に登録する（バックグラウンドのスレッドで実行）"""
+		try:
+			conn = db.connect()
+			try:
+				cur = conn.cursor()
+				
+				# lost_itemsテーブルが存在するかチェックし、存在しない場合は作成
+				cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='lost_items'")
+				if not cur.fetchone():
+					cur.execute("""
+						CREATE TABLE IF NOT EXISTS lost_items (
+							id INTEGER PRIMARY KEY AUTOINCREMENT,
+							main_id TEXT,
+							current_year INTEGER,
+							choice_finder TEXT,
+							notify TEXT,
+							get_item TEXT,
+							get_item_hour INTEGER,
+							get_item_minute INTEGER,
+							recep_item TEXT,
+							recep_item_hour INTEGER,
+							recep_item_minute INTEGER,
+							recep_manager TEXT,
+							find_area TEXT,
+							find_area_police TEXT,
+							finder_name TEXT,
+							finder_age INTEGER,
+							finder_sex TEXT,
+							finder_post TEXT,
+							finder_address TEXT,
+							finder_tel1 TEXT,
+							finder_tel2 TEXT,
+							finder_affiliation TEXT,
+							item_class_L TEXT,
+							item_class_M TEXT,
+							item_class_S TEXT,
+							item_feature TEXT,
+							item_color TEXT,
+							item_storage TEXT,
+							item_storage_place TEXT,
+							item_maker TEXT,
+							item_expiration TEXT,
+							item_num INTEGER,
+							item_unit TEXT,
+							item_value INTEGER,
+							item_money TEXT,
+							item_remarks TEXT,
+							item_image TEXT,
+							item_situation TEXT,
+							refund_situation TEXT,
+							created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+						)
+					""")
+					conn.commit()
+					print("lost_itemsテーブルを作成しました")
+			
+				sql = '''
+					INSERT INTO lost_items (
+						main_id, current_year, choice_finder, notify,
+						get_item, get_item_hour, get_item_minute,
+						recep_item, recep_item_hour, recep_item_minute,
+						recep_manager, find_area, find_area_police,
+						finder_name, finder_age, finder_sex, finder_post,
+						finder_address, finder_tel1, finder_tel2,
+						finder_affiliation, item_class_L, item_class_M,
+						item_class_S, item_feature, item_color,
+						item_storage, item_storage_place, item_maker,
+						item_expiration, item_num, item_unit,
+						item_value, item_money, item_remarks,
+						item_image, item_situation, refund_situation
+					) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+				'''
+				# 写真の書き込みを待ち、写真の移動と DB のコミットをまとめて行う（失敗時は両方取り消す）
+				with batch.commit(conn) as saved_photo_paths:
+					# 管理番号は INSERT と同じ書き込みトランザクションで採番する（同時に登録しても重ならない）
+					conn.execute("BEGIN IMMEDIATE")
+					main_id = sequences.allocate(conn, choice, current_year)
+					# JSONデータを作成
+					image_json = json.dumps(saved_photo_paths, ensure_ascii=False)
+					print(f"データベースに保存するJSONデータ: {image_json}")
+					cur.execute(sql, (main_id,) + data_before_image + (image_json,) + data_after_image)
+					lost_item_id = cur.lastrowid
+					# 一覧用の写真の行と表紙（core/photos.py）
+					photos.sync_item(conn, lost_item_id, image_json, sizes=batch.sizes())
+			finally:
+				conn.close()
+		except Exception as e:
+			print(f"データベース保存エラー: {e}")
+			import traceback
+			traceback.print_exc()
+			show_save_error(e)
+			return
+		
+		# 未解決の遺失届とのマッチング（遺失届が多くても画面を止めないようバックグラウンドで実行）
+		start_found_item_matching(lost_item_id)
+		# 類似画像検索用にメイン写真の画像ベクトルを登録（モデルの読み込みに時間がかかるためバックグラウンド）
+		if saved_photo_paths["main_photos"]:
+			start_image_indexing(lost_item_id, saved_photo_paths["main_photos"][0])
+		# 一覧・写真表示用のサムネイルを作成（バックグラウンド）
+		thumbnails.schedule(
+			saved_photo_paths["main_photos"] + saved_photo_paths["sub_photos"] + saved_photo_paths["bundle_photos"]
+		)
+		
+		# 成功メッセージを表示
+		print(f"拾得物を登録しました (ID: {main_id})")
+		
+		# ページに成功メッセージを表示
+		if page:
+			message = "拾得物を登録しました"
+			if batch.failed:
+				message += f"（写真 {len(batch.failed)}枚 を保存できませんでした）"
+			page.snack_bar = ft.SnackBar(
+				content=ft.Text(message, color=ft.colors.WHITE),
+				bgcolor=ft.colors.GREEN_700 if not batch.failed else ft.colors.ORANGE_700
+			)
+			page.snack_bar.open = True
+			page.update()
 
 	def save_notfound_item_to_db(form_data: dict):
 		try:
 			print(f"save_notfound_item_to_db called with form_data: {form_data.keys()}")
-			conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+			conn = db.connect()
 			cursor = conn.cursor()
 			
 			# notfound_itemsテーブルが存在するかチェックし、存在しない場合は作成
@@ -705,7 +601,7 @@ def main(page: ft.Page):
 			raise e
 
 	def save_refund_item_to_db(form_data: dict):
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cursor = conn.cursor()
 		
 		# 還付管理の処理を実装
@@ -721,7 +617,7 @@ def main(page: ft.Page):
 		conn.close()
 
 	def save_police_item_to_db(form_data: dict):
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cursor = conn.cursor()
 		
 		# 警察届け出処理の処理を実装
@@ -737,7 +633,7 @@ def main(page: ft.Page):
 		conn.close()
 
 	def save_ai_classification_data(form_data: dict):
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cursor = conn.cursor()
 		
 		# AI画像分類テストの処理を実装
@@ -1082,7 +978,7 @@ def main(page: ft.Page):
 				"""遺失物登録データを保存"""
 				try:
 					# データベースに保存
-					conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+					conn = db.connect()
 					cur = conn.cursor()
 					
 					# 遺失日時を結合
@@ -5,6 +5,23 @@ from pathlib import Path
 # プロジェクトルート
 project_root = Path.cwd()
 
+# YOLOモデルファイル
+yolo_models = ['yolov8x_seg_custom.pt', 'yolo11x_seg_custom.pt', 'yolov8n.pt']
+
+
+def converted_models(name):
+    """python -m core.yolo_export export で変換したモデル（あるものだけ同梱する）"""
+    model = project_root / name
+    found = []
+    for path in (model.with_suffix('.onnx'), model.with_suffix('.int8.onnx')):
+        if path.exists():
+            found.append((str(path), '.'))
+    openvino_dir = model.with_name(f'{model.stem}_openvino_model')
+    if openvino_dir.is_dir():
+        found.append((str(openvino_dir), openvino_dir.name))
+    return found
+
+
 a = Analysis(
     ['flet_app.py'],
     pathex=[str(project_root)],
@@ -12,10 +29,9 @@ a = Analysis(
     datas=[
         # データディレクトリ構造
         (str(project_root / 'data' / 'config'), 'data/config'),
-        # YOLOモデルファイル
-        (str(project_root / 'yolov8x_seg_custom.pt'), '.'),
-        (str(project_root / 'yolo11x_seg_custom.pt'), '.'),
-        (str(project_root / 'yolov8n.pt'), '.'),
+        # YOLOモデルファイル（変換済みの ONNX / OpenVINO のモデルを含む）
+        *[(str(project_root / name), '.') for name in yolo_models],
+        *[item for name in yolo_models for item in converted_models(name)],
         # 設定ファイル
         (str(project_root / 'item_classification.json'), '.'),
     ],
@@ -35,6 +51,12 @@ a = Analysis(
         'flet_pages.login_page',
         'flet_pages.initial_setup',
         'data.config.paths',
+        # core.lazy.lazy_import で名前を指定して読み込むため、静的解析では見つからない
+        'cv2',
+        # core.yolo_export のバックエンド（ultralytics が関数内で読み込む）
+        'onnxruntime',
+        'onnx',
+        'openvino',
     ],
     hookspath=[],
     hooksconfig={},
@@ -1,18 +1,17 @@
 import flet as ft
-import cv2
+from core.lazy import lazy_import
 import numpy as np
 from PIL import Image
 import io
 import base64
 from datetime import datetime
 import os
-import json
-from pathlib import Path
-import torch
-from ultralytics import YOLO
 import threading
-import time
 from .camera_form import CameraFormView
+from core import classifier, inference, taxonomy
+from core.camera import CameraStream
+
+cv2 = lazy_import("cv2")  # 起動時間短縮のため最初に使うときに読み込む
 
 class AIClassificationView(ft.UserControl):
 	def __init__(self, on_submit=None, on_temp_save=None):
@@ -21,14 +20,15 @@ class AIClassificationView(ft.UserControl):
 		self.on_temp_save = on_temp_save
 		self.captured_image = None
 		self.classification_results = None
-		self.yolo_model = None
-		self.classification_data = None
 		
 		# camera_form.pyのカメラ機能を統合（正式採用）
 		self.camera_form = None
 		
-		# 分類データの読み込み
-		self._load_classification_data()
+		# 分類データの読み込み（core/taxonomy.py の組み立て済みの分類を共有）
+		self.taxonomy = taxonomy.load()
+		
+		# YOLOモデルの読み込みを開始（起動時に開始済みなら何もしない）
+		inference.warm_up()
 
 	def _create_ai_camera_form(self):
 		"""AIテスト用のカスタムカメラフォームを作成（カメラ画面のみ）"""
@@ -66,11 +66,12 @@ class AIClassificationView(ft.UserControl):
 		)
 		
 		# カメラ関連の変数
-		ai_camera_form.cap = None
-		ai_camera_form.camera_running = False
+		ai_camera_form.stream = None  # core.camera.CameraStream
 		ai_camera_form.camera_index = 0
-		ai_camera_form.frame_width = 480
+		ai_camera_form.frame_width = 480    # プレビューの表示サイズ
 		ai_camera_form.frame_height = 360
+		ai_camera_form.capture_width = 1280  # 分類に使う写真の解像度
+		ai_camera_form.capture_height = 720
 		
 		# カメラ機能のメソッドを追加
 		ai_camera_form.start_camera = self._start_camera
@@ -95,89 +96,6 @@ class AIClassificationView(ft.UserControl):
 		
 		return ai_camera_form
 
-	def _load_classification_data(self):
-		"""item_classification.jsonとconfig.pyの分類データを統合して読み込み"""
-		try:
-			# item_classification.jsonを読み込み
-			json_path = Path(__file__).parent.parent / "item_classification.json"
-			with open(json_path, 'r', encoding='utf-8') as f:
-				json_data = json.load(f)
-			
-			# config.pyの分類データを読み込み
-			from apps.config import ITEM_CLASS_L, ITEM_CLASS_M, ITEM_CLASS_S
-			
-			# 統合された分類データを作成
-			self.classification_data = {
-				"large_categories": [],
-				"medium_categories": [],
-				"small_categories": []
-			}
-			
-			# 大分類の統合
-			large_categories = set()
-			for item in ITEM_CLASS_L:
-				large_categories.add(item)
-			
-			# JSONからも大分類を追加
-			for item in json_data:
-				large_categories.add(item["large_category_name_ja"])
-			
-			self.classification_data["large_categories"] = sorted(list(large_categories))
-			
-			# 中分類の統合
-			medium_categories = {}
-			for item in ITEM_CLASS_M:
-				large = item["data-val"]
-				medium = item["value"]
-				if large not in medium_categories:
-					medium_categories[large] = []
-				medium_categories[large].append(medium)
-			
-			# JSONからも中分類を追加
-			for item in json_data:
-				large = item["large_category_name_ja"]
-				for medium_item in item["medium_categories"]:
-					medium = medium_item["medium_category_name_ja"]
-					if large not in medium_categories:
-						medium_categories[large] = []
-					if medium not in medium_categories[large]:
-						medium_categories[large].append(medium)
-			
-			self.classification_data["medium_categories"] = medium_categories
-			
-			# 小分類の統合
-			small_categories = {}
-			for item in ITEM_CLASS_S:
-				medium = item["data-val"]
-				small = item["value"]
-				if medium not in small_categories:
-					small_categories[medium] = []
-				small_categories[medium].append(small)
-			
-			self.classification_data["small_categories"] = small_categories
-			
-			print(f"分類データ読み込み完了: 大分類{len(self.classification_data['large_categories'])}個")
-			
-		except Exception as e:
-			print(f"分類データ読み込みエラー: {e}")
-			# エラー時はデフォルトの分類データを使用
-			self.classification_data = {
-				"large_categories": ["現金", "かばん類", "財布類", "その他"],
-				"medium_categories": {
-					"現金": ["現金"],
-					"かばん類": ["手提げかばん", "肩掛けかばん", "その他かばん類"],
-					"財布類": ["財布", "がま口", "小銭入れ"],
-					"その他": ["その他"]
-				},
-				"small_categories": {
-					"現金": ["現金"],
-					"手提げかばん": ["ハンドバッグ", "ビジネスバッグ", "トートバッグ"],
-					"肩掛けかばん": ["ショルダーバッグ", "リュックサック"],
-					"財布": ["札入れ", "財布"],
-					"その他": ["その他"]
-				}
-			}
-
 	def build(self):
 		# 戻るボタン
 		self.back_button = ft.TextButton(
@@ -331,69 +249,22 @@ class AIClassificationView(ft.UserControl):
 			self.show_error(f"カメラ初期化エラー: {str(e)}")
 
 	def _start_camera(self):
-		"""カメラを起動"""
+		"""カメラを起動（取り込みとプレビュー送信は別スレッドで行う）"""
 		try:
-			# 複数のバックエンドを試行
-			backends = [
-				cv2.CAP_DSHOW,  # DirectShow
-				cv2.CAP_MSMF,   # Microsoft Media Foundation
-				cv2.CAP_ANY     # 自動選択
-			]
-			
-			self.camera_form.cap = None
-			for backend in backends:
-				try:
-					print(f"バックエンド {backend} を試行中...")
-					self.camera_form.cap = cv2.VideoCapture(self.camera_form.camera_index, backend)
-					
-					if self.camera_form.cap.isOpened():
-						print(f"カメラ {self.camera_form.camera_index} が開きました")
-						
-						# フレームサイズを設定
-						self.camera_form.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.camera_form.frame_width)
-						self.camera_form.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.camera_form.frame_height)
-						
-						# バッファサイズを設定（フレーム遅延を防ぐ）
-						self.camera_form.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-						
-						# 実際にフレームを読み取ってテスト
-						success = False
-						for attempt in range(3):
-							ret, frame = self.camera_form.cap.read()
-							if ret and frame is not None and frame.shape[0] > 0 and frame.shape[1] > 0:
-								print(f"カメラ初期化成功: バックエンド {backend} (試行 {attempt + 1})")
-								success = True
-								break
-							else:
-								print(f"フレーム取得失敗 (試行 {attempt + 1})")
-								time.sleep(0.1)
-						
-						if success:
-							break
-						else:
-							print(f"バックエンド {backend} でフレーム取得に失敗")
-							self.camera_form.cap.release()
-							self.camera_form.cap = None
-					else:
-						print(f"カメラ {self.camera_form.camera_index} を開けませんでした")
-						if self.camera_form.cap:
-							self.camera_form.cap.release()
-							self.camera_form.cap = None
-							
-				except Exception as e:
-					print(f"バックエンド {backend} でエラー: {e}")
-					if self.camera_form.cap:
-						self.camera_form.cap.release()
-						self.camera_form.cap = None
-					continue
-			
-			if self.camera_form.cap is None or not self.camera_form.cap.isOpened():
+			stream = CameraStream(
+				self.camera_form.camera_index, self.camera_form.capture_width, self.camera_form.capture_height,
+				preview_size=(self.camera_form.frame_width, self.camera_form.frame_height)
+			)
+			if not stream.open():
 				self.show_error("カメラを起動できませんでした。他のアプリケーションでカメラを使用していないか確認してください。")
 				return
 			
 			print("カメラ初期化完了")
-			self.camera_form.camera_running = True
-			self._update_camera_feed()
+			self.camera_form.stream = stream
+			stream.start(
+				on_preview=self._update_camera_feed,
+				on_error=lambda message: self.show_error(f"カメラエラー: {message}")
+			)
 			
 		except Exception as e:
 			print(f"カメラ初期化エラー: {e}")
@@ -401,74 +272,27 @@ class AIClassificationView(ft.UserControl):
 
 	def _stop_camera(self):
 		"""カメラを停止"""
-		self.camera_form.camera_running = False
-		if self.camera_form.cap is not None:
-			self.camera_form.cap.release()
-			self.camera_form.cap = None
-		time.sleep(0.1)
-
-	def _update_camera_feed(self):
-		"""カメラ映像を更新"""
-		if not self.camera_form.camera_running or self.camera_form.cap is None:
+		if self.camera_form.stream is not None:
+			self.camera_form.stream.stop()
+			self.camera_form.stream = None
+
+	def _update_camera_feed(self, image_base64):
+		"""カメラ映像を更新（プレビュースレッドから呼ばれる）"""
+		if not self.page:
 			return
-		
-		try:
-			ret, frame = self.camera_form.cap.read()
-			if ret and frame is not None and hasattr(self.camera_form, 'camera_image') and self.page:
-				if frame.shape[0] > 0 and frame.shape[1] > 0:
-					try:
-						# OpenCVのBGRをRGBに変換
-						rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-						
-						# PIL Imageに変換
-						pil_image = Image.fromarray(rgb_frame)
-						
-						# バイト配列に変換
-						img_byte_arr = io.BytesIO()
-						pil_image.save(img_byte_arr, format='JPEG', quality=85)
-						img_byte_arr = img_byte_arr.getvalue()
-						
-						# Base64エンコード
-						img_base64 = base64.b64encode(img_byte_arr).decode()
-						
-						# カメラ画像を更新
-						self.camera_form.camera_image.src_base64 = img_base64
-						self.camera_form.camera_image.update()
-					except Exception as e:
-						print(f"フレーム処理エラー: {e}")
-						pass
-			else:
-				print("フレーム取得失敗、再試行中...")
-				if not hasattr(self, 'frame_fail_count'):
-					self.frame_fail_count = 0
-				self.frame_fail_count += 1
-				if self.frame_fail_count > 10:
-					print("フレーム取得が連続して失敗したため、カメラを停止します")
-					self.camera_form.camera_running = False
-					return
-		except Exception as e:
-			print(f"カメラフレーム更新エラー: {e}")
-			if "can't grab frame" in str(e) or "OnReadSample" in str(e):
-				print("カメラエラーが発生したため、カメラを停止します")
-				self.camera_form.camera_running = False
-				return
-		
-		# フレーム取得成功時は失敗カウンターをリセット
-		if hasattr(self, 'frame_fail_count'):
-			self.frame_fail_count = 0
-		
-		# 次のフレームを取得するためにタイマーを設定
-		if self.camera_form.camera_running:
-			threading.Timer(0.033, self._update_camera_feed).start()  # 約30FPS
+		self.camera_form.camera_image.src_base64 = image_base64
+		self.camera_form.camera_image.update()
 
 	def _capture_photo(self, e):
 		"""写真を撮影"""
-		if self.camera_form.cap is None or not self.camera_form.camera_running:
+		stream = self.camera_form.stream
+		if stream is None or not stream.running:
 			self.show_error("カメラが起動していません")
 			return
 		
-		ret, frame = self.camera_form.cap.read()
-		if not ret:
+		# 取り込みスレッドが読んだ最新のフレームを使う
+		frame = stream.latest_frame()
+		if frame is None:
 			self.show_error("撮影に失敗しました")
 			return
 		
@@ -601,48 +425,17 @@ class AIClassificationView(ft.UserControl):
 				self.step_display.color = ft.colors.YELLOW_700
 				self.update()
 				
-				# カスタムYOLOモデルを使用（優先順位付き）
-				if self.yolo_model is None:
-					print("🔄 カスタムYOLOモデルを読み込み中...")
-					
-					# モデル優先順位: yolov8x_seg_custom.pt > yolov11x_seg_custom.pt > yolov8n.pt
-					model_candidates = [
-						("yolov8x_seg_custom.pt", "YOLOv8x カスタムモデル"),
-						("yolo11x_seg_custom.pt", "YOLOv11x カスタムモデル"),
-						("yolov8n.pt", "YOLOv8n デフォルトモデル")
-					]
-					
-					model_loaded = False
-					for model_file, model_name in model_candidates:
-						model_path = Path(__file__).parent.parent / model_file
-						if model_path.exists():
-							try:
-								print(f"🔄 {model_name}を読み込み中... ({model_file})")
-								print(f"📁 ファイルサイズ: {model_path.stat().st_size / (1024*1024):.1f} MB")
-								
-								self.yolo_model = YOLO(str(model_path))
-								print(f"✅ {model_name}読み込み成功")
-								model_loaded = True
-								break
-								
-							except Exception as model_error:
-								print(f"❌ {model_name}読み込みエラー: {model_error}")
-								if "C3k2" in str(model_error):
-									print("💡 互換性エラー: 次のモデルを試行します")
-								continue
-						else:
-							print(f"❌ {model_file}が見つかりません")
-					
-					if not model_loaded:
-						print("❌ すべてのカスタムモデルが読み込めませんでした")
-						print("🔄 デフォルトモデルにフォールバック...")
-						self.yolo_model = YOLO('yolov8n.pt')
+				# プロセス共有の推論サービスを使用（モデルは起動時に読み込み済み）
+				service = inference.get_service()
+				if not service.is_ready:
+					self.step_display.value = "AIモデル準備中..."
+					self.update()
 				
 				# 画像をOpenCV形式に変換
 				cv_image = cv2.cvtColor(np.array(self.captured_image), cv2.COLOR_RGB2BGR)
 				
 				# YOLOで物体検出・分類実行
-				results = self.yolo_model(cv_image)
+				results = [service.predict(cv_image)]
 				
 				# 結果の解析
 				self.classification_results = self._analyze_yolo_results(results)
@@ -699,131 +492,20 @@ class AIClassificationView(ft.UserControl):
 		return classification_results
 
 	def _estimate_classification(self, detected_class):
-		"""検出されたクラス名から大・中・小分類を推定（カスタムモデル対応）"""
-		# キーワードベースの分類推定
-		detected_class_lower = detected_class.lower()
-		
-		# 大分類の推定
-		large_category = "その他"
-		medium_category = "その他"
-		small_category = "その他"
-		
-		# カスタムモデル用の詳細分類（拾得物に特化）
-		print(f"🔍 検出クラス: {detected_class} -> 分類推定中...")
-		
-		# 現金の検出（カスタムモデル対応）
-		if any(keyword in detected_class_lower for keyword in ["cash", "money", "現金", "金", "coin", "coins", "硬貨", "紙幣"]):
-			large_category = "現金"
-			medium_category = "現金"
-			small_category = "現金"
-			print("💰 現金として分類")
-		
-		# かばん類の検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["bag", "handbag", "backpack", "かばん", "バッグ", "tote", "purse", "briefcase", "suitcase"]):
-			large_category = "かばん類"
-			if any(keyword in detected_class_lower for keyword in ["hand", "手提げ", "handbag", "tote"]):
-				medium_category = "手提げかばん"
-				small_category = "ハンドバッグ"
-			elif any(keyword in detected_class_lower for keyword in ["shoulder", "肩掛け", "shoulder"]):
-				medium_category = "肩掛けかばん"
-				small_category = "ショルダーバッグ"
-			elif any(keyword in detected_class_lower for keyword in ["backpack", "リュック", "rucksack"]):
-				medium_category = "肩掛けかばん"
-				small_category = "リュックサック"
-			else:
-				medium_category = "手提げかばん"
-				small_category = "ハンドバッグ"
-			print("👜 かばん類として分類")
-		
-		# 財布類の検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["wallet", "purse", "財布", "がま口", "coin_purse", "card_case"]):
-			large_category = "財布類"
-			if any(keyword in detected_class_lower for keyword in ["がま口", "coin_purse"]):
-				medium_category = "がま口"
-				small_category = "がま口"
-			else:
-				medium_category = "財布"
-				small_category = "財布"
-			print("👛 財布類として分類")
-		
-		# 携帯電話の検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["phone", "mobile", "携帯", "スマホ", "smartphone", "iphone", "android"]):
-			large_category = "携帯電話類"
-			medium_category = "携帯電話機"
-			small_category = "携帯電話機"
-			print("📱 携帯電話類として分類")
-		
-		# 時計の検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["watch", "clock", "時計", "腕時計", "wristwatch"]):
-			large_category = "時計類"
-			medium_category = "腕時計"
-			small_category = "腕時計男性（金属製ベルト）"
-			print("⌚ 時計類として分類")
-		
-		# めがねの検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["glasses", "eyeglasses", "めがね", "眼鏡", "sunglasses", "サングラス"]):
-			large_category = "めがね類"
-			medium_category = "めがね"
-			small_category = "めがね（ケースあり）"
-			print("👓 めがね類として分類")
-		
-		# 鍵の検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["key", "keys", "鍵", "キー", "keychain", "キーホルダー"]):
-			large_category = "鍵類"
-			medium_category = "鍵"
-			small_category = "自動車用鍵"
-			print("🗝️ 鍵類として分類")
-		
-		# 傘の検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["umbrella", "傘", "かさ", "parasol", "日傘"]):
-			large_category = "かさ類"
-			medium_category = "かさ"
-			small_category = "長傘"
-			print("☂️ かさ類として分類")
-		
-		# 衣類の検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["clothes", "clothing", "shirt", "jacket", "衣類", "服", "coat", "blouse", "dress"]):
-			large_category = "衣類・履物類"
-			medium_category = "上着類"
-			small_category = "Tシャツ"
-			print("👕 衣類として分類")
-		
-		# 靴の検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["shoe", "shoes", "boot", "靴", "履物", "sneaker", "sandal"]):
-			large_category = "衣類・履物類"
-			medium_category = "履物類"
-			small_category = "ランニングシューズ"
-			print("👟 履物類として分類")
-		
-		# 帽子の検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["hat", "cap", "帽子", "beanie", "cap"]):
-			large_category = "衣類・履物類"
-			medium_category = "帽子類"
-			small_category = "帽子"
-			print("🧢 帽子類として分類")
-		
-		# 手袋の検出（カスタムモデル対応）
-		elif any(keyword in detected_class_lower for keyword in ["glove", "gloves", "手袋", "mittens"]):
-			large_category = "衣類・履物類"
-			medium_category = "手袋"
-			small_category = "手袋（両手）"
-			print("🧤 手袋として分類")
-		
-		# カスタムモデル特有の分類を追加
-		else:
-			# カスタムモデルが返す可能性のあるクラス名を直接マッピング
-			if detected_class_lower in ["lost_item", "拾得物", "遺失物"]:
-				large_category = "その他"
-				medium_category = "その他"
-				small_category = "その他"
-				print("📦 拾得物として分類")
-			else:
-				print(f"❓ 未知のクラス: {detected_class} -> その他として分類")
-		
+		"""検出されたクラス名から大・中・小分類を推定（item_classification.json のキーワードと重みで採点）"""
+		result = classifier.classify(detected_class)
+		if result is None:
+			print(f"❓ 未知のクラス: {detected_class} -> その他として分類")
+			return {
+				"large_category": "その他",
+				"medium_category": "その他",
+				"small_category": "その他"
+			}
+		print(f"🔍 検出クラス: {detected_class} -> {result['large_category']} / {result['medium_category']}")
 		return {
-			"large_category": large_category,
-			"medium_category": medium_category,
-			"small_category": small_category
+			"large_category": result["large_category"],
+			"medium_category": result["medium_category"],
+			"small_category": result["small_category"]
 		}
 
 	def update_classification_results(self):
@@ -1,11 +1,13 @@
 import flet as ft
-import cv2
+from core.camera import CameraStream
+from core.lazy import lazy_import
 import base64
 import io
 from PIL import Image
-import threading
 import time
 
+cv2 = lazy_import("cv2")  # 起動時間短縮のため最初に使うときに読み込む
+
 
 class CameraFormView(ft.UserControl):
     """カメラ撮影専用ビュー"""
@@ -13,13 +15,13 @@ class CameraFormView(ft.UserControl):
         super().__init__()
         self.on_capture_complete = on_capture_complete
         self.on_back = on_back
-        self.cap = None
+        self.stream = None  # カメラの取り込み・プレビュー（core.camera.CameraStream）
         self.is_capturing = False
         self.main_photos = []  # メイン写真（最大1枚）
         self.sub_photos = []   # サブ写真（最大2枚）
         self.bundle_photos = []  # 同梱物写真（最大3枚）
         self.is_bundle_mode = False
-        self.camera_running = False
+        self.last_fps_update = 0.0
         self.selected_photo_index = -1  # 選択された写真のインデックス
         self.selected_photo_type = None  # 選択された写真のタイプ（main/sub/bundle）
         self.dragged_photo = None  # ドラッグ中の写真
@@ -29,12 +31,18 @@ class CameraFormView(ft.UserControl):
         
         # カメラ設定
         self.camera_index = 0
-        self.frame_width = 480
+        self.frame_width = 480    # プレビューの表示サイズ
         self.frame_height = 360
+        self.capture_width = 1280  # 撮影する写真の解像度（プレビューは表示サイズに縮小して送る）
+        self.capture_height = 720
         
         # 利用可能なカメラを確認
         self.check_available_cameras()
     
+    @property
+    def camera_running(self):
+        return self.stream is not None and self.stream.running
+    
     def check_available_cameras(self):
         """利用可能なカメラを確認"""
         print("利用可能なカメラを確認中...")
@@ -88,6 +96,9 @@ class CameraFormView(ft.UserControl):
             border=ft.border.all(2, ft.colors.GREY_400)
         )
         
+        # プレビューのフレームレート表示（取り込み / 圧縮 / 表示）
+        self.fps_text = ft.Text("", size=10, color=ft.colors.GREY_600)
+        
         # 撮影ガイドフレーム（70%サイズ、中央配置）
         guide_frame_size = int(min(self.frame_width, self.frame_height) * 0.7)
         self.guide_frame = ft.Container(
@@ -187,6 +198,7 @@ class CameraFormView(ft.UserControl):
                 alignment=ft.alignment.center,
                 padding=10
             ),
+            self.fps_text,
             ft.Row([
                 self.capture_button,
                 self.bundle_button,
@@ -211,75 +223,22 @@ class CameraFormView(ft.UserControl):
     
     def will_unmount(self):
         """コンポーネントがアンマウントされる時にカメラを停止"""
-        self.camera_running = False
-        if self.cap is not None:
-            self.cap.release()
-            self.cap = None
+        self.stop_camera()
     
     def start_camera(self):
-        """カメラを起動"""
+        """カメラを起動（取り込みとプレビュー送信は別スレッドで行う）"""
         try:
-            # 複数のバックエンドを試行
-            backends = [
-                cv2.CAP_DSHOW,  # DirectShow
-                cv2.CAP_MSMF,   # Microsoft Media Foundation
-                cv2.CAP_ANY     # 自動選択
-            ]
-            
-            self.cap = None
-            for backend in backends:
-                try:
-                    print(f"バックエンド {backend} を試行中...")
-                    self.cap = cv2.VideoCapture(self.camera_index, backend)
-                    
-                    if self.cap.isOpened():
-                        print(f"カメラ {self.camera_index} が開きました")
-                        
-                        # フレームサイズを設定
-                        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_width)
-                        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
-                        
-                        # バッファサイズを設定（フレーム遅延を防ぐ）
-                        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                        
-                        # 実際にフレームを読み取ってテスト（複数回試行）
-                        success = False
-                        for attempt in range(3):
-                            ret, frame = self.cap.read()
-                            if ret and frame is not None and frame.shape[0] > 0 and frame.shape[1] > 0:
-                                print(f"カメラ初期化成功: バックエンド {backend} (試行 {attempt + 1})")
-                                success = True
-                                break
-                            else:
-                                print(f"フレーム取得失敗 (試行 {attempt + 1})")
-                                time.sleep(0.1)  # 少し待ってから再試行
-                        
-                        if success:
-                            break
-                        else:
-                            print(f"バックエンド {backend} でフレーム取得に失敗")
-                            self.cap.release()
-                            self.cap = None
-                    else:
-                        print(f"カメラ {self.camera_index} を開けませんでした")
-                        if self.cap:
-                            self.cap.release()
-                            self.cap = None
-                            
-                except Exception as e:
-                    print(f"バックエンド {backend} でエラー: {e}")
-                    if self.cap:
-                        self.cap.release()
-                        self.cap = None
-                    continue
-            
-            if self.cap is None or not self.cap.isOpened():
+            self.stream = CameraStream(
+                self.camera_index, self.capture_width, self.capture_height,
+                preview_size=(self.frame_width, self.frame_height)
+            )
+            if not self.stream.open():
+                self.stream = None
                 self.show_error("カメラを起動できませんでした。他のアプリケーションでカメラを使用していないか確認してください。")
                 return
             
             print("カメラ初期化完了")
-            self.camera_running = True
-            self.update_camera_feed()
+            self.stream.start(on_preview=self.update_camera_feed, on_error=self.on_camera_error)
             
         except Exception as e:
             print(f"カメラ初期化エラー: {e}")
@@ -287,72 +246,40 @@ class CameraFormView(ft.UserControl):
     
     def stop_camera(self):
         """カメラを停止"""
-        self.camera_running = False
-        if self.cap is not None:
-            self.cap.release()
-            self.cap = None
-        # スレッドの終了を待つ
-        import time
-        time.sleep(0.1)
+        if self.stream is not None:
+            stats = self.stream.stats()
+            print(
+                f"カメラ停止: 取り込み {stats['capture_fps']:.1f}fps / 圧縮 {stats['encode_fps']:.1f}fps / "
+                f"表示 {stats['display_fps']:.1f}fps（捨てたフレーム {stats['dropped']}）"
+            )
+            self.stream.stop()
+            self.stream = None
     
-    def update_camera_feed(self):
-        """カメラ映像を更新"""
-        if not self.camera_running or self.cap is None:
+    def update_camera_feed(self, image_base64):
+        """カメラ映像を更新（プレビュースレッドから呼ばれる）"""
+        if not hasattr(self, 'camera_image') or not self.page:
             return
         
-        try:
-            ret, frame = self.cap.read()
-            if ret and frame is not None and hasattr(self, 'camera_image') and self.page:
-                # フレームサイズを確認
-                if frame.shape[0] > 0 and frame.shape[1] > 0:
-                    try:
-                        # OpenCVのBGRをRGBに変換
-                        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                        
-                        # PIL Imageに変換
-                        pil_image = Image.fromarray(rgb_frame)
-                        
-                        # バイト配列に変換
-                        img_byte_arr = io.BytesIO()
-                        pil_image.save(img_byte_arr, format='JPEG', quality=85)
-                        img_byte_arr = img_byte_arr.getvalue()
-                        
-                        # Base64エンコード
-                        img_base64 = base64.b64encode(img_byte_arr).decode()
-                        
-                        # 既存のImageコントロールのsrc_base64を更新（点滅を防ぐ）
-                        self.camera_image.src_base64 = img_base64
-                        self.camera_image.update()
-                    except Exception as e:
-                        print(f"フレーム処理エラー: {e}")
-                        # フレーム処理でエラーが発生した場合はスキップ
-                        pass
-            else:
-                # フレームが取得できない場合、少し待ってから再試行
-                print("フレーム取得失敗、再試行中...")
-                # 連続して失敗した場合はカメラを停止
-                if not hasattr(self, 'frame_fail_count'):
-                    self.frame_fail_count = 0
-                self.frame_fail_count += 1
-                if self.frame_fail_count > 10:  # 10回連続で失敗した場合
-                    print("フレーム取得が連続して失敗したため、カメラを停止します")
-                    self.camera_running = False
-                    return
-        except Exception as e:
-            print(f"カメラフレーム更新エラー: {e}")
-            # エラーが続く場合はカメラを停止
-            if "can't grab frame" in str(e) or "OnReadSample" in str(e):
-                print("カメラエラーが発生したため、カメラを停止します")
-                self.camera_running = False
-                return
-        
-        # フレーム取得成功時は失敗カウンターをリセット
-        if hasattr(self, 'frame_fail_count'):
-            self.frame_fail_count = 0
-        
-        # 次のフレームを取得するためにタイマーを設定
-        if self.camera_running:
-            threading.Timer(0.033, self.update_camera_feed).start()  # 約30FPS
+        # 既存のImageコントロールのsrc_base64を更新（点滅を防ぐ）
+        self.camera_image.src_base64 = image_base64
+        
+        # フレームレート表示は1秒ごとに更新
+        now = time.perf_counter()
+        if now - self.last_fps_update >= 1.0 and self.stream is not None:
+            self.last_fps_update = now
+            stats = self.stream.stats()
+            self.fps_text.value = (
+                f"取り込み {stats['capture_fps']:.0f}fps / 圧縮 {stats['encode_fps']:.0f}fps / "
+                f"表示 {stats['display_fps']:.0f}fps / {stats['preview_bytes_per_second'] / 1024:.0f} KB/s"
+            )
+            self.camera_image.update()
+            self.fps_text.update()
+        else:
+            self.camera_image.update()
+    
+    def on_camera_error(self, message):
+        """カメラが止まった時に呼ばれる"""
+        self.show_error(f"カメラエラー: {message}")
     
     def on_keyboard_event(self, e):
         """キーボードイベントハンドラー"""
@@ -378,12 +305,13 @@ class CameraFormView(ft.UserControl):
     
     def capture_photo(self, e):
         """写真を撮影"""
-        if self.cap is None or not self.camera_running:
+        if not self.camera_running:
             self.show_error("カメラが起動していません")
             return
         
-        ret, frame = self.cap.read()
-        if not ret:
+        # 取り込みスレッドが読んだ最新のフレームを使う（カメラを別スレッドから同時に読まない）
+        frame = self.stream.latest_frame()
+        if frame is None:
             self.show_error("撮影に失敗しました")
             return
         
@@ -1,8 +1,8 @@
 import flet as ft
-import json
 from datetime import date, datetime
 from pathlib import Path
-import sqlite3
+from core import db, thumbnails
+from core.query import Where
 import threading
 import time
 
@@ -13,7 +13,7 @@ def get_counts():
 	"""基本統計を取得"""
 	stored = refunded = total = 0
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
 		cur.execute("SELECT COUNT(*) FROM lost_items WHERE item_situation = '保管中'")
 		stored = cur.fetchone()[0]
@@ -35,9 +35,10 @@ def get_daily_stats():
 	# 本日の拾得物件数
 	today_found = 0
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
-		cur.execute("SELECT COUNT(*) FROM lost_items WHERE DATE(get_item) = ?", (today.isoformat(),))
+		where = Where().on_day("get_item", today)
+		cur.execute(f"SELECT COUNT(*) FROM lost_items {where.sql()}", where.params)
 		today_found = cur.fetchone()[0]
 		conn.close()
 	except Exception:
@@ -46,9 +47,10 @@ def get_daily_stats():
 	# 昨日の拾得物件数
 	yesterday_found = 0
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
-		cur.execute("SELECT COUNT(*) FROM lost_items WHERE DATE(get_item) = ?", (yesterday.isoformat(),))
+		where = Where().on_day("get_item", yesterday)
+		cur.execute(f"SELECT COUNT(*) FROM lost_items {where.sql()}", where.params)
 		yesterday_found = cur.fetchone()[0]
 		conn.close()
 	except Exception:
@@ -57,9 +59,10 @@ def get_daily_stats():
 	# 本日の遺失物届出件数（notfoundテーブルから取得）
 	today_notfound = 0
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
-		cur.execute("SELECT COUNT(*) FROM notfound WHERE DATE(created_at) = ?", (today.isoformat(),))
+		where = Where().on_day("created_at", today)
+		cur.execute(f"SELECT COUNT(*) FROM notfound_items {where.sql()}", where.params)
 		today_notfound = cur.fetchone()[0]
 		conn.close()
 	except Exception:
@@ -68,9 +71,10 @@ def get_daily_stats():
 	# 昨日の遺失物届出件数
 	yesterday_notfound = 0
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
-		cur.execute("SELECT COUNT(*) FROM notfound WHERE DATE(created_at) = ?", (yesterday.isoformat(),))
+		where = Where().on_day("created_at", yesterday)
+		cur.execute(f"SELECT COUNT(*) FROM notfound_items {where.sql()}", where.params)
 		yesterday_notfound = cur.fetchone()[0]
 		conn.close()
 	except Exception:
@@ -79,7 +83,7 @@ def get_daily_stats():
 	# 総保管数（現在保管中の件数）
 	total_stored = 0
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
 		cur.execute("SELECT COUNT(*) FROM lost_items WHERE item_situation = '保管中'")
 		total_stored = cur.fetchone()[0]
@@ -94,9 +98,10 @@ def get_daily_stats():
 	week_ago = date.fromordinal(today.toordinal() - 7)
 	week_ago_stored = 0
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
-		cur.execute("SELECT COUNT(*) FROM lost_items WHERE item_situation = '保管中' AND DATE(get_item) <= ?", (week_ago.isoformat(),))
+		where = Where().equals("item_situation", "保管中").date_to("get_item", week_ago)
+		cur.execute(f"SELECT COUNT(*) FROM lost_items {where.sql()}", where.params)
 		week_ago_stored = cur.fetchone()[0]
 		conn.close()
 	except Exception:
@@ -117,37 +122,21 @@ def get_daily_stats():
 def get_today_items():
 	items = []
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
+		where = Where().on_day("get_item", date.today())
 		cur.execute(
-			"""
-			SELECT id, item_image, get_item, get_item_hour, get_item_minute
+			f"""
+			SELECT id, cover_photo, get_item, get_item_hour, get_item_minute
 			FROM lost_items
-			WHERE DATE(get_item) = ?
+			{where.sql()}
 			ORDER BY get_item DESC
 			""",
-			(date.today().isoformat(),),
+			where.params,
 		)
 		for row in cur.fetchall():
-			item_id, item_image, d, hh, mm = row
-			img_path = None
-			if isinstance(item_image, str) and item_image:
-				try:
-					data = json.loads(item_image)
-					if isinstance(data, dict):
-						# 新しいデータ構造に対応
-						if data.get("main_photos") and len(data["main_photos"]) > 0:
-							img_path = data["main_photos"][0]
-						elif data.get("photos") and len(data["photos"]) > 0:
-							# 旧データ構造のフォールバック
-							img_path = data["photos"][0]
-					elif isinstance(data, list) and len(data) > 0:
-						# 旧データ構造のフォールバック
-						img_path = data[0]
-					else:
-						img_path = item_image
-				except Exception:
-					img_path = item_image
+			# 画像は表紙の写真（core/photos.py で登録時に決めたもの）
+			item_id, img_path, d, hh, mm = row
 			items.append({
 				"id": item_id,
 				"image": img_path,
@@ -164,7 +153,7 @@ def get_today_items():
 def get_user_store_name(user_id):
 	"""ユーザーの店舗名を取得"""
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
 		cur.execute("SELECT store_name FROM users WHERE id = ?", (user_id,))
 		result = cur.fetchone()
@@ -328,7 +317,7 @@ def build_home_content(page: ft.Page, current_user=None) -> ft.Control:
 		# 画像のサムネイルを作成
 		if it["image"] and Path(it["image"]).exists():
 			img = ft.Image(
-				src=it["image"], 
+				**thumbnails.image_source(it["image"], 120), 
 				width=120, 
 				height=120, 
 				fit=ft.ImageFit.COVER,
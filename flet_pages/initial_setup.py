@@ -1,5 +1,5 @@
 import flet as ft
-import sqlite3
+from core import app_settings, db
 from pathlib import Path
 
 class InitialSetupDialog(ft.UserControl):
@@ -223,7 +223,7 @@ class InitialSetupDialog(ft.UserControl):
     def _create_admin_account(self):
         """管理者アカウントを作成"""
         db_path = Path(__file__).parent.parent / "lostitem.db"
-        conn = sqlite3.connect(str(db_path))
+        conn = db.connect(db_path)
         cur = conn.cursor()
         
         # usersテーブルが存在するかチェック
@@ -364,7 +364,7 @@ class InitialSetupDialog(ft.UserControl):
     def _save_initial_settings(self):
         """初期設定を保存"""
         db_path = Path(__file__).parent.parent / "lostitem.db"
-        conn = sqlite3.connect(str(db_path))
+        conn = db.connect(db_path)
         cur = conn.cursor()
         
         # settingsテーブルを作成
@@ -406,4 +406,5 @@ class InitialSetupDialog(ft.UserControl):
         
         conn.commit()
         conn.close()
+        app_settings.invalidate(db_path)
         print("初期設定を保存しました")
@@ -1,140 +1,102 @@
 import flet as ft
-import json
 from datetime import date, datetime
 from pathlib import Path
-import sqlite3
+from core import db, taxonomy, thumbnails
+from core.query import Keyset
+from core.search import lost_items_filter
 import traceback
 
 DB_PATH = Path(__file__).resolve().parent.parent / "lostitem.db"
 
+# 分類フィルターの未選択の値（core/search.py の lost_items_filter が読み飛ばす）
+CLASS_PLACEHOLDER = "選択してください"
 
-def get_all_items(page=1, per_page=20, search_params=None, sort_order="date_desc"):
-    """すべての拾得物を取得（ページネーション対応）"""
+
+# 一覧で取得する列
+ITEM_LIST_COLUMNS = """id, cover_photo, get_item, get_item_hour, get_item_minute,
+               item_feature, find_area, item_color, item_situation, item_class_L, item_class_M, item_class_S,
+               recep_item, recep_item_hour, recep_item_minute"""
+
+# 並べ替え順ごとのキーセット定義（並べ替え列, 方向）
+SORT_KEYSETS = {
+    "date_desc": Keyset("get_item", "DESC"),
+    "date_asc": Keyset("get_item", "ASC"),
+    "id_desc": Keyset(None, "DESC"),
+    "id_asc": Keyset(None, "ASC"),
+    "update_desc": Keyset("recep_item", "DESC"),
+    "update_asc": Keyset("recep_item", "ASC"),
+}
+
+
+def get_all_items(page=1, per_page=20, search_params=None, sort_order="date_desc", cursor=None, total_count=None):
+    """
+    すべての拾得物を取得（ページネーション対応）
+
+    cursor を渡すとキーセット方式で、前ページ最後の行より後ろを取得する（OFFSETを使わない）。
+    カーソルは各並べ替え順の SORT_KEYSETS で作成したものを使う。
+    cursor がなく page > 1 の場合は OFFSET で取得する。
+    total_count を渡した場合は件数の再計算を省略する（絞り込み条件が変わったときだけ None を渡す）。
+    データベースのエラーの場合は件数を None で返す（呼び出し側で使い回さない）。
+    各アイテムの "cursor" が次ページ取得用のカーソルになる。
+    """
     items = []
-    total_count = 0
     
     try:
         print(f"get_all_items: Connecting to database...")
-        conn = sqlite3.connect(str(DB_PATH), timeout=10.0)  # 10秒のタイムアウトを設定
+        conn = db.connect()
         cur = conn.cursor()
         print(f"get_all_items: Connected successfully")
         
-        # 検索条件を構築
-        where_conditions = []
-        params = []
-        
-        if search_params:
-            if search_params.get("id"):
-                where_conditions.append("id = ?")
-                params.append(search_params["id"])
-            
-            if search_params.get("item_feature"):
-                where_conditions.append("item_feature LIKE ?")
-                params.append(f"%{search_params['item_feature']}%")
-            
-            if search_params.get("find_area"):
-                where_conditions.append("find_area LIKE ?")
-                params.append(f"%{search_params['find_area']}%")
-            
-            if search_params.get("item_color") and search_params["item_color"] != "未選択":
-                where_conditions.append("item_color LIKE ?")
-                params.append(f"%{search_params['item_color']}%")
-            
-            if search_params.get("start_date") and search_params.get("end_date"):
-                where_conditions.append("DATE(get_item) BETWEEN ? AND ?")
-                params.extend([search_params["start_date"], search_params["end_date"]])
-            elif search_params.get("start_date"):
-                where_conditions.append("DATE(get_item) >= ?")
-                params.append(search_params["start_date"])
-            elif search_params.get("end_date"):
-                where_conditions.append("DATE(get_item) <= ?")
-                params.append(search_params["end_date"])
-            
-            if search_params.get("item_class_L") and search_params["item_class_L"] != "選択してください":
-                where_conditions.append("item_class_L = ?")
-                params.append(search_params["item_class_L"])
-            
-            if search_params.get("item_class_M") and search_params["item_class_M"] != "選択してください":
-                where_conditions.append("item_class_M = ?")
-                params.append(search_params["item_class_M"])
-            
-            if search_params.get("item_class_S") and search_params["item_class_S"] != "選択してください":
-                where_conditions.append("item_class_S = ?")
-                params.append(search_params["item_class_S"])
-            
-            if search_params.get("item_not_yet"):
-                where_conditions.append("item_situation != '返還済み'")
-            
-            if search_params.get("valuable_only"):
-                where_conditions.append("item_value = 1")
-            
-            if not search_params.get("show_refunded", False):
-                where_conditions.append("item_situation != '返還済み'")
-            
-            if not search_params.get("show_disposed", False):
-                where_conditions.append("item_situation NOT IN ('廃棄', '売却済み')")
-        
-        # 総件数を取得
-        count_query = "SELECT COUNT(*) FROM lost_items"
-        if where_conditions:
-            count_query += " WHERE " + " AND ".join(where_conditions)
+        # 検索条件を構築（削除済みは常に除外、エクスポートと共通）
+        where = lost_items_filter(conn, search_params)
+        where_conditions = where.conditions
+        params = where.params
         
-        cur.execute(count_query, params)
-        total_count = cur.fetchone()[0]
+        # 総件数を取得（絞り込み条件が変わったときだけ）
+        if total_count is None:
+            count_query = "SELECT COUNT(*) FROM lost_items WHERE " + " AND ".join(where_conditions)
+            cur.execute(count_query, params)
+            total_count = cur.fetchone()[0]
         
         # 並べ替え順を決定
-        order_by_clause = "ORDER BY "
-        if sort_order == "date_desc":
-            order_by_clause += "get_item DESC, id DESC"
-        elif sort_order == "date_asc":
-            order_by_clause += "get_item ASC, id ASC"
-        elif sort_order == "id_desc":
-            order_by_clause += "id DESC"
-        elif sort_order == "id_asc":
-            order_by_clause += "id ASC"
-        elif sort_order == "update_desc":
-            order_by_clause += "recep_item DESC, id DESC"
-        elif sort_order == "update_asc":
-            order_by_clause += "recep_item ASC, id ASC"
-        else:
-            order_by_clause += "get_item DESC, id DESC"
-        
-        # データを取得（削除済みを除外）
-        query = """
-        SELECT id, item_image, get_item, get_item_hour, get_item_minute, 
-               item_feature, find_area, item_color, item_situation, item_class_L, item_class_M, item_class_S,
-               recep_item, recep_item_hour, recep_item_minute
-        FROM lost_items
-        WHERE item_situation != '削除済み'
-        """
-        
-        if where_conditions:
-            query += " AND " + " AND ".join(where_conditions)
+        keyset = SORT_KEYSETS.get(sort_order, SORT_KEYSETS["date_desc"])
         
-        query += f" {order_by_clause} LIMIT ? OFFSET ?"
-        
-        offset = (page - 1) * per_page
-        cur.execute(query, params + [per_page, offset])
+        # データを取得
+        base_where = " AND ".join(where_conditions)
+        if cursor is None and page > 1:
+            # カーソルがない場合のみ OFFSET で取得
+            cur.execute(
+                f"""
+                SELECT {ITEM_LIST_COLUMNS}
+                FROM lost_items
+                WHERE {base_where}
+                {keyset.order_by()} LIMIT ? OFFSET ?
+                """,
+                params + [per_page, (page - 1) * per_page],
+            )
+            rows = cur.fetchall()
+        else:
+            # カーソル以降の区間を、ページが埋まるまで順に読む
+            rows = []
+            for condition, cursor_params in keyset.segments(cursor):
+                remaining = per_page - len(rows)
+                if remaining <= 0:
+                    break
+                cur.execute(
+                    f"""
+                    SELECT {ITEM_LIST_COLUMNS}
+                    FROM lost_items
+                    WHERE {base_where} AND {condition}
+                    {keyset.order_by()} LIMIT ?
+                    """,
+                    params + cursor_params + [remaining],
+                )
+                rows.extend(cur.fetchall())
         
-        for row in cur.fetchall():
-            item_id, item_image, get_item, hour, minute, feature, area, color, situation, class_l, class_m, class_s, recep_item, recep_hour, recep_min = row
-            
-            # 画像パスを取得
-            img_path = None
-            if isinstance(item_image, str) and item_image:
-                try:
-                    data = json.loads(item_image)
-                    if isinstance(data, dict):
-                        if data.get("main_photos") and len(data["main_photos"]) > 0:
-                            img_path = data["main_photos"][0]
-                        elif data.get("photos") and len(data["photos"]) > 0:
-                            img_path = data["photos"][0]
-                    elif isinstance(data, list) and len(data) > 0:
-                        img_path = data[0]
-                    else:
-                        img_path = item_image
-                except Exception:
-                    img_path = item_image
+        for row in rows:
+            # 画像は表紙の写真（core/photos.py で登録時に決めたもの）
+            item_id, img_path, get_item, hour, minute, feature, area, color, situation, class_l, class_m, class_s, recep_item, recep_hour, recep_min = row
+            sort_value = {"get_item": get_item, "recep_item": recep_item}.get(keyset.column)
             
             # 日時をフォーマット
             if get_item:
@@ -170,6 +132,7 @@ def get_all_items(page=1, per_page=20, search_params=None, sort_order="date_desc
                 "class_l": class_l or "",
                 "class_m": class_m or "",
                 "class_s": class_s or "",
+                "cursor": keyset.cursor_of(sort_value, item_id),
             })
         
         conn.close()
@@ -177,9 +140,9 @@ def get_all_items(page=1, per_page=20, search_params=None, sort_order="date_desc
     except Exception as e:
         print(f"データベースエラー in get_all_items: {e}")
         traceback.print_exc()
-        # エラーが発生した場合は空のリストを返す
+        # エラーが発生した場合は空のリストと、件数は不明（None）を返す
         items = []
-        total_count = 0
+        total_count = None
     
     return items, total_count
 
@@ -214,7 +177,7 @@ def create_photo_card(page, item):
     # 画像のサムネイルを作成
     if item["image"] and Path(item["image"]).exists():
         img = ft.Image(
-            src=item["image"],
+            **thumbnails.image_source(item["image"], 100),
             width=100,
             height=100,
             fit=ft.ImageFit.COVER,
@@ -419,7 +382,7 @@ def create_detail_row(page, item):
 def get_item_data(item_id):
     """指定されたIDの拾得物データを取得"""
     try:
-        conn = sqlite3.connect(str(DB_PATH))
+        conn = db.connect()
         cur = conn.cursor()
         
         cur.execute("""
@@ -696,6 +659,8 @@ def build_items_list_content(page: ft.Page) -> ft.Control:
         "per_page": 20,
         "search_params": None,
         "sort_order": "date_desc",
+        "cursors": {1: None},
+        "total_count": None,
         "view_mode": "photo",
         "photo_grid": photo_grid,
         "detail_container": detail_container,
@@ -711,6 +676,11 @@ def build_items_list_content(page: ft.Page) -> ft.Control:
     return content
 
 
+def class_filter_options(values):
+    """分類フィルターの選択肢（先頭は「選択してください」）"""
+    return [ft.dropdown.Option(CLASS_PLACEHOLDER, CLASS_PLACEHOLDER)] + [ft.dropdown.Option(x) for x in values]
+
+
 def create_filter_panel(page):
     """絞り込みパネルを作成"""
     # 検索フィールド
@@ -734,22 +704,38 @@ def create_filter_panel(page):
         value="未選択"
     )
     
-    # 分類フィルター
+    # 分類フィルター（core/taxonomy.py の組み立て済みの分類で L→M→S を連動）
+    tax = taxonomy.load()
     class_l_dropdown = ft.Dropdown(
         label="大分類", width=150, height=36,
-        options=[ft.dropdown.Option("選択してください", "選択してください")],
-        value="選択してください"
+        options=class_filter_options(tax.large),
+        value=CLASS_PLACEHOLDER
     )
     class_m_dropdown = ft.Dropdown(
         label="中分類", width=150, height=36,
-        options=[ft.dropdown.Option("選択してください", "選択してください")],
-        value="選択してください"
+        options=class_filter_options([]),
+        value=CLASS_PLACEHOLDER
     )
     class_s_dropdown = ft.Dropdown(
         label="小分類", width=150, height=36,
-        options=[ft.dropdown.Option("選択してください", "選択してください")],
-        value="選択してください"
+        options=class_filter_options([]),
+        value=CLASS_PLACEHOLDER
     )
+
+    def on_class_l_change(e):
+        class_m_dropdown.options = class_filter_options(tax.mediums(class_l_dropdown.value))
+        class_m_dropdown.value = CLASS_PLACEHOLDER
+        class_m_dropdown.update()
+        class_s_dropdown.options = class_filter_options([])
+        class_s_dropdown.value = CLASS_PLACEHOLDER
+        class_s_dropdown.update()
+    class_l_dropdown.on_change = on_class_l_change
+
+    def on_class_m_change(e):
+        class_s_dropdown.options = class_filter_options(tax.smalls(class_m_dropdown.value))
+        class_s_dropdown.value = CLASS_PLACEHOLDER
+        class_s_dropdown.update()
+    class_m_dropdown.on_change = on_class_m_change
     
     # 日時フィルター
     start_date_field = ft.TextField(label="拾得日時（開始）", width=150, height=36)
@@ -849,7 +835,18 @@ def load_items(page: ft.Page):
         
         print(f"Loading items - view_mode: {view_mode}, page: {current_page}, sort: {sort_order}")
         
-        items, total_count = get_all_items(current_page, per_page, search_params, sort_order)
+        # キーセットページング用のカーソル（ページ番号 -> そのページを取得するカーソル）
+        cursors = page_data.setdefault("cursors", {1: None})
+        items, total_count = get_all_items(
+            current_page, per_page, search_params, sort_order,
+            cursor=cursors.get(current_page),
+            total_count=page_data.get("total_count"),
+        )
+        # 件数は絞り込み条件が変わるまで使い回す（取得に失敗した場合は次回数え直す）
+        page_data["total_count"] = total_count
+        total_count = total_count or 0
+        if items:
+            cursors[current_page + 1] = items[-1]["cursor"]
         print(f"Got {len(items)} items from database")
         
         # 表示形式に応じて更新
@@ -981,15 +978,16 @@ def apply_filter(page: ft.Page, fields):
     search_params["item_color"] = fields["color_dropdown"].value if fields["color_dropdown"].value else "未選択"
     search_params["start_date"] = fields["start_date_field"].value if fields["start_date_field"].value else None
     search_params["end_date"] = fields["end_date_field"].value if fields["end_date_field"].value else None
-    search_params["item_class_L"] = fields["class_l_dropdown"].value if fields["class_l_dropdown"].value else "選択してください"
-    search_params["item_class_M"] = fields["class_m_dropdown"].value if fields["class_m_dropdown"].value else "選択してください"
-    search_params["item_class_S"] = fields["class_s_dropdown"].value if fields["class_s_dropdown"].value else "選択してください"
+    search_params["item_class_L"] = fields["class_l_dropdown"].value if fields["class_l_dropdown"].value else CLASS_PLACEHOLDER
+    search_params["item_class_M"] = fields["class_m_dropdown"].value if fields["class_m_dropdown"].value else CLASS_PLACEHOLDER
+    search_params["item_class_S"] = fields["class_s_dropdown"].value if fields["class_s_dropdown"].value else CLASS_PLACEHOLDER
     search_params["valuable_only"] = fields["valuable_checkbox"].value
     search_params["show_refunded"] = fields["refunded_checkbox"].value
     search_params["show_disposed"] = fields["disposed_checkbox"].value
     
     page_data["search_params"] = search_params
     page_data["current_page"] = 1
+    reset_pagination(page_data)
     
     load_items(page)
 
@@ -1003,9 +1001,11 @@ def reset_filter(page: ft.Page, fields):
     fields["feature_field"].value = ""
     fields["area_field"].value = ""
     fields["color_dropdown"].value = "未選択"
-    fields["class_l_dropdown"].value = "選択してください"
-    fields["class_m_dropdown"].value = "選択してください"
-    fields["class_s_dropdown"].value = "選択してください"
+    fields["class_l_dropdown"].value = CLASS_PLACEHOLDER
+    fields["class_m_dropdown"].options = class_filter_options([])
+    fields["class_m_dropdown"].value = CLASS_PLACEHOLDER
+    fields["class_s_dropdown"].options = class_filter_options([])
+    fields["class_s_dropdown"].value = CLASS_PLACEHOLDER
     fields["start_date_field"].value = ""
     fields["end_date_field"].value = ""
     fields["valuable_checkbox"].value = False
@@ -1014,6 +1014,7 @@ def reset_filter(page: ft.Page, fields):
     
     page_data["search_params"] = None
     page_data["current_page"] = 1
+    reset_pagination(page_data)
     
     # フォームを更新
     for field in fields.values():
@@ -1022,11 +1023,20 @@ def reset_filter(page: ft.Page, fields):
     load_items(page)
 
 
+def reset_pagination(page_data, keep_count=False):
+    """ページングのカーソルを破棄（keep_count=False の場合は件数も再計算させる）"""
+    page_data["cursors"] = {1: None}
+    if not keep_count:
+        page_data["total_count"] = None
+
+
 def change_sort(page: ft.Page, sort_order):
     """並べ替え順を変更"""
     page_data = page.data
     page_data["sort_order"] = sort_order
     page_data["current_page"] = 1
+    # 並べ替えでは件数は変わらないため、カーソルだけを破棄する
+    reset_pagination(page_data, keep_count=True)
     load_items(page)
 
 
@@ -1087,7 +1097,7 @@ def delete_item(page: ft.Page, item_id):
     """アイテムをゴミ箱に移動（論理削除）"""
     def confirm_delete(e):
         try:
-            conn = sqlite3.connect(str(DB_PATH))
+            conn = db.connect()
             cur = conn.cursor()
             # 論理削除：item_situationを'削除済み'に変更
             cur.execute("UPDATE lost_items SET item_situation = '削除済み' WHERE id = ?", (item_id,))
@@ -1096,6 +1106,9 @@ def delete_item(page: ft.Page, item_id):
             
             print(f"アイテム ID {item_id} をゴミ箱に移動しました")
             
+            # 件数が変わるため再計算させる（カーソルはそのまま使える）
+            page.data["total_count"] = None
+            
             # ダイアログを閉じる
             page.overlay.pop()
             page.update()
@@ -1,5 +1,5 @@
 import flet as ft
-import sqlite3
+from core import db
 import hashlib
 import sys
 from pathlib import Path
@@ -44,7 +44,7 @@ def verify_user(username: str, password: str) -> dict:
     """ユーザー認証"""
     conn = None
     try:
-        conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+        conn = db.connect()
         cur = conn.cursor()
         
         # 既存のusersテーブルの構造を確認
@@ -340,7 +340,7 @@ class LoginDialog(ft.UserControl):
             
             conn = None
             try:
-                conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+                conn = db.connect()
                 cur = conn.cursor()
                 
                 # ユーザー名の重複チェック
@@ -1,5 +1,7 @@
 import flet as ft
-import sqlite3
+from core import db
+from core.query import Where
+from core.search import KeywordSearch
 import json
 from datetime import datetime, date, timedelta
 from pathlib import Path
@@ -28,7 +30,7 @@ def get_notfound_items(page=1, per_page=50, search_params=None, sort_order="date
 	
 	try:
 		print(f"get_notfound_items: Connecting to database...")
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+		conn = db.connect()
 		cur = conn.cursor()
 		print(f"get_notfound_items: Connected successfully")
         
@@ -40,19 +42,16 @@ def get_notfound_items(page=1, per_page=50, search_params=None, sort_order="date
 			if search_params.get("keyword"):
 				keyword = search_params["keyword"].strip()
 				if keyword:
-					where_conditions.append("(name LIKE ? OR phone LIKE ? OR location LIKE ? OR item LIKE ?)")
-					keyword_param = f"%{keyword}%"
-					params.extend([keyword_param, keyword_param, keyword_param, keyword_param])
+					# 氏名・電話番号・場所・品物を全文検索索引で絞り込む
+					keyword_where = KeywordSearch(conn, "notfound_items", keyword).apply(Where())
+					where_conditions.extend(keyword_where.conditions)
+					params.extend(keyword_where.params)
             
-		if search_params.get("start_date") and search_params.get("end_date"):
-			where_conditions.append("DATE(lost_date) BETWEEN ? AND ?")
-			params.extend([search_params["start_date"], search_params["end_date"]])
-		elif search_params.get("start_date"):
-			where_conditions.append("DATE(lost_date) >= ?")
-			params.append(search_params["start_date"])
-		elif search_params.get("end_date"):
-			where_conditions.append("DATE(lost_date) <= ?")
-			params.append(search_params["end_date"])
+		if search_params and (search_params.get("start_date") or search_params.get("end_date")):
+			# DATE(lost_date) で包まずに範囲条件にしてインデックスを使う
+			date_where = Where().date_between("lost_date", search_params.get("start_date"), search_params.get("end_date"))
+			where_conditions.extend(date_where.conditions)
+			params.extend(date_where.params)
 		
 		# 状態フィルター（すべてを選択した場合は何も表示しない問題を修正）
 		if search_params and search_params.get("status") and search_params["status"] != "":
@@ -91,7 +90,9 @@ def get_notfound_items(page=1, per_page=50, search_params=None, sort_order="date
 		query = f"""
 			SELECT 
 				id, name, phone, lost_date, location, item,
-				status, contact_date, return_date, created_at, updated_at
+				status, contact_date, return_date, created_at, updated_at,
+				(SELECT COUNT(*) FROM match_candidates m WHERE m.notfound_id = notfound_items.id),
+				(SELECT MAX(score) FROM match_candidates m WHERE m.notfound_id = notfound_items.id)
 			FROM notfound_items 
 			{where_clause}
 			{order_clause}
@@ -112,7 +113,10 @@ def get_notfound_items(page=1, per_page=50, search_params=None, sort_order="date
 				"contact_date": row[7] or "",
 				"return_date": row[8] or "",
 				"created_at": row[9] or "",
-				"updated_at": row[10] or ""
+				"updated_at": row[10] or "",
+				# マッチング一括処理・拾得物登録時に保存された一致候補
+				"match_count": row[11] or 0,
+				"match_score": row[12] or 0
 			})
 		
 		conn.close()
@@ -432,9 +436,16 @@ def build_notfound_list_content(page: ft.Page) -> ft.Control:
 							ft.Text(f"内容: {item_content}", size=11, color=ft.colors.GREY_600)
 						], spacing=2, width=250),
 						
-						# 状態
+						# 状態（一致候補があれば件数と最高スコアを併記）
 						ft.Container(
-							content=ft.Text(status_text, size=12, weight=ft.FontWeight.BOLD, color=status_color),
+							content=ft.Column([
+								ft.Text(status_text, size=12, weight=ft.FontWeight.BOLD, color=status_color),
+								ft.Text(
+									f"候補 {item['match_count']}件 ({int(item['match_score'] * 100)}%)",
+									size=10, color=ft.colors.BLUE_700,
+									visible=item["match_count"] > 0
+								)
+							], spacing=2, horizontal_alignment=ft.CrossAxisAlignment.CENTER),
 							width=100,
 							alignment=ft.alignment.center
 						),
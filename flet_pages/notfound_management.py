@@ -1,6 +1,7 @@
 import flet as ft
 from datetime import datetime, date
-from apps.config import COLOR, SEX, ITEM_CLASS_L, ITEM_CLASS_M, ITEM_CLASS_S
+from apps.config import COLOR, SEX
+from core import taxonomy
 
 MINUTES_15 = ["00", "15", "30", "45"]
 HOURS = [f"{h:02d}" for h in range(0, 24)]
@@ -87,16 +88,16 @@ class NotFoundManagementView(ft.UserControl):
 		self.card_contact_min = ft.Dropdown(options=[ft.dropdown.Option(x) for x in MINUTES_15], value=nm, width=90)
 		self.card_manager = ft.TextField(label="連絡者", width=200)
 
-		# 物件分類
-		self.item_class_L = ft.Dropdown(label="---", options=[ft.dropdown.Option(x) for x in ITEM_CLASS_L], width=150)
+		# 物件分類（core/taxonomy.py の組み立て済みの分類）
+		tax = taxonomy.load()
+		self.item_class_L = ft.Dropdown(label="---", options=[ft.dropdown.Option(x) for x in tax.large], width=150)
 		self.item_class_M = ft.Dropdown(label="---", width=150)
 		self.item_class_S = ft.Dropdown(label="---", width=150)
 
 		# L→M→S の連動
 		def on_L_change(e):
 			val = self.item_class_L.value
-			m_opts = [m["value"] for m in ITEM_CLASS_M if m.get("data-val") == val]
-			self.item_class_M.options = [ft.dropdown.Option(x) for x in m_opts]
+			self.item_class_M.options = [ft.dropdown.Option(x) for x in tax.mediums(val)]
 			self.item_class_M.value = None
 			self.item_class_M.update()
 			self.item_class_S.options = []
@@ -106,8 +107,7 @@ class NotFoundManagementView(ft.UserControl):
 
 		def on_M_change(e):
 			val = self.item_class_M.value
-			s_opts = [s["value"] for s in ITEM_CLASS_S if s.get("data-val") == val]
-			self.item_class_S.options = [ft.dropdown.Option(x) for x in s_opts]
+			self.item_class_S.options = [ft.dropdown.Option(x) for x in tax.smalls(val)]
 			self.item_class_S.value = None
 			self.item_class_S.update()
 		self.item_class_M.on_change = on_M_change
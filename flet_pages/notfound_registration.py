@@ -1,6 +1,6 @@
 import flet as ft
 from datetime import datetime, date
-import sqlite3
+from core import app_settings, db, matching
 from pathlib import Path
 
 MINUTES_15 = ["00", "15", "30", "45"]
@@ -10,19 +10,9 @@ HOURS = [f"{h:02d}" for h in range(0, 24)]
 DB_PATH = Path(__file__).parent.parent / "lostitem.db"
 
 def get_find_places():
-	"""設定からの拾得場所一覧を取得"""
+	"""設定からの拾得場所一覧を取得（core/app_settings.py のキャッシュから取得）"""
 	try:
-		conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
-		cur = conn.cursor()
-		cur.execute("SELECT value FROM settings WHERE key = 'find_places'")
-		result = cur.fetchone()
-		conn.close()
-		
-		if result and result[0]:
-			import json
-			places = json.loads(result[0])
-			return places if isinstance(places, list) else []
-		return []
+		return app_settings.get_list("find_places")
 	except Exception as e:
 		print(f"拾得場所読み込みエラー: {e}")
 		return []
@@ -812,17 +802,29 @@ class NotFoundRegistrationView(ft.UserControl):
 
 	def show_matching_dialog(self):
 		"""マッチング確認ダイアログを表示"""
+		# 登録した内容でマッチングする（ダイアログ表示前に入力値を確保）
+		report = matching.Report.from_form(self.collect())
+
 		def on_matching_click():
-			# マッチング画面へ遷移（後日実装）
 			if self.page:
 				self.page.dialog.open = False
 				self.page.update()
-				self.page.snack_bar = ft.SnackBar(
-					content=ft.Text("マッチング機能は後日対応予定です", color=ft.colors.WHITE),
-					bgcolor=ft.colors.ORANGE_700
-				)
-				self.page.snack_bar.open = True
-				self.page.go("/")
+				try:
+					conn = db.connect()
+					try:
+						matches = matching.find_matches(conn, report)
+					finally:
+						conn.close()
+				except Exception as e:
+					print(f"マッチングエラー: {e}")
+					self.page.snack_bar = ft.SnackBar(
+						content=ft.Text(f"マッチングエラー: {e}", color=ft.colors.WHITE),
+						bgcolor=ft.colors.RED_700
+					)
+					self.page.snack_bar.open = True
+					self.page.update()
+					return
+				self.show_matching_results(matches)
 
 		def on_home_click():
 			# ホームへ戻る
@@ -873,6 +875,50 @@ class NotFoundRegistrationView(ft.UserControl):
 			dialog.open = True
 			self.page.update()
 	
+	def show_matching_results(self, matches):
+		"""マッチング結果（一致する可能性の高い拾得物）を表示"""
+		def on_close():
+			if self.page:
+				self.page.dialog.open = False
+				self.page.update()
+				self.page.go("/")
+
+		if matches:
+			rows = []
+			for m in matches:
+				category = " / ".join(v for v in (m["item_class_L"], m["item_class_M"]) if v)
+				rows.append(
+					ft.Container(
+						content=ft.Row([
+							ft.Text(f"{int(m['score'] * 100)}%", size=16, weight=ft.FontWeight.BOLD, color=ft.colors.BLUE_700, width=50),
+							ft.Column([
+								ft.Text(f"{category or '分類なし'}　{m['item_color'] or ''}", size=14, weight=ft.FontWeight.BOLD),
+								ft.Text(f"拾得日: {m['get_item'] or '-'}　拾得場所: {m['find_area'] or '-'}", size=12, color=ft.colors.GREY_700),
+								ft.Text(m["item_feature"] or "", size=12, color=ft.colors.GREY_700, max_lines=2),
+							], spacing=2, expand=True),
+						]),
+						padding=8,
+						border=ft.border.only(bottom=ft.border.BorderSide(1, ft.colors.GREY_300)),
+					)
+				)
+			body = ft.Column(rows, scroll=ft.ScrollMode.AUTO, spacing=0)
+		else:
+			body = ft.Container(
+				content=ft.Text("一致する可能性のある拾得物は見つかりませんでした", size=14, color=ft.colors.GREY_700),
+				alignment=ft.alignment.center
+			)
+
+		dialog = ft.AlertDialog(
+			title=ft.Text(f"マッチング結果（{len(matches)}件）", size=18, weight=ft.FontWeight.BOLD),
+			content=ft.Container(content=body, width=480, height=360),
+			actions=[ft.TextButton("閉じる", on_click=lambda e: on_close())],
+			actions_alignment=ft.MainAxisAlignment.END
+		)
+		if self.page:
+			self.page.dialog = dialog
+			dialog.open = True
+			self.page.update()
+
 	def collect(self):
 		"""入力データを収集"""
 		# 遺失場所の値を取得（手入力またはプルダウン）
@@ -1,14 +1,9 @@
 import flet as ft
 from datetime import datetime, date
 import requests
-import cv2
-import base64
-import io
-import json
-from pathlib import Path
-from PIL import Image
-from apps.config import OWN_WAIVER, NOTE, COLOR, STORAGE_PLACE, ITEM_CLASS_L, ITEM_CLASS_M, ITEM_CLASS_S, REPORT_NECESSITY, STORE
+from apps.config import OWN_WAIVER, NOTE, COLOR, STORAGE_PLACE, REPORT_NECESSITY, STORE
 from flet_pages.money_registration import MoneyRegistrationView
+from core import app_settings, classifier, taxonomy, thumbnails
 
 MINUTES_15 = ["00", "15", "30", "45"]
 HOURS = [f"{h:02d}" for h in range(0, 24)]
@@ -68,8 +63,8 @@ class RegisterFormView(ft.UserControl):
 		# エラーメッセージ表示用
 		self.error_banner = None
 		
-		# 分類データの読み込み
-		self.classification_data = self._load_classification_data()
+		# 分類データの読み込み（core/taxonomy.py の組み立て済みの分類を共有）
+		self.taxonomy = taxonomy.load()
 		
 		# 拾得場所データの読み込み
 		self.find_places_data = self._load_find_places()
@@ -174,8 +169,10 @@ class RegisterFormView(ft.UserControl):
 		if data.get("item_class_L"):
 			self.item_class_L.value = str(data["item_class_L"])
 		if data.get("item_class_M"):
+			self.item_class_M.options = [ft.dropdown.Option(x) for x in self.taxonomy.mediums(self.item_class_L.value)]
 			self.item_class_M.value = str(data["item_class_M"])
 		if data.get("item_class_S"):
+			self.item_class_S.options = [ft.dropdown.Option(x) for x in self.taxonomy.smalls(self.item_class_M.value)]
 			self.item_class_S.value = str(data["item_class_S"])
 		if data.get("item_color"):
 			self.color.value = str(data["item_color"])
@@ -273,8 +270,8 @@ class RegisterFormView(ft.UserControl):
 					if ai_result.get("medium_category"):
 						# 中分類のオプションを更新
 						large_val = ai_result["large_category"]
-						if large_val in self.classification_data.get("medium_categories", {}):
-							medium_opts = self.classification_data["medium_categories"][large_val]
+						medium_opts = self.taxonomy.mediums(large_val)
+						if medium_opts:
 							self.item_class_M.options = [ft.dropdown.Option(x) for x in medium_opts]
 							self.item_class_M.value = ai_result["medium_category"]
 							self._check_if_money()
@@ -283,8 +280,8 @@ class RegisterFormView(ft.UserControl):
 					if ai_result.get("small_category"):
 						# 小分類のオプションを更新
 						medium_val = ai_result["medium_category"]
-						if medium_val in self.classification_data.get("small_categories", {}):
-							small_opts = self.classification_data["small_categories"][medium_val]
+						small_opts = self.taxonomy.smalls(medium_val)
+						if small_opts:
 							self.item_class_S.options = [ft.dropdown.Option(x) for x in small_opts]
 							self.item_class_S.value = ai_result["small_category"]
 							self._check_if_money()
@@ -294,158 +291,39 @@ class RegisterFormView(ft.UserControl):
 		except Exception as e:
 			print(f"AI分類結果適用エラー: {e}")
 	
-	def _load_classification_data(self):
-		"""分類データを読み込み"""
-		try:
-			# item_classification.jsonを読み込み
-			json_path = Path(__file__).parent.parent / "item_classification.json"
-			with open(json_path, 'r', encoding='utf-8') as f:
-				json_data = json.load(f)
-			
-			# config.pyの分類データを読み込み
-			from apps.config import ITEM_CLASS_L, ITEM_CLASS_M, ITEM_CLASS_S
-			
-			# 統合された分類データを作成
-			classification_data = {
-				"large_categories": [],
-				"medium_categories": {},
-				"small_categories": {}
-			}
-			
-			# 大分類の統合
-			large_categories = set(ITEM_CLASS_L)
-			
-			# JSONからも大分類を追加
-			for item in json_data:
-				large_categories.add(item["large_category_name_ja"])
-			
-			classification_data["large_categories"] = sorted(list(large_categories))
-			
-			# 中分類の統合
-			for item in ITEM_CLASS_M:
-				large = item["data-val"]
-				medium = item["value"]
-				if large not in classification_data["medium_categories"]:
-					classification_data["medium_categories"][large] = []
-				classification_data["medium_categories"][large].append(medium)
-			
-			# JSONからも中分類を追加
-			for item in json_data:
-				large = item["large_category_name_ja"]
-				for medium_item in item["medium_categories"]:
-					medium = medium_item["medium_category_name_ja"]
-					if large not in classification_data["medium_categories"]:
-						classification_data["medium_categories"][large] = []
-					if medium not in classification_data["medium_categories"][large]:
-						classification_data["medium_categories"][large].append(medium)
-			
-			# 小分類の統合
-			for item in ITEM_CLASS_S:
-				medium = item["data-val"]
-				small = item["value"]
-				if medium not in classification_data["small_categories"]:
-					classification_data["small_categories"][medium] = []
-				classification_data["small_categories"][medium].append(small)
-			
-			return classification_data
-			
-		except Exception as e:
-			print(f"分類データ読み込みエラー: {e}")
-			# エラー時はデフォルトの分類データを使用
-			return {
-				"large_categories": ["現金", "かばん類", "財布類", "その他"],
-				"medium_categories": {
-					"現金": ["現金"],
-					"かばん類": ["手提げかばん", "肩掛けかばん", "その他かばん類"],
-					"財布類": ["財布", "がま口", "小銭入れ"],
-					"その他": ["その他"]
-				},
-				"small_categories": {
-					"現金": ["現金"],
-					"手提げかばん": ["ハンドバッグ", "ビジネスバッグ", "トートバッグ"],
-					"肩掛けかばん": ["ショルダーバッグ", "リュックサック"],
-					"財布": ["札入れ", "財布"],
-					"その他": ["その他"]
-				}
-			}
+	def _suggest_item_class_from_feature(self):
+		"""分類が未選択の場合、特徴の記述からキーワードで分類を推定して入力（core/classifier.py）"""
+		if self.item_class_L.value or not self.feature.value:
+			return
+		result = classifier.classify(self.feature.value)
+		if result is None or not self.taxonomy.has_large(result["large_category"]):
+			return
+		self.item_class_L.value = result["large_category"]
+		self.item_class_M.options = [ft.dropdown.Option(x) for x in self.taxonomy.mediums(result["large_category"])]
+		self.item_class_M.value = result["medium_category"]
+		self.item_class_S.options = [ft.dropdown.Option(x) for x in self.taxonomy.smalls(result["medium_category"])]
+		if self.taxonomy.has_small(result["medium_category"], result["small_category"]):
+			self.item_class_S.value = result["small_category"]
+		self._check_if_money()
+		self._validate_item_class()
+		self.update()
 	
 	def _load_find_places(self):
-		"""拾得場所データを読み込み（設定画面と同期）"""
+		"""拾得場所データを読み込み（設定画面と同期、core/app_settings.py のキャッシュから取得）"""
 		try:
-			import sqlite3
-			import json
-			from pathlib import Path
-			DB_PATH = Path(__file__).resolve().parent.parent / "lostitem.db"
-			
-			conn = sqlite3.connect(str(DB_PATH))
-			cur = conn.cursor()
-			
-			# settingsテーブルから拾得場所リストを取得
-			cur.execute("SELECT value FROM settings WHERE key = 'find_places'")
-			result = cur.fetchone()
-			
-			if result:
-				find_places = json.loads(result[0])
-			else:
-				# デフォルトの拾得場所リスト
-				find_places = ["1階 エントランス", "2階 トイレ前", "3階 会議室前"]
-				# デフォルトをデータベースに保存
-				cur.execute("""
-					INSERT OR REPLACE INTO settings (key, value, updated_at)
-					VALUES (?, ?, CURRENT_TIMESTAMP)
-				""", ('find_places', json.dumps(find_places, ensure_ascii=False)))
-				conn.commit()
-			
-			conn.close()
-			return find_places
+			return app_settings.find_places()
 		except Exception as e:
 			print(f"拾得場所リスト取得エラー: {e}")
 			# エラー時はデフォルトリストを返す
-			return ["1階 エントランス", "2階 トイレ前", "3階 会議室前"]
+			return list(app_settings.DEFAULT_FIND_PLACES)
 	
 	def _load_storage_places(self):
-		"""保管場所データを読み込み（設定画面と同期）"""
+		"""保管場所データを読み込み（STORAGE_PLACE + 設定画面で追加した保管場所）"""
 		try:
-			import sqlite3
-			import json
-			from pathlib import Path
-			DB_PATH = Path(__file__).resolve().parent.parent / "lostitem.db"
-			
-			# まずconfig.pyのSTORAGE_PLACEを取得
-			from apps.config import STORAGE_PLACE
-			base_places = [item[0] for item in STORAGE_PLACE]
-			
-			conn = sqlite3.connect(str(DB_PATH))
-			cur = conn.cursor()
-			
-			# settingsテーブルから保管場所リストを取得
-			cur.execute("SELECT value FROM settings WHERE key = 'storage_places'")
-			result = cur.fetchone()
-			
-			if result:
-				db_places = json.loads(result[0])
-			else:
-				# デフォルトの保管場所リスト（STORAGE_PLACEベース）
-				db_places = base_places.copy()
-				# デフォルトをデータベースに保存
-				cur.execute("""
-					INSERT OR REPLACE INTO settings (key, value, updated_at)
-					VALUES (?, ?, CURRENT_TIMESTAMP)
-				""", ('storage_places', json.dumps(db_places, ensure_ascii=False)))
-				conn.commit()
-			
-			# ベースの項目とデータベースの項目をマージ（重複は除く）
-			all_places = base_places.copy()
-			for place in db_places:
-				if place not in all_places:
-					all_places.append(place)
-			
-			conn.close()
-			return all_places
+			return app_settings.storage_places()
 		except Exception as e:
 			print(f"保管場所リスト取得エラー: {e}")
 			# エラー時はSTORAGE_PLACEベースのリストを返す
-			from apps.config import STORAGE_PLACE
 			return [item[0] for item in STORAGE_PLACE]
 	
 	def _toggle_find_place_custom(self, e):
@@ -825,7 +703,7 @@ class RegisterFormView(ft.UserControl):
 		# 物件分類・色・保管
 		self.item_class_L = ft.Dropdown(
 			hint_text="分類（大）を選択",
-			options=[ft.dropdown.Option(x) for x in ITEM_CLASS_L],
+			options=[ft.dropdown.Option(x) for x in self.taxonomy.large],
 			width=300,
 			focused_color=ft.colors.BLUE,
 			bgcolor=ft.colors.WHITE,
@@ -860,7 +738,8 @@ class RegisterFormView(ft.UserControl):
 			min_lines=2,
 			width=400,
 			focused_color=ft.colors.BLUE,
-			bgcolor=ft.colors.WHITE
+			bgcolor=ft.colors.WHITE,
+			on_blur=lambda e: self._suggest_item_class_from_feature()
 		)
 		
 		self.storage_place = ft.Dropdown(
@@ -879,8 +758,7 @@ class RegisterFormView(ft.UserControl):
 		# L→M→S の連動とバリデーション
 		def on_L_change(e):
 			val = self.item_class_L.value
-			m_opts = [m["value"] for m in ITEM_CLASS_M if m.get("data-val") == val]
-			self.item_class_M.options = [ft.dropdown.Option(x) for x in m_opts]
+			self.item_class_M.options = [ft.dropdown.Option(x) for x in self.taxonomy.mediums(val)]
 			self.item_class_M.value = None
 			self.item_class_M.update()
 			self.item_class_S.options = []
@@ -895,8 +773,7 @@ class RegisterFormView(ft.UserControl):
 
 		def on_M_change(e):
 			val = self.item_class_M.value
-			s_opts = [s["value"] for s in ITEM_CLASS_S if s.get("data-val") == val]
-			self.item_class_S.options = [ft.dropdown.Option(x) for x in s_opts]
+			self.item_class_S.options = [ft.dropdown.Option(x) for x in self.taxonomy.smalls(val)]
 			self.item_class_S.value = None
 			self.item_class_S.update()
 			
@@ -1769,39 +1646,13 @@ class RegisterFormView(ft.UserControl):
 	
 	def create_photo_thumbnail(self, frame, size=80):
 		"""フレームからサムネイルを作成（1:1正方形、左右トリミング）"""
-		# 正方形のサムネイルサイズ
-		target_size = size
-		
-		# フレームの中心部分を正方形にクロップ
-		h, w = frame.shape[:2]
-		if w > h:
-			# 横長の場合：左右をトリミング
-			start_x = (w - h) // 2
-			cropped_frame = frame[:, start_x:start_x + h]
-		else:
-			# 縦長の場合：上下をトリミング
-			start_y = (h - w) // 2
-			cropped_frame = frame[start_y:start_y + w, :]
-		
-		# 正方形にリサイズ
-		small_frame = cv2.resize(cropped_frame, (target_size, target_size), interpolation=cv2.INTER_AREA)
-		rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-		
-		# PIL Imageに変換
-		pil_image = Image.fromarray(rgb_frame)
-		
-		# 解像度を下げる（JPEGの品質を下げる）
-		img_byte_arr = io.BytesIO()
-		pil_image.save(img_byte_arr, format='JPEG', quality=60, optimize=True)
-		img_byte_arr = img_byte_arr.getvalue()
-		
-		# Base64エンコード
-		img_base64 = base64.b64encode(img_byte_arr).decode()
+		# 同じフレームのサムネイルは再利用する（フォームを作り直すたびに圧縮しない）
+		img_base64 = thumbnails.frame_thumbnail_base64(frame, size)
 		
 		return ft.Image(
 			src_base64=img_base64,
-			width=target_size,
-			height=target_size,
+			width=size,
+			height=size,
 			fit=ft.ImageFit.COVER,  # 正方形で余白をなくす
 			border_radius=4
 		)
@@ -1827,32 +1678,13 @@ class RegisterFormView(ft.UserControl):
 			self.on_back_to_camera()
 
 	def _get_staff_list(self):
-		"""設定から担当者リストを取得"""
+		"""設定から担当者リストを取得（core/app_settings.py のキャッシュから取得）"""
 		try:
-			import sqlite3
-			import json
-			from pathlib import Path
-			DB_PATH = Path(__file__).resolve().parent.parent / "lostitem.db"
-			
-			conn = sqlite3.connect(str(DB_PATH))
-			cur = conn.cursor()
-			
-			# settingsテーブルから担当者リストを取得
-			cur.execute("SELECT value FROM settings WHERE key = 'staff_list'")
-			result = cur.fetchone()
-			
-			if result:
-				staff_list = json.loads(result[0])
-			else:
-				# デフォルトの担当者リスト
-				staff_list = ["佐藤", "鈴木", "田中", "高橋"]
-			
-			conn.close()
-			return staff_list
+			return app_settings.staff_list()
 		except Exception as e:
 			print(f"担当者リスト取得エラー: {e}")
 			# エラー時はデフォルトリストを返す
-			return ["佐藤", "鈴木", "田中", "高橋"]
+			return list(app_settings.DEFAULT_STAFF_LIST)
 	
 	def did_mount(self):
 		# DatePicker をページオーバーレイに追加
@@ -1,42 +1,20 @@
 import flet as ft
-import json
-import sqlite3
+from core import db, taxonomy, thumbnails
+from core.query import Where
+from core.search import KeywordSearch
 from datetime import date, datetime, timedelta
 from pathlib import Path
-import cv2
+from core.lazy import lazy_import
 import base64
 import io
 from PIL import Image
 
+cv2 = lazy_import("cv2")  # 起動時間短縮のため最初に使うときに読み込む
+
 # データベースパス
 DB_PATH = Path(__file__).resolve().parent.parent / "lostitem.db"
 
 # 定数定義
-ITEM_CLASS_L = [
-    "衣類・履物", "貴重品", "電化製品", "文房具・書籍", 
-    "化粧品・日用品", "食品・飲料", "その他"
-]
-
-ITEM_CLASS_M = [
-    {"value": "財布", "data-val": "貴重品"},
-    {"value": "鍵", "data-val": "貴重品"},
-    {"value": "携帯電話", "data-val": "電化製品"},
-    {"value": "スマートフォン", "data-val": "電化製品"},
-    {"value": "時計", "data-val": "貴重品"},
-    {"value": "眼鏡", "data-val": "その他"},
-    {"value": "カバン・バッグ", "data-val": "衣類・履物"},
-    {"value": "帽子", "data-val": "衣類・履物"},
-    {"value": "靴", "data-val": "衣類・履物"},
-    {"value": "傘", "data-val": "その他"},
-]
-
-ITEM_CLASS_S = [
-    {"value": "革製", "data-val": "財布"},
-    {"value": "布製", "data-val": "財布"},
-    {"value": "金属製", "data-val": "鍵"},
-    {"value": "プラスチック製", "data-val": "鍵"},
-]
-
 COLOR = [
     ("黒", "黒"), ("白", "白"), ("赤", "赤"), ("青", "青"), ("緑", "緑"),
     ("黄", "黄"), ("茶", "茶"), ("灰", "灰"), ("紫", "紫"), ("ピンク", "ピンク"),
@@ -184,10 +162,11 @@ class SearchManagementView(ft.UserControl):
             border_radius=8,
         )
         
-        # 分類
+        # 分類（core/taxonomy.py の組み立て済みの分類）
+        tax = taxonomy.load()
         self.class_l_dropdown = ft.Dropdown(
             label="分類（大）",
-            options=[ft.dropdown.Option(x) for x in ITEM_CLASS_L],
+            options=[ft.dropdown.Option(x) for x in tax.large],
             width=180,
             height=45,
             border_radius=8,
@@ -231,8 +210,7 @@ class SearchManagementView(ft.UserControl):
         # 分類の連動
         def on_class_l_change(e):
             val = self.class_l_dropdown.value
-            m_opts = [m["value"] for m in ITEM_CLASS_M if m.get("data-val") == val]
-            self.class_m_dropdown.options = [ft.dropdown.Option(x) for x in m_opts]
+            self.class_m_dropdown.options = [ft.dropdown.Option(x) for x in tax.mediums(val)]
             self.class_m_dropdown.value = None
             self.class_m_dropdown.update()
             self.class_s_dropdown.options = []
@@ -242,8 +220,7 @@ class SearchManagementView(ft.UserControl):
         
         def on_class_m_change(e):
             val = self.class_m_dropdown.value
-            s_opts = [s["value"] for s in ITEM_CLASS_S if s.get("data-val") == val]
-            self.class_s_dropdown.options = [ft.dropdown.Option(x) for x in s_opts]
+            self.class_s_dropdown.options = [ft.dropdown.Option(x) for x in tax.smalls(val)]
             self.class_s_dropdown.value = None
             self.class_s_dropdown.update()
         self.class_m_dropdown.on_change = on_class_m_change
@@ -359,71 +336,55 @@ class SearchManagementView(ft.UserControl):
     def perform_search(self, e):
         """検索を実行"""
         try:
-            conn = sqlite3.connect(str(DB_PATH))
+            conn = db.connect()
             cur = conn.cursor()
             
             # 検索条件を構築
-            where_conditions = []
-            params = []
+            where = Where()
             
-            # 検索ワード
-            if self.search_word_field.value:
-                search_word = f"%{self.search_word_field.value}%"
-                where_conditions.append("""
-                    (feature LIKE ? OR maker LIKE ? OR remarks LIKE ? OR 
-                     item_class_l LIKE ? OR item_class_m LIKE ? OR item_class_s LIKE ?)
-                """)
-                params.extend([search_word] * 6)
+            # 検索ワード（全文検索索引で絞り込み、関連度の高い順に並べる）
+            keyword = KeywordSearch(conn, "lost_items", self.search_word_field.value)
+            keyword.apply_like(where)
             
             # 日付範囲
-            if self.date_from_field.value:
-                where_conditions.append("DATE(get_item) >= ?")
-                params.append(self.date_from_field.value)
-            
-            if self.date_to_field.value:
-                where_conditions.append("DATE(get_item) <= ?")
-                params.append(self.date_to_field.value)
+            if self.date_from_field.value or self.date_to_field.value:
+                where.date_between("get_item", self.date_from_field.value, self.date_to_field.value)
             
             # 色
             if self.color_dropdown.value:
-                where_conditions.append("color = ?")
-                params.append(self.color_dropdown.value)
+                where.equals("item_color", self.color_dropdown.value)
             
             # 分類
             if self.class_l_dropdown.value:
-                where_conditions.append("item_class_l = ?")
-                params.append(self.class_l_dropdown.value)
+                where.equals("item_class_L", self.class_l_dropdown.value)
             
             if self.class_m_dropdown.value:
-                where_conditions.append("item_class_m = ?")
-                params.append(self.class_m_dropdown.value)
+                where.equals("item_class_M", self.class_m_dropdown.value)
             
             if self.class_s_dropdown.value:
-                where_conditions.append("item_class_s = ?")
-                params.append(self.class_s_dropdown.value)
+                where.equals("item_class_S", self.class_s_dropdown.value)
             
             # 保管場所
             if self.storage_dropdown.value:
-                where_conditions.append("storage_place = ?")
-                params.append(self.storage_dropdown.value)
+                where.equals("item_storage_place", self.storage_dropdown.value)
             
             # ステータス
             if self.status_dropdown.value == "stored":
-                where_conditions.append("item_situation = '保管中'")
+                where.add("item_situation = '保管中'")
             elif self.status_dropdown.value == "refunded":
-                where_conditions.append("refund_situation = '済'")
+                where.add("refund_situation = '済'")
             
             # SQLクエリを構築
-            where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-            
             query = f"""
-                SELECT id, item_image, get_item, get_item_hour, get_item_minute,
-                       item_class_l, item_class_m, item_class_s, color, feature,
-                       item_situation, refund_situation, storage_place
+                SELECT id, cover_photo, get_item, get_item_hour, get_item_minute,
+                       item_class_L, item_class_M, item_class_S, item_color, item_feature,
+                       item_situation, refund_situation, item_storage_place
                 FROM lost_items
-                WHERE {where_clause}
-                ORDER BY get_item DESC
+                {keyword.join()}
+                {where.sql()}
+                ORDER BY {keyword.rank_order("get_item DESC")}
             """
+            params = keyword.join_params + where.params
             
             cur.execute(query, params)
             rows = cur.fetchall()
@@ -432,19 +393,8 @@ class SearchManagementView(ft.UserControl):
             # 検索結果を処理
             self.search_results = []
             for row in rows:
-                item_id, item_image, get_date, hour, minute, class_l, class_m, class_s, color, feature, item_situation, refund_situation, storage_place = row
-                
-                # 画像パスを取得
-                img_path = None
-                if item_image:
-                    try:
-                        data = json.loads(item_image)
-                        if isinstance(data, dict) and data.get("photos"):
-                            img_path = data["photos"][0] if data["photos"] else None
-                        elif isinstance(data, list) and len(data) > 0:
-                            img_path = data[0]
-                    except:
-                        img_path = item_image
+                # 画像は表紙の写真（core/photos.py で登録時に決めたもの）
+                item_id, img_path, get_date, hour, minute, class_l, class_m, class_s, color, feature, item_situation, refund_situation, storage_place = row
                 
                 self.search_results.append({
                     "id": item_id,
@@ -494,7 +444,7 @@ class SearchManagementView(ft.UserControl):
             # 画像のサムネイルを作成
             if item["image"] and Path(item["image"]).exists():
                 img = ft.Image(
-                    src=item["image"],
+                    **thumbnails.image_source(item["image"], 120),
                     width=120,
                     height=120,
                     fit=ft.ImageFit.COVER,
@@ -553,7 +503,7 @@ class SearchManagementView(ft.UserControl):
             # 画像のサムネイル
             if item["image"] and Path(item["image"]).exists():
                 img = ft.Image(
-                    src=item["image"],
+                    **thumbnails.image_source(item["image"], 80),
                     width=80,
                     height=80,
                     fit=ft.ImageFit.COVER,
@@ -649,7 +599,7 @@ class SearchManagementView(ft.UserControl):
         # メイン画像
         if item["image"] and Path(item["image"]).exists():
             main_img = ft.Image(
-                src=item["image"],
+                **thumbnails.image_source(item["image"], 200),
                 width=200,
                 height=200,
                 fit=ft.ImageFit.COVER,
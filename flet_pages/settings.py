@@ -1,8 +1,8 @@
 import flet as ft
-import sqlite3
+from core import app_settings, db
+from data.config import DB_BACKUP_DIR
 import hashlib
 from pathlib import Path
-from datetime import datetime
 
 DB_PATH = Path(__file__).resolve().parent.parent / "lostitem.db"
 
@@ -14,7 +14,7 @@ def hash_password(password: str) -> str:
 def get_user_store_name(user_id):
     """ユーザーの店舗名を取得"""
     try:
-        conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+        conn = db.connect()
         cur = conn.cursor()
         # カラムが存在するかチェック
         cur.execute("PRAGMA table_info(users)")
@@ -33,7 +33,7 @@ def get_user_store_name(user_id):
 def update_user_store_name(user_id, store_name):
     """ユーザーの店舗名を更新"""
     try:
-        conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+        conn = db.connect()
         cur = conn.cursor()
         cur.execute("UPDATE users SET store_name = ? WHERE id = ?", (store_name, user_id))
         conn.commit()
@@ -157,7 +157,7 @@ class SettingsView(ft.UserControl):
         def save_facility_name():
             """施設名を保存"""
             try:
-                conn = sqlite3.connect(str(DB_PATH))
+                conn = db.connect()
                 cur = conn.cursor()
                 
                 # 施設名を設定テーブルに保存
@@ -173,6 +173,7 @@ class SettingsView(ft.UserControl):
                 
                 conn.commit()
                 conn.close()
+                app_settings.invalidate()
                 
                 self.page.snack_bar = ft.SnackBar(ft.Text("施設名を保存しました"), bgcolor=ft.colors.GREEN_700)
                 self.page.snack_bar.open = True
@@ -885,7 +886,7 @@ class SettingsView(ft.UserControl):
         backup_section = ft.Container(
             content=ft.Column([
                 ft.Text("データバックアップ", size=16, weight=ft.FontWeight.BOLD),
-                ft.Text("データベース全体をバックアップします", size=12, color=ft.colors.GREY_600),
+                ft.Text("データベースと写真をバックアップします（写真は追加・変更分のみ）", size=12, color=ft.colors.GREY_600),
                 ft.Row([
                     ft.ElevatedButton(
                         "バックアップ作成",
@@ -1012,63 +1013,11 @@ class SettingsView(ft.UserControl):
     # ========================================
     
     def get_general_settings(self):
-        """一般設定を取得"""
-        print("get_general_settings: 開始")
+        """一般設定を取得（core/app_settings.py のキャッシュから取得）"""
         try:
-            print(f"get_general_settings: DB接続開始 - {DB_PATH}")
-            conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
-            print("get_general_settings: DB接続成功")
-            cur = conn.cursor()
-            
-            print("get_general_settings: settingsテーブル作成")
-            # settingsテーブルが存在しない場合は作成
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            print("get_general_settings: settingsテーブル作成完了")
-            
-            # 既存のテーブルにupdated_atカラムがない場合は追加
-            print("get_general_settings: updated_atカラムチェック")
-            try:
-                cur.execute("SELECT updated_at FROM settings LIMIT 1")
-                print("get_general_settings: updated_atカラム存在")
-            except sqlite3.OperationalError:
-                # カラムが存在しない場合は追加
-                print("get_general_settings: updated_atカラム追加")
-                cur.execute("ALTER TABLE settings ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
-                conn.commit()
-                print("get_general_settings: updated_atカラム追加完了")
-            
-            # デフォルトの担当者リストを初期化
-            print("get_general_settings: staff_listチェック")
-            cur.execute("SELECT value FROM settings WHERE key = 'staff_list'")
-            result = cur.fetchone()
-            if not result:
-                # デフォルトの担当者リストを設定
-                print("get_general_settings: staff_list初期化")
-                import json
-                default_staff = ["佐藤", "鈴木", "田中", "高橋"]
-                cur.execute("INSERT INTO settings (key, value) VALUES (?, ?)", 
-                          ("staff_list", json.dumps(default_staff, ensure_ascii=False)))
-                conn.commit()
-                print("get_general_settings: staff_list初期化完了")
-            else:
-                print("get_general_settings: staff_list存在")
-            
-            print("get_general_settings: 全設定取得")
-            settings = {}
-            cur.execute("SELECT key, value FROM settings")
-            for row in cur.fetchall():
-                settings[row[0]] = row[1]
-            print(f"get_general_settings: 設定取得完了 - {len(settings)}件")
-            
-            conn.close()
-            print("get_general_settings: DB接続クローズ完了")
-            return settings
+            # 担当者リストが未設定の場合はデフォルトを保存
+            app_settings.staff_list()
+            return app_settings.get_cache().all()
         except Exception as e:
             print(f"設定取得エラー: {e}")
             import traceback
@@ -1078,72 +1027,28 @@ class SettingsView(ft.UserControl):
     def get_staff_list(self):
         """担当者リストを取得"""
         try:
-            import json
-            settings = self.get_general_settings()
-            staff_json = settings.get("staff_list", "[]")
-            return json.loads(staff_json)
+            return app_settings.staff_list()
         except Exception as e:
             print(f"担当者リスト取得エラー: {e}")
-            return ["佐藤", "鈴木", "田中", "高橋"]
+            return list(app_settings.DEFAULT_STAFF_LIST)
     
     def get_storage_places(self):
         """保管場所リストを取得（register_form.pyのSTORAGE_PLACEと同期）"""
         try:
-            import json
-            # register_form.pyのSTORAGE_PLACEから取得
-            from apps.config import STORAGE_PLACE
-            base_places = [item[0] for item in STORAGE_PLACE]  # タプルの最初の要素を取得
-            
-            settings = self.get_general_settings()
-            storage_json = settings.get("storage_places", "[]")
-            if not storage_json:
-                # デフォルトの保管場所を設定（STORAGE_PLACEベース）
-                self.save_storage_places(base_places)
-                return base_places
-            
-            db_places = json.loads(storage_json)
-            # ベースの項目とデータベースの項目をマージ（重複は除く）
-            all_places = base_places.copy()
-            for place in db_places:
-                if place not in all_places:
-                    all_places.append(place)
-            return all_places
+            return app_settings.storage_places()
         except Exception as e:
             print(f"保管場所リスト取得エラー: {e}")
             # エラー時はSTORAGE_PLACEベースのリストを返す
-            from apps.config import STORAGE_PLACE
-            return [item[0] for item in STORAGE_PLACE]
+            return app_settings.base_storage_places()
     
     def get_find_places(self):
         """拾得場所リストを取得（register_form.pyの_load_find_placesと同期）"""
         try:
-            import json
-            import sqlite3
-            from pathlib import Path
-            DB_PATH = Path(__file__).resolve().parent.parent / "lostitem.db"
-            
-            # register_form.pyと同じ方法でデータベースから取得
-            conn = sqlite3.connect(str(DB_PATH))
-            cur = conn.cursor()
-            
-            # settingsテーブルから拾得場所リストを取得
-            cur.execute("SELECT value FROM settings WHERE key = 'find_places'")
-            result = cur.fetchone()
-            
-            if result:
-                find_places = json.loads(result[0])
-            else:
-                # デフォルトの拾得場所リスト
-                find_places = ["1階 エントランス", "2階 トイレ前", "3階 会議室前"]
-                # デフォルトをデータベースに保存
-                self.save_find_places(find_places)
-            
-            conn.close()
-            return find_places
+            return app_settings.find_places()
         except Exception as e:
             print(f"拾得場所リスト取得エラー: {e}")
             # エラー時はデフォルトリストを返す
-            return ["1階 エントランス", "2階 トイレ前", "3階 会議室前"]
+            return list(app_settings.DEFAULT_FIND_PLACES)
     
     def save_storage_places(self, places):
         """保管場所リストを保存"""
@@ -1170,19 +1075,9 @@ class SettingsView(ft.UserControl):
             print(f"拾得場所保存エラー: {e}")
     
     def save_general_settings(self, settings):
-        """一般設定を保存"""
+        """一般設定を保存（保存後に設定のキャッシュを読み直す）"""
         try:
-            conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
-            cur = conn.cursor()
-            
-            for key, value in settings.items():
-                cur.execute("""
-                    INSERT OR REPLACE INTO settings (key, value, updated_at)
-                    VALUES (?, ?, CURRENT_TIMESTAMP)
-                """, (key, value))
-            
-            conn.commit()
-            conn.close()
+            app_settings.set_many(settings)
             
             if self.page:
                 self.page.snack_bar = ft.SnackBar(ft.Text("設定を保存しました"), bgcolor=ft.colors.GREEN_700)
@@ -1757,7 +1652,7 @@ class SettingsView(ft.UserControl):
     def update_username(self, new_username):
         """ユーザー名を更新"""
         try:
-            conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+            conn = db.connect()
             cur = conn.cursor()
             
             # 同じユーザー名が既に存在するかチェック
@@ -1778,7 +1673,7 @@ class SettingsView(ft.UserControl):
     def update_password(self, current_password, new_password):
         """パスワードを更新"""
         try:
-            conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+            conn = db.connect()
             cur = conn.cursor()
             
             # 現在のパスワードを確認
@@ -1810,7 +1705,7 @@ class SettingsView(ft.UserControl):
             import os
             from datetime import datetime
             
-            conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+            conn = db.connect()
             cur = conn.cursor()
             
             # 拾得物件数を取得
@@ -1847,98 +1742,60 @@ class SettingsView(ft.UserControl):
             }
     
     def create_backup(self):
-        """データベースバックアップを作成"""
-        try:
-            import shutil
-            from datetime import datetime
-            from pathlib import Path
-            
-            # バックアップフォルダを作成
-            backup_dir = Path(__file__).resolve().parent.parent / "data" / "backups" / "database"
-            backup_dir.mkdir(parents=True, exist_ok=True)
-            
-            # バックアップファイル名を生成（日時付き）
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = backup_dir / f"lostitem_backup_{timestamp}.db"
-            
-            # データベースファイルをコピー
-            shutil.copy2(str(DB_PATH), str(backup_file))
-            
-            self.page.snack_bar = ft.SnackBar(
-                ft.Text(f"バックアップを作成しました: {backup_file.name}"),
-                bgcolor=ft.colors.GREEN_700
-            )
+        """データベースバックアップを作成（バックグラウンドで実行）"""
+        from core import backup
+
+        def show(message, color):
+            self.page.snack_bar = ft.SnackBar(ft.Text(message), bgcolor=color)
             self.page.snack_bar.open = True
             self.page.update()
-            
-        except Exception as e:
-            print(f"バックアップ作成エラー: {e}")
-            self.page.snack_bar = ft.SnackBar(
-                ft.Text(f"バックアップ作成エラー: {e}"),
-                bgcolor=ft.colors.RED_700
+
+        def on_done(result):
+            images = result["images"]
+            show(
+                f"バックアップを作成しました: {result['snapshot'].name}（写真 {images['copied']}枚 を追加）",
+                ft.colors.GREEN_700,
             )
-            self.page.snack_bar.open = True
-            self.page.update()
+
+        def on_error(e):
+            show(f"バックアップ作成エラー: {e}", ft.colors.RED_700)
+
+        # 書き込み中でも一貫したスナップショットになるよう、オンラインバックアップ API で少しずつコピーする
+        if backup.start(str(DB_PATH), on_done=on_done, on_error=on_error) is None:
+            show("バックアップを作成中です。完了までお待ちください", ft.colors.ORANGE_700)
+        else:
+            show("バックアップを作成しています...", ft.colors.BLUE_700)
     
     def export_items_data(self):
-        """拾得物データをCSVエクスポート"""
-        try:
-            import csv
-            from datetime import datetime
-            from pathlib import Path
-            
-            # エクスポートフォルダを作成
-            export_dir = Path(__file__).resolve().parent.parent / "data" / "exports"
-            export_dir.mkdir(parents=True, exist_ok=True)
-            
-            # CSVファイル名を生成
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            csv_file = export_dir / f"items_export_{timestamp}.csv"
-            
-            conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
-            cur = conn.cursor()
-            
-            # 拾得物データを取得
-            cur.execute("""
-                SELECT 
-                    item_number, category, subcategory, description, color,
-                    brand, material, size_info, find_location, storage_location,
-                    finder_name, received_date, staff_name, status, notes
-                FROM items
-                ORDER BY received_date DESC
-            """)
-            
-            items = cur.fetchall()
-            
-            # CSVファイルに書き込み
-            with open(csv_file, 'w', newline='', encoding='utf-8-sig') as f:
-                writer = csv.writer(f)
-                # ヘッダー行
-                writer.writerow([
-                    '拾得番号', 'カテゴリ', 'サブカテゴリ', '詳細説明', '色',
-                    'ブランド', '素材', 'サイズ情報', '拾得場所', '保管場所',
-                    '拾得者名', '受付日時', '担当者', 'ステータス', '備考'
-                ])
-                # データ行
-                writer.writerows(items)
-            
-            conn.close()
-            
-            self.page.snack_bar = ft.SnackBar(
-                ft.Text(f"拾得物データをエクスポートしました: {csv_file.name}"),
-                bgcolor=ft.colors.GREEN_700
-            )
-            self.page.snack_bar.open = True
-            self.page.update()
-            
-        except Exception as e:
-            print(f"エクスポートエラー: {e}")
-            self.page.snack_bar = ft.SnackBar(
-                ft.Text(f"エクスポートエラー: {e}"),
-                bgcolor=ft.colors.RED_700
-            )
+        """拾得物データをCSVエクスポート（バックグラウンドで少しずつ書き出す）"""
+        from core import export
+
+        def show(message, color):
+            self.page.snack_bar = ft.SnackBar(ft.Text(message), bgcolor=color)
             self.page.snack_bar.open = True
             self.page.update()
+
+        def on_progress(done, total):
+            show(f"拾得物データをエクスポート中... ({done}/{total}件)", ft.colors.BLUE_700)
+
+        def on_done(result):
+            show(f"拾得物データをエクスポートしました: {result['path'].name}（{result['rows']}件）", ft.colors.GREEN_700)
+
+        def on_error(e):
+            show(f"エクスポートエラー: {e}", ft.colors.RED_700)
+
+        # 削除済み以外のすべての拾得物（返還済み・廃棄/売却済みを含む）
+        started = export.start(
+            "lost_items",
+            on_done=on_done,
+            on_error=on_error,
+            fmt="csv",
+            search_params={"show_refunded": True, "show_disposed": True},
+            on_progress=on_progress,
+            db_path=str(DB_PATH),
+        )
+        if started is None:
+            show("エクスポート中です。完了までお待ちください", ft.colors.ORANGE_700)
     
     def export_users_data(self):
         """ユーザーデータをCSVエクスポート"""
@@ -1955,7 +1812,7 @@ class SettingsView(ft.UserControl):
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             csv_file = export_dir / f"users_export_{timestamp}.csv"
             
-            conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+            conn = db.connect()
             cur = conn.cursor()
             
             # ユーザーデータを取得（パスワードは除外）
@@ -2011,7 +1868,7 @@ class SettingsView(ft.UserControl):
         def delete_old_data(e):
             try:
                 months = int(months_dropdown.value)
-                conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+                conn = db.connect()
                 cur = conn.cursor()
                 
                 # 削除対象のデータ数を確認
@@ -2096,7 +1953,7 @@ class SettingsView(ft.UserControl):
                 return
             
             try:
-                conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+                conn = db.connect()
                 cur = conn.cursor()
                 
                 # 全テーブルのデータを削除（構造は残す）
@@ -2107,6 +1964,7 @@ class SettingsView(ft.UserControl):
                 
                 conn.commit()
                 conn.close()
+                app_settings.invalidate()
                 
                 self.page.dialog.open = False
                 self.page.snack_bar = ft.SnackBar(
@@ -2150,15 +2008,11 @@ class SettingsView(ft.UserControl):
     def show_restore_dialog(self):
         """バックアップ復元ダイアログ"""
         try:
-            from pathlib import Path
+            from core import backup
             
-            # バックアップフォルダからファイル一覧を取得
-            backup_dir = Path(__file__).resolve().parent.parent / "data" / "backups" / "database"
-            backup_files = []
-            
-            if backup_dir.exists():
-                backup_files = [f.name for f in backup_dir.glob("*.db") if f.is_file()]
-                backup_files.sort(reverse=True)  # 新しい順
+            # バックアップフォルダからスナップショットの一覧を取得（新しい順、以前の .db ファイルも含む）
+            backup_dir = DB_BACKUP_DIR
+            backup_files = [f.name for f in backup.list_snapshots(backup_dir)]
             
             if not backup_files:
                 self.page.snack_bar = ft.SnackBar(
@@ -2181,16 +2035,11 @@ class SettingsView(ft.UserControl):
                     return
                 
                 try:
-                    import shutil
-                    
                     backup_file = backup_dir / backup_dropdown.value
                     
-                    # 現在のデータベースをバックアップ
-                    current_backup = backup_dir / f"before_restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-                    shutil.copy2(str(DB_PATH), str(current_backup))
-                    
-                    # バックアップから復元
-                    shutil.copy2(str(backup_file), str(DB_PATH))
+                    # 検証してから、現在のデータベースをバックアップして復元
+                    backup.restore(backup_file, str(DB_PATH), backup_dir)
+                    app_settings.invalidate()
                     
                     self.page.dialog.open = False
                     self.page.snack_bar = ft.SnackBar(
@@ -2278,7 +2127,7 @@ class SettingsView(ft.UserControl):
                     self.page.update()
                     return
                 
-                conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+                conn = db.connect()
                 cur = conn.cursor()
                 
                 imported_count = 0
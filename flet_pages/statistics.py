@@ -1,5 +1,5 @@
 import flet as ft
-import sqlite3
+from core import db, stats
 from pathlib import Path
 from datetime import datetime, timedelta
 import json
@@ -111,7 +111,7 @@ class StatisticsView(ft.UserControl):
     def load_statistics(self):
         """統計データを読み込む"""
         try:
-            conn = sqlite3.connect(str(DB_PATH), timeout=10.0)
+            conn = db.connect()
             cur = conn.cursor()
             
             # 基本統計
@@ -237,60 +237,24 @@ class StatisticsView(ft.UserControl):
         self.chart_area.content = charts
     
     def get_daily_data(self, cur):
-        """日別データを取得"""
-        data = []
-        for i in range(30, -1, -1):
-            date = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-            cur.execute("SELECT COUNT(*) FROM lost_items WHERE DATE(get_item) = ?", (date,))
-            count = cur.fetchone()[0]
-            data.append({"label": date[-5:], "value": count})
-        return data
+        """日別データを取得（過去30日分を1回の集計で取得）"""
+        return stats.daily_series(cur, days=31)
     
     def get_monthly_data(self, cur):
-        """月別データを取得"""
-        data = []
-        for i in range(12, -1, -1):
-            date = (datetime.now() - timedelta(days=i*30)).strftime("%Y-%m")
-            cur.execute("SELECT COUNT(*) FROM lost_items WHERE strftime('%Y-%m', get_item) = ?", (date,))
-            count = cur.fetchone()[0]
-            data.append({"label": date[-5:], "value": count})
-        return data
+        """月別データを取得（過去12ヶ月分を1回の集計で取得）"""
+        return stats.monthly_series(cur, months=13)
     
     def get_yearly_data(self, cur):
         """年別データを取得"""
-        data = []
-        cur.execute("SELECT strftime('%Y', get_item) as year, COUNT(*) FROM lost_items GROUP BY year ORDER BY year")
-        for row in cur.fetchall():
-            if row[0]:
-                data.append({"label": row[0], "value": row[1]})
-        return data
+        return stats.yearly_series(cur)
     
     def get_hourly_distribution(self, cur):
         """時間帯別分布を取得"""
-        data = []
-        for hour in range(0, 24, 3):
-            cur.execute(
-                "SELECT COUNT(*) FROM lost_items WHERE get_item_hour >= ? AND get_item_hour < ?",
-                (hour, hour + 3)
-            )
-            count = cur.fetchone()[0]
-            data.append({"label": f"{hour:02d}-{hour+3:02d}時", "value": count})
-        return data
+        return stats.hourly_distribution(cur, bucket_hours=3)
     
     def get_category_distribution(self, cur):
         """カテゴリ別分布を取得"""
-        cur.execute("""
-            SELECT item_class_L, COUNT(*) 
-            FROM lost_items 
-            WHERE item_class_L IS NOT NULL AND item_class_L != ''
-            GROUP BY item_class_L 
-            ORDER BY COUNT(*) DESC 
-            LIMIT 6
-        """)
-        data = []
-        for row in cur.fetchall():
-            data.append({"label": row[0] or "未分類", "value": row[1]})
-        return data
+        return stats.category_distribution(cur, limit=6)
     
     def create_line_chart(self, data):
         """折れ線グラフを作成（シンプルな棒グラフで代用）"""
@@ -390,23 +354,53 @@ class StatisticsView(ft.UserControl):
         
         return ft.Column(items, spacing=8)
     
+    def period_range(self, period=None):
+        """期間（省略時は選択中の期間）の今日・今月・今年の開始日と終了日"""
+        period = period or self.period
+        today = datetime.now().date()
+        if period == "day":
+            return today, today
+        if period == "year":
+            return today.replace(month=1, day=1), today.replace(month=12, day=31)
+        start = today.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return start, end
+
+    def start_export(self, fmt, start, end, label):
+        """拾得物をバックグラウンドでエクスポート（進み具合と結果はスナックバーで表示）"""
+        from core import export
+
+        def show(message, color):
+            if self.page:
+                self.page.snack_bar = ft.SnackBar(ft.Text(message), bgcolor=color)
+                self.page.snack_bar.open = True
+                self.page.update()
+
+        started = export.start(
+            "lost_items",
+            on_done=lambda result: show(
+                f"{label}を出力しました: {result['path'].name}（{result['rows']}件）", ft.colors.GREEN_700
+            ),
+            on_error=lambda ex: show(f"{label}の出力エラー: {ex}", ft.colors.RED_700),
+            fmt=fmt,
+            search_params={
+                "start_date": start.isoformat(),
+                "end_date": end.isoformat(),
+                "show_refunded": True,
+                "show_disposed": True,
+            },
+            on_progress=lambda done, total: show(f"{label}を出力中... ({done}/{total}件)", ft.colors.BLUE_700),
+            db_path=str(DB_PATH),
+        )
+        if started is None:
+            show("エクスポート中です。完了までお待ちください", ft.colors.ORANGE_700)
+
     def export_monthly_report(self, e):
-        """月次レポートを出力"""
-        if self.page:
-            self.page.snack_bar = ft.SnackBar(
-                ft.Text("月次レポート出力機能は開発中です"),
-                bgcolor=ft.colors.ORANGE_700
-            )
-            self.page.snack_bar.open = True
-            self.page.update()
+        """今月の拾得物の一覧を Excel で出力"""
+        start, end = self.period_range("month")
+        self.start_export("xlsx", start, end, f"{start.year}年{start.month}月の月次レポート")
     
     def export_csv(self, e):
-        """CSVエクスポート"""
-        if self.page:
-            self.page.snack_bar = ft.SnackBar(
-                ft.Text("CSVエクスポート機能は開発中です"),
-                bgcolor=ft.colors.ORANGE_700
-            )
-            self.page.snack_bar.open = True
-            self.page.update()
-
+        """選択中の期間の拾得物を CSV でエクスポート"""
+        start, end = self.period_range()
+        self.start_export("csv", start, end, "CSV")
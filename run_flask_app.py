@@ -31,6 +31,12 @@ def main():
         db.create_all()
         print("データベースを初期化しました")
     
+    # 画像認識用のYOLOモデルをバックグラウンドで読み込む
+    # （デバッグモードの自動再読み込みでは、サーバーを実行する子プロセスだけで読み込む）
+    if not app.debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        from core import inference
+        inference.warm_up(inference.FLASK_MODEL_CANDIDATES)
+    
     print("=" * 50)
     print("アプリケーションが起動しました")
     print("ブラウザで http://localhost:5000 にアクセスしてください")
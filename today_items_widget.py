@@ -12,6 +12,8 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QFont, QPixmap, QIcon
 
+from core import thumbnails
+
 class TodayItemsWidget(QWidget):
     """本日の拾得物一覧ウィジェット"""
     
@@ -128,7 +130,9 @@ class TodayItemsWidget(QWidget):
         # 写真がある場合は表示
         if item.get('item_image'):
             try:
-                pixmap = QPixmap(item['item_image'])
+                # 元の写真ではなく表示の大きさに合ったサムネイルを読む（作れない場合は元の写真）
+                path = thumbnails.thumbnail_path(item['item_image'], 180) or item['item_image']
+                pixmap = QPixmap(str(path))
                 if not pixmap.isNull():
                     pixmap = pixmap.scaled(180, 120, Qt.KeepAspectRatio, Qt.SmoothTransformation)
                     photo_label.setPixmap(pixmap)